@@ -77,11 +77,11 @@ setup(
     python_requires='>=3.6',
     install_requires=[
         'tqdm>=4.56.0',
-        'pandas>=1.2.0',
-        'xmltodict>=0.12.0',
-        'weightedstats>=0.4.1'
+        'pandas>=1.2.0'
     ],
-    extras_require={},
+    extras_require={
+        'parquet': ['pyarrow'],
+    },
     entry_points={
         # 'console_scripts': [
         #     'rcv-cruncher = rcv_cruncher.cli:main',
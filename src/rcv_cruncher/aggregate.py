@@ -0,0 +1,118 @@
+from __future__ import annotations
+from typing import (Any, Dict, List, Optional, Tuple)
+
+import os
+import pathlib
+import pickle
+import shutil
+
+import pandas as pd
+
+import rcv_cruncher.util as util
+
+from rcv_cruncher.writers import CSVTableWriter
+
+SPOOL_DIR = '.stats_spool'
+
+
+def fv_db_columns(group: str) -> Optional[List[str]]:
+    """
+    Column order of the fvDB format for an rcv group, None if the package has no format file for it.
+    """
+    format_fpath = f"{os.path.dirname(__file__)}/extra/fv_db_format/{group}_columns.csv"
+    if not os.path.isfile(format_fpath):
+        return None
+    return pd.read_csv(format_fpath)['cruncher_col'].tolist()
+
+
+class StatsSink:
+    """
+    Aggregated stats files of a results directory, built one contest at a time.
+
+    Each contest's stats rows are appended to an on-disk spool per output as soon as they are added, so memory
+    does not grow with the number of contests. On close(), each output is written in order of the keys the rows
+    were added with (e.g. contest set position), whatever order they arrived in. Its columns are the union of the
+    columns of all its rows, in order of first appearance, and rows without a column are left empty.
+
+    Written outputs follow the run config: group_{group}.csv (per_rcv_group_stats),
+    group_{group}_fvDBfmt.csv (per_rcv_group_stats_fvDBfmt) and {variant}.csv (per_rcv_type_stats).
+    """
+
+    def __init__(self, results_dir: pathlib.Path, run_config: Dict) -> None:
+
+        self.results_dir = pathlib.Path(results_dir)
+        self.run_config = run_config
+
+        self._spool_dir = self.results_dir / SPOOL_DIR
+        if self._spool_dir.exists():
+            shutil.rmtree(util.longname(self._spool_dir))
+
+        # (kind, name) -> (spool file, {key: [(offset, columns)]})
+        self._spools = {}
+
+    def __enter__(self) -> StatsSink:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def add(self, key: Any, variant: str, variant_group: str, df: pd.DataFrame) -> None:
+        """
+        Append the stats rows of one contest, sorted into the outputs by key.
+        """
+        if self.run_config.get('per_rcv_group_stats') or self.run_config.get('per_rcv_group_stats_fvDBfmt'):
+            self._append(('group', variant_group), key, df)
+
+        if self.run_config.get('per_rcv_type_stats'):
+            self._append(('variant', variant), key, df)
+
+    def _append(self, output: Tuple[str, str], key: Any, df: pd.DataFrame) -> None:
+
+        if output not in self._spools:
+            self._spool_dir.mkdir(parents=True, exist_ok=True)
+            spool_file = open(util.longname(self._spool_dir / f'{output[0]}_{output[1]}.pkl'), 'w+b')
+            self._spools[output] = (spool_file, {})
+
+        spool_file, index = self._spools[output]
+        index.setdefault(key, []).append((spool_file.tell(), list(df.columns)))
+        pickle.dump(df, spool_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _write_output(self, output: Tuple[str, str], path: pathlib.Path, columns: Optional[List[str]] = None) -> None:
+
+        spool_file, index = self._spools[output]
+        chunks = [chunk for key in sorted(index) for chunk in index[key]]
+
+        if columns is None:
+            columns = list(dict.fromkeys(col for _, chunk_columns in chunks for col in chunk_columns))
+
+        spool_file.flush()
+        with CSVTableWriter(util.longname(path)) as writer:
+            for offset, _ in chunks:
+                spool_file.seek(offset)
+                writer.write(pickle.load(spool_file).reindex(columns=columns))
+
+    def close(self) -> None:
+        """
+        Write the outputs and remove the spool.
+        """
+        try:
+            for output in sorted(self._spools):
+                kind, name = output
+
+                if kind == 'group':
+                    if self.run_config.get('per_rcv_group_stats'):
+                        self._write_output(output, self.results_dir / f'group_{name}.csv')
+
+                    fmt_order = fv_db_columns(name) if self.run_config.get('per_rcv_group_stats_fvDBfmt') else None
+                    if fmt_order is not None:
+                        self._write_output(output, self.results_dir / f'group_{name}_fvDBfmt.csv', columns=fmt_order)
+
+                else:
+                    self._write_output(output, self.results_dir / f'{name}.csv')
+
+        finally:
+            for spool_file, _ in self._spools.values():
+                spool_file.close()
+            self._spools = {}
+            if self._spool_dir.exists():
+                shutil.rmtree(util.longname(self._spool_dir))
@@ -0,0 +1,146 @@
+from __future__ import annotations
+from typing import (Any, Dict, List, Tuple)
+
+import decimal
+import json
+import re
+
+import numpy as np
+
+from rcv_cruncher.encoded import (EncodedField, EncodedRanks)
+
+# schema metadata key holding the cvr id info and the names of the rank columns
+METADATA_KEY = b'rcv_cruncher'
+
+_RANK_COLUMN = re.compile(r'^rank(\d+)$')
+
+
+def import_pyarrow() -> Tuple[Any, Any]:
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as err:
+        raise RuntimeError('arrow and parquet support requires pyarrow. '
+                           'install it with "pip install rcv_cruncher[parquet]"') from err
+    return pyarrow, pyarrow.parquet
+
+
+def _index_dtype(n_labels: int) -> np.dtype:
+    # arrow dictionary indices are signed
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_labels <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def ranks_to_arrow(ranks: EncodedRanks) -> Dict[str, Any]:
+    """
+    One dictionary-encoded string column per rank ('rank1', 'rank2', ...). Every column has the label
+    table of ranks as its dictionary and the encoded ranks as its indices.
+    """
+    pa, _ = import_pyarrow()
+
+    codes = ranks.codes
+    dictionary = pa.array(ranks.labels, type=pa.string())
+    indices = codes.astype(_index_dtype(len(ranks.labels)))
+
+    return {f'rank{i + 1}': pa.DictionaryArray.from_arrays(np.ascontiguousarray(indices[:, i]), dictionary)
+            for i in range(codes.shape[1])}
+
+
+def field_to_arrow(name: str, values: Any) -> Any:
+    """
+    Arrow array for a parsed cvr field. An EncodedField becomes a dictionary-encoded column with its codes as
+    indices (missing values are null). Numeric numpy arrays are wrapped without copying.
+    """
+    pa, _ = import_pyarrow()
+    try:
+        if not isinstance(values, EncodedField):
+            return pa.array(values)
+
+        codes = values.codes.astype(np.int64)
+        dictionary = values.values
+        mask = None
+
+        # parquet cannot store nulls in a dictionary, so the missing value is dropped from it and masked instead
+        missing = values.missing_code
+        if missing is not None:
+            del dictionary[missing]
+            mask = codes == missing
+            codes = codes - (codes > missing)
+            codes[mask] = 0
+
+        indices = codes.astype(_index_dtype(len(dictionary)))
+        return pa.DictionaryArray.from_arrays(indices, pa.array(dictionary), mask=mask)
+
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as err:
+        raise RuntimeError(f'parsed cvr field "{name}" cannot be converted to an arrow column.') from err
+
+
+def rank_columns(table: Any) -> List[str]:
+    """
+    Names of the rank columns of table, from the schema metadata if present, otherwise the
+    columns named 'rank1', 'rank2', ... in rank order.
+    """
+    metadata = table_metadata(table)
+    if 'rank_columns' in metadata:
+        return metadata['rank_columns']
+
+    numbered = [(int(m.group(1)), name) for name in table.column_names for m in [_RANK_COLUMN.match(name)] if m]
+    return [name for _, name in sorted(numbered)]
+
+
+def table_metadata(table: Any) -> Dict[str, Any]:
+    metadata = table.schema.metadata or {}
+    if METADATA_KEY not in metadata:
+        return {}
+    return json.loads(metadata[METADATA_KEY])
+
+
+def ranks_from_arrow(table: Any, columns: List[str]) -> EncodedRanks:
+    """
+    EncodedRanks from the rank columns of table. Dictionary-encoded columns are mapped into the label table
+    through their dictionaries, other columns are dictionary-encoded first. Null marks are read as skipped.
+    """
+    pa, _ = import_pyarrow()
+
+    if not columns:
+        raise RuntimeError('arrow table has no rank columns.')
+
+    ranks = EncodedRanks()
+    rank_codes = np.empty((table.num_rows, len(columns)), dtype=np.int64)
+
+    for i, name in enumerate(columns):
+
+        column = table.column(name).combine_chunks()
+        if not pa.types.is_dictionary(column.type):
+            column = column.dictionary_encode()
+
+        lookup = ranks.encode_labels(column.dictionary.to_pylist())
+        indices = column.indices.fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64)
+        col_codes = lookup[indices] if len(lookup) else np.zeros(len(indices), dtype=np.int64)
+
+        null = column.is_null().to_numpy(zero_copy_only=False)
+        col_codes[null] = EncodedRanks.SKIPPED_CODE
+        rank_codes[:, i] = col_codes
+
+    ranks.append_codes(rank_codes)
+    return ranks
+
+
+def weights_to_arrow(weights: List[decimal.Decimal]) -> Any:
+    """
+    Decimal column of the weights, with the smallest precision and scale that hold them all exactly.
+    """
+    pa, _ = import_pyarrow()
+    return pa.array(list(weights))
+
+
+def weights_from_arrow(column: Any) -> List[decimal.Decimal]:
+    """
+    Decimal weights from a decimal (exact) or numeric column.
+    """
+    pa, _ = import_pyarrow()
+    if pa.types.is_decimal(column.type):
+        return column.to_pylist()
+    return [decimal.Decimal(str(w)) for w in column.to_pylist()]
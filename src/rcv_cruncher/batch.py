@@ -1,728 +1,1152 @@
+from __future__ import annotations
+from typing import (Any, Dict, Iterable, List, Optional, Tuple)
+
+import abc
+import collections
+import concurrent.futures
+import datetime
+import json
+import os
+import pathlib
+import pickle
+import shutil
+import time
+
+import pandas as pd
+import tqdm
+
+import rcv_cruncher.parsers as parsers
+import rcv_cruncher.util as util
+
+from rcv_cruncher import __version__
+from rcv_cruncher.aggregate import StatsSink
+from rcv_cruncher.checkpoint import Checkpoint
+from rcv_cruncher.encoded import (ParsedCVRBuilder, iter_parsed_batches)
+from rcv_cruncher.manifest import (RunManifest, contest_hash)
+from rcv_cruncher.scheduling import (MemoryEstimator, WorkerFailure, input_bytes, parser_name, peak_rss,
+                                     run_in_processes)
+from rcv_cruncher.telemetry import TelemetryLog
+from rcv_cruncher.rcv.base import RCV
+from rcv_cruncher.rcv.variants import get_rcv_dict
+from rcv_cruncher.workqueue import run_in_queue
+from rcv_cruncher.writers import (QueuedTableWriter, WriterPool)
+
+# read functions in parsers and rcv_variants
+rcv_dict = get_rcv_dict()
+parser_dict = parsers.get_parser_dict()
+
+# contest_set.csv columns and the RCV constructor arguments they are passed as
+CONTEST_RCV_ARGS = {
+    'jurisdiction': 'jurisdiction',
+    'state': 'state',
+    'year': 'year',
+    'date': 'date',
+    'office': 'office',
+    'notes': 'notes',
+    'exhaust_on_overvote': 'exhaust_on_overvote_marks',
+    'exhaust_on_repeated_skipped_rankings': 'exhaust_on_repeated_skipped_marks',
+    'exhaust_on_duplicate_rankings': 'exhaust_on_duplicate_candidate_marks',
+    'exclude_writeins': 'exclude_writein_marks',
+    'combine_writeins': 'combine_writein_marks',
+    'treat_combined_writeins_as_duplicates': 'treat_combined_writeins_as_exhaustable_duplicates',
+    'num_winners': 'n_winners',
+    'multi_winner_rounds': 'multi_winner_rounds'
+}
+
+# run_config.txt options whose output tables are not yet available in the package
+UNAVAILABLE_OUTPUTS = [
+    'candidate_details',
+    'round_by_round',
+    'ballot_stats_debug',
+    'cvr_ballot_allocation_rank_format',
+    'cvr_ballot_allocation_candidate_format',
+    'first_choice_to_finalist',
+    'condorcet',
+    'first_second_choices',
+    'cumulative_rankings',
+    'rank_usage',
+    'crossover_support'
+]
+
+ERROR_LOG_HEADER = ['contest', 'split_id', 'cruncher_step', 'message']
+STEP_LOG_HEADER = ['contest', 'split_id', 'cruncher_step', 'seconds']
+
+
+# typecast functions
+def cast_str(s: str) -> Optional[str]:
+    """
+    If string-in-string '"0006"', evaluate to '0006'
+    If 'None', return None
+    else, return str() result
+    """
+    s = str(s)
+    if len(s) > 1 and ((s[0] == '"' and s[-1] == '"') or (s[0] == "'" and s[-1] == "'")):
+        return s[1:-1]
+    elif s == 'None':
+        return None
+    else:
+        return s
+
+
+def cast_int(s: Any) -> int:
+    if isinstance(s, int):
+        return s
+    return int(s)
+
+
+def cast_bool(s: Any) -> bool:
+    if isinstance(s, bool):
+        return s
+    if str(s).title() not in ('True', 'False'):
+        raise RuntimeError(f'invalid boolean value "{s}". Must be "true" or "false".')
+    return str(s).title() == 'True'
+
+
+def cast_list(lst: str) -> List[str]:
+    if lst == "":
+        return []
+    return lst.strip('\n').split(",")
+
+
+def cast_dict(dct: str) -> Dict[str, str]:
+    dct_return = {}
+    if dct == "":
+        return dct_return
+    comma_split = dct.strip("\n").split(",")
+    for i in comma_split:
+        equal_split = i.split("=")
+        dct_return.update({equal_split[0]: "=".join(equal_split[1:])})
+    return dct_return
+
+
+def cast_func(s: str) -> Any:
+    """
+    The rcv variant class or parser function named s, None if there is none.
+    """
+    if s in rcv_dict and s in parser_dict:
+        raise RuntimeError('(developer error) An rcv variant class and a parser function share the same name. Make them unique.')
+
+    if s in rcv_dict:
+        return rcv_dict[s]
+
+    if s in parser_dict:
+        return parser_dict[s]
+
+    return None
+
+
+def _read_settings(file_name: str) -> Dict:
+    settings_fpath = f'{os.path.dirname(__file__)}/{file_name}'
+    if os.path.isfile(settings_fpath) is False:
+        raise RuntimeError(f'(developer error) Looking for {file_name}. Not a valid file path: {settings_fpath}')
 
-# import json
-# import os
-# import pathlib
-# import re
-# import shutil
-# import pkg_resources
-# import collections
-# import datetime
-# import abc
+    with open(settings_fpath) as settings_file:
+        return json.load(settings_file)
 
-# import pandas as pd
-# import tqdm
 
-# import rcv_cruncher.parsers as parsers
-# import rcv_cruncher.rcv_base as rcv_base
-# import rcv_cruncher.rcv_variants as rcv_variants
-# import rcv_cruncher.util as util
-# import rcv_cruncher.write_out as write_out
+def read_run_config(run_config_fpath: pathlib.Path) -> Dict:
+    """
+    Read run_config.txt, lines of "option = value". Unknown options are ignored and missing options get
+    their defaults from run_config_settings.json.
+    """
+    run_config_settings = _read_settings('run_config_settings.json')
 
+    if os.path.isfile(run_config_fpath) is False:
+        raise RuntimeError(f'not a valid file path: {run_config_fpath}')
 
-# # read functions in parsers and rcv_variants
-# rcv_dict = rcv_variants.get_rcv_dict()
-# parser_dict = parsers.get_parser_dict()
+    run_config = {}
+    with open(run_config_fpath) as run_config_file:
+        for line_num, line in enumerate(run_config_file, start=1):
 
+            l_splits = [s.strip() for s in line.strip('\n').split("=")]
 
-# @staticmethod
-# def new_rcv_contest(contest_dict: Dict) -> Type[RCV]:
-#     """
-#     Pass in a dictionary and run the constructor function stored within it
-#     """
-#     param_names = inspect.signature(contest_dict['rcv_type'].__init__)
-#     param_dict = {k: v for k, v in contest_dict.items() if k in param_names}
-#     return contest_dict['rcv_type'](**param_dict)
+            if len(l_splits) < 2:
+                continue
 
+            input_option = l_splits[0]
+            input_value = "=".join(l_splits[1:])
 
-# def dummy(*args):
-#     pass
+            if input_option not in run_config_settings:
+                continue
 
+            if run_config_settings[input_option]['type'] == "bool":
+                if input_value.title() != "True" and input_value.title() != "False":
+                    raise RuntimeError(f'invalid value ({input_value}) provided in run_config.txt'
+                                       f'on line {line_num} for option "{l_splits[0]}". Must be "true" or "false".')
+                input_value = input_value.title() == "True"
 
-# # typecast functions
-# def cast_str(s):
-#     """
-#     If string-in-string '"0006"', evaluate to '0006'
-#     If 'None', return None (since this string cannot be evaluated)
-#     else, return str() result
-#     """
-#     if (s[0] == '"' and s[-1] == '"') or (s[0] == "'" and s[-1] == "'"):
-#         return eval(s)
-#     elif s == 'None':
-#         return None
-#     else:
-#         return str(s)
+            run_config.update({input_option: input_value})
 
+    # add in defaults for missing options
+    for field in run_config_settings:
+        if field not in run_config:
+            run_config.update({field: run_config_settings[field]['default']})
 
-# def cast_int(s):
-#     if isinstance(s, int):
-#         return s
-#     return int(s)
+    run_config['cvr_path_root'] = pathlib.Path(run_config['cvr_path_root'])
+    run_config['run_config_file_path'] = run_config_fpath
 
+    return run_config
 
-# def cast_bool(s):
-#     if isinstance(s, bool):
-#         return s
-#     return eval(s.title())
 
+def read_contest_set(contest_set_path: str, override_cvr_root_dir: Optional[str] = None) -> Tuple[List[Dict], Dict]:
+    """
+    Read contest_set.csv and run_config.txt from the contest set directory.
 
-# def cast_list(lst):
-#     if lst == "":
-#         return []
-#     return lst.strip('\n').split(",")
+    Returns a list of contest dictionaries, one per row of contest_set.csv that is not ignored and has
+    a valid parser, and the run config dictionary.
+    """
+    contest_set_path = pathlib.Path(contest_set_path)
 
+    # assemble typecast funcs
+    cast_funcs = {'str': cast_str, 'int': cast_int, 'dict': cast_dict,
+                  'bool': cast_bool, 'func': cast_func, 'list': cast_list}
 
-# def cast_dict(dct):
-#     dct_return = {}
-#     if dct == "":
-#         return dct_return
-#     comma_split = dct.strip("\n").split(",")
-#     for i in comma_split:
-#         equal_split = i.split("=")
-#         dct_return.update({equal_split[0]: "=".join(equal_split[1:])})
-#     return dct_return
+    contest_set_settings = _read_settings('contest_set_settings.json')
+    run_config = read_run_config(contest_set_path / 'run_config.txt')
 
+    # read contest_set.csv
+    contest_set_fpath = contest_set_path / 'contest_set.csv'
+    if os.path.isfile(contest_set_fpath) is False:
+        raise RuntimeError(f'not a valid file path: {contest_set_fpath}')
 
-# def cast_func(s):
+    contest_set_df = pd.read_csv(contest_set_fpath, dtype=object)
 
-#     if s in rcv_dict and s in parser_dict:
-#         raise RuntimeError('(developer error) An rcv variant class and a parser function share the same name. Make them unique.')
+    # add in default values for missing columns
+    for setting in contest_set_settings:
+        if setting not in contest_set_df.columns:
+            contest_set_df[setting] = contest_set_settings[setting]['default']
 
-#     if s in rcv_dict:
-#         return rcv_dict[s]
+    # fill in na values with defaults and evaluate column, if indicated
+    for col in contest_set_df:
 
-#     if s in parser_dict:
-#         return parser_dict[s]
+        if col not in contest_set_settings:
+            print(f'info -- "{col}" is an unrecognized column in contest_set.csv, it will be ignored.')
+        else:
+            contest_set_df[col] = contest_set_df[col].fillna(contest_set_settings[col]['default'])
+            contest_set_df[col] = [cast_funcs[contest_set_settings[col]['type']](i) for i in contest_set_df[col].tolist()]
 
+    contest_set_df['contest_set_path'] = contest_set_path
 
-# # other helpers
-# # def dop(ctx):
-# #     return '_'.join([ctx['year'], ctx['place'], ctx['office']])
+    # convert df to listOdicts, one dict per row
+    competitions = contest_set_df.to_dict('records')
 
-# def unique_id(ctx):
-#     filled_date = "/".join([piece if len(piece) > 1 else "0" + piece for piece in ctx['date'].split("/")])
-#     pieces = [ctx['jurisdiction'], filled_date, ctx['office']]
-#     cleaned_pieces = [re.sub('[^0-9a-zA-Z_]+', '', x) for x in pieces]
-#     return "_".join(cleaned_pieces)
+    cvr_path_root = pathlib.Path(override_cvr_root_dir) if override_cvr_root_dir else run_config['cvr_path_root']
 
-# def read_contest_set(contest_set_path, override_cvr_root_dir=None):
+    for d in competitions:
 
-#     contest_set_path = pathlib.Path(contest_set_path)
+        if d['cvr_path']:
+            d['cvr_path'] = cvr_path_root / d['cvr_path']
 
-#     # assemble typecast funcs
-#     cast_dict = {'str': cast_str, 'int': cast_int, 'dict': cast_dict,
-#                  'bool': cast_bool, 'func': cast_func, 'list': cast_list}
+        d['parser_args'] = {'cvr_path': d['cvr_path']}
+        d['parser_args'].update(d['extra_parser_args'])
 
-#     # settings/defaults
-#     contest_set_settings_fpath = f'{os.path.dirname(__file__)}/contest_set_settings.json'
-#     if os.path.isfile(contest_set_settings_fpath) is False:
-#         raise RuntimeError(f'(developer error) Looking for contest_set_settings.json. Not a valid file path: {contest_set_settings_fpath}')
+        if d['candidate_map']:
+            d['candidate_map'] = cvr_path_root / d['candidate_map']
 
-#     with open(contest_set_settings_fpath) as contest_set_settings_file:
-#         contest_set_settings = json.load(contest_set_settings_file)
+        d['uid'] = util.unique_id(jurisdiction=d['jurisdiction'], date=d['date'], year=d['year'], office=d['office'])
+        d['split_id'] = ''
 
-#     run_config_settings_fpath = f'{os.path.dirname(__file__)}/run_config_settings.json'
-#     if os.path.isfile(run_config_settings_fpath) is False:
-#         raise RuntimeError(f'(developer error) Looking for run_config_settings.json. Not a valid file path: {run_config_settings_fpath}')
+    # remove contest that should be ignored
+    competitions = [comp for comp in competitions if not comp['ignore_contest']]
 
-#     with open(run_config_settings_fpath) as run_config_settings_file:
-#         run_config_settings = json.load(run_config_settings_file)
+    # remove contests with invalid parser, print warning.
+    valid_competitions = [comp for comp in competitions if comp['parser'] is not None]
+    if len(valid_competitions) < len(competitions):
+        print(f'info -- {len(competitions) - len(valid_competitions)} contests in contest_set.csv did not '
+              'include a valid cvr parser field. They will be ignored.')
 
-#     # read run_config.txt
-#     run_config_fpath = contest_set_path / 'run_config.txt'
-#     if os.path.isfile(run_config_fpath) is False:
-#         raise RuntimeError(f'not a valid file path: {run_config_fpath}')
+    # store file locations
+    run_config['contest_set_file_path'] = contest_set_fpath
 
-#     run_config = {}
-#     with open(run_config_fpath) as run_config_file:
-#         for line_num, l in enumerate(run_config_file, start=1):
+    return valid_competitions, run_config
 
-#             l_splits = l.strip('\n').split("=")
-#             l_splits = [s.strip() for s in l_splits]
 
-#             if len(l_splits) < 2:
-#                 continue
+def encode_parsed_cvr(parsed: Dict) -> Dict:
+    """
+    Encode a parser's output, which may be yielded in batches.
+    """
+    builder = ParsedCVRBuilder()
+    for batch in iter_parsed_batches(parsed):
+        builder.add_batch(batch)
+    return builder.result()
 
-#             input_option = l_splits[0]
-#             input_value = l_splits[1]
 
-#             if input_option not in run_config_settings:
-#                 continue
+def parse_contest_cvr(contest: Dict) -> Dict:
+    """
+    Run the contest's parser and encode its output, which may be yielded in batches.
+    """
+    return encode_parsed_cvr(contest['parser'](**contest['parser_args']))
 
-#             if run_config_settings[input_option]['type'] == "bool":
-#                 if input_value.title() != "True" and input_value.title() != "False":
-#                     raise RuntimeError(f'invalid value ({input_value}) provided in run_config.txt'
-#                                        f'on line {line_num} for option "{l_splits[0]}". Must be "true" or "false".')
-#                 input_value = eval(input_value.title())
 
-#             run_config.update({input_option: input_value})
+def _write_parsed_cvr_cache(cache_path: pathlib.Path, parsed_cvr: Dict) -> None:
+    # write then rename, so a killed run never leaves a partial cache behind
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as cache_file:
+        pickle.dump(parsed_cvr, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
 
-#     # add in defaults for missing options
-#     for field in run_config_settings:
-#         if field not in run_config:
-#             run_config.update({field: run_config_settings[field]['default']})
 
-#     run_config['cvr_path_root'] = pathlib.Path(run_config['cvr_path_root'])
+def load_or_parse_contest_cvr(contest: Dict) -> Dict:
+    """
+    Parsed cvr of the contest. If the contest has a 'parsed_cvr_cache' path, the parsed cvr is read from it
+    when it exists, and written to it after parsing otherwise, so a resumed run does not parse again.
+    """
+    cache_path = contest.get('parsed_cvr_cache')
+    if cache_path is None:
+        return parse_contest_cvr(contest)
 
-#     # read contest_set.csv
-#     contest_set_fpath = contest_set_path / 'contest_set.csv'
-#     if os.path.isfile(contest_set_fpath) is False:
-#         raise RuntimeError(f'not a valid file path: {contest_set_fpath}')
+    cache_path = pathlib.Path(cache_path)
+    if cache_path.is_file():
+        with open(cache_path, 'rb') as cache_file:
+            return pickle.load(cache_file)
 
-#     contest_set_df = pd.read_csv(contest_set_fpath, dtype=object)
+    parsed_cvr = parse_contest_cvr(contest)
+    _write_parsed_cvr_cache(cache_path, parsed_cvr)
+    return parsed_cvr
 
-#     # add in default values for missing columns
-#     for setting in contest_set_settings:
-#         if setting not in contest_set_df.columns:
-#             contest_set_df[setting] = contest_set_settings[setting]['default']
 
-#     # fill in na values with defaults and evaluate column, if indicated
-#     for col in contest_set_df:
+def parse_office_group(contest: Dict, offices: List[Optional[str]], office_parses: Dict) -> Dict:
+    """
+    Parsed cvr of the contest, read in one pass with those of the other offices of its cvr by the parser's
+    multi-office reader (see :data:`rcv_cruncher.parsers.multi_office_parsers`). Every office's parsed cvr
+    is stored in office_parses, {office: parsed cvr}. If the multi-office read fails, the contest's cvr is
+    parsed alone (see :func:`load_or_parse_contest_cvr`) and office_parses is left as it was.
+    """
+    parser_args = {k: v for k, v in contest['parser_args'].items() if k != 'office'}
+    read_offices = parsers.multi_office_parsers[contest['parser']]
+    try:
+        office_cvrs = {office: encode_parsed_cvr(parsed)
+                       for office, parsed in read_offices(offices=offices, **parser_args).items()}
+    except Exception:
+        # another office may be the one failing, so it does not fail this contest
+        return load_or_parse_contest_cvr(contest)
 
-#         if col not in contest_set_settings:
-#             print(f'info -- "{col}" is an unrecognized column in contest_set.csv, it will be ignored.')
-#         else:
-#             contest_set_df[col] = contest_set_df[col].fillna(contest_set_settings[col]['default'])
-#             contest_set_df[col] = [cast_dict[contest_set_settings[col]['type']](i) for i in contest_set_df[col].tolist()]
+    office_parses.update(office_cvrs)
+    parsed_cvr = office_cvrs[contest['parser_args'].get('office')]
 
-#     contest_set_df['contest_set_path'] = contest_set_path
+    cache_path = contest.get('parsed_cvr_cache')
+    if cache_path is not None:
+        _write_parsed_cvr_cache(pathlib.Path(cache_path), parsed_cvr)
+    return parsed_cvr
 
-#     # convert df to listOdicts, one dict per row
-#     competitions = contest_set_df.to_dict('records')
 
-#     # add dop, uid, cvr_path_root
-#     for d in competitions:
-
-#         if override_cvr_root_dir:
-#             d['cvr_path'] = pathlib.Path(override_cvr_root_dir) / d['cvr_path']
-#         else:
-#             d['cvr_path'] = run_config['cvr_path_root'] / d['cvr_path']
-
-#         d['parser_args'] = {'cvr_path': d['cvr_path']}
-#         d['parser_args'].update(d['extra_parser_args'])
-
-#         if d['candidate_map']:
-#             d['candidate_map'] = run_config['cvr_path_root'] / d['candidate_map']
-
-#         d['uid'] = util.unique_id(d)
-
-#     # remove contest that should be ignored
-#     competitions = [comp for comp in competitions if not comp.get('ignore_contest', True)]
-
-#     # remove contests with invalid parser, print warning.
-#     no_parser = []
-#     for comp in competitions:
-#         if comp['parser'] == dummy:
-#             no_parser.append(comp)
-
-#     no_parser_uniqueID = [comp['uid'] for comp in no_parser]
-#     valid_competitions = [comp for comp in competitions if comp['uid'] not in no_parser_uniqueID]
-
-#     if no_parser:
-#         print(f'info -- {len(no_parser)} contests in contest_set.csv did not include a valid cvr parser field. They will be ignored.')
-
-#     # store file locations
-#     run_config['contest_set_file_path'] = contest_set_fpath
-#     run_config['run_config_file_path'] = run_config_fpath
-
-#     return valid_competitions, run_config
-
-
-# def write_aggregated_stats(results_dir,
-#                            output_config,
-#                            rcv_group_stats_df_dict,
-#                            rcv_variant_stats_df_dict,
-#                            candidate_details_dfs,
-#                            quiet=False):
-
-#     if not quiet:
-#         print("####################")
-#         print("Write stored results")
-
-#     if output_config.get('per_rcv_group_stats', False):
-
-#         if not quiet:
-#             print("write group stats ...")
-
-#         for group in rcv_group_stats_df_dict:
-#             if rcv_group_stats_df_dict[group]:
-#                 df = pd.concat(rcv_group_stats_df_dict[group], axis=0, ignore_index=True, sort=False)
-#                 df.to_csv(util.longname(results_dir / f'group_{group}.csv'), index=False)
-
-#     if output_config.get('per_rcv_group_stats_fvDBfmt', False):
-
-#         if not quiet:
-#             print("write group stats in fvDB order ...")
-
-#         for group in rcv_group_stats_df_dict:
-#             format_fpath = f"extra/fv_db_format/{group}_columns.csv"
-#             if rcv_group_stats_df_dict[group] and os.path.isfile(format_fpath):
-
-#                 # read in column order
-#                 fmt_df = pd.read_csv(format_fpath)
-#                 fmt_order = fmt_df['cruncher_col'].tolist()
-
-#                 df = pd.concat(rcv_group_stats_df_dict[group], axis=0, ignore_index=True, sort=False)
-#                 df = df.reindex(fmt_order, axis=1)
-#                 df.to_csv(util.longname(results_dir / f'group_{group}_fvDBfmt.csv'), index=False)
-
-#     if output_config.get('per_rcv_type_stats', False):
-
-#         if not quiet:
-#             print("Write tabulation stats ...")
-
-#         for variant in rcv_variant_stats_df_dict:
-#             if rcv_variant_stats_df_dict[variant]:
-#                 df = pd.concat(rcv_variant_stats_df_dict[variant], axis=0, ignore_index=True, sort=False)
-#                 df.to_csv(util.longname(results_dir / f'{variant}.csv'), index=False)
-
-#     if output_config.get('candidate_details', False) and candidate_details_dfs:
-
-#         if not quiet:
-#             print("Write candidate details ...")
-
-#         df = pd.concat(util.flatten_list(candidate_details_dfs), axis=0, ignore_index=True, sort=False)
-#         df.to_csv(util.longname(results_dir / 'candidate_details.csv'), index=False)
-
-
-# class Steps(abc.ABC):
-
-#     def __init__(self, contest, output_config, converted_cvr_dir, results_dir, pbar_desc):
-
-#         self.contest = contest
-#         self.output_config = output_config
-#         self.converted_cvr_dir = converted_cvr_dir
-#         self.results_dir = results_dir
-#         self.pbar_desc = pbar_desc
-#         self.error_log_writers = []
-
-#         self.state_data = {
-#             'n_errors': 0,
-#             'rcv_obj': None
-#         }
-#         self.steps = {}
-
-#     def update_state(self, dct):
-#         self.state_data.update(dct)
-
-#     def update_pbar_desc(self, desc):
-#         self.pbar_desc = desc
-
-#     def update_error_log_writers(self, writers_list):
-#         self.error_log_writers = writers_list if isinstance(writers_list, list) else [writers_list]
-
-#     def refresh_steps(self):
-
-#         cache_keys = ['success', 'order']
-#         cache = collections.defaultdict(dict)
-#         for k1 in self.steps:
-#             for k2 in cache_keys:
-#                 if k2 in self.steps[k1]:
-#                     cache[k1].update({k2: self.steps[k1][k2]})
-
-#         self.steps = self.generate_steps()
-
-#         for k in self.steps:
-#             for cache_key in cache_keys:
-#                 if cache_key in cache[k]:
-#                     self.steps[k][cache_key] = cache[k][cache_key]
-
-#     @abc.abstractmethod
-#     def generate_steps(self):
-#         pass
-
-#     def n_steps(self):
-#         return len(self.steps.keys())
-
-#     def next_step(self):
-
-#         remaining_steps = [
-#             (k, step) for k, step in self.steps.items()
-#             if step['success'] is None  # step not attempted yet
-#             and step['condition']  # step conditions are met
-#             and not any(self.steps[dep_k]['success'] is False for dep_k in step['fail_with'])  # all step dependencies are met
-#             and all(self.steps[dep_k]['success'] for dep_k in step['depends_on'])  # all step dependencies are met
-#         ]
-
-#         if not remaining_steps:
-#             return False
-#         else:
-#             return remaining_steps[0]
-
-#     def run_steps(self):
-
-#         self.state_data['n_errors'] = 0
-
-#         # init
-#         self.refresh_steps()
-#         for step_num, k in enumerate(self.steps, start=1):
-#             self.steps[k]['success'] = None
-#             self.steps[k]['order'] = step_num
-
-#         step_reached = 0
-
-#         pbar = tqdm.tqdm(total=self.n_steps(), bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt}{postfix}', colour='GREEN')
-#         pbar.set_description(self.pbar_desc)
-
-#         next_step = self.next_step()
-#         while next_step:
-
-#             step_name, step_details = next_step
-
-#             try:
-
-#                 pbar.set_postfix_str(step_name)
-
-#                 if step_details['return_key']:
-#                     self.state_data.update({
-#                         step_details['return_key']:
-#                         step_details['f'](*step_details['args'])
-#                         })
-#                 else:
-#                     step_details['f'](*step_details['args'])
-
-#             except Exception as e:
-
-#                 self.steps[step_name]['success'] = False
-
-#                 for writer in self.error_log_writers:
-#                     writer.write([self.contest['uid'], self.contest['split_id'], step_name, repr(e)])
-#                 self.state_data['n_errors'] += 1
-
-#             else:
-#                 self.steps[step_name]['success'] = True
-
-#             finally:
-#                 pbar.update(step_details['order']-step_reached)
-#                 step_reached = step_details['order']
-
-#             self.refresh_steps()
-#             next_step = self.next_step()
-
-#         pbar.set_postfix_str('complete')
-#         pbar.close()
-
-#     def return_results(self):
-#         return self.state_data
-
-
-# class CrunchSteps(Steps):
-
-#     def generate_steps(self):
-
-#         return collections.OrderedDict([
-#             ('convert_cvr_rank', {
-#                 'f': write_out.write_converted_cvr,
-#                 'args': [self.contest, self.converted_cvr_dir, 'rank'],
-#                 'condition': self.output_config.get('convert_cvr_rank_format'),
-#                 'fail_with': [],
-#                 'depends_on': [],
-#                 'return_key': None
-#             }),
-#             ('convert_cvr_candidate', {
-#                 'f': write_out.write_converted_cvr,
-#                 'args': [self.contest, self.converted_cvr_dir, 'candidate'],
-#                 'condition': self.output_config.get('convert_cvr_candidate_format'),
-#                 'fail_with': [],
-#                 'depends_on': [],
-#                 'return_key': None
-#             }),
-#             ('tabulate', {
-#                 'f': rcv_base.RCV.run_rcv,
-#                 'args': [self.contest],
-#                 'condition': True,
-#                 'depends_on': [],
-#                 'fail_with': [],
-#                 'return_key': 'rcv_obj'
-#             }),
-#             ('tabulation_stats', {
-#                 'f': rcv_base.RCV.get_tabulation_stats_df,
-#                 'args': [self.state_data['rcv_obj']],
-#                 'condition': self.output_config.get('per_rcv_type_stats'),
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': 'tabulation_stats_df'
-#             }),
-#             ('rcv_variant', {
-#                 'f': rcv_base.RCV.get_variant_name,
-#                 'args': [self.state_data['rcv_obj']],
-#                 'condition': True,
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': 'variant'
-#             }),
-#             ('contest_stats', {
-#                 'f': rcv_base.RCV.get_contest_stats_df,
-#                 'args': [self.state_data['rcv_obj']],
-#                 'condition': self.output_config.get('per_rcv_group_stats'),
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': 'contest_stats_df'
-#             }),
-#             ('rcv_group', {
-#                 'f': rcv_base.RCV.get_variant_group,
-#                 'args': [self.state_data['rcv_obj']],
-#                 'condition': True,
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': 'variant_group'
-#             }),
-#             ('candidate_details', {
-#                 'f': write_out.prepare_candidate_details,
-#                 'args': [self.state_data['rcv_obj']],
-#                 'condition': self.output_config.get('candidate_details'),
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': 'candidate_details'
-#             }),
-#             ('round_by_round', {
-#                 'f': write_out.write_rcv_rounds,
-#                 'args': [self.state_data['rcv_obj'], self.results_dir],
-#                 'condition': self.output_config.get('round_by_round'),
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('ballot_stats_debug', {
-#                 'f': write_out.write_ballot_debug_info,
-#                 'args': [self.state_data['rcv_obj'], self.results_dir],
-#                 'condition': self.output_config.get('ballot_stats_debug'),
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('cvr_ballot_allocation_rank', {
-#                 'f': write_out.write_converted_cvr_annotated,
-#                 'args': [self.state_data['rcv_obj'], self.results_dir, 'rank'],
-#                 'condition': self.output_config.get('cvr_ballot_allocation_rank_format'),
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('cvr_ballot_allocation_candidate', {
-#                 'f': write_out.write_converted_cvr_annotated,
-#                 'args': [self.state_data['rcv_obj'], self.results_dir, 'candidate'],
-#                 'condition': self.output_config.get('cvr_ballot_allocation_candidate_format'),
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('first_choice_to_finalist', {
-#                 'f': write_out.write_first_to_finalist_tables,
-#                 'args': [self.state_data['rcv_obj'], self.results_dir],
-#                 'condition': self.output_config.get('first_choice_to_finalist'),
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('condorcet', {
-#                 'f': write_out.write_condorcet_tables,
-#                 'args': [self.contest, self.results_dir],
-#                 'condition': self.output_config.get('condorcet'),
-#                 'depends_on': [],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('first_second_choices', {
-#                 'f': write_out.write_first_second_tables,
-#                 'args': [self.contest, self.results_dir],
-#                 'condition': self.output_config.get('first_second_choices'),
-#                 'depends_on': [],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('cumulative_rankings', {
-#                 'f': write_out.write_cumulative_ranking_tables,
-#                 'args': [self.contest, self.results_dir],
-#                 'condition': self.output_config.get('cumulative_rankings'),
-#                 'depends_on': [],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('rank_usage', {
-#                 'f': write_out.write_rank_usage_tables,
-#                 'args': [self.contest, self.results_dir],
-#                 'condition': self.output_config.get('rank_usage'),
-#                 'depends_on': [],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('crossover_support', {
-#                 'f': write_out.write_opponent_crossover_tables,
-#                 'args': [self.contest, self.results_dir],
-#                 'condition': self.output_config.get('crossover_support'),
-#                 'depends_on': [],
-#                 'fail_with': [],
-#                 'return_key': None
-#             }),
-#             ('split_stats', {
-#                 'f': rcv_base.RCV.get_split_stats,
-#                 'args': [self.state_data['rcv_obj']],
-#                 'condition': True,
-#                 'depends_on': ['tabulate'],
-#                 'fail_with': [],
-#                 'return_key': 'split_stats'
-#             })
-#         ])
-
-
-# def init_error_logger(results_dir):
-#     header_list = ['contest', 'split_id', 'cruncher_step', 'message']
-#     error_log_path = results_dir / 'error_log.csv'
-#     return util.CSVLogger(error_log_path, header_list)
-
-
-# def write_input_dir(results_dir, output_config, start_time, end_time):
-
-#     # copy input files
-#     result_log_dir = results_dir / 'inputs'
-#     util.verifyDir(result_log_dir)
-
-#     pkg_version = pkg_resources.require("rcv_cruncher")[0].version
-#     pkg_url = "https://github.com/fairvotereform/rcv_cruncher"
-#     with open(result_log_dir / 'pkg_info.txt', 'w') as pkg_info:
-#         pkg_info.write(f'version: {pkg_version}\n')
-#         pkg_info.write(f'github: {pkg_url}\n')
-#         pkg_info.write(f'start_time: {start_time.strftime("%Y-%m-%d %H:%M:%S")}\n')
-#         pkg_info.write(f'end_time: {end_time.strftime("%Y-%m-%d %H:%M:%S")}')
-
-#     log_output_config = result_log_dir / 'output_config.csv'
-#     shutil.copy2(output_config['run_config_file_path'], log_output_config)
-
-#     log_contest_set_fname = result_log_dir / 'contest_set.csv'
-#     shutil.copy2(output_config['contest_set_file_path'], log_contest_set_fname)
-
-
-# def crunch_contest_set(contest_set, output_config, path_to_output, fresh_output=False):
-
-#     start_time = datetime.datetime.now()
-
-#     ##################
-#     # OUTPUT PATHS
-#     path_to_output = pathlib.Path(path_to_output)
-
-#     # cvrs from path_to_cvr used in tabulation will be converted and output here
-#     converted_cvr_dir = path_to_output / 'converted_cvr'
-#     if fresh_output and converted_cvr_dir.exists():
-#         print('deleting existing converted_cvr directory...')
-#         shutil.rmtree(util.longname(converted_cvr_dir))
-#     util.verifyDir(util.longname(converted_cvr_dir))
-
-#     # various tabulation stats will be output here
-#     results_dir = path_to_output / 'results'
-#     if fresh_output and results_dir.exists():
-#         print('deleting existing results directory...')
-#         shutil.rmtree(util.longname(results_dir))
-#     util.verifyDir(util.longname(results_dir))
-
-#     #########################
-#     # SOME RESULTS CONTAINERS
-
-#     candidate_details_dfs = []
-#     rcv_variant_stats_df_dict = {variant_name: [] for variant_name in rcv_variants.get_rcv_dict().keys()}
-#     rcv_group_stats_df_dict = {variant_group: [] for variant_group in
-#                                set(g.variant_group() for g in rcv_variants.get_rcv_dict().values())}
-
-#     allsplit_rcv_variant_stats_df_dict = {variant_name: [] for variant_name in rcv_variants.get_rcv_dict().keys()}
-#     allsplit_rcv_group_stats_df_dict = {variant_group: [] for variant_group in
-#                                         set(g.variant_group() for g in rcv_variants.get_rcv_dict().values())}
-
-#     # init loggers
-#     error_logger = init_error_logger(results_dir)
-
-#     n_errors = 0
-#     #########################
-#     # LOOP TROUGH CONTESTS
-
-#     for idx, contest in enumerate(contest_set):
-
-#         # RUN OPERATIONS
-#         pbar_desc = f'{idx+1} of {len(contest_set)} contests: '
-#         pbar_desc += f'{contest["jurisdiction"]} {contest["date"]} {contest["office"]}'
-#         if n_errors:
-#             pbar_desc = f'[{n_errors} ERRORS SO FAR] ' + pbar_desc
-
-#         step_obj = CrunchSteps(contest, output_config, converted_cvr_dir, results_dir, pbar_desc)
-#         step_obj.update_error_log_writers([error_logger])
-#         step_obj.run_steps()
-
-#         crunch_returns = step_obj.return_results()
-#         n_errors += crunch_returns['n_errors']
-
-#         # STORE RESULTS
-#         if output_config.get('candidate_details') and crunch_returns.get('candidate_details'):
-#             candidate_details_dfs.append(crunch_returns['candidate_details'])
-
-#         if output_config.get('per_rcv_type_stats') and crunch_returns.get('tabulation_stats_df'):
-#             variant = crunch_returns['variant']
-#             rcv_variant_stats_df_dict[variant].append(crunch_returns['tabulation_stats_df'])
-
-#         if output_config.get('per_rcv_group_stats') and crunch_returns.get('contest_stats_df'):
-#             variant_group = crunch_returns['variant_group']
-#             rcv_group_stats_df_dict[variant_group].append(crunch_returns['contest_stats_df'])
-
-#         if crunch_returns.get('split_stats'):
-
-#             split_stats = crunch_returns['split_stats']
-
-#             # SPLIT PATHS
-#             split_path = results_dir / 'split_stats'
-#             util.verifyDir(split_path)
-
-#             split_contest_path = split_path / contest["uid"]
-#             util.verifyDir(split_contest_path)
-
-#             # SPLIT RESULTS CONTAINERS
-#             split_rcv_variant_stats_df_dict = {variant_name: [] for variant_name in rcv_variants.get_rcv_dict().keys()}
-#             split_rcv_group_stats_df_dict = {variant_group: [] for variant_group in
-#                                              set(g.variant_group() for g in rcv_variants.get_rcv_dict().values())}
-
-#             for split_stat in split_stats:
-
-#                 if output_config.get('per_rcv_type_stats') and split_stat.get('tabulation_stats_df'):
-#                     variant = split_stat['variant']
-#                     split_rcv_variant_stats_df_dict[variant].append(split_stat['tabulation_stats_df'])
-#                     allsplit_rcv_variant_stats_df_dict[variant].append(split_stat['tabulation_stats_df'])
-
-#                 if output_config.get('per_rcv_group_stats') and split_stat.get('contest_stats_df'):
-#                     variant_group = split_stat['variant_group']
-#                     split_rcv_group_stats_df_dict[variant_group].append(split_stat['contest_stats_df'])
-#                     allsplit_rcv_group_stats_df_dict[variant_group].append(split_stat['contest_stats_df'])
-
-#             write_aggregated_stats(split_contest_path, output_config,
-#                                    split_rcv_group_stats_df_dict, split_rcv_variant_stats_df_dict,
-#                                    [], quiet=True)
-
-#         # remove cvr from mem
-#         if 'cvr' in contest:
-#             del contest['cvr']
-
-#     # close logs
-#     error_logger.close()
-
-#     # WRITE OUT AGGREGATED STATS FOR CONTESTS
-#     write_aggregated_stats(results_dir,
-#                            output_config,
-#                            rcv_group_stats_df_dict,
-#                            rcv_variant_stats_df_dict,
-#                            candidate_details_dfs,
-#                            quiet=False)
-
-#     # WRITE OUT AGGREGATED STATS FOR ALL SPLITS
-#     if os.path.isdir(results_dir / 'split_stats'):
-
-#         allsplit_agg_path = results_dir / 'split_stats' / 'all_contest_splits'
-#         util.verifyDir(allsplit_agg_path)
-
-#         write_aggregated_stats(allsplit_agg_path,
-#                                output_config,
-#                                allsplit_rcv_group_stats_df_dict,
-#                                allsplit_rcv_variant_stats_df_dict,
-#                                [], quiet=True)
-
-#     end_time = datetime.datetime.now()
-
-#     write_input_dir(results_dir, output_config, start_time, end_time)
-
-#     duration = end_time - start_time
-#     print(f"runtime duration: {str(duration)}")
-#     print("DONE!")
+def _shared_parsed_cvr(parsed_cvr: Dict) -> Dict:
+    return parsed_cvr
+
+
+def new_rcv_contest(contest: Dict, parsed_cvr: Dict) -> RCV:
+    """
+    Construct the contest's rcv variant from the contest dictionary and its parsed cvr.
+    """
+    if contest.get('rcv_type') is None:
+        raise RuntimeError(f'contest {contest["uid"]} does not name a valid rcv_type. options: {list(rcv_dict)}')
+
+    rcv_args = {arg: contest[col] for col, arg in CONTEST_RCV_ARGS.items() if col in contest}
+    rcv_args['split_fields'] = contest.get('split_fields') or None
+
+    return contest['rcv_type'](parsed_cvr=parsed_cvr, **rcv_args)
+
+
+# cpu time of the calling thread (python 3.7+), so concurrent steps are not charged for each other
+_thread_time = getattr(time, 'thread_time', time.process_time)
+
+
+def _timed_call(f: Any, args: List) -> Tuple[Any, Optional[Exception], float, float]:
+    """
+    Call f(*args). Returns its return value (None if it raised), the exception it raised (or None), the
+    call duration in seconds and the cpu seconds used by the calling thread.
+    """
+    start = time.perf_counter()
+    start_cpu = _thread_time()
+    try:
+        value = f(*args)
+    except Exception as e:
+        return None, e, time.perf_counter() - start, _thread_time() - start_cpu
+    return value, None, time.perf_counter() - start, _thread_time() - start_cpu
+
+
+class Steps(abc.ABC):
+    """
+    Named steps of work on one contest, forming a dependency graph. A step is ready once its condition is true,
+    every step in its depends_on list succeeded and no step in its fail_with list failed. Ready steps run
+    concurrently in a thread pool of up to max_workers threads, so steps that only depend on a shared earlier
+    step (e.g. writing converted cvrs and computing stats after tabulation) overlap. A step that raises is
+    logged as an error row and marked failed, steps depending on it are not run, and the remaining steps continue.
+
+    Step functions run in worker threads, but their return values are stored and the steps regenerated
+    in the calling thread only.
+
+    Steps named in skip_steps that have no return value (e.g. file writers whose output already exists)
+    count as succeeded without running.
+    """
+
+    def __init__(self, contest: Dict, run_config: Dict, converted_cvr_dir: pathlib.Path,
+                 results_dir: pathlib.Path, max_workers: int = 1, skip_steps: Iterable[str] = ()) -> None:
+
+        self.contest = contest
+        self.run_config = run_config
+        self.converted_cvr_dir = converted_cvr_dir
+        self.results_dir = results_dir
+        self.max_workers = max_workers
+        self.skip_steps = list(skip_steps)
+        self.errors = []
+
+        self.state_data = {
+            'n_errors': 0
+        }
+        self.steps = {}
+
+    def update_state(self, dct: Dict) -> None:
+        self.state_data.update(dct)
+
+    def refresh_steps(self) -> None:
+
+        cache_keys = ['success', 'order', 'started', 'duration', 'cpu_duration', 'message']
+        cache = collections.defaultdict(dict)
+        for k1 in self.steps:
+            for k2 in cache_keys:
+                if k2 in self.steps[k1]:
+                    cache[k1].update({k2: self.steps[k1][k2]})
+
+        self.steps = self.generate_steps()
+
+        for k in self.steps:
+            for cache_key in cache_keys:
+                if cache_key in cache[k]:
+                    self.steps[k][cache_key] = cache[k][cache_key]
+
+    @abc.abstractmethod
+    def generate_steps(self) -> collections.OrderedDict:
+        pass
+
+    def n_steps(self) -> int:
+        return len(self.steps.keys())
+
+    def ready_steps(self) -> List[Tuple[str, Dict]]:
+
+        return [
+            (k, step) for k, step in self.steps.items()
+            if not step['started']  # step not attempted yet
+            and step['condition']  # step conditions are met
+            and not any(self.steps[dep_k]['success'] is False for dep_k in step['fail_with'])  # all step dependencies are met
+            and all(self.steps[dep_k]['success'] for dep_k in step['depends_on'])  # all step dependencies are met
+        ]
+
+    def _finish_step(self, step_name: str, value: Any, error: Optional[Exception], duration: float,
+                     cpu_duration: float) -> None:
+
+        self.steps[step_name]['duration'] = duration
+        self.steps[step_name]['cpu_duration'] = cpu_duration
+
+        if error is not None:
+            self.steps[step_name]['success'] = False
+            self.steps[step_name]['message'] = repr(error)
+            self.errors.append([self.contest['uid'], self.contest.get('split_id', ''), step_name, repr(error)])
+            self.state_data['n_errors'] += 1
+        else:
+            self.steps[step_name]['success'] = True
+            if self.steps[step_name]['return_key']:
+                self.state_data.update({self.steps[step_name]['return_key']: value})
+
+    def run_steps(self) -> None:
+
+        self.state_data['n_errors'] = 0
+        self.errors = []
+
+        # init
+        self.refresh_steps()
+        for step_num, k in enumerate(self.steps, start=1):
+            self.steps[k]['success'] = None
+            self.steps[k]['started'] = False
+            self.steps[k]['duration'] = None
+            self.steps[k]['cpu_duration'] = None
+            self.steps[k]['message'] = None
+            self.steps[k]['order'] = step_num
+
+        for k in self.skip_steps:
+            if k in self.steps and not self.steps[k]['return_key']:
+                self.steps[k]['success'] = True
+                self.steps[k]['started'] = True
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+
+            running = {}
+            while True:
+
+                for step_name, step_details in self.ready_steps():
+                    self.steps[step_name]['started'] = True
+                    running[pool.submit(_timed_call, step_details['f'], step_details['args'])] = step_name
+
+                if not running:
+                    break
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    self._finish_step(running.pop(future), *future.result())
+
+                self.refresh_steps()
+
+        # report errors in step order, however the steps finished
+        self.errors.sort(key=lambda row: self.steps[row[2]]['order'])
+
+    def step_durations(self) -> Dict[str, float]:
+        """
+        Seconds taken by each step that ran, in step order.
+        """
+        return {k: step['duration'] for k, step in self.steps.items() if step['duration'] is not None}
+
+    def step_report(self) -> Dict[str, Dict]:
+        """
+        Outcome of each step that ran, in step order:
+        {step name: {'success', 'seconds', 'cpu_seconds', 'output', 'message'}}.
+        """
+        return {k: {'success': step['success'], 'seconds': step['duration'], 'cpu_seconds': step['cpu_duration'],
+                    'output': step.get('output'), 'message': step['message']}
+                for k, step in self.steps.items() if step['duration'] is not None}
+
+    def return_results(self) -> Dict:
+        return self.state_data
+
+
+def converted_cvr_path(contest: Dict, converted_cvr_dir: pathlib.Path, cvr_format: str = 'rank',
+                       compress: bool = False) -> pathlib.Path:
+    uid = contest['uid'] if not contest.get('split_id') else contest.get('split_id')
+    return converted_cvr_dir / f"{cvr_format}_format" / f"{uid}.csv{'.gz' if compress else ''}"
+
+
+def write_converted_cvr(contest: Dict, rcv_obj: RCV, converted_cvr_dir: pathlib.Path, cvr_format: str = 'rank',
+                        compress: bool = False, writer_pool: Optional[WriterPool] = None) -> Optional[QueuedTableWriter]:
+    """
+    Convert cvr into common csv format (gzipped if compress is True) and write out. If writer_pool is given,
+    the table chunks are handed off to it and its writer is returned, to wait on.
+    """
+    output_path = converted_cvr_path(contest, converted_cvr_dir, cvr_format, compress=compress)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if writer_pool is None:
+        rcv_obj.write_cvr_table(util.longname(output_path), table_format=cvr_format)
+        return None
+
+    with writer_pool.open(util.longname(output_path)) as writer:
+        for chunk in rcv_obj.iter_cvr_table(table_format=cvr_format):
+            writer.write(chunk)
+    return writer
+
+
+def contest_stats_df(rcv_obj: RCV) -> pd.DataFrame:
+    return pd.concat(rcv_obj.stats(), axis=0, ignore_index=True, sort=False)
+
+
+def split_stats_df(rcv_obj: RCV) -> Optional[pd.DataFrame]:
+    if not rcv_obj.split_fields:
+        return None
+    return pd.concat(rcv_obj.stats(add_split_stats=True), axis=0, ignore_index=True, sort=False)
+
+
+class CrunchSteps(Steps):
+    """
+    Crunch steps of one contest. If parsed_cvr is given (shared by contests reading the same cvr), the parse
+    step returns it rather than parsing. If office_group, (offices, office_parses), is given instead, the parse
+    step reads the cvr of every one of those offices in one pass (see :func:`parse_office_group`).
+
+    If writer_pool is given, the converted cvr steps hand their tables off to it and finish without waiting
+    for the files to be written. Their writers are kept in pending_writes, {step name: writer}.
+    """
+
+    def __init__(self, *args, parsed_cvr: Optional[Dict] = None,
+                 office_group: Optional[Tuple[List[Optional[str]], Dict]] = None,
+                 writer_pool: Optional[WriterPool] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.parsed_cvr = parsed_cvr
+        self.office_group = office_group
+        self.writer_pool = writer_pool
+        self.pending_writes = {}
+
+    def _write_converted_cvr(self, step_name: str, rcv_obj: RCV, cvr_format: str) -> None:
+        writer = write_converted_cvr(self.contest, rcv_obj, self.converted_cvr_dir, cvr_format,
+                                     compress=self.run_config.get('compress_converted_cvr', False),
+                                     writer_pool=self.writer_pool)
+        if writer is not None:
+            self.pending_writes[step_name] = writer
+
+    def generate_steps(self) -> collections.OrderedDict:
+
+        any_stats = self.run_config.get('per_rcv_group_stats') or self.run_config.get('per_rcv_type_stats')
+        compress = self.run_config.get('compress_converted_cvr', False)
+
+        if self.parsed_cvr is not None:
+            parse_f, parse_args = _shared_parsed_cvr, [self.parsed_cvr]
+        elif self.office_group is not None:
+            parse_f, parse_args = parse_office_group, [self.contest, *self.office_group]
+        else:
+            parse_f, parse_args = load_or_parse_contest_cvr, [self.contest]
+
+        return collections.OrderedDict([
+            ('parse', {
+                'f': parse_f,
+                'args': parse_args,
+                'condition': True,
+                'depends_on': [],
+                'fail_with': [],
+                'return_key': 'parsed_cvr'
+            }),
+            ('tabulate', {
+                'f': new_rcv_contest,
+                'args': [self.contest, self.state_data.get('parsed_cvr')],
+                'condition': True,
+                'depends_on': ['parse'],
+                'fail_with': [],
+                'return_key': 'rcv_obj'
+            }),
+            ('convert_cvr_rank', {
+                'f': self._write_converted_cvr,
+                'args': ['convert_cvr_rank', self.state_data.get('rcv_obj'), 'rank'],
+                'condition': self.run_config.get('convert_cvr_rank_format'),
+                'depends_on': ['tabulate'],
+                'fail_with': [],
+                'return_key': None,
+                'output': converted_cvr_path(self.contest, self.converted_cvr_dir, 'rank', compress=compress)
+            }),
+            ('convert_cvr_candidate', {
+                'f': self._write_converted_cvr,
+                'args': ['convert_cvr_candidate', self.state_data.get('rcv_obj'), 'candidate'],
+                'condition': self.run_config.get('convert_cvr_candidate_format'),
+                'depends_on': ['tabulate'],
+                'fail_with': [],
+                'return_key': None,
+                'output': converted_cvr_path(self.contest, self.converted_cvr_dir, 'candidate', compress=compress)
+            }),
+            ('rcv_variant', {
+                'f': RCV.get_variant_name,
+                'args': [self.state_data.get('rcv_obj')],
+                'condition': True,
+                'depends_on': ['tabulate'],
+                'fail_with': [],
+                'return_key': 'variant'
+            }),
+            ('rcv_group', {
+                'f': RCV.get_variant_group,
+                'args': [self.state_data.get('rcv_obj')],
+                'condition': True,
+                'depends_on': ['tabulate'],
+                'fail_with': [],
+                'return_key': 'variant_group'
+            }),
+            ('contest_stats', {
+                'f': contest_stats_df,
+                'args': [self.state_data.get('rcv_obj')],
+                'condition': any_stats,
+                'depends_on': ['tabulate'],
+                'fail_with': [],
+                'return_key': 'contest_stats_df'
+            }),
+            ('split_stats', {
+                'f': split_stats_df,
+                'args': [self.state_data.get('rcv_obj')],
+                'condition': any_stats,
+                'depends_on': ['tabulate'],
+                'fail_with': [],
+                'return_key': 'split_stats_df'
+            })
+        ])
+
+
+def contest_size(rcv_obj: Optional[RCV]) -> Dict[str, Optional[int]]:
+    """
+    Number of ballots, candidates and rounds (summed over tabulations) of a contest, None if it was not tabulated.
+    """
+    if rcv_obj is None:
+        return {'n_ballots': None, 'n_candidates': None, 'n_rounds': None}
+
+    return {
+        'n_ballots': rcv_obj.n_ballots(),
+        'n_candidates': len(rcv_obj.get_candidates().unique_candidates),
+        'n_rounds': sum(rcv_obj.n_rounds(tabulation_num=n) for n in range(1, rcv_obj.n_tabulations() + 1))
+    }
+
+
+def crunch_contest(contest: Dict, run_config: Dict, converted_cvr_dir: pathlib.Path,
+                   results_dir: pathlib.Path, step_jobs: int = 1, parsed_cvr: Optional[Dict] = None,
+                   return_parsed_cvr: bool = False, office_group: Optional[Tuple[List[Optional[str]], Dict]] = None,
+                   writer_pool: Optional[WriterPool] = None) -> Dict:
+    """
+    Run the crunch steps of one contest, up to step_jobs steps at a time. Returns the contest's stats tables,
+    variant, variant group, step durations, error log rows, wall seconds and size (see :func:`contest_size`),
+    but not the parsed cvr or rcv object, so results stay small when sent back from a worker process.
+
+    If parsed_cvr is given, the contest is crunched from it instead of parsing its cvr. If return_parsed_cvr is
+    True, the parsed cvr (None if parsing failed) is also returned, under 'parsed_cvr'. If office_group,
+    (offices, office_parses), is given, the cvrs of those offices are parsed along with the contest's and stored
+    in office_parses (see :func:`parse_office_group`).
+
+    If writer_pool is given, converted cvrs are written by its threads and the results hold their writers under
+    'pending_writes'. Pass the results to :func:`finish_writes` before using them.
+    """
+    step_obj = CrunchSteps(contest, run_config, converted_cvr_dir, results_dir, max_workers=step_jobs,
+                           skip_steps=contest.get('resume_skip_steps', ()), parsed_cvr=parsed_cvr,
+                           office_group=office_group, writer_pool=writer_pool)
+    start = time.perf_counter()
+    step_obj.run_steps()
+
+    state = step_obj.return_results()
+    result = {
+        'wall_seconds': time.perf_counter() - start,
+        'size': contest_size(state.get('rcv_obj')),
+        'n_errors': state['n_errors'],
+        'errors': step_obj.errors,
+        'step_durations': step_obj.step_durations(),
+        'steps': step_obj.step_report(),
+        'variant': state.get('variant'),
+        'variant_group': state.get('variant_group'),
+        'contest_stats_df': state.get('contest_stats_df'),
+        'split_stats_df': state.get('split_stats_df')
+    }
+    if return_parsed_cvr:
+        result['parsed_cvr'] = state.get('parsed_cvr')
+    if writer_pool is not None:
+        result['pending_writes'] = step_obj.pending_writes
+    return result
+
+
+def writes_done(result: Dict) -> bool:
+    return all(writer.future.done() for writer in result.get('pending_writes', {}).values())
+
+
+def finish_writes(contest: Dict, result: Dict) -> Dict:
+    """
+    Wait for the queued writes of a contest's crunch results. The writer thread's seconds and cpu seconds are
+    added to the step's, and a write that failed marks its step failed, with an error row.
+    """
+    for step_name, writer in result.pop('pending_writes', {}).items():
+
+        error = writer.future.exception()
+
+        result['step_durations'][step_name] += writer.seconds
+        result['steps'][step_name]['seconds'] += writer.seconds
+        result['steps'][step_name]['cpu_seconds'] += writer.cpu_seconds
+
+        if error is not None:
+            result['errors'].append([contest['uid'], contest.get('split_id', ''), step_name, repr(error)])
+            result['n_errors'] += 1
+            result['steps'][step_name].update({'success': False, 'message': repr(error)})
+
+    return result
+
+
+def crunch_contest_group(group: List[Tuple[int, Dict]], run_config: Dict, converted_cvr_dir: pathlib.Path,
+                         results_dir: pathlib.Path, step_jobs: int = 1, writer_threads: int = 0,
+                         writer_pool: Optional[WriterPool] = None) -> Dict[int, Dict]:
+    """
+    Crunch (index, contest) pairs that read the same cvr with the same parser (see :func:`contest_groups`),
+    in order. The cvr is parsed by the first contest and shared by the rest, and released once the last
+    contest is done. If parsing fails, the next contest tries again. Returns {index: crunch results}.
+
+    Contests of different offices whose parser has a multi-office reader are parsed in one pass by the first
+    contest, and each office's parsed cvr is released once the last contest of that office is done.
+
+    With writer_threads, converted cvrs are written by a :class:`rcv_cruncher.writers.WriterPool` of that many
+    threads while the next contests are crunched, and the group returns once every write is done. If a
+    writer_pool is given instead, it is used and the results are returned with their writes still pending
+    (see :func:`finish_writes`).
+    """
+    own_pool = writer_pool is None and writer_threads > 0
+    if own_pool:
+        writer_pool = WriterPool(writer_threads)
+
+    multi_office = bool(group) and group[0][1]['parser'] in parsers.multi_office_parsers
+    offices = [contest['parser_args'].get('office') if multi_office else None for _, contest in group]
+
+    results = {}
+    # parsed cvrs shared with later contests of the group, {office: parsed cvr} (None is the office of a
+    # parser without a multi-office reader)
+    office_parses = {}
+    group_parse = multi_office
+    try:
+        for n, (idx, contest) in enumerate(group):
+            office = offices[n]
+            more_contests = office in offices[n + 1:]
+            parsed_cvr = office_parses.get(office)
+
+            # read the remaining offices in one pass, unless the contest's parsed cvr is cached from a past run
+            cache_path = contest.get('parsed_cvr_cache')
+            office_group = None
+            if parsed_cvr is None and group_parse and len(set(offices[n:])) > 1 \
+                    and (cache_path is None or not pathlib.Path(cache_path).is_file()):
+                office_group = (list(dict.fromkeys(offices[n:])), office_parses)
+
+            result = crunch_contest(contest, run_config, converted_cvr_dir, results_dir, step_jobs,
+                                    parsed_cvr=parsed_cvr, return_parsed_cvr=parsed_cvr is None and more_contests,
+                                    office_group=office_group, writer_pool=writer_pool)
+            parsed = result.pop('parsed_cvr', None)
+            if parsed is not None:
+                office_parses[office] = parsed
+
+            # a failed multi-office read is not tried again, the rest of the group is parsed office by office
+            if office_group is not None and not office_parses.keys() >= set(office_group[0]):
+                group_parse = False
+
+            if not more_contests:
+                office_parses.pop(office, None)
+            results[idx] = result
+    finally:
+        if own_pool:
+            writer_pool.close()
+
+    if own_pool:
+        results = {idx: finish_writes(contest, results[idx]) for idx, contest in group if idx in results}
+    return results
+
+
+def contest_groups(contests: List[Tuple[int, Dict]]) -> List[List[Tuple[int, Dict]]]:
+    """
+    Group (index, contest) pairs by parser and parser arguments (which include the cvr path), in order of
+    first appearance. The office is left out for parsers with a multi-office reader
+    (see :data:`rcv_cruncher.parsers.multi_office_parsers`), so every office of a cvr is parsed together.
+    """
+    groups = {}
+    for idx, contest in contests:
+        parser_args = contest.get('parser_args', {})
+        if contest['parser'] in parsers.multi_office_parsers:
+            parser_args = {k: v for k, v in parser_args.items() if k != 'office'}
+        parser_args = repr(sorted((str(k), str(v)) for k, v in parser_args.items()))
+        groups.setdefault((contest['parser'], parser_args), []).append((idx, contest))
+    return list(groups.values())
+
+
+def init_error_logger(results_dir: pathlib.Path) -> util.CSVLogger:
+    error_log_path = results_dir / 'error_log.csv'
+    return util.CSVLogger(error_log_path, ERROR_LOG_HEADER)
+
+
+def write_input_dir(results_dir: pathlib.Path, run_config: Dict,
+                    start_time: datetime.datetime, end_time: datetime.datetime) -> None:
+
+    # copy input files
+    result_log_dir = results_dir / 'inputs'
+    util.verifyDir(result_log_dir)
+
+    pkg_url = "https://github.com/fairvotereform/rcv_cruncher"
+    with open(result_log_dir / 'pkg_info.txt', 'w') as pkg_info:
+        pkg_info.write(f'version: {__version__}\n')
+        pkg_info.write(f'github: {pkg_url}\n')
+        pkg_info.write(f'start_time: {start_time.strftime("%Y-%m-%d %H:%M:%S")}\n')
+        pkg_info.write(f'end_time: {end_time.strftime("%Y-%m-%d %H:%M:%S")}')
+
+    if run_config.get('run_config_file_path'):
+        shutil.copy2(run_config['run_config_file_path'], result_log_dir / 'run_config.txt')
+
+    if run_config.get('contest_set_file_path'):
+        shutil.copy2(run_config['contest_set_file_path'], result_log_dir / 'contest_set.csv')
+
+
+def store_contest_results(idx: int, contest: Dict, result: Dict, results_dir: pathlib.Path, run_config: Dict,
+                          stats_sink: StatsSink, split_stats_sink: StatsSink) -> None:
+    """
+    Add a finished contest's stats to the aggregated stats sinks and write its own split stats files.
+    """
+    if not result.get('variant') or not result.get('variant_group'):
+        return
+
+    if result.get('contest_stats_df') is not None:
+        stats_sink.add(idx, result['variant'], result['variant_group'], result['contest_stats_df'])
+
+    if result.get('split_stats_df') is not None:
+
+        split_contest_path = results_dir / 'split_stats' / contest["uid"]
+        split_contest_path.mkdir(parents=True, exist_ok=True)
+
+        with StatsSink(split_contest_path, run_config) as contest_split_sink:
+            contest_split_sink.add(0, result['variant'], result['variant_group'], result['split_stats_df'])
+
+        split_stats_sink.add(idx, result['variant'], result['variant_group'], result['split_stats_df'])
+
+
+def parsed_cvr_cache_path(parsed_cvr_cache_dir: pathlib.Path, uid: str, hash_value: str) -> pathlib.Path:
+    return parsed_cvr_cache_dir / f'{uid}_{hash_value[:16]}.pkl'
+
+
+def resumable_contest(contest: Dict, hash_value: str, checkpoint: Checkpoint, parsed_cvr_cache_dir: pathlib.Path,
+                      resume: bool) -> Dict:
+    """
+    Copy of the contest with the path to cache its parsed cvr at and, when resuming a contest checkpointed with
+    the same hash, the steps to skip: those that succeeded and whose output file still exists.
+    """
+    contest = dict(contest, parsed_cvr_cache=parsed_cvr_cache_path(parsed_cvr_cache_dir, contest['uid'], hash_value))
+
+    previous = checkpoint.contest(contest['uid']) if resume else None
+    if previous is not None and previous['hash'] == hash_value:
+        contest['resume_skip_steps'] = [step for step, info in checkpoint.steps(contest['uid']).items()
+                                        if info['status'] == 'success' and info['output']
+                                        and pathlib.Path(info['output']).is_file()]
+
+    return contest
+
+
+def _run_contests(contests: List[Tuple[int, Dict]], run_config: Dict, converted_cvr_dir: pathlib.Path,
+                  results_dir: pathlib.Path, jobs: int, step_jobs: int, estimator: MemoryEstimator,
+                  memory_budget: Optional[int] = None, memory_limit: Optional[int] = None,
+                  timeout: Optional[float] = None, work_queue: Optional[pathlib.Path] = None,
+                  writer_threads: int = 0):
+    """
+    Yield (contest index, crunch results) as the (index, contest) pairs finish. Contests reading the same cvr
+    are crunched together from one parse (see :func:`crunch_contest_group`).
+
+    With one job and no memory limit, timeout or work queue, contests run in this process, in order. Otherwise
+    each group runs in its own worker process, scheduled by :func:`rcv_cruncher.scheduling.run_in_processes`,
+    or as a task of the work queue file work_queue, run by jobs local workers and any remote ones
+    (see :func:`rcv_cruncher.workqueue.run_in_queue`). Contests may then finish out of order.
+    If a worker fails, every contest of its group gets an error row.
+
+    With writer_threads, converted cvrs are written in writer threads while the next contests are crunched
+    (see :func:`crunch_contest_group`). Running in this process, one writer pool serves every group and
+    contests are yielded, in order, once their writes are done.
+    """
+    groups = contest_groups(contests)
+    group_args = (run_config, converted_cvr_dir, results_dir, step_jobs, writer_threads)
+
+    if work_queue is not None:
+        group_results = run_in_queue(list(enumerate(groups)), crunch_contest_group, group_args, work_queue,
+                                     local_workers=jobs)
+
+    elif jobs == 1 and memory_limit is None and timeout is None:
+        contest_dict = dict(contests)
+        writer_pool = WriterPool(writer_threads) if writer_threads else None
+        pending = collections.deque()
+        try:
+            for group in groups:
+                pending.extend(crunch_contest_group(group, *group_args, writer_pool=writer_pool).items())
+                while pending and writes_done(pending[0][1]):
+                    idx, result = pending.popleft()
+                    yield idx, finish_writes(contest_dict[idx], result)
+            while pending:
+                idx, result = pending.popleft()
+                yield idx, finish_writes(contest_dict[idx], result)
+        finally:
+            if writer_pool is not None:
+                writer_pool.close()
+        return
+
+    else:
+        def estimate(group: List[Tuple[int, Dict]]) -> int:
+            return max(estimator.estimate(contest) for _, contest in group)
+
+        group_results = run_in_processes(list(enumerate(groups)), crunch_contest_group, group_args, jobs, estimate,
+                                         memory_budget=memory_budget, memory_limit=memory_limit, timeout=timeout)
+
+    for group_num, results, peak in group_results:
+        for idx, contest in groups[group_num]:
+            if isinstance(results, WorkerFailure):
+                result = {'n_errors': 1, 'step_durations': {}, 'steps': {},
+                          'errors': [[contest['uid'], contest.get('split_id', ''), results.step, results.message]]}
+            else:
+                result = results[idx]
+            result['peak_rss'] = peak
+            yield idx, result
+
+
+def converted_cvr_paths(contest: Dict, run_config: Dict, converted_cvr_dir: pathlib.Path) -> List[pathlib.Path]:
+    """
+    Converted cvr files the run config asks for, as written by write_converted_cvr().
+    """
+    return [converted_cvr_path(contest, converted_cvr_dir, cvr_format,
+                               compress=run_config.get('compress_converted_cvr', False))
+            for cvr_format in ('rank', 'candidate') if run_config.get(f'convert_cvr_{cvr_format}_format')]
+
+
+def crunch_contest_set(contest_set: List[Dict],
+                       run_config: Dict,
+                       path_to_output: str,
+                       fresh_output: bool = False,
+                       jobs: int = 1,
+                       incremental: bool = True,
+                       step_jobs: int = 4,
+                       memory_budget: Optional[int] = None,
+                       memory_limit: Optional[int] = None,
+                       timeout: Optional[float] = None,
+                       resume: bool = False,
+                       work_queue: Optional[str] = None,
+                       writer_threads: int = 2) -> None:
+    """
+    Crunch every contest in the contest set and write the aggregated stats to path_to_output/results.
+
+    Contests run in up to jobs worker processes (all cpus if jobs is 0 or None). Errors in any contest
+    are written to results/error_log.csv without stopping the other contests. Aggregated stats are
+    written in contest set order, however contests are scheduled.
+
+    Within a contest, up to step_jobs independent crunch steps run concurrently in threads (see :class:`Steps`).
+    The seconds taken by each step are written to results/step_durations.csv, and the wall and cpu time, peak
+    memory, size and output bytes of each crunched contest and step to results/telemetry.jsonl, with a report of
+    the slowest in results/telemetry_summary.txt (see :class:`rcv_cruncher.telemetry.TelemetryLog`). Converted cvrs are written by
+    writer_threads threads (inline if 0), so the next contest is crunched while they are written, and are
+    gzipped if the run config sets compress_converted_cvr.
+
+    When contests run in worker processes, they start largest estimated memory first and the sum of the
+    estimates of running contests is kept under memory_budget bytes. Estimates come from input file sizes,
+    refined by the peak memory measured in earlier runs (see :class:`rcv_cruncher.scheduling.MemoryEstimator`).
+    Each worker is stopped once its resident memory goes over memory_limit bytes (checked where /proc is
+    available, e.g. linux) or after timeout seconds, and the contest gets an error row.
+
+    Contest and step completion is recorded in results/checkpoint.sqlite as contests finish (see
+    :class:`rcv_cruncher.checkpoint.Checkpoint`), and parsed cvrs are cached until their contest succeeds.
+    If resume is True, an interrupted or failed run is continued: finished contests are reused, the parsed cvr
+    caches of unfinished ones are read instead of parsing again, and converted cvr steps whose files were
+    already written are skipped. Otherwise the checkpoint and parsed cvr caches of earlier runs are cleared.
+
+    If work_queue is a path, contests are published as tasks to a SQLite work queue at that path (see
+    :class:`rcv_cruncher.workqueue.WorkQueue`) instead, and run by jobs worker processes on this host plus any
+    started on other hosts with ``python -m rcv_cruncher --worker WORK_QUEUE``. Workers lease their tasks, and
+    the task of a worker that dies is retried by another. Remote workers need the output directory at the same
+    path, e.g. on a shared filesystem. Memory budget, limit and timeout do not apply to queued contests.
+
+    If incremental is True, contests whose inputs and settings are unchanged since they last ran without
+    errors (see :class:`rcv_cruncher.manifest.RunManifest`) are not crunched again. Their cached results are
+    spliced into the aggregated stats.
+    """
+
+    start_time = datetime.datetime.now()
+
+    if not jobs:
+        jobs = os.cpu_count() or 1
+
+    ##################
+    # OUTPUT PATHS
+    path_to_output = pathlib.Path(path_to_output)
+    util.verifyDir(util.longname(path_to_output))
+
+    # cvrs from path_to_cvr used in tabulation will be converted and output here
+    converted_cvr_dir = path_to_output / 'converted_cvr'
+    if fresh_output and converted_cvr_dir.exists():
+        print('deleting existing converted_cvr directory...')
+        shutil.rmtree(util.longname(converted_cvr_dir))
+    util.verifyDir(util.longname(converted_cvr_dir))
+
+    # various tabulation stats will be output here
+    results_dir = path_to_output / 'results'
+    if fresh_output and results_dir.exists():
+        print('deleting existing results directory...')
+        shutil.rmtree(util.longname(results_dir))
+    util.verifyDir(util.longname(results_dir))
+
+    for option in UNAVAILABLE_OUTPUTS:
+        if run_config.get(option):
+            print(f'info -- "{option}" output is not available in this version of rcv_cruncher, it will be skipped.')
+
+    # init loggers
+    error_logger = init_error_logger(results_dir)
+    step_logger = util.CSVLogger(results_dir / 'step_durations.csv', STEP_LOG_HEADER)
+    telemetry = TelemetryLog(results_dir)
+
+    #########################
+    # FIND CHANGED CONTESTS
+
+    manifest = RunManifest.load(results_dir, reuse_results=incremental or resume)
+
+    checkpoint = Checkpoint(results_dir, reset=not resume)
+    parsed_cvr_cache_dir = results_dir / 'parsed_cvr_cache'
+    if not resume and parsed_cvr_cache_dir.exists():
+        shutil.rmtree(util.longname(parsed_cvr_cache_dir))
+    contest_hashes = [contest_hash(contest, run_config) for contest in contest_set]
+
+    # contests sharing a unique id cannot be told apart in the manifest, so they always run
+    uid_counts = collections.Counter(contest['uid'] for contest in contest_set)
+
+    # aggregated stats are spooled to disk as contests finish and sorted into contest set order at the end
+    stats_sink = StatsSink(results_dir, run_config)
+    split_stats_sink = StatsSink(results_dir / 'split_stats' / 'all_contest_splits', run_config)
+
+    n_reused = 0
+    contests_to_run = []
+    for idx, contest in enumerate(contest_set):
+
+        cached_results = None
+        if uid_counts[contest['uid']] == 1 \
+                and manifest.is_current(contest['uid'], contest_hashes[idx]) \
+                and all(p.is_file() for p in converted_cvr_paths(contest, run_config, converted_cvr_dir)):
+            cached_results = manifest.load_results(contest['uid'])
+
+        if cached_results is not None:
+            store_contest_results(idx, contest, cached_results, results_dir, run_config, stats_sink, split_stats_sink)
+            n_reused += 1
+        elif uid_counts[contest['uid']] == 1:
+            contests_to_run.append((idx, resumable_contest(contest, contest_hashes[idx], checkpoint,
+                                                           parsed_cvr_cache_dir, resume)))
+        else:
+            contests_to_run.append((idx, contest))
+
+    if n_reused:
+        print(f'info -- {n_reused} contests are unchanged since the last run, their results will be reused.')
+
+    checkpoint.start_contests({'uid': contest['uid'], 'hash': contest_hashes[idx]} for idx, contest in contests_to_run
+                              if uid_counts[contest['uid']] == 1)
+
+    #########################
+    # RUN CONTESTS
+
+    n_errors = 0
+
+    pbar = tqdm.tqdm(total=len(contests_to_run), bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt}{postfix}', colour='GREEN')
+    pbar.set_description(f'crunching contests ({jobs} jobs)')
+
+    estimator = MemoryEstimator(manifest.measurements)
+    contest_results = _run_contests(contests_to_run, run_config, converted_cvr_dir, results_dir, jobs, step_jobs,
+                                    estimator, memory_budget=memory_budget, memory_limit=memory_limit, timeout=timeout,
+                                    work_queue=pathlib.Path(work_queue) if work_queue else None,
+                                    writer_threads=writer_threads)
+
+    for idx, result in contest_results:
+
+        for error_row in result['errors']:
+            error_logger.write(error_row)
+        for step_name, seconds in result['step_durations'].items():
+            step_logger.write([contest_set[idx]['uid'], contest_set[idx].get('split_id', ''), step_name, f'{seconds:.6f}'])
+        n_errors += result['n_errors']
+        telemetry.add_contest(contest_set[idx], result,
+                              peak_rss=result['peak_rss'] if 'peak_rss' in result else peak_rss())
+
+        store_contest_results(idx, contest_set[idx], result, results_dir, run_config, stats_sink, split_stats_sink)
+
+        uid = contest_set[idx]['uid']
+        if uid_counts[uid] == 1:
+            manifest.record_measurement(uid, parser_name(contest_set[idx]), input_bytes(contest_set[idx]),
+                                        result.get('peak_rss'))
+
+        if uid_counts[uid] == 1:
+            checkpoint.finish_contest(uid, contest_hashes[idx], result['n_errors'], result.get('steps', {}))
+
+        if result['n_errors'] == 0 and uid_counts[uid] == 1:
+            manifest.record(uid, contest_hashes[idx], result)
+            cache_path = parsed_cvr_cache_path(parsed_cvr_cache_dir, uid, contest_hashes[idx])
+            if cache_path.is_file():
+                os.remove(cache_path)
+        else:
+            manifest.discard(uid)
+        manifest.save()
+
+        pbar.update(1)
+        if n_errors:
+            pbar.set_postfix_str(f'{n_errors} ERRORS SO FAR')
+
+    pbar.close()
+    error_logger.close()
+    step_logger.close()
+    telemetry.close(run_seconds=(datetime.datetime.now() - start_time).total_seconds())
+    checkpoint.close()
+
+    manifest.keep_only(contest['uid'] for contest in contest_set)
+    manifest.save()
+
+    #########################
+    # WRITE OUT AGGREGATED STATS, IN CONTEST SET ORDER
+
+    print("write aggregated stats ...")
+    stats_sink.close()
+    split_stats_sink.close()
+
+    end_time = datetime.datetime.now()
+
+    write_input_dir(results_dir, run_config, start_time, end_time)
+
+    duration = end_time - start_time
+    print(f"runtime duration: {str(duration)}")
+    print("DONE!")
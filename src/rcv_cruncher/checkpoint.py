@@ -0,0 +1,112 @@
+from __future__ import annotations
+from typing import (Dict, Iterable, Optional)
+
+import datetime
+import pathlib
+import sqlite3
+
+CHECKPOINT_FILE = 'checkpoint.sqlite'
+
+_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS contests (
+           uid TEXT PRIMARY KEY,
+           hash TEXT NOT NULL,
+           status TEXT NOT NULL,
+           n_errors INTEGER,
+           updated TEXT NOT NULL
+       )''',
+    '''CREATE TABLE IF NOT EXISTS steps (
+           uid TEXT NOT NULL,
+           step TEXT NOT NULL,
+           status TEXT NOT NULL,
+           seconds REAL,
+           output TEXT,
+           message TEXT,
+           PRIMARY KEY (uid, step)
+       )'''
+]
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec='seconds')
+
+
+class Checkpoint:
+    """
+    Completion state of a batch run, kept in results/checkpoint.sqlite so an interrupted run can be resumed.
+
+    Contests about to run are marked 'running'. Once a contest is finished, it is marked 'finished' or
+    'failed' (if any step had an error), along with the status, duration, output path and error message of
+    each step that ran. Every change is committed at once, so the checkpoint survives the run being killed.
+    A contest still marked 'running' when a run is resumed did not finish.
+
+    If reset is True, the state of earlier runs is cleared.
+    """
+
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+
+    def __init__(self, results_dir: pathlib.Path, reset: bool = False) -> None:
+
+        self.path = pathlib.Path(results_dir) / CHECKPOINT_FILE
+        self._conn = sqlite3.connect(str(self.path))
+
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            if reset:
+                self._conn.execute('DELETE FROM contests')
+                self._conn.execute('DELETE FROM steps')
+
+    def __enter__(self) -> Checkpoint:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def contest(self, uid: str) -> Optional[Dict]:
+        """
+        Checkpointed hash and status of a contest, None if it has none.
+        """
+        row = self._conn.execute('SELECT hash, status, n_errors, updated FROM contests WHERE uid = ?', (uid,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(['hash', 'status', 'n_errors', 'updated'], row))
+
+    def steps(self, uid: str) -> Dict[str, Dict]:
+        """
+        Checkpointed steps of a contest, {step name: {'status', 'seconds', 'output', 'message'}}.
+        """
+        rows = self._conn.execute('SELECT step, status, seconds, output, message FROM steps WHERE uid = ?', (uid,))
+        return {row[0]: dict(zip(['status', 'seconds', 'output', 'message'], row[1:])) for row in rows}
+
+    def start_contests(self, contests: Iterable[Dict[str, str]]) -> None:
+        """
+        Mark contests, given as {'uid', 'hash'} dictionaries, as running. Step records of a contest
+        whose hash changed are dropped.
+        """
+        with self._conn:
+            for contest in contests:
+                previous = self.contest(contest['uid'])
+                if previous is not None and previous['hash'] != contest['hash']:
+                    self._conn.execute('DELETE FROM steps WHERE uid = ?', (contest['uid'],))
+                self._conn.execute('INSERT OR REPLACE INTO contests VALUES (?, ?, ?, NULL, ?)',
+                                   (contest['uid'], contest['hash'], self.RUNNING, _now()))
+
+    def finish_contest(self, uid: str, hash_value: str, n_errors: int, steps: Dict[str, Dict]) -> None:
+        """
+        Record a finished contest and the steps that ran, given as {step name: {'success', 'seconds', 'output',
+        'message'}}.
+        """
+        with self._conn:
+            for step, info in steps.items():
+                output = str(info['output']) if info.get('output') is not None else None
+                self._conn.execute('INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?, ?, ?)',
+                                   (uid, step, 'success' if info['success'] else 'failed', info.get('seconds'),
+                                    output, info.get('message')))
+            self._conn.execute('INSERT OR REPLACE INTO contests VALUES (?, ?, ?, ?, ?)',
+                               (uid, hash_value, self.FAILED if n_errors else self.FINISHED, n_errors, _now()))
+
+    def close(self) -> None:
+        self._conn.close()
@@ -17,7 +17,9 @@ Why does this file exist, and why not put this in __main__?
 import argparse
 import os
 
-import rcv_cruncher.contests as contests
+import rcv_cruncher.batch as batch
+import rcv_cruncher.util as util
+import rcv_cruncher.workqueue as workqueue
 
 
 def main():
@@ -26,23 +28,81 @@ def main():
     p = argparse.ArgumentParser(description='Analyze RCV election data.'
                                 'For information on input file preparation, check the documentation at ***docs link here ****')
 
-    p.add_argument('contest_set_path', help="Path to directory containing contest_set.csv and run_config.json.")
+    p.add_argument('contest_set_path', nargs='?',
+                   help="Path to directory containing contest_set.csv and run_config.json.")
     p.add_argument('--fresh', action='store_true',
                    help='Delete existing results/ and converted_cvr/ directories located in contest set directory')
+    p.add_argument('--full', action='store_true',
+                   help='Crunch every contest, even those unchanged since the last run (see results/manifest.json)')
+    p.add_argument('--resume', action='store_true',
+                   help='Continue an interrupted or failed run, skipping finished contests and steps '
+                        '(see results/checkpoint.sqlite)')
+    p.add_argument('--jobs', type=int, default=1,
+                   help='Number of contests to crunch in parallel worker processes. 0 uses all cpus. (default: 1)')
     # p.add_argument('--output_path', help='By default all output will be written to contest_set_path,'
     #                                      'provide this argument to specify an alternative.')
 
+    p.add_argument('--step-jobs', type=int, default=4,
+                   help='Number of independent steps of one contest (e.g. writing converted cvrs and computing stats) '
+                        'to run concurrently in threads. (default: 4)')
+    p.add_argument('--writer-threads', type=int, default=2,
+                   help='Number of threads writing converted cvrs while the next contests are crunched. '
+                        '0 writes them inline. (default: 2)')
+
+    p.add_argument('--memory-budget',
+                   help='Total memory (e.g. 16G) that contests running in parallel are estimated to use at once. '
+                        'Largest contests start first. (default: no budget)')
+    p.add_argument('--memory-limit',
+                   help='Resident memory limit (e.g. 8G) of each contest worker process, which is stopped if it goes '
+                        'over. Checked on linux only. (default: no limit)')
+    p.add_argument('--timeout', type=float,
+                   help='Seconds after which a contest worker process is stopped. (default: no timeout)')
+
+    p.add_argument('--work-queue',
+                   help='Path of a SQLite work queue file (e.g. on a shared filesystem) to publish contests to. '
+                        'They are run by --jobs local workers plus any started on other hosts with --worker.')
+    p.add_argument('--worker', metavar='WORK_QUEUE',
+                   help='Run as a worker: crunch contests from the work queue file of a running contest set, '
+                        'until none are left.')
+
     args = p.parse_args()
+
+    if args.worker:
+        if not os.path.isfile(args.worker):
+            raise RuntimeError(f'invalid path [--worker]: {args.worker}')
+        workqueue.run_worker(args.worker)
+        return(0)
+
     contest_set_path = args.contest_set_path
     fresh = args.fresh
+    jobs = args.jobs
+    full = args.full
+    resume = args.resume
+    step_jobs = args.step_jobs
+    writer_threads = args.writer_threads
+    memory_budget = util.parse_bytes(args.memory_budget) if args.memory_budget else None
+    memory_limit = util.parse_bytes(args.memory_limit) if args.memory_limit else None
+    timeout = args.timeout
     output_path = contest_set_path  # args.output_path if args.output_path else args.contest_set_path
 
+    if contest_set_path is None:
+        p.error('contest_set_path is required, unless running as a --worker')
+
     if not os.path.isabs(contest_set_path):
         contest_set_path = f'{os.getcwd()}/{contest_set_path}'
 
     if not os.path.isdir(contest_set_path):
         raise RuntimeError(f'invalid path [contest_set_path]: {contest_set_path}')
 
+    if jobs < 0:
+        raise RuntimeError(f'invalid value [--jobs]: {jobs}. Must be 0 or more.')
+
+    if step_jobs < 1:
+        raise RuntimeError(f'invalid value [--step-jobs]: {step_jobs}. Must be 1 or more.')
+
+    if writer_threads < 0:
+        raise RuntimeError(f'invalid value [--writer-threads]: {writer_threads}. Must be 0 or more.')
+
     # if not os.path.isabs(output_path):
     #     output_path = f'{os.getcwd()}/{output_path}'
 
@@ -50,9 +110,12 @@ def main():
     #     raise RuntimeError(f'invalid path [output_path]: {output_path}')
 
     # read in contest set info
-    contest_set, run_config = contests.read_contest_set(contest_set_path)
+    contest_set, run_config = batch.read_contest_set(contest_set_path)
 
     # analyze contests
-    contests.crunch_contest_set(contest_set, run_config, output_path, fresh_output=fresh)
+    batch.crunch_contest_set(contest_set, run_config, output_path, fresh_output=fresh, jobs=jobs,
+                             incremental=not full, step_jobs=step_jobs, memory_budget=memory_budget,
+                             memory_limit=memory_limit, timeout=timeout, resume=resume, work_queue=args.work_queue,
+                             writer_threads=writer_threads)
 
     return(0)
@@ -1,13 +1,16 @@
 from __future__ import annotations
-from typing import (Callable, Dict, Optional, List, Type)
+from typing import (Any, Callable, Dict, Optional, List, Type, Union)
 
 import copy
 import decimal
-import collections
-import re
+import os
 
 import pandas as pd
 
+import rcv_cruncher.arrow as arrow
+import rcv_cruncher.util as util
+
+from rcv_cruncher.encoded import (EncodedField, ParsedCVRBuilder, iter_parsed_batches)
 from rcv_cruncher.marks import BallotMarks
 from rcv_cruncher.cvr.tables import CastVoteRecord_tables
 from rcv_cruncher.cvr.stats import CastVoteRecord_stats
@@ -17,6 +20,8 @@ decimal.getcontext().prec = 30
 
 class CastVoteRecord(CastVoteRecord_stats, CastVoteRecord_tables):
 
+    _ID_FIELDS = ('jurisdiction', 'state', 'year', 'date', 'office', 'notes')
+
     @staticmethod
     def get_stats(cvr: Type[CastVoteRecord],
                   keep_decimal_type: bool = False,
@@ -26,6 +31,38 @@ class CastVoteRecord(CastVoteRecord_stats, CastVoteRecord_tables):
                          add_split_stats=add_split_stats,
                          add_id_info=add_id_info)
 
+    @classmethod
+    def from_arrow(cls, table: Any, **kwargs) -> CastVoteRecord:
+        """
+        Make a cvr from a pyarrow Table, such as one returned by to_arrow() or a rank format table.
+        Rank columns are read from the schema metadata, or else are the columns named 'rank1', 'rank2', ...
+        The weight column, if any, may be decimal or numeric. All other columns become parsed cvr fields.
+        Id info stored in the schema metadata is used unless passed as keyword arguments.
+        """
+
+        metadata = arrow.table_metadata(table)
+        rank_columns = arrow.rank_columns(table)
+
+        parsed_cvr = {'ranks': arrow.ranks_from_arrow(table, rank_columns)}
+        for name in table.column_names:
+            if name == 'weight':
+                parsed_cvr['weight'] = arrow.weights_from_arrow(table.column(name))
+            elif name not in rank_columns:
+                parsed_cvr[name] = table.column(name).to_pylist()
+
+        id_info = {k: v for k, v in metadata.items() if k in cls._ID_FIELDS}
+        id_info.update(kwargs)
+
+        return cls(parsed_cvr=parsed_cvr, **id_info)
+
+    @classmethod
+    def read_parquet(cls, path: Union[str, os.PathLike], **kwargs) -> CastVoteRecord:
+        """
+        Read a cvr written with write_parquet(). Keyword arguments are passed to from_arrow().
+        """
+        _, pq = arrow.import_pyarrow()
+        return cls.from_arrow(pq.read_table(str(path)), **kwargs)
+
     def __init__(self,
                  jurisdiction: str = "",
                  state: str = "",
@@ -71,13 +108,16 @@ class CastVoteRecord(CastVoteRecord_stats, CastVoteRecord_tables):
 
         # STAT INFO
 
-        self._cvr_stat_table = None
+        self._cvr_weights = None
+        self._cvr_valid_ranks_used = None
+        self._cvr_first_round = None
+        self._cvr_flags = None
         self._compute_cvr_stat_table()
 
         self._summary_cvr_stat_table = None
         self._compute_summary_cvr_stat_table()
 
-        self._split_filter_dict = {}
+        self._split_groups = {}
         self._summary_cvr_split_stat_table = None
 
     # CVR MODS
@@ -85,6 +125,13 @@ class CastVoteRecord(CastVoteRecord_stats, CastVoteRecord_tables):
                             parser_func: Optional[Callable] = None,
                             parser_args: Optional[Dict] = None,
                             parsed_cvr: Optional[Dict[str, List]] = None) -> Dict[str, List]:
+        """
+        Parser output may be a dictionary of lists, a list of rank lists, or an iterable yielding either of those
+        in batches. Batches are encoded and validated one at a time, so only the compact parsed CVR is kept.
+        Ranks are stored as :class:`rcv_cruncher.encoded.EncodedRanks` and only expanded into BallotMarks
+        when a modified cvr is made. Other fields, except weight, are stored as
+        :class:`rcv_cruncher.encoded.EncodedField` and only expanded into lists by get_cvr_dict().
+        """
 
         if parser_func and parser_args:
             parsed_cvr = parser_func(**parser_args)
@@ -92,58 +139,29 @@ class CastVoteRecord(CastVoteRecord_stats, CastVoteRecord_tables):
         if not parsed_cvr:
             raise ValueError('if no parser_func and parser_args are passed, a parsed_cvr must be passed.')
 
-        # if parser returns a list, assume it is rank list of lists
-        if isinstance(parsed_cvr, list):
-            parsed_cvr = {
-                'ranks': parsed_cvr,
-                'weight': [decimal.Decimal('1')] * len(parsed_cvr)
-            }
-
-        if 'ranks' not in parsed_cvr:
-            raise RuntimeError('Parsed CVR does not contain field "ranks"')
+        builder = ParsedCVRBuilder()
+        for batch in iter_parsed_batches(parsed_cvr):
+            builder.add_batch(batch)
 
+        parsed_cvr = builder.result()
         if len(parsed_cvr['ranks']) == 0:
             raise RuntimeError('parsed ranks list is empty.')
 
-        if 'weight' not in parsed_cvr:
-            parsed_cvr['weight'] = [decimal.Decimal('1') for _ in parsed_cvr['ranks']]
-
-        if not isinstance(parsed_cvr['weight'][0], decimal.Decimal):
-            parsed_cvr['weight'] = [decimal.Decimal(str(i)) for i in parsed_cvr['weight']]
-
-        parsed_cvr['ballot_marks'] = [BallotMarks(ranks) for ranks in parsed_cvr['ranks']]
-        del parsed_cvr['ranks']
-
-        ballot_lengths = collections.Counter(len(b.marks) for b in parsed_cvr['ballot_marks'])
-        if len(ballot_lengths) > 1:
-            raise RuntimeError(f'Parsed CVR contains ballots with unequal length rank lists. {str(ballot_lengths)}')
-
-        field_lengths = {k: len(parsed_cvr[k]) for k in parsed_cvr}
-        if len(set(field_lengths.values())) > 1:
-            raise RuntimeError(f'Parsed CVR contains fields of unequal length. {str(field_lengths)}')
+        self._parsed_candidates = builder.candidates
 
         return parsed_cvr
 
     def _unique_id(self) -> str:
-        pieces = []
-        if self.jurisdiction:
-            pieces.append(self.jurisdiction)
-        if self.date:
-            padded_date = "".join(date_piece if len(date_piece) > 1 else "0" + date_piece
-                                  for date_piece in self.date.split("/"))
-            pieces.append(padded_date)
-        elif self.year:
-            pieces.append(self.year)
-        if self.office:
-            pieces.append(self.office)
-        return "_".join(re.sub('[^0-9a-zA-Z_]+', '', piece) for piece in pieces)
+        return util.unique_id(jurisdiction=self.jurisdiction, date=self.date, year=self.year, office=self.office)
 
     def _make_modified_cvr(self, rule_set_name: str) -> None:
 
         if rule_set_name not in self._rule_sets:
             raise RuntimeError(f'rule set {rule_set_name} has not yet been added using add_rule_set().')
 
-        cvr = copy.deepcopy(self._parsed_cvr)
+        # encoded fields are not changed by rule sets, so every modified cvr shares them
+        cvr = {k: v if isinstance(v, EncodedField) else copy.deepcopy(v) for k, v in self._parsed_cvr.items() if k != 'ranks'}
+        cvr['ballot_marks'] = [BallotMarks(ranks) for ranks in self._parsed_cvr['ranks']]
 
         for ballot in cvr['ballot_marks']:
             ballot.apply_rules(**self._rule_sets[rule_set_name])
@@ -155,14 +173,12 @@ class CastVoteRecord(CastVoteRecord_stats, CastVoteRecord_tables):
         if rule_set_name not in self._rule_sets:
             raise RuntimeError(f'rule set {rule_set_name} has not yet been added using add_rule_set().')
 
-        cvr = self._parsed_cvr
-
         # unpack rules
         rule_set = self._rule_sets[rule_set_name]
         combine_writeins = rule_set['combine_writein_marks']
         exclude_writeins = rule_set['exclude_writein_marks']
 
-        candidate_ballot_marks = BallotMarks(set.union(*[b.unique_candidates for b in cvr['ballot_marks']]))
+        candidate_ballot_marks = BallotMarks(set(self._parsed_candidates))
         candidate_ballot_marks.apply_rules(combine_writein_marks=combine_writeins, exclude_writein_marks=exclude_writeins)
 
         self._candidate_sets.update({rule_set_name: candidate_ballot_marks})
@@ -175,6 +191,9 @@ class CastVoteRecord(CastVoteRecord_stats, CastVoteRecord_tables):
 
         self._rule_sets.update({set_name: set_dict})
 
+    def n_ballots(self) -> int:
+        return len(self._parsed_cvr['ranks'])
+
     def get_cvr_dict(self, rule_set_name: Optional[str] = None) -> Dict[str, List]:
 
         if rule_set_name is None:
@@ -183,7 +202,8 @@ class CastVoteRecord(CastVoteRecord_stats, CastVoteRecord_tables):
         if rule_set_name not in self._modified_cvrs:
             self._make_modified_cvr(rule_set_name)
 
-        return copy.deepcopy(self._modified_cvrs[rule_set_name])
+        return {k: v.to_list() if isinstance(v, EncodedField) else copy.deepcopy(v)
+                for k, v in self._modified_cvrs[rule_set_name].items()}
 
     def get_candidates(self, rule_set_name: Optional[str] = None) -> BallotMarks:
 
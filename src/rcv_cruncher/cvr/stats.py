@@ -1,11 +1,14 @@
 
-import collections
-import weightedstats
+from typing import (List, Optional, Tuple, Union)
 
+import numpy as np
 import pandas as pd
 
 import rcv_cruncher.util as util
 
+from rcv_cruncher.encoded import (EncodedField, EncodedRanks)
+from rcv_cruncher.flags import FlagStore
+from rcv_cruncher.histogram import (ExactWeights, WeightedHistogram)
 from rcv_cruncher.marks import BallotMarks
 
 
@@ -24,7 +27,7 @@ class CastVoteRecord_stats:
 
         if add_split_stats:
 
-            self._make_split_filter_dict()
+            self._make_split_groups()
             self._compute_summary_cvr_split_stat_table()
 
             if self._summary_cvr_split_stat_table is not None:
@@ -40,76 +43,105 @@ class CastVoteRecord_stats:
                 cvr_stats = cvr_split_stats
 
         if not keep_decimal_type:
-            cvr_stats = cvr_stats.applymap(util.decimal2float)
+            cvr_stats = util.decimal2float_frame(cvr_stats)
 
         return cvr_stats
 
-    def _compute_cvr_stat_table(self) -> None:
+    # per-ballot flags, in the column order of the materialized stat table
+    _cvr_flag_names = ['used_last_rank', 'undervote', 'ranked_single', 'ranked_multiple', 'ranked_3_or_more',
+                       'first_round_overvote', 'contains_overvote', 'contains_skip', 'contains_duplicate',
+                       'irregular', 'fully_ranked']
+
+    @property
+    def _cvr_stat_table(self) -> pd.DataFrame:
+        """
+        Per-ballot stat table as a DataFrame, materialized from the compact per-ballot stats on each access.
+        """
+        weight = self._cvr_weights.decimals
+        df = pd.DataFrame({'weight': weight})
+        df['valid_ranks_used'] = self._cvr_valid_ranks_used
+        df['ranks_used_times_weight'] = df['valid_ranks_used'] * df['weight']
+        for name in self._cvr_flag_names:
+            df[name] = self._cvr_flags[name]
+        df.insert(df.columns.get_loc('first_round_overvote'), 'first_round', self._cvr_first_round)
+        return df
 
-        cvr = self.get_cvr_dict()
+    def _compute_cvr_stat_table(self) -> None:
+        """
+        Per-ballot stats, computed with array operations on the encoded rank matrix of the parsed cvr, which is
+        what the default rule set produces. Boolean stats are packed into a :class:`rcv_cruncher.flags.FlagStore`.
+        """
+
+        ranks = self._parsed_cvr['ranks']
+        codes = ranks.codes.astype(np.int64)
+        labels = ranks.labels
+        n_ballots = codes.shape[0]
         candidates = self.get_candidates()
 
-        df = pd.DataFrame()
-        df['weight'] = cvr['weight']
+        skipped = codes == EncodedRanks.SKIPPED_CODE
+        overvote = codes == EncodedRanks.OVERVOTE_CODE
 
-        df['valid_ranks_used'] = [len(b.unique_candidates) for b in cvr['ballot_marks']]
-        df['ranks_used_times_weight'] = df['valid_ranks_used'] * df['weight']
+        # sorting each ballot puts repeated marks next to each other
+        sorted_codes = np.sort(codes, axis=1)
+        first_of_value = np.ones(sorted_codes.shape, dtype=bool)
+        first_of_value[:, 1:] = sorted_codes[:, 1:] != sorted_codes[:, :-1]
+        sorted_is_candidate = sorted_codes > EncodedRanks.OVERVOTE_CODE
+
+        self._cvr_weights = ExactWeights(self._parsed_cvr['weight'])
+        flags = FlagStore(n_ballots)
+
+        valid_ranks_used = (first_of_value & sorted_is_candidate).sum(axis=1)
+        self._cvr_valid_ranks_used = valid_ranks_used.astype(np.min_scalar_type(codes.shape[1]))
 
-        df['used_last_rank'] = [True if b.marks[-1] != BallotMarks.SKIPPED else False for b in cvr['ballot_marks']]
+        flags['used_last_rank'] = ~skipped[:, -1]
 
-        df['undervote'] = [b.unique_marks == {BallotMarks.SKIPPED} for b in cvr['ballot_marks']]
-        df['ranked_single'] = df['valid_ranks_used'] == 1
-        df['ranked_multiple'] = df['valid_ranks_used'] > 1
-        df['ranked_3_or_more'] = df['valid_ranks_used'] > 2
+        undervote = skipped.all(axis=1)
+        flags['undervote'] = undervote
+        flags['ranked_single'] = valid_ranks_used == 1
+        flags['ranked_multiple'] = valid_ranks_used > 1
+        flags['ranked_3_or_more'] = valid_ranks_used > 2
 
-        ballot_marks_no_skipped = [BallotMarks.remove_mark(b, [BallotMarks.SKIPPED]) for b in cvr['ballot_marks']]
-        first_round = [b.marks[0] if b.marks else 'NA' for b in ballot_marks_no_skipped]
-        df['first_round'] = pd.Series(first_round, dtype='category')
+        # first non-skipped mark, or 'NA' for undervotes
+        first_mark_idx = np.argmax(~skipped, axis=1)
+        first_codes = np.where(undervote, -1, codes[np.arange(n_ballots), first_mark_idx])
+        unique_first_codes, first_code_inverse = np.unique(first_codes, return_inverse=True)
+        first_round_categories = pd.Categorical([labels[c] if c >= 0 else 'NA' for c in unique_first_codes])
+        self._cvr_first_round = pd.Categorical.from_codes(first_round_categories.codes[first_code_inverse],
+                                                          first_round_categories.categories)
 
-        df['first_round_overvote'] = df['first_round'].eq(BallotMarks.OVERVOTE)
+        flags['first_round_overvote'] = first_codes == EncodedRanks.OVERVOTE_CODE
 
-        df['contains_overvote'] = [BallotMarks.OVERVOTE in b.unique_marks for b in cvr['ballot_marks']]
+        flags['contains_overvote'] = overvote.any(axis=1)
 
         # contains_skipped
-        # {SKIPVOTE} & {x} - {y}
-        # this checks that x == SKIPVOTE and that y then != SKIPVOTE
-        # (the y check is important to know whether or not the ballot contains marks
-        # following the skipped rank)
-        df['contains_skip'] = [any({BallotMarks.SKIPPED} & {x} - {y} for x, y in zip(b.marks, b.marks[1:]))
-                               for b in cvr['ballot_marks']]
+        # a skipped rank followed by a non-skipped mark
+        flags['contains_skip'] = (skipped[:, :-1] & ~skipped[:, 1:]).any(axis=1)
 
         # contains_duplicate
-        # remove overvotes and undervotes
-        dup_check = [BallotMarks.remove_mark(b, [BallotMarks.SKIPPED, BallotMarks.OVERVOTE]) for b in cvr['ballot_marks']]
-        # count all ranks for candidates
-        counters = [collections.Counter(b.marks) for b in dup_check]
-        # check if any candidates were ranked more than once
-        df['contains_duplicate'] = [max(counter.values()) > 1 if counter else False for counter in counters]
+        # any candidate code appearing more than once in a ballot
+        flags['contains_duplicate'] = (~first_of_value & sorted_is_candidate).any(axis=1)
 
         irregular_condtions = ['contains_overvote', 'contains_skip', 'contains_duplicate']
-        df['irregular'] = df[irregular_condtions].any(axis='columns')
+        flags['irregular'] = flags.any(irregular_condtions)
 
         # fully_ranked
         candidates_combined_writeins = BallotMarks.combine_writein_marks(candidates)
         candidates_excluded_writeins = BallotMarks.remove_mark(candidates_combined_writeins, [BallotMarks.WRITEIN])
         candidate_set = candidates_excluded_writeins.unique_candidates
 
-        ballot_marks_cleaned = [BallotMarks.remove_mark(b, [BallotMarks.OVERVOTE, BallotMarks.SKIPPED])
-                                for b in cvr['ballot_marks']]
-        ballot_marks_cleaned = [BallotMarks.remove_duplicate_candidate_marks(b) for b in ballot_marks_cleaned]
+        label_codes = ranks.label_map()
+        in_candidate_set = np.zeros(len(labels), dtype=bool)
+        in_candidate_set[[label_codes[c] for c in candidate_set if c in label_codes]] = True
+        n_ranked_from_set = (first_of_value & in_candidate_set[sorted_codes]).sum(axis=1)
 
-        fully_ranked = [(set(b.marks) & candidate_set) == candidate_set or
-                        # voters ranked every possible candidate
-                        len(a.marks) == len(b.marks)
-                        # or did not, had no skipped ranks, overvotes, or duplicates
-                        for a, b in zip(cvr['ballot_marks'], ballot_marks_cleaned)]
-        df['fully_ranked'] = fully_ranked
+        # voters ranked every possible candidate
+        # or did not, had no skipped ranks, overvotes, or duplicates
+        flags['fully_ranked'] = (n_ranked_from_set == len(candidate_set)) | (valid_ranks_used == codes.shape[1])
 
-        self._cvr_stat_table = df
+        self._cvr_flags = flags
 
     def _compute_summary_cvr_stat_table(self) -> None:
 
-        cvr = self.get_cvr_dict()
         candidates = self.get_candidates()
 
         s = pd.Series(dtype=object)
@@ -117,7 +149,7 @@ class CastVoteRecord_stats:
         candidates_no_writeins = BallotMarks.remove_mark(BallotMarks.combine_writein_marks(candidates), [BallotMarks.WRITEIN])
         s['n_candidates'] = len(candidates_no_writeins.marks)
 
-        s['rank_limit'] = len(cvr['ballot_marks'][0].marks)
+        s['rank_limit'] = self._parsed_cvr['ranks'].rank_limit
         s['restrictive_rank_limit'] = True if s['rank_limit'] < (s['n_candidates'] - 1) else False
 
         # first_round_overvote
@@ -129,134 +161,191 @@ class CastVoteRecord_stats:
         # skipped rankings are followed by an overvote.
 
         # Other jursidictions (Minneapolis) simply skip over overvotes in a ballot.
-        s['first_round_overvote'] = self._cvr_stat_table.loc[self._cvr_stat_table['first_round_overvote'], 'weight'].sum()
+        flag_sums = self._cvr_flags.weighted_sums(self._cvr_flag_names, self._cvr_weights)
+        s['first_round_overvote'] = flag_sums['first_round_overvote'][0]
 
         # The number of voters that validly used only a single ranking. (weighted)
-        s['ranked_single'] = self._cvr_stat_table.loc[self._cvr_stat_table['ranked_single'], 'weight'].sum()
+        s['ranked_single'] = flag_sums['ranked_single'][0]
 
         # The number of voters that validly used 3 or more rankings. (weighted)
-        s['ranked_3_or_more'] = self._cvr_stat_table.loc[self._cvr_stat_table['ranked_3_or_more'], 'weight'].sum()
+        s['ranked_3_or_more'] = flag_sums['ranked_3_or_more'][0]
 
         # The number of voters that validly use more than one ranking. (weighted)
-        s['ranked_multiple'] = self._cvr_stat_table.loc[self._cvr_stat_table['ranked_multiple'], 'weight'].sum()
+        s['ranked_multiple'] = flag_sums['ranked_multiple'][0]
 
         # The number of voters that have validly used all available rankings on the
         # ballot, or that have validly ranked all non-write-in candidates. (weighted)
-        s['total_fully_ranked'] = self._cvr_stat_table.loc[self._cvr_stat_table['fully_ranked'], 'weight'].sum()
+        s['total_fully_ranked'] = flag_sums['fully_ranked'][0]
 
         # The number of ballots that rank the same candidate more than once. (weighted)
-        s['includes_duplicate_ranking'] = self._cvr_stat_table.loc[self._cvr_stat_table['contains_duplicate'], 'weight'].sum()
+        s['includes_duplicate_ranking'] = flag_sums['contains_duplicate'][0]
 
         # The number of ballots that have an skipped ranking followed by any other marked ranking. (weighted)
-        s['includes_skipped_ranking'] = self._cvr_stat_table.loc[self._cvr_stat_table['contains_skip'], 'weight'].sum()
+        s['includes_skipped_ranking'] = flag_sums['contains_skip'][0]
 
         # This includes ballots with no marks. (weighted)
-        s['total_ballots'] = self._cvr_stat_table['weight'].sum()
+        s['total_ballots'] = self._cvr_weights.sums()[0]
 
         # Number of ballots that either had a multiple ranking, overvote,
         # or a skipped ranking (only those followed by a mark). This includes ballots even where the irregularity was not
         # the cause of exhaustion. (weighted)
-        s['total_irregular'] = self._cvr_stat_table.loc[self._cvr_stat_table['irregular'], 'weight'].sum()
+        s['total_irregular'] = flag_sums['irregular'][0]
 
         # Number of ballots with at least one overvote. Not necessarily cause of exhaustion. (weighted)
-        s['includes_overvote_ranking'] = self._cvr_stat_table.loc[self._cvr_stat_table['contains_overvote'], 'weight'].sum()
+        s['includes_overvote_ranking'] = flag_sums['contains_overvote'][0]
 
         # Ballots completely made up of skipped rankings (no marks). (weighted)
-        s['total_undervote'] = self._cvr_stat_table.loc[self._cvr_stat_table['undervote'], 'weight'].sum()
+        s['total_undervote'] = flag_sums['undervote'][0]
 
-        # Mean number of validly used rankings across all non-undervote ballots. (weighted)
-        weighted_sum = self._cvr_stat_table.loc[~self._cvr_stat_table['undervote'], 'ranks_used_times_weight'].sum()
-        s['mean_rankings_used'] = weighted_sum / self._cvr_stat_table.loc[~self._cvr_stat_table['undervote'], 'weight'].sum()
-
-        # Median number of validly used rankings across all non-undervote ballots. (weighted)
-        # s['median_rankings_used'] = self._cvr_stat_table.loc[~self._cvr_stat_table['undervote'], 'ranks_used_times_weight'].median()
-
-        ranks_used = self._cvr_stat_table.loc[~self._cvr_stat_table['undervote'], 'valid_ranks_used'].tolist()
-        weights = self._cvr_stat_table.loc[~self._cvr_stat_table['undervote'], 'weight'].tolist()
-        weights_float = [float(i) for i in weights]
-        s['median_rankings_used'] = weightedstats.weighted_median(ranks_used, weights=weights_float)
+        # Mean and median number of validly used rankings across all non-undervote ballots. (weighted)
+        rankings_used = self._rankings_used_histogram()
+        s['mean_rankings_used'] = rankings_used.mean()[0]
+        s['median_rankings_used'] = rankings_used.median()[0]
 
         self._summary_cvr_stat_table = s.to_frame().transpose()
 
-    def _make_split_filter_dict(self) -> None:
+    def _make_split_groups(self) -> None:
+        """
+        Factorize each split field into integer group codes, stored in self._split_groups as
+        {split field name: (group code array, list of group values)}.
 
-        if self.split_fields:
+        A split field may also be a tuple of field names, which splits on every combination of their values
+        (e.g. ('precinct', 'countingGroup')). Its name and values are joined with ':'.
+        Fields not present in the cvr are ignored.
+        """
 
-            cvr = self.get_cvr_dict()
-            cvr_fields = list(cvr.keys())
-            field_name_lower_dict = {k.lower(): k for k in cvr_fields}
+        if not self.split_fields or self._split_groups:
+            return
 
-            for field in self.split_fields:
-                if field.lower() in field_name_lower_dict:
-                    cvr_field_name = field_name_lower_dict[field.lower()]
-                    cvr_field = cvr[cvr_field_name]
-                    field_filter_dict = {unique_val: [unique_val == i for i in cvr_field] for unique_val in set(cvr_field)}
-                    self._split_filter_dict.update({cvr_field_name: field_filter_dict})
+        field_name_lower_dict = {k.lower(): k for k in self._parsed_cvr if k != 'ranks'}
+
+        for split_field in self.split_fields:
+
+            fields = [split_field] if isinstance(split_field, str) else list(split_field)
+            if not all(field.lower() in field_name_lower_dict for field in fields):
+                continue
+
+            cvr_field_names = [field_name_lower_dict[field.lower()] for field in fields]
+            field_codes, field_values = zip(*[self._split_field_groups(self._parsed_cvr[field])
+                                              for field in cvr_field_names])
+
+            if len(cvr_field_names) == 1:
+                group_codes, group_values = field_codes[0], field_values[0]
+            else:
+                # combine per-field codes into one code per combination, numbered by first appearance
+                combined = np.zeros(len(field_codes[0]), dtype=np.int64)
+                for codes, values in zip(field_codes, field_values):
+                    combined = combined * len(values) + codes
+                group_codes, first_idx = self._factorize_split_field(combined, return_first_index=True)
+                group_values = [":".join(str(values[codes[idx]]) for codes, values in zip(field_codes, field_values))
+                                for idx in first_idx]
+
+            self._split_groups.update({":".join(cvr_field_names): (group_codes, group_values)})
+
+    def _split_field_groups(self, field: Union[EncodedField, List]) -> Tuple[np.ndarray, List]:
+        """
+        Group codes and group values of a split field. Encoded fields already number their values in order of
+        first appearance, so their codes are used directly, with the missing value group moved to the end.
+        """
+        if not isinstance(field, EncodedField):
+            return self._factorize_split_field(field)
+
+        codes = field.codes.astype(np.int64)
+        values = field.values
+        missing = field.missing_code
+
+        if missing is not None and missing != len(values) - 1:
+            order = [code for code in range(len(values)) if code != missing] + [missing]
+            remap = np.empty(len(values), dtype=np.int64)
+            remap[order] = np.arange(len(values))
+            codes = remap[codes]
+            values = [values[code] for code in order]
+
+        return codes, values
+
+    @staticmethod
+    def _factorize_split_field(field_values: List, return_first_index: bool = False) -> Tuple[np.ndarray, List]:
+        """
+        Integer group code per ballot, with groups numbered in order of first appearance. Missing values form their own group.
+        Returns the group codes and either the group values or the index of each group's first ballot.
+        """
+        codes, uniques = pd.factorize(np.fromiter(field_values, dtype=object, count=len(field_values)), sort=False)
+        codes = codes.astype(np.int64)
+        uniques = list(uniques)
+
+        missing = codes == -1
+        if missing.any():
+            codes[missing] = len(uniques)
+            uniques.append(field_values[int(np.argmax(missing))])
+
+        if return_first_index:
+            _, first_idx = np.unique(codes, return_index=True)
+            return codes, first_idx.tolist()
+
+        return codes, uniques
 
     def _clean_string(self, x: str) -> str:
         return str(x).replace(":", "_").replace("/", "_").replace("\\", "_").replace(" ", "_").replace("-", "_")
 
-    def _compute_cvr_split_stats(self, split_filter) -> pd.DataFrame:
-
-        filtered_stat_table = self._cvr_stat_table.loc[split_filter, :]
-
-        first_round_overvote = filtered_stat_table.loc[filtered_stat_table['first_round_overvote'], 'weight'].sum()
-        ranked_single = filtered_stat_table.loc[filtered_stat_table['ranked_single'], 'weight'].sum()
-        ranked_multiple = filtered_stat_table.loc[filtered_stat_table['ranked_multiple'], 'weight'].sum()
-        ranked_3_or_more = filtered_stat_table.loc[filtered_stat_table['ranked_3_or_more'], 'weight'].sum()
-        total_fully_ranked = filtered_stat_table.loc[filtered_stat_table['fully_ranked'], 'weight'].sum()
-        includes_duplicate_ranking = filtered_stat_table.loc[filtered_stat_table['contains_duplicate'], 'weight'].sum()
-        includes_skipped_ranking = filtered_stat_table.loc[filtered_stat_table['contains_skip'], 'weight'].sum()
-        total_irregular = filtered_stat_table.loc[filtered_stat_table['irregular'], 'weight'].sum()
-        total_ballots = filtered_stat_table['weight'].sum()
-        includes_overvote_ranking = filtered_stat_table.loc[filtered_stat_table['contains_overvote'], 'weight'].sum()
-        total_undervote = filtered_stat_table.loc[filtered_stat_table['undervote'], 'weight'].sum()
-
-        weighted_sum = filtered_stat_table.loc[~filtered_stat_table['undervote'], 'ranks_used_times_weight'].sum()
-        mean_rankings_used = weighted_sum / filtered_stat_table.loc[~filtered_stat_table['undervote'], 'weight'].sum()
-
-        ranks_used = filtered_stat_table.loc[~filtered_stat_table['undervote'], 'valid_ranks_used'].tolist()
-        weights = filtered_stat_table.loc[~filtered_stat_table['undervote'], 'weight'].tolist()
-        weights_float = [float(i) for i in weights]
-        median_rankings_used = weightedstats.weighted_median(ranks_used, weights=weights_float)
-
-        filtered_summary_stat_table = pd.DataFrame({
-            'split_first_round_overvote': [first_round_overvote],
-            'split_ranked_single': [ranked_single],
-            'split_ranked_multiple': [ranked_multiple],
-            'split_ranked_3_or_more': [ranked_3_or_more],
-            'split_mean_rankings_used': [mean_rankings_used],
-            'split_median_rankings_used': [median_rankings_used],
-            'split_total_fully_ranked': [total_fully_ranked],
-            'split_includes_duplicate_ranking': [includes_duplicate_ranking],
-            'split_includes_skipped_ranking': [includes_skipped_ranking],
-            'split_total_irregular': [total_irregular],
-            'split_total_ballots': [total_ballots],
-            'split_includes_overvote_ranking': [includes_overvote_ranking],
-            'split_total_undervote': [total_undervote]
+    def _split_id_table(self, split_field: str, split_values: List) -> pd.DataFrame:
+        return pd.DataFrame({
+            'split_field': [split_field] * len(split_values),
+            'split_value': split_values,
+            'split_id': [self._clean_string(split_field) + "-" + self._clean_string(v) for v in split_values]
+        })
+
+    def _rankings_used_histogram(self,
+                                 group_codes: Optional[np.ndarray] = None,
+                                 n_groups: Optional[int] = None) -> WeightedHistogram:
+        """
+        Weighted histogram of valid rankings used by non-undervote ballots, optionally per split group.
+        """
+        return WeightedHistogram(self._cvr_valid_ranks_used,
+                                 self._cvr_weights,
+                                 group_codes=group_codes,
+                                 n_groups=n_groups if group_codes is not None else 1,
+                                 n_values=self._parsed_cvr['ranks'].rank_limit + 1,
+                                 mask=~self._cvr_flags['undervote'])
+
+    def _compute_cvr_split_stats(self, group_codes: np.ndarray, n_groups: int) -> pd.DataFrame:
+        """
+        All cvr split stats for one split field, computed with weighted bincounts over the per-ballot flags.
+        """
+
+        sums = self._cvr_flags.weighted_sums(self._cvr_flag_names, self._cvr_weights, group_codes, n_groups)
+        total_ballots = self._cvr_weights.sums(group_codes, n_groups)
+
+        # mean and median rankings used exclude undervotes, groups of only undervotes get NaN
+        rankings_used = self._rankings_used_histogram(group_codes, n_groups)
+        mean_rankings_used = rankings_used.mean()
+        median_rankings_used = rankings_used.median()
+
+        split_stats = pd.DataFrame({
+            'split_first_round_overvote': sums['first_round_overvote'],
+            'split_ranked_single': sums['ranked_single'],
+            'split_ranked_multiple': sums['ranked_multiple'],
+            'split_ranked_3_or_more': sums['ranked_3_or_more'],
+            'split_mean_rankings_used': mean_rankings_used,
+            'split_median_rankings_used': median_rankings_used,
+            'split_total_fully_ranked': sums['fully_ranked'],
+            'split_includes_duplicate_ranking': sums['contains_duplicate'],
+            'split_includes_skipped_ranking': sums['contains_skip'],
+            'split_total_irregular': sums['irregular'],
+            'split_total_ballots': total_ballots,
+            'split_includes_overvote_ranking': sums['contains_overvote'],
+            'split_total_undervote': sums['undervote']
             })
-        return filtered_summary_stat_table
+        return split_stats
 
     def _compute_summary_cvr_split_stat_table(self) -> None:
 
-        if not self._split_filter_dict:
+        if not self._split_groups:
             return
 
         split_df_list = []
+        for split_field, (group_codes, group_values) in self._split_groups.items():
+            split_id_df = self._split_id_table(split_field, group_values)
+            split_stat_df = self._compute_cvr_split_stats(group_codes, len(group_values))
+            split_df_list.append(pd.concat([split_id_df, split_stat_df], axis='columns'))
 
-        for field in self._split_filter_dict:
-            field_clean = self._clean_string(field)
-
-            for unique_val in self._split_filter_dict[field]:
-                val_clean = self._clean_string(unique_val)
-                split_id = field_clean + "-" + val_clean
-
-                split_id_df = pd.DataFrame({
-                    'split_field': [field],
-                    'split_value': [unique_val],
-                    'split_id': [split_id]
-                    })
-                split_stat_df = self._compute_cvr_split_stats(self._split_filter_dict[field][unique_val])
-                split_df_list.append(pd.concat([split_id_df, split_stat_df], axis='columns'))
-
-        self._summary_cvr_split_stat_table = pd.concat(split_df_list, axis=0, sort=False)
+        self._summary_cvr_split_stat_table = pd.concat(split_df_list, axis=0, ignore_index=True, sort=False)
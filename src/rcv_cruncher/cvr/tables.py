@@ -1,83 +1,204 @@
+from __future__ import annotations
+from typing import (Any, Dict, Iterator, List, Optional, Set, Union)
 
-import copy
+import json
+import os
 
+import numpy as np
 import pandas as pd
 
-import rcv_cruncher.util as util
+import rcv_cruncher.arrow as arrow
 
 from rcv_cruncher.marks import BallotMarks
+from rcv_cruncher.writers import open_table_writer
 
 
 class CastVoteRecord_tables:
 
-    # EXPORT
+    # rows per chunk when streaming converted cvr tables
+    DEFAULT_CHUNK_SIZE = 100000
 
-    def get_cvr_table(self, table_format: str = "rank") -> pd.DataFrame:
+    # EXPORT
 
+    @staticmethod
+    def _check_table_format(table_format: str) -> None:
         if table_format != "rank" and table_format != "candidate":
             raise RuntimeError('table_format argument must be "rank" or "candidate"')
 
+    def get_cvr_table(self, table_format: str = "rank") -> pd.DataFrame:
+
+        self._check_table_format(table_format)
+
         if table_format == "rank":
             return self._rank_header_cvr()
         elif table_format == "candidate":
             return self._candidate_header_cvr()
 
-    def _rank_header_cvr(self) -> pd.DataFrame:
+    def iter_cvr_table(self, table_format: str = "rank", chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Yield the table returned by get_cvr_table() in chunks of at most chunk_size consecutive ballots.
+        Each chunk is built directly from the encoded ranks, so only one chunk is in memory at a time.
+        """
+
+        self._check_table_format(table_format)
+
+        if chunk_size is None:
+            chunk_size = self.DEFAULT_CHUNK_SIZE
+        if chunk_size < 1:
+            raise RuntimeError('chunk_size must be a positive integer.')
+
+        n_ballots = len(self._parsed_cvr['ranks'])
+
+        # table wide decisions are made once, so every chunk has the same columns
+        include_weight = not self._all_weights_one()
+        candidates = self._table_candidates() if table_format == "candidate" else None
+
+        for start in range(0, n_ballots, chunk_size):
+            stop = min(start + chunk_size, n_ballots)
+            if table_format == "rank":
+                yield self._rank_table_chunk(start, stop, include_weight=include_weight)
+            else:
+                yield self._candidate_table_chunk(start, stop, include_weight=include_weight, candidates=candidates)
+
+    def write_cvr_table(self,
+                        path: Union[str, os.PathLike],
+                        table_format: str = "rank",
+                        file_format: Optional[str] = None,
+                        chunk_size: Optional[int] = None) -> int:
+        """
+        Stream the converted cvr table to path as csv, gzipped csv or parquet (requires pyarrow), one chunk at a time.
+        If file_format is None, it is inferred from the extension of path. Returns the number of rows written.
+        """
+
+        self._check_table_format(table_format)
+
+        with open_table_writer(path, file_format=file_format) as writer:
+            for chunk in self.iter_cvr_table(table_format=table_format, chunk_size=chunk_size):
+                writer.write(chunk)
+
+        return writer.n_rows
+
+    def to_arrow(self) -> Any:
+        """
+        The parsed cvr as a pyarrow Table: one dictionary-encoded column per rank ('rank1', 'rank2', ...) whose
+        indices are the encoded ranks, the other parsed fields, and the weights as a decimal column. The cvr id
+        info and the rank column names are kept in the schema metadata, so from_arrow() can rebuild the cvr.
+        """
+
+        pa, _ = arrow.import_pyarrow()
+
+        rank_columns = arrow.ranks_to_arrow(self._parsed_cvr['ranks'])
+
+        columns = {k: arrow.field_to_arrow(k, v) for k, v in self._parsed_cvr.items() if k != 'ranks' and k != 'weight'}
+        columns.update(rank_columns)
+        columns['weight'] = arrow.weights_to_arrow(self._parsed_cvr['weight'])
+
+        metadata = {
+            'jurisdiction': self.jurisdiction,
+            'state': self.state,
+            'year': self.year,
+            'date': self.date,
+            'office': self.office,
+            'notes': self.notes,
+            'rank_columns': list(rank_columns)
+        }
+
+        return pa.table(columns).replace_schema_metadata({arrow.METADATA_KEY: json.dumps(metadata)})
+
+    def write_parquet(self, path: Union[str, os.PathLike]) -> None:
+        """
+        Write the table returned by to_arrow() to a parquet file, which read_parquet() reads back.
+        """
+        _, pq = arrow.import_pyarrow()
+        pq.write_table(self.to_arrow(), str(path))
+
+    def _all_weights_one(self) -> bool:
+        return all(w == 1 for w in self._parsed_cvr['weight'])
+
+    def _table_candidates(self) -> Set[str]:
+        candidates = self.get_candidates().unique_candidates
+        candidates.update({BallotMarks.OVERVOTE})
+        return candidates
 
-        ballot_dict = copy.deepcopy(self.get_cvr_dict())
-        bs = [b.marks for b in ballot_dict['ballot_marks']]
-        weight = ballot_dict['weight']
-        del ballot_dict['ballot_marks']
-        del ballot_dict['weight']
+    def _field_chunk(self, start: int, stop: int) -> Dict[str, List]:
+        return {k: v.take(slice(start, stop)) for k, v in self._parsed_cvr.items() if k != 'ranks' and k != 'weight'}
 
-        # how many ranks?
-        num_ranks = max(len(i) for i in bs)
+    def _rank_header_cvr(self) -> pd.DataFrame:
+        n_ballots = len(self._parsed_cvr['ranks'])
+        return self._rank_table_chunk(0, n_ballots, include_weight=not self._all_weights_one())
 
-        # make sure all ballots are lists of equal length, adding trailing 'skipped' if necessary
-        bs = [b + ([BallotMarks.SKIPPED] * (num_ranks - len(b))) for b in bs]
+    def _rank_table_chunk(self, start: int, stop: int, include_weight: bool = True) -> pd.DataFrame:
+        """
+        Rank format rows for ballots start to stop: the parsed fields, weight (if included) and one column per rank.
+        The default rule set leaves marks unchanged, so rank columns are the labels of the encoded ranks.
+        """
 
-        # assemble output_table, start with extras
-        output_df = pd.DataFrame.from_dict(ballot_dict)
+        ranks = self._parsed_cvr['ranks']
+        codes = ranks.codes[start:stop]
+        labels = ranks.label_array()
 
-        # are weights all one, then dont add to output
-        if not all([i == 1 for i in weight]):
-            output_df['weight'] = [float(w) for w in weight]
+        columns = self._field_chunk(start, stop)
 
-        # add in rank columns
-        for i in range(1, num_ranks + 1):
-            output_df['rank' + str(i)] = [b[i-1] for b in bs]
+        if include_weight:
+            columns['weight'] = np.array([float(w) for w in self._parsed_cvr['weight'][start:stop]], dtype=np.float64)
 
-        return output_df
+        for i in range(codes.shape[1]):
+            columns['rank' + str(i + 1)] = labels[codes[:, i]]
+
+        return pd.DataFrame(columns, index=pd.RangeIndex(start, stop))
 
     def _candidate_header_cvr(self) -> pd.DataFrame:
+        n_ballots = len(self._parsed_cvr['ranks'])
+        return self._candidate_table_chunk(0, n_ballots, include_weight=not self._all_weights_one(),
+                                           candidates=self._table_candidates())
+
+    def _candidate_table_chunk(self,
+                               start: int,
+                               stop: int,
+                               include_weight: bool = True,
+                               candidates: Optional[Set[str]] = None) -> pd.DataFrame:
+        """
+        Candidate format rows for ballots start to stop. One column per candidate (and overvotes) holding the
+        comma separated ranks at which each ballot marked them, or None. Built from the encoded rank matrix of
+        the parsed cvr, which is what the default rule set produces.
+        """
+
+        ranks = self._parsed_cvr['ranks']
+        codes = ranks.codes[start:stop]
+        n_ballots, rank_limit = codes.shape
+        label_codes = ranks.label_map()
+
+        if candidates is None:
+            candidates = self._table_candidates()
+
+        columns = self._field_chunk(start, stop)
+
+        if include_weight:
+            columns['weight'] = self._parsed_cvr['weight'][start:stop]
 
-        # get ballots and candidates
-        ballot_dl = copy.deepcopy(self.get_cvr_dict())
-        candidates = copy.deepcopy(self.get_candidates()).unique_candidates
-        candidates.update({BallotMarks.OVERVOTE})
+        # add rank limit
+        columns['rank_limit'] = np.full(n_ballots, rank_limit, dtype=np.int64)
 
-        # remove weights if all equal to 1
-        if set(ballot_dl['weight']) == {1}:
-            del ballot_dl['weight']
+        # each ballot's ranks of a candidate form a bit pattern, which is turned into a string once per pattern
+        rank_bits = np.left_shift(1, np.arange(rank_limit, dtype=np.int64)) if rank_limit < 63 else None
 
-        # add rank limit
-        ballot_dl['rank_limit'] = [len(ballot_dl['ballot_marks'][0].marks)] * len(ballot_dl['ballot_marks'])
-
-        # convert dict of list to list of dicts
-        ballot_ld = util.DL2LD(ballot_dl)
-
-        # add candidate index information
-        for b in ballot_ld:
-            b.update({f"candidate_{cand}": None for cand in candidates})
-            for rank_idx, cand in enumerate(b['ballot_marks'].marks, start=1):
-                if cand != BallotMarks.SKIPPED:
-                    if not b[f"candidate_{cand}"]:
-                        b[f"candidate_{cand}"] = str(rank_idx)
-                    else:
-                        b[f"candidate_{cand}"] += f',{rank_idx}'
-            del b['ballot_marks']
-
-        df = pd.DataFrame(ballot_ld)
+        for cand in candidates:
+
+            cand_ranks = codes == label_codes[cand] if cand in label_codes else np.zeros(codes.shape, dtype=bool)
+
+            if rank_bits is not None:
+                pattern_codes, patterns = pd.factorize(cand_ranks.astype(np.int64) @ rank_bits, sort=False)
+                pattern_ranks = [np.flatnonzero(np.bitwise_and(p, rank_bits)) for p in patterns]
+            else:
+                patterns, pattern_codes = np.unique(cand_ranks, axis=0, return_inverse=True)
+                pattern_codes = pattern_codes.reshape(-1)
+                pattern_ranks = [np.flatnonzero(p) for p in patterns]
+
+            pattern_strings = np.array([",".join(str(r + 1) for r in rank_idx) if len(rank_idx) else None
+                                        for rank_idx in pattern_ranks], dtype=object)
+            columns[f"candidate_{cand}"] = pattern_strings[pattern_codes]
+
+        df = pd.DataFrame(columns, index=pd.RangeIndex(start, stop))
         return df.reindex(sorted(df.columns), axis=1)
 
 
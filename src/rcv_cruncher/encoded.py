@@ -0,0 +1,421 @@
+from __future__ import annotations
+from typing import (Any, Dict, Iterable, Iterator, List, Optional, Set, Union)
+
+import decimal
+
+import numpy as np
+import pandas as pd
+
+from rcv_cruncher.marks import BallotMarks
+
+
+class EncodedRanks:
+    """
+    Compact storage for the rankings of a CVR. Each ballot is a row of integer codes in a
+    (n_ballots x rank_limit) matrix, and each code indexes into a shared table of mark labels.
+
+    The first two codes are always reserved for BallotMarks.SKIPPED and BallotMarks.OVERVOTE,
+    all other labels (candidates, writeins) are appended to the table as they are discovered.
+
+    Rank rows can be added in chunks, which are only concatenated when the full matrix is requested.
+    """
+
+    SKIPPED_CODE = 0
+    OVERVOTE_CODE = 1
+
+    def __init__(self, codes: Optional[np.ndarray] = None, labels: Optional[Iterable[str]] = None) -> None:
+
+        self._labels = [BallotMarks.SKIPPED, BallotMarks.OVERVOTE]
+        self._label_codes = {BallotMarks.SKIPPED: self.SKIPPED_CODE, BallotMarks.OVERVOTE: self.OVERVOTE_CODE}
+        self._chunks = []
+        self._codes = None
+        self._rank_limit = None
+
+        if labels is not None:
+            labels = list(labels)
+            if labels[:2] != self._labels:
+                raise ValueError(f'first two labels must be {self._labels}')
+            self.encode_labels(labels[2:])
+
+        if codes is not None:
+            self.append_codes(codes)
+
+    @classmethod
+    def from_lists(cls, rank_lists: Iterable[List[str]]) -> EncodedRanks:
+        encoded = cls()
+        encoded.append_lists(rank_lists)
+        return encoded
+
+    @staticmethod
+    def _code_dtype(n_labels: int) -> np.dtype:
+        return np.min_scalar_type(max(n_labels - 1, 0))
+
+    @property
+    def labels(self) -> List[str]:
+        return list(self._labels)
+
+    @property
+    def codes(self) -> np.ndarray:
+        """
+        The (n_ballots x rank_limit) code matrix, using the smallest unsigned dtype that fits the label table.
+        """
+        if self._chunks:
+            chunks = [self._codes] + self._chunks if self._codes is not None else self._chunks
+            self._codes = np.concatenate(chunks, axis=0).astype(self._code_dtype(len(self._labels)), copy=False)
+            self._chunks = []
+
+        if self._codes is None:
+            return np.empty((0, self._rank_limit or 0), dtype=self._code_dtype(len(self._labels)))
+
+        return self._codes
+
+    @property
+    def rank_limit(self) -> int:
+        return self._rank_limit or 0
+
+    def encode_labels(self, labels: Iterable[str]) -> np.ndarray:
+        """
+        Return the code for each label, adding any labels not already in the table.
+        """
+        label_codes = []
+        for label in labels:
+            if label not in self._label_codes:
+                self._label_codes[label] = len(self._labels)
+                self._labels.append(label)
+            label_codes.append(self._label_codes[label])
+        return np.array(label_codes, dtype=np.int64)
+
+    def append_codes(self, codes: np.ndarray, pad_ranks: bool = False) -> np.ndarray:
+        """
+        Append a chunk of rank rows that are already encoded with this object's label table.
+        Returns the appended chunk.
+
+        If pad_ranks is True, chunks with a different number of ranks than previous chunks are allowed
+        and the narrower side is padded with trailing SKIPPED codes.
+        """
+        codes = np.asarray(codes)
+        if codes.ndim != 2:
+            raise ValueError('codes must be a 2-dimensional (n_ballots x rank_limit) array.')
+
+        if codes.size and (codes.min() < 0 or codes.max() >= len(self._labels)):
+            raise ValueError('codes contain values outside of the label table.')
+
+        if self._rank_limit is None:
+            self._rank_limit = codes.shape[1]
+        elif codes.shape[1] != self._rank_limit:
+
+            if not pad_ranks:
+                raise RuntimeError(f'rank chunk has {codes.shape[1]} ranks, expected {self._rank_limit}.')
+
+            if codes.shape[1] < self._rank_limit:
+                codes = self._pad_codes(codes, self._rank_limit)
+            else:
+                self._rank_limit = codes.shape[1]
+                if self._codes is not None:
+                    self._codes = self._pad_codes(self._codes, self._rank_limit)
+                self._chunks = [self._pad_codes(chunk, self._rank_limit) for chunk in self._chunks]
+
+        self._chunks.append(codes)
+        return codes
+
+    def _pad_codes(self, codes: np.ndarray, rank_limit: int) -> np.ndarray:
+        return np.pad(codes, ((0, 0), (0, rank_limit - codes.shape[1])), constant_values=self.SKIPPED_CODE)
+
+    def append_lists(self, rank_lists: Iterable[List[str]], pad_ranks: bool = False) -> np.ndarray:
+        """
+        Encode and append a chunk of per-ballot rank lists. Returns the appended chunk of codes.
+
+        If pad_ranks is True, rank lists may differ in length and are padded with trailing SKIPPED marks.
+        """
+        rank_lists = list(rank_lists)
+        if not rank_lists:
+            return np.empty((0, self.rank_limit), dtype=np.int64)
+
+        ballot_lengths = set(len(b) for b in rank_lists)
+        if len(ballot_lengths) > 1 and not pad_ranks:
+            raise RuntimeError(f'rank lists are not all the same length. {sorted(ballot_lengths)}')
+
+        rank_limit = max(ballot_lengths)
+        if len(ballot_lengths) > 1:
+            rank_lists = [b + [BallotMarks.SKIPPED] * (rank_limit - len(b)) for b in rank_lists]
+
+        # encode only the unique marks, then map cells through the lookup
+        flat = [mark for b in rank_lists for mark in b]
+        unique_marks = list(dict.fromkeys(flat))
+        lookup = dict(zip(unique_marks, self.encode_labels(unique_marks).tolist()))
+        codes = np.fromiter((lookup[mark] for mark in flat), dtype=np.int64, count=len(flat))
+        return self.append_codes(codes.reshape(len(rank_lists), rank_limit), pad_ranks=pad_ranks)
+
+    def extend(self, other: EncodedRanks, label_map: Optional[Dict[str, str]] = None,
+               pad_ranks: bool = False) -> np.ndarray:
+        """
+        Append the rows of another EncodedRanks object, remapping its codes into this label table.
+        Labels are optionally renamed using label_map along the way. Returns the appended chunk of codes.
+        """
+        label_map = label_map or {}
+        remap = self.encode_labels(label_map.get(label, label) for label in other._labels)
+        if not len(other):
+            return np.empty((0, self.rank_limit), dtype=np.int64)
+        return self.append_codes(remap[other.codes], pad_ranks=pad_ranks)
+
+    def relabel(self, label_map: Dict[str, str]) -> EncodedRanks:
+        """
+        Return a new EncodedRanks with each label replaced by its value in label_map (labels not in the map
+        are kept). Labels that map to the same value share a code in the new object.
+        """
+        relabeled = EncodedRanks()
+        relabeled.extend(self, label_map)
+        return relabeled
+
+    def used_labels(self, codes: Optional[np.ndarray] = None) -> Set[str]:
+        """
+        Set of labels that appear at least once in the code matrix, or in codes if passed.
+        """
+        codes = self.codes if codes is None else codes
+        counts = np.bincount(np.asarray(codes, dtype=np.int64).ravel(), minlength=len(self._labels))
+        return {label for label, count in zip(self._labels, counts) if count}
+
+    def unique_candidates(self, codes: Optional[np.ndarray] = None) -> Set[str]:
+        """
+        Set of labels that appear at least once, excluding BallotMarks.SKIPPED and BallotMarks.OVERVOTE.
+        """
+        return self.used_labels(codes) - {BallotMarks.SKIPPED, BallotMarks.OVERVOTE}
+
+    def label_array(self) -> np.ndarray:
+        return np.array(self._labels, dtype=object)
+
+    def to_lists(self) -> List[List[str]]:
+        return self.label_array()[self.codes].tolist()
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    def __iter__(self) -> Iterator[List[str]]:
+        return iter(self.to_lists())
+
+    def __getitem__(self, idx: int) -> List[str]:
+        return [self._labels[code] for code in self.codes[idx]]
+
+    def __repr__(self) -> str:
+        return f'EncodedRanks(n_ballots={len(self)}, rank_limit={self.rank_limit}, n_labels={len(self._labels)})'
+
+    def label_map(self) -> Dict[str, int]:
+        return dict(self._label_codes)
+
+
+def _is_missing(value: Any) -> bool:
+    return np.ndim(value) == 0 and bool(pd.isna(value))
+
+
+class EncodedField:
+    """
+    Compact storage for a ballot metadata field (precinct, ballotType, ballotID...). Each ballot holds an
+    integer code indexing into a table of the field's unique values, which are numbered in order of first
+    appearance. Missing values (None, NaN) share one code, whose table entry is the first missing value seen.
+
+    Values can be appended in chunks, which are only concatenated when the full code array is requested.
+    """
+
+    def __init__(self, values: Optional[Iterable] = None) -> None:
+        self._values = []
+        self._value_codes = {}
+        self._missing_code = None
+        self._chunks = []
+        self._codes = None
+
+        if values is not None:
+            self.append(values)
+
+    @property
+    def values(self) -> List:
+        """
+        Table of unique values, indexed by code.
+        """
+        return list(self._values)
+
+    @property
+    def missing_code(self) -> Optional[int]:
+        return self._missing_code
+
+    @property
+    def codes(self) -> np.ndarray:
+        """
+        Code of each ballot, using the smallest unsigned dtype that fits the value table.
+        """
+        if self._chunks:
+            chunks = [self._codes] + self._chunks if self._codes is not None else self._chunks
+            self._codes = np.concatenate(chunks).astype(np.min_scalar_type(max(len(self._values) - 1, 0)), copy=False)
+            self._chunks = []
+
+        if self._codes is None:
+            return np.empty(0, dtype=np.uint8)
+
+        return self._codes
+
+    def _encode_values(self, values: List) -> np.ndarray:
+        """
+        Code of each value in values, adding any values not already in the table.
+        """
+        codes = np.empty(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            if _is_missing(value):
+                if self._missing_code is None:
+                    self._missing_code = len(self._values)
+                    self._values.append(value)
+                codes[i] = self._missing_code
+                continue
+            if value not in self._value_codes:
+                self._value_codes[value] = len(self._values)
+                self._values.append(value)
+            codes[i] = self._value_codes[value]
+        return codes
+
+    def append(self, values: Union[EncodedField, Iterable]) -> np.ndarray:
+        """
+        Encode and append a chunk of values, or the values of another EncodedField. Returns the appended codes.
+        Only the unique values of the chunk are looked up in the table.
+        """
+        if isinstance(values, EncodedField):
+            chunk_codes, chunk_values = values.codes, values._values
+        else:
+            values = list(values)
+            chunk_codes, chunk_values = pd.factorize(np.fromiter(values, dtype=object, count=len(values)), sort=False)
+            chunk_values = list(chunk_values)
+            missing = chunk_codes == -1
+            if missing.any():
+                chunk_codes[missing] = len(chunk_values)
+                chunk_values.append(values[int(np.argmax(missing))])
+
+        codes = self._encode_values(chunk_values)[chunk_codes] if len(chunk_codes) else np.empty(0, dtype=np.int64)
+        self._chunks.append(codes.astype(np.min_scalar_type(max(len(self._values) - 1, 0))))
+        return codes
+
+    def value_array(self) -> np.ndarray:
+        return np.fromiter(self._values, dtype=object, count=len(self._values))
+
+    def take(self, idx: Union[slice, np.ndarray]) -> List:
+        """
+        Values of the selected ballots, as a list.
+        """
+        return self.value_array()[self.codes[idx]].tolist()
+
+    def isin(self, values: Iterable) -> np.ndarray:
+        """
+        Bool array that is True for ballots whose value is in values, tested on the codes.
+        """
+        values = list(values)
+        table_mask = np.fromiter((v in values for v in self._values), dtype=bool, count=len(self._values))
+        if self._missing_code is not None:
+            table_mask[self._missing_code] = any(_is_missing(v) for v in values)
+        return table_mask[self.codes]
+
+    def to_list(self) -> List:
+        return self.take(slice(None))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.to_list())
+
+    def __getitem__(self, idx: Union[int, slice]) -> Any:
+        if isinstance(idx, slice):
+            return self.take(idx)
+        return self._values[self.codes[idx]]
+
+    def __repr__(self) -> str:
+        return f'EncodedField(n_ballots={len(self)}, n_values={len(self._values)})'
+
+
+ParsedBatch = Union[Dict[str, List], List[List[str]]]
+
+
+def iter_parsed_batches(parsed_cvr: Union[ParsedBatch, Iterable[ParsedBatch]]) -> Iterator[Dict[str, List]]:
+    """
+    Normalize parser output into a stream of batch dictionaries.
+
+    Parsers may return a single dictionary of lists, a list of rank lists, or any other iterable
+    (typically a generator) that yields either of those one batch of ballots at a time.
+    """
+    if isinstance(parsed_cvr, dict):
+        yield parsed_cvr
+    elif isinstance(parsed_cvr, list):
+        yield {'ranks': parsed_cvr}
+    else:
+        for batch in parsed_cvr:
+            yield {'ranks': batch} if isinstance(batch, list) else batch
+
+
+class ParsedCVRBuilder:
+    """
+    Combine parsed ballot batches into one compact parsed CVR dictionary.
+
+    Each batch is validated, encoded and scanned for candidates as it is added, so only one batch
+    of uncompressed ballots needs to be held in memory at a time. Ranks are stored as EncodedRanks,
+    weights as a list of Decimals and all other fields as EncodedFields.
+    """
+
+    def __init__(self) -> None:
+        self.ranks = EncodedRanks()
+        self.candidates = set()
+        self._fields = None
+        self._rank_limit = None
+
+    def add_batch(self, batch: Dict[str, List]) -> None:
+
+        if 'ranks' not in batch:
+            raise RuntimeError('Parsed CVR does not contain field "ranks"')
+
+        batch_ranks = batch['ranks']
+        n_ballots = len(batch_ranks)
+
+        field_lengths = {k: len(v) for k, v in batch.items()}
+        if len(set(field_lengths.values())) > 1:
+            raise RuntimeError(f'Parsed CVR contains fields of unequal length. {str(field_lengths)}')
+
+        batch_fields = [k for k in batch if k != 'ranks']
+        if 'weight' not in batch:
+            batch_fields.append('weight')
+
+        if self._fields is None:
+            self._fields = {k: [] if k == 'weight' else EncodedField() for k in batch_fields}
+        elif set(batch_fields) != set(self._fields):
+            raise RuntimeError(f'Parsed CVR batch fields {batch_fields} do not match earlier batches {list(self._fields)}')
+
+        if isinstance(batch_ranks, EncodedRanks):
+            batch_lengths = {batch_ranks.rank_limit}
+        else:
+            batch_lengths = set(len(b) for b in batch_ranks)
+        if n_ballots and self._rank_limit is not None:
+            batch_lengths.add(self._rank_limit)
+        if len(batch_lengths) > 1:
+            raise RuntimeError(f'Parsed CVR contains ballots with unequal length rank lists. {sorted(batch_lengths)}')
+
+        if isinstance(batch_ranks, EncodedRanks):
+            codes = self.ranks.extend(batch_ranks)
+        else:
+            codes = self.ranks.append_lists(batch_ranks)
+        self.candidates.update(self.ranks.unique_candidates(codes))
+        if n_ballots:
+            self._rank_limit = codes.shape[1]
+
+        for k in self._fields:
+            if k == 'weight':
+                weights = batch.get('weight', [decimal.Decimal('1')] * n_ballots)
+                if weights and not isinstance(weights[0], decimal.Decimal):
+                    weights = [decimal.Decimal(str(i)) for i in weights]
+                self._fields[k].extend(weights)
+            else:
+                self._fields[k].append(batch[k])
+
+    def result(self) -> Dict[str, Union[EncodedRanks, List]]:
+        """
+        Parsed CVR dictionary with the encoded ranks under 'ranks', the weights under 'weight' and all other
+        fields as EncodedFields.
+        """
+        if self._fields is None:
+            raise RuntimeError('parsed CVR contains no batches.')
+
+        parsed_cvr = {'ranks': self.ranks}
+        parsed_cvr.update(self._fields)
+        return parsed_cvr
@@ -0,0 +1,121 @@
+from __future__ import annotations
+from typing import (Dict, Iterable, List, Optional, Tuple, Union)
+
+import decimal
+
+import numpy as np
+import pandas as pd
+
+from rcv_cruncher.histogram import ExactWeights
+
+
+class FlagStore:
+    """
+    Named per-ballot boolean flags, packed eight to a byte.
+
+    Each ballot is a row of a (n_ballots x ceil(n_flags / 8)) uint8 matrix and each flag name maps to one bit
+    of that row, so twenty flags take three bytes per ballot instead of twenty bool columns. Flags are unpacked
+    into bool arrays only when they are read, and into a DataFrame only when one is asked for with to_frame().
+    """
+
+    def __init__(self, n_rows: int) -> None:
+        self._n_rows = n_rows
+        self._bits = np.zeros((n_rows, 0), dtype=np.uint8)
+        self._flag_bits = {}
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._flag_bits)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bits.nbytes
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._flag_bits
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.get(name)
+
+    def __setitem__(self, name: str, values: Iterable[bool]) -> None:
+        self.set(name, values)
+
+    def __repr__(self) -> str:
+        return f'FlagStore(n_rows={self._n_rows}, flags={self.names})'
+
+    def set(self, name: str, values: Iterable[bool]) -> None:
+        """
+        Store a flag, replacing any flag already stored under name.
+        """
+        values = np.asarray(values, dtype=bool)
+        if values.shape != (self._n_rows,):
+            raise RuntimeError(f'flag "{name}" has shape {values.shape}, expected ({self._n_rows},).')
+
+        if name not in self._flag_bits:
+            bit = len(self._flag_bits)
+            if bit // 8 == self._bits.shape[1]:
+                self._bits = np.concatenate([self._bits, np.zeros((self._n_rows, 1), dtype=np.uint8)], axis=1)
+            self._flag_bits[name] = bit
+
+        column, mask = self._position(name)
+        self._bits[:, column] &= np.uint8(~mask & 0xFF)
+        self._bits[:, column] |= values.astype(np.uint8) << np.uint8(self._flag_bits[name] % 8)
+
+    def _position(self, name: str) -> Tuple[int, int]:
+        if name not in self._flag_bits:
+            raise RuntimeError(f'flag "{name}" is not in the flag store. flags: {self.names}')
+        bit = self._flag_bits[name]
+        return bit // 8, 1 << (bit % 8)
+
+    def get(self, name: str) -> np.ndarray:
+        """
+        Flag as a bool array.
+        """
+        column, mask = self._position(name)
+        return (self._bits[:, column] & np.uint8(mask)) != 0
+
+    def any(self, names: Iterable[str]) -> np.ndarray:
+        """
+        Bool array that is True where any of the named flags is set, tested a byte at a time.
+        """
+        byte_masks = {}
+        for name in names:
+            column, mask = self._position(name)
+            byte_masks[column] = byte_masks.get(column, 0) | mask
+
+        result = np.zeros(self._n_rows, dtype=bool)
+        for column, mask in byte_masks.items():
+            result |= (self._bits[:, column] & np.uint8(mask)) != 0
+        return result
+
+    def count(self, name: str, group_codes: Optional[np.ndarray] = None, n_groups: int = 1) -> np.ndarray:
+        """
+        Number of ballots with the flag set, per group.
+        """
+        flag = self.get(name)
+        if group_codes is None:
+            return np.array([np.count_nonzero(flag)])
+        return np.bincount(np.asarray(group_codes, dtype=np.int64)[flag], minlength=n_groups)
+
+    def weighted_sums(self,
+                      names: Iterable[str],
+                      weights: Union[ExactWeights, Iterable[decimal.Decimal]],
+                      group_codes: Optional[np.ndarray] = None,
+                      n_groups: int = 1,
+                      empty: Union[int, decimal.Decimal] = 0) -> Dict[str, List[Union[int, decimal.Decimal]]]:
+        """
+        Exact sum of the weights of ballots with each flag set, per group. Groups with no flagged ballots get empty.
+        """
+        if not isinstance(weights, ExactWeights):
+            weights = ExactWeights(list(weights))
+        return {name: weights.sums(group_codes, n_groups, mask=self.get(name), empty=empty) for name in names}
+
+    def to_frame(self, names: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        DataFrame of bool columns, one per flag (all flags if names is None).
+        """
+        names = self.names if names is None else list(names)
+        return pd.DataFrame({name: self.get(name) for name in names})
@@ -0,0 +1,219 @@
+from __future__ import annotations
+from typing import (List, Optional, Sequence, Tuple, Union)
+
+import decimal
+import fractions
+
+import numpy as np
+import pandas as pd
+
+import rcv_cruncher.util as util
+
+# bincount sums weights as float64, which is exact for integer totals below this
+_EXACT_FLOAT_INT_LIMIT = 2 ** 53
+
+
+class ExactWeights:
+    """
+    Decimal ballot weights prepared once for exact vectorized sums.
+
+    Weights are scaled to integers by a common power of ten, so sums can be taken with np.bincount over any
+    subset or grouping of ballots without losing precision. If the weights cannot be scaled to integers safely,
+    Decimal group-by sums are used instead.
+    """
+
+    def __init__(self, weights: Sequence[decimal.Decimal]) -> None:
+        self.decimals = np.fromiter(weights, dtype=object, count=len(weights))
+        self.scaled, self.exponent = self._integer_weights(self.decimals)
+
+    def __len__(self) -> int:
+        return len(self.decimals)
+
+    @staticmethod
+    def _integer_weights(weights: np.ndarray) -> Tuple[Optional[np.ndarray], int]:
+        """
+        Weights multiplied by 10 ** exponent, as a float64 array of exact integers, and the exponent. The array
+        is None if that is not possible without losing precision.
+        """
+        codes, unique_weights = pd.factorize(weights, sort=False)
+        if not len(unique_weights):
+            return np.zeros(0), 0
+
+        unique_weights = [decimal.Decimal(w) for w in unique_weights]
+        if any(not w.is_finite() or w < 0 for w in unique_weights):
+            return None, 0
+
+        exponent = max(0, max(-w.as_tuple().exponent for w in unique_weights))
+        scale = 10 ** exponent
+        unique_scaled = [int(w * scale) for w in unique_weights]
+        if any(s != w * scale for s, w in zip(unique_scaled, unique_weights)):
+            return None, 0
+
+        unique_counts = np.bincount(codes, minlength=len(unique_scaled))
+        if sum(s * int(c) for s, c in zip(unique_scaled, unique_counts)) >= _EXACT_FLOAT_INT_LIMIT:
+            return None, 0
+
+        return np.array(unique_scaled, dtype=np.float64)[codes], exponent
+
+    @staticmethod
+    def _select(group_codes: Optional[np.ndarray], mask: Optional[np.ndarray],
+                n: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if group_codes is None:
+            group_codes = np.zeros(n, dtype=np.int64)
+        group_codes = np.asarray(group_codes, dtype=np.int64)
+        if mask is not None:
+            mask = np.asarray(mask, dtype=bool)
+            group_codes = group_codes[mask]
+        return group_codes, mask
+
+    def _selected_sums(self, group_codes: np.ndarray, n_groups: int,
+                       mask: Optional[np.ndarray]) -> List[Union[int, decimal.Decimal]]:
+        if self.scaled is not None:
+            scaled = self.scaled if mask is None else self.scaled[mask]
+            sums = np.bincount(group_codes, weights=scaled, minlength=n_groups)
+            return [int(s) for s in np.rint(sums)]
+
+        weights = self.decimals if mask is None else self.decimals[mask]
+        sums = [0] * n_groups
+        for group, total in pd.Series(weights, dtype=object).groupby(group_codes).sum().items():
+            sums[group] = total
+        return sums
+
+    def scaled_sums(self,
+                    group_codes: Optional[np.ndarray] = None,
+                    n_groups: int = 1,
+                    mask: Optional[np.ndarray] = None) -> List[Union[int, decimal.Decimal]]:
+        """
+        Sum of the selected weights in each group, as python ints of the weights times 10 ** exponent, or as
+        Decimals if the weights could not be scaled. Groups without selected weights sum to 0.
+        """
+        group_codes, mask = self._select(group_codes, mask, len(self))
+        return self._selected_sums(group_codes, n_groups, mask)
+
+    def sums(self,
+             group_codes: Optional[np.ndarray] = None,
+             n_groups: int = 1,
+             mask: Optional[np.ndarray] = None,
+             empty: Union[int, decimal.Decimal] = 0) -> List[Union[int, decimal.Decimal]]:
+        """
+        Exact Decimal sum of the selected weights in each group. Groups with no selected ballots get empty.
+        """
+        group_codes, mask = self._select(group_codes, mask, len(self))
+        n_selected = np.bincount(group_codes, minlength=n_groups)
+        totals = self._selected_sums(group_codes, n_groups, mask)
+
+        if self.scaled is not None:
+            totals = [decimal.Decimal(t).scaleb(-self.exponent) for t in totals]
+
+        return [t if c else empty for t, c in zip(totals, n_selected)]
+
+
+class WeightedHistogram:
+    """
+    Weighted histograms of a small non-negative integer stat (e.g. valid rankings used, 0..rank_limit),
+    one histogram per group.
+
+    Decimal weights are scaled to integers by a common power of ten (see :class:`ExactWeights`) and counted
+    with np.bincount, so the histograms, and the means and quantiles derived from them, are exact. If the
+    weights cannot be scaled to integers safely, per-bin Decimal sums are used instead.
+    """
+
+    def __init__(self,
+                 values: Sequence[int],
+                 weights: Union[Sequence[decimal.Decimal], ExactWeights],
+                 group_codes: Optional[np.ndarray] = None,
+                 n_groups: Optional[int] = None,
+                 n_values: Optional[int] = None,
+                 mask: Optional[np.ndarray] = None) -> None:
+
+        if not isinstance(weights, ExactWeights):
+            weights = ExactWeights(weights)
+
+        values = np.asarray(values, dtype=np.int64)
+        if group_codes is None:
+            group_codes = np.zeros(len(values), dtype=np.int64)
+        group_codes = np.asarray(group_codes, dtype=np.int64)
+
+        # only masked ballots are counted, but bins are numbered over all of them
+        selected_values = values if mask is None else values[np.asarray(mask, dtype=bool)]
+        selected_groups = group_codes if mask is None else group_codes[np.asarray(mask, dtype=bool)]
+        if selected_values.size and selected_values.min() < 0:
+            raise ValueError('WeightedHistogram values must be non-negative integers.')
+
+        self.n_groups = n_groups if n_groups is not None else int(selected_groups.max(initial=-1)) + 1
+        self.n_values = n_values if n_values is not None else int(selected_values.max(initial=-1)) + 1
+
+        bins = group_codes * self.n_values + np.maximum(values, 0)
+        n_bins = self.n_groups * self.n_values
+        counts = weights.scaled_sums(bins, n_bins, mask=mask)
+
+        # exact weight per (group, value), as python ints (scaled weights) or Decimals
+        self.counts = np.array(counts, dtype=object).reshape(self.n_groups, self.n_values)
+
+    def totals(self) -> List[Union[int, decimal.Decimal]]:
+        """
+        Total (scaled) weight of each group.
+        """
+        return [sum(row) for row in self.counts]
+
+    def mean(self) -> List[decimal.Decimal]:
+        """
+        Weighted mean value of each group, NaN for groups without weight.
+        """
+        value_range = np.arange(self.n_values).astype(object)
+        means = []
+        for row in self.counts:
+            total = sum(row)
+            if not total:
+                means.append(util.NAN)
+            else:
+                means.append(decimal.Decimal(sum(row * value_range)) / decimal.Decimal(total))
+        return means
+
+    def quantile(self, q: Union[float, str, decimal.Decimal]) -> List[Union[int, float, decimal.Decimal]]:
+        """
+        Weighted q-quantile of each group, NaN for groups without weight.
+
+        The quantile is the first value whose cumulative weight exceeds q of the group total. If the cumulative
+        weight up to some value equals q of the total exactly, the quantile is the average of that value and the
+        next value with weight.
+        """
+        q = fractions.Fraction(str(q))
+        if not 0 <= q <= 1:
+            raise ValueError('quantile must be between 0 and 1.')
+
+        quantiles = []
+        for row in self.counts:
+
+            total = sum(row)
+            if not total:
+                quantiles.append(util.NAN)
+                continue
+
+            # compare cumulative * denominator against total * numerator to stay in exact arithmetic
+            target = total * q.numerator
+            cumulative = 0
+            lower_value = None
+            for value, weight in enumerate(row):
+
+                if not weight:
+                    continue
+
+                if lower_value is not None:
+                    quantiles.append((lower_value + value) / 2)
+                    break
+
+                cumulative += weight
+                if cumulative * q.denominator > target:
+                    quantiles.append(value)
+                    break
+                if cumulative * q.denominator == target:
+                    lower_value = value
+            else:
+                # q == 1 and the final value was reached exactly
+                quantiles.append(lower_value)
+
+        return quantiles
+
+    def median(self) -> List[Union[int, float, decimal.Decimal]]:
+        return self.quantile('0.5')
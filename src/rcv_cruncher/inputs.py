@@ -0,0 +1,263 @@
+from __future__ import annotations
+from typing import (IO, Any, List, Optional, Union)
+
+import bz2
+import fnmatch
+import gzip
+import io
+import lzma
+import os
+import pathlib
+import zipfile
+
+
+COMPRESSION_SUFFIXES = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open
+}
+
+
+class _ZipHandle:
+    """
+    Open zip archive shared by InputPath objects, closed once the last one holding a reference is closed.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.zip = zipfile.ZipFile(path)
+        self.refs = 1
+
+    def acquire(self) -> _ZipHandle:
+        self.refs += 1
+        return self
+
+    def release(self) -> None:
+        self.refs -= 1
+        if self.refs == 0:
+            self.zip.close()
+
+
+class InputPath:
+    """
+    Path to a CVR input file or directory that may be compressed or inside a zip archive.
+
+    - A ``.gz``, ``.bz2`` or ``.xz`` file is decompressed on the fly when opened.
+    - A ``.zip`` file is treated as a directory of its members. If every member sits in one top-level folder,
+      that folder is used as the root.
+    - A path that continues past a zip file (e.g. ``cvr.zip/CvrExport.json``) refers to a member of that zip.
+
+    Files are always read as streams, nothing is extracted to disk. When globbing, compression suffixes are
+    ignored, so ``CvrExport*.json`` also matches ``CvrExport_1.json.gz``.
+
+    A zip archive stays open until close() is called (or the with block ends) on every InputPath constructed
+    from it, including copies made with InputPath(other). Paths reached from one (joinpath, glob, iterdir,
+    parent) share its archive without holding it open, so they can only be read while it is open.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike, InputPath]) -> None:
+
+        if isinstance(path, InputPath):
+            self._path = path._path
+            self._member = path._member
+            self._handle = path._handle.acquire() if path._handle is not None else None
+            self._owns_handle = True
+            return
+
+        self._path = pathlib.Path(path)
+        self._handle = None
+        self._owns_handle = True
+        self._member = ''
+
+        if self._path.exists():
+            if self._path.is_file() and self._path.suffix.lower() == '.zip' and zipfile.is_zipfile(self._path):
+                self._handle = _ZipHandle(self._path)
+                self._member = self._zip_root()
+            return
+
+        for parent in self._path.parents:
+            if parent.is_file() and zipfile.is_zipfile(parent):
+                self._handle = _ZipHandle(parent)
+                self._member = self._path.relative_to(parent).as_posix()
+                self._path = parent
+                return
+
+    def __enter__(self) -> InputPath:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Release this path's reference to its zip archive, closing it if no other path holds one.
+        """
+        if self._handle is not None and self._owns_handle:
+            self._handle.release()
+        self._owns_handle = False
+
+    @property
+    def _zip(self) -> Optional[zipfile.ZipFile]:
+        return self._handle.zip if self._handle is not None else None
+
+    @classmethod
+    def _zip_member(cls, zip_path: InputPath, member: str) -> InputPath:
+        member_path = cls.__new__(cls)
+        member_path._path = zip_path._path
+        member_path._handle = zip_path._handle
+        member_path._owns_handle = False
+        member_path._member = member.strip('/')
+        return member_path
+
+    def _zip_root(self) -> str:
+        top_level = {name.split('/')[0] for name in self._zip.namelist()}
+        if len(top_level) == 1:
+            root = top_level.pop()
+            if any(name.startswith(root + '/') for name in self._zip.namelist()):
+                return root
+        return ''
+
+    @property
+    def name(self) -> str:
+        if self._zip is not None:
+            return self._member.rsplit('/', 1)[-1] if self._member else self._path.name
+        return self._path.name
+
+    @property
+    def parent(self) -> InputPath:
+        if self._zip is not None and self._member:
+            return InputPath._zip_member(self, self._member.rsplit('/', 1)[0] if '/' in self._member else '')
+        return InputPath(self._path.parent)
+
+    @property
+    def compression(self) -> Optional[str]:
+        """
+        Compression suffix of the file (e.g. '.gz'), or None if it is not compressed.
+        """
+        suffix = pathlib.PurePosixPath(self.name).suffix.lower()
+        return suffix if suffix in COMPRESSION_SUFFIXES else None
+
+    @property
+    def local_path(self) -> Optional[pathlib.Path]:
+        """
+        Filesystem path if this is an uncompressed file on disk, otherwise None.
+        """
+        if self._zip is None and self.compression is None:
+            return self._path
+        return None
+
+    @property
+    def archive(self) -> Optional[pathlib.Path]:
+        """
+        Zip file on disk holding this path, or None if it is not in a zip.
+        """
+        return self._path if self._zip is not None else None
+
+    @property
+    def member(self) -> Optional[str]:
+        """
+        Name of this path inside its zip file ('' for the zip root), or None if it is not in a zip.
+        """
+        return self._member if self._zip is not None else None
+
+    def size(self) -> int:
+        """
+        Bytes of this file, or of all files under this directory. Zip members count their uncompressed size,
+        other files their size on disk.
+        """
+        if self._zip is None:
+            if self._path.is_dir():
+                return sum(p.stat().st_size for p in self._path.rglob('*') if p.is_file())
+            return self._path.stat().st_size if self._path.is_file() else 0
+
+        prefix = f'{self._member}/' if self._member else ''
+        return sum(info.file_size for info in self._zip.infolist()
+                   if info.filename == self._member or info.filename.startswith(prefix))
+
+    def __truediv__(self, other: str) -> InputPath:
+        return self.joinpath(other)
+
+    def joinpath(self, other: str) -> InputPath:
+        if self._zip is not None:
+            return InputPath._zip_member(self, f'{self._member}/{other}' if self._member else str(other))
+        return InputPath(self._path / other)
+
+    def find(self, name: str) -> InputPath:
+        """
+        Child called name, or name with a compression suffix (e.g. ``CvrExport.json.gz``) if only that exists.
+        """
+        for suffix in [''] + list(COMPRESSION_SUFFIXES):
+            child = self.joinpath(f'{name}{suffix}')
+            if child.is_file():
+                return child
+        return self.joinpath(name)
+
+    def exists(self) -> bool:
+        return self.is_file() or self.is_dir()
+
+    def is_file(self) -> bool:
+        if self._zip is not None:
+            return bool(self._member) and self._member in self._zip.NameToInfo
+        return self._path.is_file()
+
+    def is_dir(self) -> bool:
+        if self._zip is not None:
+            prefix = f'{self._member}/' if self._member else ''
+            return any(name.startswith(prefix) for name in self._zip.namelist())
+        return self._path.is_dir()
+
+    def iterdir(self) -> List[InputPath]:
+
+        if self._zip is None:
+            return [InputPath(p) for p in sorted(self._path.iterdir())]
+
+        prefix = f'{self._member}/' if self._member else ''
+        children = {name[len(prefix):].split('/')[0] for name in self._zip.namelist()
+                    if name.startswith(prefix) and len(name) > len(prefix)}
+        return [InputPath._zip_member(self, prefix + child) for child in sorted(children)]
+
+    def glob(self, pattern: str) -> List[InputPath]:
+        """
+        Children of this directory whose name matches pattern, with or without their compression suffix.
+        """
+        matches = []
+        for child in self.iterdir():
+            name = child.name
+            if child.compression is not None:
+                name = name[:-len(child.compression)]
+            if fnmatch.fnmatch(child.name, pattern) or fnmatch.fnmatch(name, pattern):
+                matches.append(child)
+        return matches
+
+    def open(self, mode: str = 'r', encoding: Optional[str] = 'utf8', newline: Optional[str] = None) -> IO:
+        """
+        Open the file for streamed reading, decompressing it if needed. Mode may be 'r' or 'rb'.
+        """
+        if mode not in ('r', 'rb'):
+            raise ValueError(f'InputPath only supports reading. mode "{mode}" is not allowed.')
+
+        if self.local_path is not None:
+            if mode == 'rb':
+                return open(self._path, 'rb')
+            return open(self._path, 'r', encoding=encoding, newline=newline)
+
+        f = self._zip.open(self._member) if self._zip is not None else self._path
+        if self.compression is not None:
+            f = COMPRESSION_SUFFIXES[self.compression](f, 'rb')
+
+        if mode == 'rb':
+            return f
+        return io.TextIOWrapper(f, encoding=encoding, newline=newline)
+
+    def __str__(self) -> str:
+        if self._zip is not None and self._member:
+            return str(self._path / self._member)
+        return str(self._path)
+
+    def __repr__(self) -> str:
+        return f'InputPath({str(self)!r})'
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, InputPath) and str(self) == str(other)
+
+    def __hash__(self) -> int:
+        return hash(str(self))
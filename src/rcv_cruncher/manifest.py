@@ -0,0 +1,188 @@
+from __future__ import annotations
+from typing import (Any, Dict, Iterable, Optional)
+
+import datetime
+import hashlib
+import inspect
+import json
+import os
+import pathlib
+import pickle
+
+from rcv_cruncher import __version__
+from rcv_cruncher.inputs import InputPath
+
+MANIFEST_FILE = 'manifest.json'
+CACHE_DIR = 'contest_cache'
+
+# run_config options that do not change any single contest's outputs
+_RUN_CONFIG_IGNORE = ['cvr_path_root', 'run_config_file_path', 'contest_set_file_path']
+
+# contest dictionary keys that do not change the contest's outputs
+_CONTEST_IGNORE = ['contest_set_path']
+
+
+def _code_version(obj: Any) -> Optional[str]:
+    """
+    Hash of the source code of a parser function or rcv variant class, so editing a custom parser or variant
+    reruns the contests that use it. Objects without retrievable source are identified by name only.
+    """
+    if obj is None:
+        return None
+    name = f'{getattr(obj, "__module__", "")}.{getattr(obj, "__qualname__", repr(obj))}'
+    try:
+        source = inspect.getsource(obj)
+    except (OSError, TypeError):
+        return name
+    return f'{name}:{hashlib.sha256(source.encode()).hexdigest()}'
+
+
+def file_fingerprint(path: Any) -> Any:
+    """
+    (size, modification time) of a file, or a sorted list of them for every file in a directory. For a path
+    inside a zip file (e.g. export.zip/exp/c.csv), the zip file's size and modification time and the member
+    name. None if the path does not exist.
+    """
+    if not path:
+        return None
+
+    path = pathlib.Path(path)
+    if path.is_file():
+        stat = path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    if path.is_dir():
+        return sorted([str(p.relative_to(path)), p.stat().st_size, p.stat().st_mtime_ns]
+                      for p in path.rglob('*') if p.is_file())
+
+    with InputPath(path) as input_path:
+        if input_path.archive is not None and input_path.exists():
+            stat = input_path.archive.stat()
+            return [stat.st_size, stat.st_mtime_ns, input_path.member]
+
+    return None
+
+
+def _jsonable(value: Any) -> Any:
+    if callable(value):
+        return _code_version(value)
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def contest_hash(contest: Dict, run_config: Dict) -> str:
+    """
+    Hash of everything a contest's outputs depend on: its contest_set.csv row, the run_config output options,
+    the package version, the source of its parser and rcv variant and the fingerprints of its input files.
+    """
+    content = {
+        'version': __version__,
+        'contest': _jsonable({k: v for k, v in contest.items() if k not in _CONTEST_IGNORE}),
+        'run_config': _jsonable({k: v for k, v in run_config.items() if k not in _RUN_CONFIG_IGNORE}),
+        'inputs': {
+            'cvr_path': file_fingerprint(contest.get('cvr_path')),
+            'candidate_map': file_fingerprint(contest.get('candidate_map'))
+        }
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class RunManifest:
+    """
+    Record of the contests crunched into a results directory, written to results/manifest.json.
+
+    Each contest's entry holds its contest_hash() and its crunch results, pickled in results/contest_cache/.
+    A later run reuses the cached results of every contest whose hash has not changed.
+
+    The manifest also keeps the peak memory measured for each contest, used to schedule later runs
+    (see :class:`rcv_cruncher.scheduling.MemoryEstimator`).
+    """
+
+    def __init__(self, results_dir: pathlib.Path) -> None:
+        self.results_dir = pathlib.Path(results_dir)
+        self.contests = {}
+        self.measurements = {}
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self.results_dir / MANIFEST_FILE
+
+    @classmethod
+    def load(cls, results_dir: pathlib.Path, reuse_results: bool = True) -> RunManifest:
+        """
+        Manifest of results_dir, empty if there is none or it cannot be read. If reuse_results is False,
+        only the memory measurements are loaded.
+        """
+        manifest = cls(results_dir)
+        if manifest.path.is_file():
+            try:
+                with open(manifest.path) as manifest_file:
+                    content = json.load(manifest_file)
+                manifest.contests = content['contests'] if reuse_results else {}
+                manifest.measurements = content.get('measurements', {})
+            except (ValueError, KeyError):
+                print(f'info -- {manifest.path} could not be read, all contests will be crunched.')
+                manifest.contests = {}
+                manifest.measurements = {}
+        return manifest
+
+    def _cache_path(self, uid: str) -> pathlib.Path:
+        return self.results_dir / CACHE_DIR / f'{uid}.pkl'
+
+    def is_current(self, uid: str, hash_value: str) -> bool:
+        return uid in self.contests and self.contests[uid]['hash'] == hash_value and self._cache_path(uid).is_file()
+
+    def load_results(self, uid: str) -> Optional[Dict]:
+        """
+        Cached crunch results of a contest, or None if the cache cannot be read. The contest's entry is then
+        dropped, so it is crunched again.
+        """
+        try:
+            with open(self._cache_path(uid), 'rb') as cache_file:
+                return pickle.load(cache_file)
+        except Exception:
+            print(f'info -- cached results of {uid} could not be read, it will be crunched again.')
+            self.discard(uid)
+            return None
+
+    def record(self, uid: str, hash_value: str, results: Dict) -> None:
+        cache_path = self._cache_path(uid)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write then rename, so a killed run never leaves a partial cache behind
+        tmp_path = cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as cache_file:
+            pickle.dump(results, cache_file)
+        os.replace(tmp_path, cache_path)
+
+        self.contests[uid] = {'hash': hash_value, 'crunched': datetime.datetime.now().isoformat(timespec='seconds')}
+
+    def record_measurement(self, uid: str, parser: str, input_bytes: int, peak_rss: Optional[int]) -> None:
+        if peak_rss is not None:
+            self.measurements[uid] = {'parser': parser, 'input_bytes': input_bytes, 'peak_rss': peak_rss}
+
+    def discard(self, uid: str) -> None:
+        self.contests.pop(uid, None)
+        if self._cache_path(uid).is_file():
+            os.remove(self._cache_path(uid))
+
+    def keep_only(self, uids: Iterable[str]) -> None:
+        """
+        Drop the entries and measurements of contests no longer in the contest set.
+        """
+        uids = set(uids)
+        for uid in [uid for uid in self.contests if uid not in uids]:
+            self.discard(uid)
+        self.measurements = {uid: m for uid, m in self.measurements.items() if uid in uids}
+
+    def save(self) -> None:
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as manifest_file:
+            json.dump({'version': __version__, 'contests': self.contests, 'measurements': self.measurements},
+                      manifest_file, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -1,16 +1,19 @@
 
 import csv
-import pathlib
 import json
 import math
+import mmap
 import os
 import re
 import collections
 import decimal
-import xmltodict
+import xml.etree.ElementTree as ET
 
+import numpy as np
 import pandas as pd
 
+from rcv_cruncher.encoded import (EncodedRanks, ParsedCVRBuilder)
+from rcv_cruncher.inputs import InputPath
 from rcv_cruncher.marks import BallotMarks
 
 decimal.getcontext().prec = 30
@@ -37,7 +40,88 @@ def get_parser_dict():
     return parser_dict
 
 
-def cruncher_csv(cvr_path):
+def cruncher_csv_batches(cvr_path, chunksize=10000):
+    """Reads ballot ranking information stored in csv format, yielding it in batches of ballots.
+    See :func:`cruncher_csv` for the file format.
+
+    Rank columns are read as categoricals, so candidate code and constant replacement is done once per
+    unique mark rather than once per cell.
+
+    :param cvr_path: The path to the CVR file.
+    :type cvr_path: :data:`types.Path`
+    :param chunksize: Number of csv rows per batch. If None, the whole file is yielded as one batch.
+    :type chunksize: int, optional
+    :return: Generator of dictionaries, each containing all columns in the CVR file for one batch of rows.
+        Rank columns are combined into an :class:`rcv_cruncher.encoded.EncodedRanks` stored with the key 'ranks'.
+        All other columns are lists, :func:`cruncher_csv` encodes them as :class:`rcv_cruncher.encoded.EncodedField`
+        objects.
+        A 'weight' key and list of 1's is added if no 'weight' column exists.
+        All weights are of type :class:`decimal.Decimal`.
+    :rtype: Iterator[:data:`types.BallotDictOfLists`]
+    """
+
+    with InputPath(cvr_path) as cvr_path:
+
+        # find rank columns
+        with cvr_path.open('rb') as f:
+            header = pd.read_csv(f, encoding="utf8", nrows=0).columns.tolist()
+        rank_col = [col for col in header if 'rank' in col.lower()]
+        other_col = [col for col in header if col not in rank_col]
+
+        # replace skipped ranks and overvotes with constants
+        mark_map = {'under': BallotMarks.SKIPPED,
+                    'skipped': BallotMarks.SKIPPED,
+                    'undervote': BallotMarks.SKIPPED,
+                    'over': BallotMarks.OVERVOTE,
+                    'overvote': BallotMarks.OVERVOTE,
+                    'UWI': BallotMarks.WRITEIN}
+
+        # if candidate codes file exist, swap in names
+        cand_codes_dict = {}
+        candidate_codes_fpath = cvr_path.parent / 'candidate_codes.csv'
+        if candidate_codes_fpath.is_file():
+            with candidate_codes_fpath.open('rb') as f:
+                cand_codes = pd.read_csv(f, encoding="utf8")
+            cand_codes_dict = {str(code): cand for code, cand in zip(cand_codes['code'], cand_codes['candidate'])}
+
+        def map_mark(mark):
+            mark = cand_codes_dict.get(mark, mark)
+            return mark_map.get(mark, mark)
+
+        with cvr_path.open('rb') as f:
+
+            reader = pd.read_csv(f, encoding="utf8", dtype={col: 'category' for col in rank_col},
+                                 chunksize=chunksize)
+            for chunk in (reader if chunksize else [reader]):
+
+                ranks = EncodedRanks()
+                rank_codes = np.empty((len(chunk), len(rank_col)), dtype=np.int64)
+                for col_idx, col in enumerate(rank_col):
+
+                    categorical = chunk[col].cat
+                    category_codes = ranks.encode_labels(map_mark(str(cat)) for cat in categorical.categories)
+
+                    # missing values have categorical code -1, which indexes the trailing SKIPPED code
+                    lookup = np.append(category_codes, EncodedRanks.SKIPPED_CODE)
+                    rank_codes[:, col_idx] = lookup[categorical.codes]
+
+                ranks.append_codes(rank_codes)
+
+                # assemble dict, blank metadata cells are marked as skipped
+                dct = {'ranks': ranks}
+                dct.update({col: (chunk[col] if col == 'weight' else chunk[col].fillna(BallotMarks.SKIPPED)).tolist()
+                            for col in other_col})
+
+                # add weight if not present in csv
+                if 'weight' not in dct:
+                    dct['weight'] = [decimal.Decimal('1')] * len(ranks)
+                else:
+                    dct['weight'] = [decimal.Decimal(str(w)) for w in dct['weight']]
+
+                yield dct
+
+
+def cruncher_csv(cvr_path, chunksize=None):
     """Reads ballot ranking information stored in csv format.
     One ballot per row, with ranking columns appearing in order and named with the word "rank"
     (e.x. "rank1", "rank2", etc)
@@ -46,67 +130,20 @@ def cruncher_csv(cvr_path):
     same directory, it will be read and columns named "code" and "candidate" will be used to replace
     candidate codes with candidate names in the CVR file during readin.
     :type cvr_path: :data:`types.Path`
-    :raises RuntimeError: Error raised if not all parsed rank lists are the same length.
-    :return: A dictionary of lists containing all columns in the CVR file.
-        Rank columns are combined into per-ballot lists and stored with the key 'ranks'.
+    :param chunksize: If provided, the CVR file is read this many rows at a time. Useful for files
+    too large to load as a single DataFrame.
+    :type chunksize: int, optional
+    :return: A dictionary containing all columns in the CVR file.
+        Rank columns are combined into an :class:`rcv_cruncher.encoded.EncodedRanks` stored with the key 'ranks'.
+        All other columns are :class:`rcv_cruncher.encoded.EncodedField` objects.
         A 'weight' key and list of 1's is added to the dictionary if no 'weight' column exists.
         All weights are of type :class:`decimal.Decimal`.
     :rtype: :data:`types.BallotDictOfLists`
     """
-
-    cvr_path = pathlib.Path(cvr_path)
-    df = pd.read_csv(cvr_path, encoding="utf8")
-
-    # find rank columns
-    rank_col = [col for col in df.columns if 'rank' in col.lower()]
-
-    # ensure rank columns are strings
-    df[rank_col] = df[rank_col].astype(str)
-
-    # if candidate codes file exist, swap in names
-    candidate_codes_fpath = cvr_path.parent / 'candidate_codes.csv'
-    if os.path.isfile(candidate_codes_fpath):
-
-        cand_codes = pd.read_csv(candidate_codes_fpath, encoding="utf8")
-        cand_codes_dict = {str(code): cand for code, cand in zip(cand_codes['code'], cand_codes['candidate'])}
-        replace_dict = {col: cand_codes_dict for col in rank_col}
-
-        df = df.replace(replace_dict)
-
-    # replace skipped ranks and overvotes with constants
-    df = df.replace({col: {'under': BallotMarks.SKIPPED,
-                           'skipped': BallotMarks.SKIPPED,
-                           'undervote': BallotMarks.SKIPPED,
-                           'over': BallotMarks.OVERVOTE,
-                           'overvote': BallotMarks.OVERVOTE,
-                           'UWI': BallotMarks.WRITEIN}
-                    for col in rank_col})
-
-    df = df.fillna(BallotMarks.SKIPPED)
-
-    # pull out rank lists
-    rank_col_list = [df[col].tolist() for col in rank_col]
-    rank_lists = [list(rank_tuple) for rank_tuple in list(zip(*rank_col_list))]
-
-    # double check all ballot ranks are equal length
-    if not all([len(i) == len(rank_lists[0]) for i in rank_lists]):
-        raise RuntimeError("not all rank lists are same length. debug")
-
-    # assemble dict
-    dct = {'ranks': rank_lists}
-
-    # add in non-rank columns
-    for col in df.columns:
-        if col not in rank_col:
-            dct[col] = df[col].tolist()
-
-    # add weight if not present in csv
-    if 'weight' not in dct:
-        dct['weight'] = [decimal.Decimal('1') for b in dct['ranks']]
-    else:
-        dct['weight'] = [decimal.Decimal(str(w)) for w in dct['weight']]
-
-    return dct
+    builder = ParsedCVRBuilder()
+    for batch in cruncher_csv_batches(cvr_path, chunksize=chunksize):
+        builder.add_batch(batch)
+    return builder.result()
 
 
 def dominion5_4(cvr_path, office):
@@ -122,224 +159,75 @@ def dominion5_4(cvr_path, office):
     :return:
     :rtype: :data:`types.BallotDictOfLists`
     """
+    return dominion5_4_offices(cvr_path, [office])[office]
 
-    path = pathlib.Path(cvr_path)
 
-    # load manifests, with ids as keys
-    with open(path / 'ContestManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            if i['Description'] == office:
-                current_contest_id = i['Id']
-                current_contest_rank_limit = i['NumOfRanks']
+def dominion5_4_offices(cvr_path, offices):
+    """Reads ballot data from Dominion V5.4 CVRs for several contests, in one pass over the CVR export.
+    See :func:`dominion5_4`.
 
-    candidate_manifest = {}
-    with open(path / 'CandidateManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            candidate_manifest[i['Id']] = i['Description']
+    :param cvr_path: Path to the CVR export directory.
+    :type cvr_path: :data:`types.Path`
+    :param offices: Names of the contests to read. Each must match a contest name in ContestManifest.json.
+    :type offices: List[str]
+    :return: Dictionary with offices as keys and parsed contest dictionaries as values.
+    :rtype: Dict[str, :data:`types.BallotDictOfLists`]
+    """
 
-    precinctPortion_manifest = {}
-    with open(path / 'PrecinctPortionManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            precinctPortion_manifest[i['Id']] = {'Portion': i['Description'], 'PrecinctId': i['PrecinctId']}
+    with InputPath(cvr_path) as path:
 
-    precinct_manifest = {}
-    if os.path.isfile(path / 'PrecinctManifest.json'):
-        with open(path / 'PrecinctManifest.json', encoding="utf8") as f:
+        # load manifests, with ids as keys
+        office_contests = {}
+        with path.find('ContestManifest.json').open(encoding="utf8") as f:
             for i in json.load(f)['List']:
-                precinct_manifest[i['Id']] = i['Description']
-
-    ballotType_manifest = {}
-    with open(path / 'BallotTypeManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            ballotType_manifest[i['Id']] = i['Description']
-
-    countingGroup_manifest = {}
-    with open(path / 'CountingGroupManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            countingGroup_manifest[i['Id']] = i['Description']
-
-    ballotTypeContest_manifest = {}
-    with open(path / 'BallotTypeContestManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-
-            if i['ContestId'] not in ballotTypeContest_manifest.keys():
-                ballotTypeContest_manifest[i['ContestId']] = []
-
-            ballotTypeContest_manifest[i['ContestId']].append(i['BallotTypeId'])
-
-    # read in ballots
-    ballot_ranks = []
-    ballot_IDs = []
-    ballot_precinctPortions = []
-    ballot_precincts = []
-    ballot_types = []
-    ballot_countingGroups = []
-    with open(path / 'CvrExport.json', encoding="utf8") as f:
-        for contests in json.load(f)['Sessions']:
-
-            # ballotID
-            ballotID_search = re.search('Images\\\\(.*)\*\.\*', contests['ImageMask'])
-            if ballotID_search:
-                ballotID = ballotID_search.group(1)
-            else:
-                raise RuntimeError('regex is not working correctly. debug')
-
-            countingGroup = countingGroup_manifest[contests['CountingGroupId']]
-
-            # for each session use original, or if isCurrent is False,
-            # use modified
-            if contests['Original']['IsCurrent']:
-                current_contests = contests['Original']
-            else:
-                current_contests = contests['Modified']
-
-            # precinctId for this ballot
-            precinctPortion = precinctPortion_manifest[current_contests['PrecinctPortionId']]['Portion']
-            precinctId = precinctPortion_manifest[current_contests['PrecinctPortionId']]['PrecinctId']
-
-            precinct = None
-            if precinct_manifest:
-                precinct = precinct_manifest[precinctId]
-
-            # ballotType for this ballot
-            ballotType = ballotType_manifest[current_contests['BallotTypeId']]
-
-            if len(current_contests['Cards']) > 1:
-                print('"Cards" has length greater than 1, not prepared for this. debug')
-                exit(1)
-
-            ballot_contest_marks = None
-            for ballot_contest in current_contests['Cards'][0]['Contests']:
-                if ballot_contest['Id'] == current_contest_id:
-                    ballot_contest_marks = ballot_contest['Marks']
-
-            # skip ballot if didn't contain contest
-            if ballot_contest_marks is None:
-                continue
-
-            # check for marks on each rank expected for this contest
-            currentRank = 1
-            current_ballot_ranks = []
-            while currentRank <= current_contest_rank_limit:
-
-                # find any marks that have the currentRank and aren't Ambiguous
-                currentRank_marks = [i for i in ballot_contest_marks
-                                     if i['Rank'] == currentRank and i['IsAmbiguous'] is False]
-
-                if len(currentRank_marks) == 0:
-                    currentCandidate = BallotMarks.SKIPPED
-                elif len(currentRank_marks) > 1:
-                    currentCandidate = BallotMarks.OVERVOTE
-                else:
-                    currentCandidate = candidate_manifest[currentRank_marks[0]['CandidateId']]
+                if i['Description'] in offices:
+                    office_contests[i['Description']] = {'id': i['Id'], 'rank_limit': i['NumOfRanks']}
 
-                current_ballot_ranks.append(currentCandidate)
-                currentRank += 1
+        missing_offices = [office for office in offices if office not in office_contests]
+        if missing_offices:
+            raise RuntimeError(f'contest set office values {missing_offices} not present in '
+                               f'ContestManifest.json in {path}')
 
-            ballot_ranks.append(current_ballot_ranks)
-            ballot_precinctPortions.append(precinctPortion)
-            ballot_precincts.append(precinct)
-            ballot_IDs.append(ballotID)
-            ballot_types.append(ballotType)
-            ballot_countingGroups.append(countingGroup)
-
-    ballot_dict = {'ranks': ballot_ranks,
-                   'weight': [decimal.Decimal('1')] * len(ballot_ranks),
-                   'ballotID': ballot_IDs,
-                   'precinctPortion': ballot_precinctPortions,
-                   'ballot_type': ballot_types,
-                   'countingGroup': ballot_countingGroups}
-
-    # make sure precinctManifest was part of CVR, otherwise exclude precinct column
-    if len(ballot_precincts) != sum(i is None for i in ballot_precincts):
-        ballot_dict['precinct'] = ballot_precincts
-
-    # check ballotIDs are unique
-    if len(set(ballot_dict['ballotID'])) != len(ballot_dict['ballotID']):
-        raise RuntimeError("some non-unique ballot IDs")
+        candidate_manifest = {}
+        with path.find('CandidateManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                candidate_manifest[i['Id']] = i['Description']
 
-    return ballot_dict
+        precinctPortion_manifest = {}
+        with path.find('PrecinctPortionManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                precinctPortion_manifest[i['Id']] = {'Portion': i['Description'], 'PrecinctId': i['PrecinctId']}
 
+        precinct_manifest = {}
+        if path.find('PrecinctManifest.json').is_file():
+            with path.find('PrecinctManifest.json').open(encoding="utf8") as f:
+                for i in json.load(f)['List']:
+                    precinct_manifest[i['Id']] = i['Description']
 
-def dominion5_10(cvr_path, office):
+        ballotType_manifest = {}
+        with path.find('BallotTypeManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                ballotType_manifest[i['Id']] = i['Description']
 
-    path = pathlib.Path(cvr_path)
+        countingGroup_manifest = {}
+        with path.find('CountingGroupManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                countingGroup_manifest[i['Id']] = i['Description']
 
-    # load manifests, with ids as keys
-    with open(path / 'ContestManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            if i['Description'] == office:
-                current_contest_id = i['Id']
-                current_contest_rank_limit = i['NumOfRanks']
+        ballotTypeContest_manifest = {}
+        with path.find('BallotTypeContestManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
 
-    candidate_manifest = {}
-    with open(path / 'CandidateManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            candidate_manifest[i['Id']] = i['Description']
+                if i['ContestId'] not in ballotTypeContest_manifest.keys():
+                    ballotTypeContest_manifest[i['ContestId']] = []
 
-    precinctPortion_manifest = {}
-    with open(path / 'PrecinctPortionManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            precinctPortion_manifest[i['Id']] = {'Portion': i['Description'], 'PrecinctId': i['PrecinctId']}
+                ballotTypeContest_manifest[i['ContestId']].append(i['BallotTypeId'])
 
-    precinct_manifest = {}
-    if os.path.isfile(path / 'PrecinctManifest.json'):
-        with open(path / 'PrecinctManifest.json', encoding="utf8") as f:
-            for i in json.load(f)['List']:
-                precinct_manifest[i['Id']] = i['Description']
-
-    district_manifest = {}
-    with open(path / 'DistrictManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            district_manifest[i['Id']] = {'District': i['Description'], 'DistrictTypeId': i['DistrictTypeId']}
-
-    districtType_manifest = {}
-    with open(path / 'DistrictTypeManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            districtType_manifest[i['Id']] = i['Description']
-
-    districtPrecinctPortion_manifest = {}
-    with open(path / 'DistrictPrecinctPortionManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            districtPrecinctPortion_manifest[i['PrecinctPortionId']] = i['DistrictId']
-
-    ballotType_manifest = {}
-    with open(path / 'BallotTypeManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            ballotType_manifest[i['Id']] = i['Description']
-
-    countingGroup_manifest = {}
-    with open(path / 'CountingGroupManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            countingGroup_manifest[i['Id']] = i['Description']
-
-    ballotTypeContest_manifest = {}
-    with open(path / 'BallotTypeContestManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-
-            if i['ContestId'] not in ballotTypeContest_manifest.keys():
-                ballotTypeContest_manifest[i['ContestId']] = []
-
-            ballotTypeContest_manifest[i['ContestId']].append(i['BallotTypeId'])
-
-    tabulator_manifest = {}
-    with open(path / 'TabulatorManifest.json', encoding="utf8") as f:
-        for i in json.load(f)['List']:
-            tabulator_manifest[i['Id']] = i['VotingLocationName']
-
-    # read in ballots
-    ballot_ranks = []
-    ballot_IDs = []
-    ballot_precinctPortions = []
-    ballot_precincts = []
-    ballot_types = []
-    ballot_countingGroups = []
-    ballot_votingLocation = []
-    ballot_district = []
-    ballot_districtType = []
-
-    for cvr_export in path.glob("CvrExport*.json"):
-        with open(cvr_export, encoding="utf8") as f:
+        # read in ballots, into one set of lists per office
+        office_ballots = {office: {'ranks': [], 'ballotID': [], 'precinctPortion': [], 'precinct': [],
+                                   'ballot_type': [], 'countingGroup': []}
+                          for office in office_contests}
+        with path.find('CvrExport.json').open(encoding="utf8") as f:
             for contests in json.load(f)['Sessions']:
 
                 # ballotID
@@ -351,9 +239,6 @@ def dominion5_10(cvr_path, office):
 
                 countingGroup = countingGroup_manifest[contests['CountingGroupId']]
 
-                # voting location for ballots
-                ballotVotingLocation = tabulator_manifest[contests['TabulatorId']]
-
                 # for each session use original, or if isCurrent is False,
                 # use modified
                 if contests['Original']['IsCurrent']:
@@ -372,126 +257,325 @@ def dominion5_10(cvr_path, office):
                 # ballotType for this ballot
                 ballotType = ballotType_manifest[current_contests['BallotTypeId']]
 
-                # district for ballot
-                ballotDistrictId = districtPrecinctPortion_manifest[current_contests['PrecinctPortionId']]
-                ballotDistrict = district_manifest[ballotDistrictId]['District']
-                ballotDistrictType = districtType_manifest[district_manifest[ballotDistrictId]['DistrictTypeId']]
+                if len(current_contests['Cards']) > 1:
+                    print('"Cards" has length greater than 1, not prepared for this. debug')
+                    exit(1)
+
+                ballot_contest_marks = {ballot_contest['Id']: ballot_contest['Marks']
+                                        for ballot_contest in current_contests['Cards'][0]['Contests']}
+
+                for office, office_contest in office_contests.items():
+
+                    # skip ballot if didn't contain contest
+                    if office_contest['id'] not in ballot_contest_marks:
+                        continue
+                    contest_marks = ballot_contest_marks[office_contest['id']]
+
+                    # check for marks on each rank expected for this contest
+                    currentRank = 1
+                    current_ballot_ranks = []
+                    while currentRank <= office_contest['rank_limit']:
+
+                        # find any marks that have the currentRank and aren't Ambiguous
+                        currentRank_marks = [i for i in contest_marks
+                                             if i['Rank'] == currentRank and i['IsAmbiguous'] is False]
+
+                        if len(currentRank_marks) == 0:
+                            currentCandidate = BallotMarks.SKIPPED
+                        elif len(currentRank_marks) > 1:
+                            currentCandidate = BallotMarks.OVERVOTE
+                        else:
+                            currentCandidate = candidate_manifest[currentRank_marks[0]['CandidateId']]
+
+                        current_ballot_ranks.append(currentCandidate)
+                        currentRank += 1
+
+                    ballots = office_ballots[office]
+                    ballots['ranks'].append(current_ballot_ranks)
+                    ballots['precinctPortion'].append(precinctPortion)
+                    ballots['precinct'].append(precinct)
+                    ballots['ballotID'].append(ballotID)
+                    ballots['ballot_type'].append(ballotType)
+                    ballots['countingGroup'].append(countingGroup)
+
+        parsed_offices = {}
+        for office, ballots in office_ballots.items():
+
+            ballot_dict = {'ranks': ballots['ranks'],
+                           'weight': [decimal.Decimal('1')] * len(ballots['ranks']),
+                           'ballotID': ballots['ballotID'],
+                           'precinctPortion': ballots['precinctPortion'],
+                           'ballot_type': ballots['ballot_type'],
+                           'countingGroup': ballots['countingGroup']}
+
+            # make sure precinctManifest was part of CVR, otherwise exclude precinct column
+            if len(ballots['precinct']) != sum(i is None for i in ballots['precinct']):
+                ballot_dict['precinct'] = ballots['precinct']
+
+            # check ballotIDs are unique
+            if len(set(ballot_dict['ballotID'])) != len(ballot_dict['ballotID']):
+                raise RuntimeError("some non-unique ballot IDs")
+
+            parsed_offices[office] = ballot_dict
+
+        return parsed_offices
+
+
+def dominion5_10(cvr_path, office):
+    return dominion5_10_offices(cvr_path, [office])[office]
+
+
+def dominion5_10_offices(cvr_path, offices):
+    """Reads ballot data from Dominion V5.10 CVRs for several contests, in one pass over the CVR exports.
+
+    :param cvr_path: Path to the CVR export directory.
+    :type cvr_path: :data:`types.Path`
+    :param offices: Names of the contests to read. Each must match a contest name in ContestManifest.json.
+    :type offices: List[str]
+    :return: Dictionary with offices as keys and parsed contest dictionaries as values.
+    :rtype: Dict[str, :data:`types.BallotDictOfLists`]
+    """
+
+    with InputPath(cvr_path) as path:
+
+        # load manifests, with ids as keys
+        office_contests = {}
+        with path.find('ContestManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                if i['Description'] in offices:
+                    office_contests[i['Description']] = {'id': i['Id'], 'rank_limit': i['NumOfRanks']}
+
+        missing_offices = [office for office in offices if office not in office_contests]
+        if missing_offices:
+            raise RuntimeError(f'contest set office values {missing_offices} not present in '
+                               f'ContestManifest.json in {path}')
+        office_contest_ids = {office_contest['id'] for office_contest in office_contests.values()}
+
+        candidate_manifest = {}
+        with path.find('CandidateManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                candidate_manifest[i['Id']] = i['Description']
+
+        precinctPortion_manifest = {}
+        with path.find('PrecinctPortionManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                precinctPortion_manifest[i['Id']] = {'Portion': i['Description'], 'PrecinctId': i['PrecinctId']}
+
+        precinct_manifest = {}
+        if path.find('PrecinctManifest.json').is_file():
+            with path.find('PrecinctManifest.json').open(encoding="utf8") as f:
+                for i in json.load(f)['List']:
+                    precinct_manifest[i['Id']] = i['Description']
+
+        district_manifest = {}
+        with path.find('DistrictManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                district_manifest[i['Id']] = {'District': i['Description'], 'DistrictTypeId': i['DistrictTypeId']}
+
+        districtType_manifest = {}
+        with path.find('DistrictTypeManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                districtType_manifest[i['Id']] = i['Description']
+
+        districtPrecinctPortion_manifest = {}
+        with path.find('DistrictPrecinctPortionManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                districtPrecinctPortion_manifest[i['PrecinctPortionId']] = i['DistrictId']
+
+        ballotType_manifest = {}
+        with path.find('BallotTypeManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                ballotType_manifest[i['Id']] = i['Description']
+
+        countingGroup_manifest = {}
+        with path.find('CountingGroupManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                countingGroup_manifest[i['Id']] = i['Description']
+
+        ballotTypeContest_manifest = {}
+        with path.find('BallotTypeContestManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+
+                if i['ContestId'] not in ballotTypeContest_manifest.keys():
+                    ballotTypeContest_manifest[i['ContestId']] = []
+
+                ballotTypeContest_manifest[i['ContestId']].append(i['BallotTypeId'])
+
+        tabulator_manifest = {}
+        with path.find('TabulatorManifest.json').open(encoding="utf8") as f:
+            for i in json.load(f)['List']:
+                tabulator_manifest[i['Id']] = i['VotingLocationName']
+
+        # read in ballots, into one set of lists per office
+        office_ballots = {office: {'ranks': [], 'ballotID': [], 'precinctPortion': [], 'precinct': [],
+                                   'ballot_type': [], 'countingGroup': [], 'votingLocation': [], 'district': [],
+                                   'districtType': []}
+                          for office in office_contests}
+
+        for cvr_export in path.glob("CvrExport*.json"):
+            with cvr_export.open(encoding="utf8") as f:
+                for contests in json.load(f)['Sessions']:
+
+                    # ballotID
+                    ballotID_search = re.search('Images\\\\(.*)\*\.\*', contests['ImageMask'])
+                    if ballotID_search:
+                        ballotID = ballotID_search.group(1)
+                    else:
+                        raise RuntimeError('regex is not working correctly. debug')
+
+                    countingGroup = countingGroup_manifest[contests['CountingGroupId']]
 
-                ballot_contest_marks = None
-                for cards in current_contests['Cards']:
-                    for ballot_contest in cards['Contests']:
-                        if ballot_contest['Id'] == current_contest_id:
-                            if ballot_contest_marks is not None:
+                    # voting location for ballots
+                    ballotVotingLocation = tabulator_manifest[contests['TabulatorId']]
+
+                    # for each session use original, or if isCurrent is False,
+                    # use modified
+                    if contests['Original']['IsCurrent']:
+                        current_contests = contests['Original']
+                    else:
+                        current_contests = contests['Modified']
+
+                    # precinctId for this ballot
+                    precinctPortion = precinctPortion_manifest[current_contests['PrecinctPortionId']]['Portion']
+                    precinctId = precinctPortion_manifest[current_contests['PrecinctPortionId']]['PrecinctId']
+
+                    precinct = None
+                    if precinct_manifest:
+                        precinct = precinct_manifest[precinctId]
+
+                    # ballotType for this ballot
+                    ballotType = ballotType_manifest[current_contests['BallotTypeId']]
+
+                    # district for ballot
+                    ballotDistrictId = districtPrecinctPortion_manifest[current_contests['PrecinctPortionId']]
+                    ballotDistrict = district_manifest[ballotDistrictId]['District']
+                    ballotDistrictType = districtType_manifest[district_manifest[ballotDistrictId]['DistrictTypeId']]
+
+                    ballot_contest_marks = {}
+                    for cards in current_contests['Cards']:
+                        for ballot_contest in cards['Contests']:
+                            if ballot_contest['Id'] not in office_contest_ids:
+                                continue
+                            if ballot_contest['Id'] in ballot_contest_marks:
                                 raise (RuntimeError(
                                     "Contest Id appears twice across a single set of cards. Not expected."))
-                            ballot_contest_marks = ballot_contest['Marks']
+                            ballot_contest_marks[ballot_contest['Id']] = ballot_contest['Marks']
 
-                # skip ballot if didn't contain contest
-                if ballot_contest_marks is None:
-                    continue
+                    for office, office_contest in office_contests.items():
 
-                # check for marks on each rank expected for this contest
-                currentRank = 1
-                current_ballot_ranks = []
-                while currentRank <= current_contest_rank_limit:
+                        # skip ballot if didn't contain contest
+                        if office_contest['id'] not in ballot_contest_marks:
+                            continue
+                        contest_marks = ballot_contest_marks[office_contest['id']]
 
-                    # find any marks that have the currentRank and aren't Ambiguous
-                    currentRank_marks = [i for i in ballot_contest_marks
-                                         if i['Rank'] == currentRank and i['IsAmbiguous'] is False]
+                        # check for marks on each rank expected for this contest
+                        currentRank = 1
+                        current_ballot_ranks = []
+                        while currentRank <= office_contest['rank_limit']:
 
-                    currentCandidate = '**error**'
+                            # find any marks that have the currentRank and aren't Ambiguous
+                            currentRank_marks = [i for i in contest_marks
+                                                 if i['Rank'] == currentRank and i['IsAmbiguous'] is False]
 
-                    if len(currentRank_marks) == 0:
-                        currentCandidate = BallotMarks.SKIPPED
-                    elif len(currentRank_marks) > 1:
-                        currentCandidate = BallotMarks.OVERVOTE
-                    else:
-                        currentCandidate = candidate_manifest[currentRank_marks[0]['CandidateId']]
-
-                    if currentCandidate == '**error**':
-                        raise RuntimeError('error in filtering marks. debug')
-
-                    current_ballot_ranks.append(currentCandidate)
-                    currentRank += 1
-
-                ballot_ranks.append(current_ballot_ranks)
-                ballot_precinctPortions.append(precinctPortion)
-                ballot_precincts.append(precinct)
-                ballot_IDs.append(ballotID)
-                ballot_types.append(ballotType)
-                ballot_countingGroups.append(countingGroup)
-                ballot_votingLocation.append(ballotVotingLocation)
-                ballot_district.append(ballotDistrict)
-                ballot_districtType.append(ballotDistrictType)
-
-    ballot_dict = {'ranks': ballot_ranks,
-                   'weight': [decimal.Decimal('1')] * len(ballot_ranks),
-                   'ballotID': ballot_IDs,
-                   'precinct': ballot_precincts,
-                   'precinctPortion': ballot_precinctPortions,
-                   'ballot_type': ballot_types,
-                   'countingGroup': ballot_countingGroups,
-                   'votingLocation': ballot_votingLocation,
-                   'district': ballot_district,
-                   'districtType': ballot_districtType}
-
-    # make sure precinctManifest was part of CVR, otherwise exclude precinct column
-    if len(ballot_precincts) != sum(i is None for i in ballot_precincts):
-        ballot_dict['precinct'] = ballot_precincts
-
-    # check ballotIDs are unique
-    if len(set(ballot_dict['ballotID'])) != len(ballot_dict['ballotID']):
-        raise RuntimeError("some non-unique ballot IDs")
-
-    return ballot_dict
+                            currentCandidate = '**error**'
 
+                            if len(currentRank_marks) == 0:
+                                currentCandidate = BallotMarks.SKIPPED
+                            elif len(currentRank_marks) > 1:
+                                currentCandidate = BallotMarks.OVERVOTE
+                            else:
+                                currentCandidate = candidate_manifest[currentRank_marks[0]['CandidateId']]
 
-def choice_pro_plus(cvr_path):
+                            if currentCandidate == '**error**':
+                                raise RuntimeError('error in filtering marks. debug')
+
+                            current_ballot_ranks.append(currentCandidate)
+                            currentRank += 1
+
+                        ballots = office_ballots[office]
+                        ballots['ranks'].append(current_ballot_ranks)
+                        ballots['precinctPortion'].append(precinctPortion)
+                        ballots['precinct'].append(precinct)
+                        ballots['ballotID'].append(ballotID)
+                        ballots['ballot_type'].append(ballotType)
+                        ballots['countingGroup'].append(countingGroup)
+                        ballots['votingLocation'].append(ballotVotingLocation)
+                        ballots['district'].append(ballotDistrict)
+                        ballots['districtType'].append(ballotDistrictType)
 
-    cvr_path = pathlib.Path(cvr_path)
+        parsed_offices = {}
+        for office, ballots in office_ballots.items():
 
-    # read chp file
-    chp_glob = [f for f in cvr_path.glob('*.chp')]
-    if len(chp_glob) > 1:
-        raise RuntimeError(f'more than one .chp file found in directory {str(cvr_path)}')
+            ballot_dict = {'ranks': ballots['ranks'],
+                           'weight': [decimal.Decimal('1')] * len(ballots['ranks']),
+                           'ballotID': ballots['ballotID'],
+                           'precinct': ballots['precinct'],
+                           'precinctPortion': ballots['precinctPortion'],
+                           'ballot_type': ballots['ballot_type'],
+                           'countingGroup': ballots['countingGroup'],
+                           'votingLocation': ballots['votingLocation'],
+                           'district': ballots['district'],
+                           'districtType': ballots['districtType']}
 
-    candidate_map = {}
-    prm_files = []
-    with open(chp_glob[0], encoding='utf8') as f:
-        for i in f:
+            # make sure precinctManifest was part of CVR, otherwise exclude precinct column
+            if len(ballots['precinct']) != sum(i is None for i in ballots['precinct']):
+                ballot_dict['precinct'] = ballots['precinct']
 
-            split = i.strip('\n').split()
+            # check ballotIDs are unique
+            if len(set(ballot_dict['ballotID'])) != len(ballot_dict['ballotID']):
+                raise RuntimeError("some non-unique ballot IDs")
 
-            if len(split) >= 3 and split[0] == '.CANDIDATE':
-                candidate_map[split[1].strip(',')] = i.split('"')[1].split('"')[0]
+            parsed_offices[office] = ballot_dict
 
-            if len(split) == 2 and split[0] == '.INCLUDE':
-                prm_files.append(cvr_path / split[1])
+        return parsed_offices
 
-    # read prm files
-    if not prm_files:
-        raise RuntimeError(f'no .prm files listed in .chp file {chp_glob[0]}')
 
-    ballots = []
-    for prm_file in prm_files:
-        with open(prm_file, 'r', encoding='utf8') as f:
+def choice_pro_plus(cvr_path):
+
+    with InputPath(cvr_path) as cvr_path:
+
+        # read chp file
+        chp_glob = [f for f in cvr_path.glob('*.chp')]
+        if len(chp_glob) > 1:
+            raise RuntimeError(f'more than one .chp file found in directory {str(cvr_path)}')
+
+        candidate_map = {}
+        prm_files = []
+        with chp_glob[0].open(encoding='utf8') as f:
             for i in f:
-                if any(map(str.isalnum, i)) and i.strip()[0] != '#':
-                    b = []
-                    s = i.split()
-                    choices = [] if len(s) == 1 else s[1].split(',')
-                    for choice in filter(None, choices):
-                        can, rank = choice.split(']')[0].split('[')
-                        b.extend([BallotMarks.SKIPPED] * (int(rank) - len(b) - 1))
-                        b.append(BallotMarks.OVERVOTE if '=' in choice else candidate_map[can])
-                    ballots.append(b)
 
-    # add in tail skipped ranks
-    maxlen = max(map(len, ballots))
-    for b in ballots:
-        b.extend([BallotMarks.SKIPPED] * (maxlen - len(b)))
+                split = i.strip('\n').split()
+
+                if len(split) >= 3 and split[0] == '.CANDIDATE':
+                    candidate_map[split[1].strip(',')] = i.split('"')[1].split('"')[0]
+
+                if len(split) == 2 and split[0] == '.INCLUDE':
+                    prm_files.append(cvr_path.find(split[1]))
+
+        # read prm files
+        if not prm_files:
+            raise RuntimeError(f'no .prm files listed in .chp file {chp_glob[0]}')
+
+        ballots = []
+        for prm_file in prm_files:
+            with prm_file.open('r', encoding='utf8') as f:
+                for i in f:
+                    if any(map(str.isalnum, i)) and i.strip()[0] != '#':
+                        b = []
+                        s = i.split()
+                        choices = [] if len(s) == 1 else s[1].split(',')
+                        for choice in filter(None, choices):
+                            can, rank = choice.split(']')[0].split('[')
+                            b.extend([BallotMarks.SKIPPED] * (int(rank) - len(b) - 1))
+                            b.append(BallotMarks.OVERVOTE if '=' in choice else candidate_map[can])
+                        ballots.append(b)
+
+        # add in tail skipped ranks
+        maxlen = max(map(len, ballots))
+        for b in ballots:
+            b.extend([BallotMarks.SKIPPED] * (maxlen - len(b)))
 
-    return {'ranks': ballots, 'weight': [decimal.Decimal('1')] * len(ballots)}
+        return {'ranks': ballots, 'weight': [decimal.Decimal('1')] * len(ballots)}
 
 
 def burlington2006(cvr_path):
@@ -507,267 +591,407 @@ def burlington2006(cvr_path):
         dictionary: Dictionary with a single key, "ranks", containing parsed ballots as a list of lists.
         Overvotes and skipped rankings are represented by constants.
     """
-    path = pathlib.Path(cvr_path)
+    with InputPath(cvr_path) as path:
 
-    # read in lines
-    ballots = []
-    with open(path, "r", encoding='utf8') as f:
-        for line in f:
-            ballots.append([BallotMarks.OVERVOTE if '=' in i else i for i in line.split()[3:]])
+        # read in lines
+        ballots = []
+        with path.open("r", encoding='utf8') as f:
+            for line in f:
+                ballots.append([BallotMarks.OVERVOTE if '=' in i else i for i in line.split()[3:]])
 
-    # fill in skipped ranks with constant
-    maxlen = max(map(len, ballots))
-    for b in ballots:
-        b.extend([BallotMarks.SKIPPED] * (maxlen - len(b)))
+        # fill in skipped ranks with constant
+        maxlen = max(map(len, ballots))
+        for b in ballots:
+            b.extend([BallotMarks.SKIPPED] * (maxlen - len(b)))
 
-    # read candidate codes
-    candidate_codes_fname = path.parent / "candidate_codes.csv"
-    if os.path.exists(candidate_codes_fname):
+        # read candidate codes
+        candidate_codes_fname = path.parent / "candidate_codes.csv"
+        if candidate_codes_fname.is_file():
 
-        cand_codes = pd.read_csv(candidate_codes_fname, encoding="utf8")
-        cand_codes_dict = {str(code): cand for code, cand in zip(cand_codes['code'], cand_codes['candidate'])}
+            with candidate_codes_fname.open('rb') as f:
+                cand_codes = pd.read_csv(f, encoding="utf8")
+            cand_codes_dict = {str(code): cand for code, cand in zip(cand_codes['code'], cand_codes['candidate'])}
 
-        # replace candidate codes with candidate names
-        new_ballots = []
-        for b in ballots:
-            new_ballots.append([cand_codes_dict[cand] if cand in cand_codes_dict else cand for cand in b])
+            # replace candidate codes with candidate names
+            new_ballots = []
+            for b in ballots:
+                new_ballots.append([cand_codes_dict[cand] if cand in cand_codes_dict else cand for cand in b])
 
-    return {'ranks': new_ballots}
+        return {'ranks': new_ballots}
 
 
-def optech1(cvr_path, office):
+def _read_fixed_width_fields(path, field_slices):
+    """Read fixed-width records from a file and slice out each field column-wise.
 
-    cvr_path = pathlib.Path(cvr_path)
+    The file is viewed as a (n_records x record_length) byte array, so no per-line python work is done.
+    Uncompressed files on disk are memory mapped, compressed or archived files are decompressed into memory.
+    Record length is taken from the first line. If the lines are not all that long, the file is sliced line by
+    line instead, with short lines padded with spaces and blank lines skipped.
 
-    # FIND THE FILES
-    ballot_image_files = [f for f in cvr_path.glob('*allot*.txt')]
-    master_lookup_files = [f for f in cvr_path.glob('*aster*.txt')]
+    :param path: Path to fixed-width file.
+    :param field_slices: Dictionary of field names to (start, stop) byte positions.
+    :return: Dictionary of field names to numpy bytes arrays, one element per record.
+    """
 
-    ballot_image_path = None
-    if not ballot_image_files:
-        raise RuntimeError(f'parser error - no ballot image file found in {cvr_path}')
-    elif len(ballot_image_files) > 1:
-        raise RuntimeError(f'too many ballot image files in directory {cvr_path}. Should only be one.')
-    else:
-        ballot_image_path = ballot_image_files[0]
+    with InputPath(path) as path:
+
+        if path.local_path is not None:
+            with open(path.local_path, 'rb') as f:
+
+                if os.fstat(f.fileno()).st_size == 0:
+                    raise RuntimeError(f'fixed width file is empty: {path}')
+
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return _slice_fixed_width_fields(mm, field_slices, path)
+
+        with path.open('rb') as f:
+            data = f.read()
+
+        if not data:
+            raise RuntimeError(f'fixed width file is empty: {path}')
+
+        return _slice_fixed_width_fields(data, field_slices, path)
+
+
+def _fields_from_records(blocks, record_length, field_slices, path):
+
+    # fields are copied out, so no views into data outlive this function
+    fields = {}
+    for field_name, (start, stop) in field_slices.items():
+        if stop > record_length:
+            raise RuntimeError(f'fixed width field {field_name} extends past record length ({record_length}) in {path}')
+        field_bytes = np.concatenate([block[:, start:stop] for block in blocks])
+        fields[field_name] = np.ascontiguousarray(field_bytes).view(f'S{stop - start}').ravel()
+
+    return fields
+
+
+def _slice_fixed_width_lines(data, field_slices, path):
+
+    lines = [line for line in bytes(data).split(b'\n') if line.strip()]
+    if not lines:
+        raise RuntimeError(f'fixed width file is empty: {path}')
+
+    # counting the newline, as for uniform records
+    record_length = max(len(line) for line in lines) + 1
+    records = np.frombuffer(b''.join(line.ljust(record_length) for line in lines),
+                            dtype=np.uint8).reshape(len(lines), record_length)
+
+    return _fields_from_records([records], record_length, field_slices, path)
 
-    master_lookup_path = None
-    if not master_lookup_files:
-        raise RuntimeError(f'parser error - no master lookup file found in {cvr_path}')
-    elif len(master_lookup_files) > 1:
-        raise RuntimeError(f'too many master lookup files in directory {cvr_path}. Should only be one.')
+
+def _slice_fixed_width_fields(data, field_slices, path):
+
+    record_length = data.find(b'\n') + 1 or len(data)
+    n_records = len(data) // record_length
+    tail = data[n_records * record_length:]
+
+    buffer = np.frombuffer(data, dtype=np.uint8, count=n_records * record_length)
+    records = buffer.reshape(n_records, record_length)
+
+    # a record of another length would shift every later field, so each row must hold exactly one line
+    newline = ord('\n')
+    if (b'\n' in tail or not (records[:, -1] == newline).all()
+            or np.count_nonzero(buffer == newline) != n_records):
+        return _slice_fixed_width_lines(data, field_slices, path)
+
+    # a final line without a trailing newline
+    if tail.strip():
+        tail_record = np.frombuffer(tail.ljust(record_length), dtype=np.uint8).reshape(1, record_length)
     else:
-        master_lookup_path = master_lookup_files[0]
-
-    # READ MASTER LOOKUP
-    master_lookup = collections.defaultdict(dict)
-    candidate_contest_map = {}
-    with open(master_lookup_path, encoding='utf8') as f:
-        for i in f:
-            mapping = i[:10].strip()
-            key = i[10:17].strip()
-            value = i[17:67].strip()
-
-            master_lookup[mapping][key] = value
-
-            if mapping == "Candidate":
-                candidate_contest_id = i[74:81].strip()
-                candidate_contest_map.update({key: candidate_contest_id})
-
-    # find contest id
-    contest_reverse_map = {v: k for k, v in master_lookup['Contest'].items()}
-    if office not in contest_reverse_map:
-        raise RuntimeError(f'contest set office value ({office}) not present in master lookup file {master_lookup_path}')
-    contest_id = contest_reverse_map[office]
-
-    # remove candidates from master lookup if they are from another contest
-    master_lookup['Candidate'] = {candidate_id: candidate_val for candidate_id, candidate_val
-                                  in master_lookup['Candidate'].items()
-                                  if candidate_contest_map[candidate_id] == contest_id}
-
-    # tally types are stored in master lookup with 7 chars but only recorded in ballot image with 3
-    # trim off the first 4 char from the master lookup strings
-    tally_type_map = {k[4:]: v for k, v in master_lookup['Tally Type'].items()}
-
-    # separate out other maps
-    precinct_map = master_lookup['Precinct']
-    name_map = {k: {'WRITEIN': BallotMarks.WRITEIN}.get(v.upper().replace('-', ''), v)
-                for k, v in master_lookup['Candidate'].items()}
-
-    # READ BALLOT FILE
-    voter_info_collected = collections.defaultdict(list)
-    max_rank_num = 0
-    with open(ballot_image_path, "r", encoding='utf8') as f:
-
-        for line in f:
-
-            line_contest_id = line[:7].strip()
-            line_voter_id = line[7:16].strip()
-            line_tally_type = line[23:26].strip()
-            line_precinct_id = line[26:33].strip()
-            line_candidate_id = line[36:43].strip()
-            line_rank = line[33:36].strip()
-            line_skipped = line[43].strip()
-            line_overvote = line[44].strip()
-
-            # skip line if not for contest
-            if line_contest_id != contest_id:
-                continue
+        tail_record = np.empty((0, record_length), dtype=np.uint8)
+
+    return _fields_from_records([records, tail_record], record_length, field_slices, path)
+
+
+def _fixed_width_to_int(field):
+    """Convert a numpy bytes array of right-justified (space or zero padded) digits into integers.
+    """
+    digits = field.view(np.uint8).reshape(len(field), -1).astype(np.int64) - ord('0')
+    is_digit = (digits >= 0) & (digits <= 9)
+
+    non_digit = ~is_digit & (field.view(np.uint8).reshape(len(field), -1) != ord(' '))
+    if non_digit.any():
+        raise RuntimeError('non-numeric characters found in numeric fixed width field.')
+
+    powers = 10 ** np.arange(digits.shape[1] - 1, -1, -1, dtype=np.int64)
+    return (np.where(is_digit, digits, 0) * powers).sum(axis=1)
+
+
+def _optech1_ballots(fields, office, name_map, precinct_map, tally_type_map):
+    """Assemble the ballots of one contest from the fixed width fields of its ballot image lines.
+    """
+    line_rank = _fixed_width_to_int(fields['rank'])
+    line_skipped = _fixed_width_to_int(fields['skipped']).astype(bool)
+    line_overvote = _fixed_width_to_int(fields['overvote']).astype(bool)
+    max_rank_num = int(line_rank.max())
+
+    if line_rank.min() < 1:
+        raise RuntimeError('ballot image contains rank numbers less than 1. unexpected')
+
+    # group lines into ballots by voter id, keeping voters in order of first appearance
+    voter_uniques, voter_first_line, voter_inverse = np.unique(fields['voter_id'],
+                                                               return_index=True, return_inverse=True)
+    voter_order = np.argsort(voter_first_line, kind='stable')
+    voter_position = np.empty(len(voter_order), dtype=np.int64)
+    voter_position[voter_order] = np.arange(len(voter_order))
+    line_ballot = voter_position[voter_inverse]
+    first_line = voter_first_line[voter_order]
+    n_ballots = len(voter_order)
+
+    # each voter should have exactly one line per rank
+    rank_cell = line_ballot * max_rank_num + (line_rank - 1)
+    rank_cell_counts = np.bincount(rank_cell, minlength=n_ballots * max_rank_num)
+    if (rank_cell_counts > 1).any():
+        raise RuntimeError('multiple ballot image lines for the same voter and rank. unexpected')
+    if (rank_cell_counts == 0).any():
+        raise RuntimeError('not all ranks for this voter had data stored in the file. unexpected.')
+
+    # debug checks
+    for field_name, field_label in [('tally_type', 'tally type'), ('precinct_id', 'precinct')]:
+        if (fields[field_name] != fields[field_name][first_line][line_ballot]).any():
+            raise RuntimeError(f"Marks for this voter contain multiple {field_label} values. Unexpected.")
+
+    # encode marks, candidate ids are mapped once per unique id
+    ranks = EncodedRanks()
+
+    candidate_uniques, candidate_inverse = np.unique(fields['candidate_id'], return_inverse=True)
+    candidate_ids = [c.decode().strip() for c in candidate_uniques]
+    candidate_nonzero = np.array([bool(int(c)) for c in candidate_ids], dtype=bool)
+
+    unknown_candidates = [c for c, nonzero in zip(candidate_ids, candidate_nonzero) if nonzero and c not in name_map]
+    if unknown_candidates:
+        raise RuntimeError(f'ballot image candidate ids {unknown_candidates} not found in master lookup for contest {office}')
+
+    candidate_codes = ranks.encode_labels(name_map[c] if nonzero else BallotMarks.SKIPPED
+                                          for c, nonzero in zip(candidate_ids, candidate_nonzero))
+    line_has_candidate = candidate_nonzero[candidate_inverse]
+
+    # 0 candidate id plus a skipped or overvote mark, indicate skip or overvote
+    if (line_has_candidate & (line_skipped | line_overvote)).any():
+        raise RuntimeError('both a skip and overvote mark for this rank. unexpected')
+    if (~line_has_candidate & line_skipped & line_overvote).any():
+        raise RuntimeError('this shouldnt be reached')
+    if (~line_has_candidate & ~line_skipped & ~line_overvote).any():
+        raise RuntimeError('rank has no candidate, skipped or overvote mark. unexpected')
+
+    line_code = np.where(line_has_candidate, candidate_codes[candidate_inverse],
+                         np.where(line_overvote, EncodedRanks.OVERVOTE_CODE, EncodedRanks.SKIPPED_CODE))
+
+    rank_codes = np.empty(n_ballots * max_rank_num, dtype=np.int64)
+    rank_codes[rank_cell] = line_code
+    ranks.append_codes(rank_codes.reshape(n_ballots, max_rank_num))
+
+    # per ballot info, decoded once per unique value
+    def ballot_values(field, value_map):
+        uniques, inverse = np.unique(field[first_line], return_inverse=True)
+        decoded = [value_map[u.decode().strip()] for u in uniques]
+        return [decoded[i] for i in inverse]
 
-            max_rank_num = int(line_rank) if int(line_rank) > max_rank_num else max_rank_num
-
-            voter_info_collected[line_voter_id].append({
-                'voter_id': line_voter_id,
-                'tally_type': tally_type_map[line_tally_type],
-                'precinct': precinct_map[line_precinct_id],
-                # 0 candidate id plus a skipped or overvote mark, indicate skip or overvote
-                'candidate': name_map[line_candidate_id] if int(line_candidate_id) else 0,
-                'rank': int(line_rank),
-                'skipped': int(line_skipped),
-                'overvote': int(line_overvote)
-                })
-
-            # debug check to see if ballot marks with valid candidate name stored sometimes also get paired,
-            # with overvote or skipped marks?
-            if int(line_candidate_id) and (int(line_skipped) or int(line_overvote)):
-                raise RuntimeError('both a skip and overvote mark for this rank. unexpected')
-
-    # for each voter, assemble the ballot
     dct = {
-        'ranks': [],
-        'precinct': [],
-        'tally_type': [],
-        'ballotID': []
+        'ranks': ranks,
+        'precinct': ballot_values(fields['precinct_id'], precinct_map),
+        'tally_type': ballot_values(fields['tally_type'], tally_type_map),
+        'ballotID': [v.decode().strip() for v in voter_uniques[voter_order]]
     }
-    for voter_id in voter_info_collected:
 
-        voter_ballot_info = voter_info_collected[voter_id]
+    # add weights
+    dct.update({'weight': [decimal.Decimal('1')] * n_ballots})
+    return dct
 
-        # debug checks
-        voter_tally_type_set = set([b['tally_type'] for b in voter_ballot_info])
-        voter_precinct_set = set([b['precinct'] for b in voter_ballot_info])
 
-        if len(voter_tally_type_set) > 1:
-            raise RuntimeError("Marks for this voter contain multiple tally type values. Unexpected.")
+def optech1(cvr_path, office):
+    return optech1_offices(cvr_path, [office])[office]
 
-        if len(voter_precinct_set) > 1:
-            raise RuntimeError("Marks for this voter contain multiple precinct values. Unexpected.")
 
-        voter_tally_type = list(voter_tally_type_set)[0]
-        voter_precinct = list(voter_precinct_set)[0]
+def optech1_offices(cvr_path, offices):
+    """Reads an Optech ballot image once for several contests.
 
-        voter_ranks = [None] * max_rank_num
-        for rank in range(1, max_rank_num + 1):
+    :param cvr_path: Path to the directory holding the ballot image and master lookup files.
+    :type cvr_path: :data:`types.Path`
+    :param offices: Contest names, as they appear in the master lookup file.
+    :type offices: List[str]
+    :return: Dictionary with offices as keys and parsed contest dictionaries as values.
+    :rtype: Dict[str, :data:`types.BallotDictOfLists`]
+    """
 
-            rank_info_filter = [b for b in voter_ballot_info if b['rank'] == rank]
+    with InputPath(cvr_path) as cvr_path:
+
+        # FIND THE FILES
+        ballot_image_files = [f for f in cvr_path.glob('*allot*.txt')]
+        master_lookup_files = [f for f in cvr_path.glob('*aster*.txt')]
+
+        ballot_image_path = None
+        if not ballot_image_files:
+            raise RuntimeError(f'parser error - no ballot image file found in {cvr_path}')
+        elif len(ballot_image_files) > 1:
+            raise RuntimeError(f'too many ballot image files in directory {cvr_path}. Should only be one.')
+        else:
+            ballot_image_path = ballot_image_files[0]
+
+        master_lookup_path = None
+        if not master_lookup_files:
+            raise RuntimeError(f'parser error - no master lookup file found in {cvr_path}')
+        elif len(master_lookup_files) > 1:
+            raise RuntimeError(f'too many master lookup files in directory {cvr_path}. Should only be one.')
+        else:
+            master_lookup_path = master_lookup_files[0]
+
+        # READ MASTER LOOKUP
+        master_lookup = collections.defaultdict(dict)
+        candidate_contest_map = {}
+        with master_lookup_path.open(encoding='utf8') as f:
+            for i in f:
+                mapping = i[:10].strip()
+                key = i[10:17].strip()
+                value = i[17:67].strip()
 
-            if len(rank_info_filter) > 1:
-                raise RuntimeError('unexpected')
-                # an overvote marker is stored in the file, but do overvoted ranks still get all their marks stored ?
-            elif len(rank_info_filter) == 0:
-                raise RuntimeError('unexpected')
-                # this would be unexpected since there is a skipped rank mark in the file
-            else:
-                rank_info = rank_info_filter[0]
+                master_lookup[mapping][key] = value
 
-            rank_candidate = rank_info['candidate']
+                if mapping == "Candidate":
+                    candidate_contest_id = i[74:81].strip()
+                    candidate_contest_map.update({key: candidate_contest_id})
 
-            if rank_candidate == 0 and rank_info['skipped'] and rank_info['overvote']:
-                raise RuntimeError('this shouldnt be reached')
-            elif rank_candidate == 0 and rank_info['skipped']:
-                voter_ranks[rank-1] = BallotMarks.SKIPPED
-            elif rank_candidate == 0 and rank_info['overvote']:
-                voter_ranks[rank-1] = BallotMarks.OVERVOTE
-            else:
-                voter_ranks[rank-1] = rank_candidate
+        # find contest ids
+        contest_reverse_map = {v: k for k, v in master_lookup['Contest'].items()}
+        for office in offices:
+            if office not in contest_reverse_map:
+                raise RuntimeError(f'contest set office value ({office}) not present in master lookup file {master_lookup_path}')
 
-        if any(r is None for r in voter_ranks):
-            raise RuntimeError('not all ranks for this voter had data stored in the file. unexpected.')
+        # tally types are stored in master lookup with 7 chars but only recorded in ballot image with 3
+        # trim off the first 4 char from the master lookup strings
+        tally_type_map = {k[4:]: v for k, v in master_lookup['Tally Type'].items()}
 
-        dct['ranks'].append(voter_ranks)
-        dct['ballotID'].append(voter_id)
-        dct['tally_type'].append(voter_tally_type)
-        dct['precinct'].append(voter_precinct)
+        # separate out other maps
+        precinct_map = master_lookup['Precinct']
 
-    # add weights
-    dct.update({'weight': [decimal.Decimal('1')] * len(dct['ranks'])})
-    return dct
+        # READ BALLOT FILE
+        fields = _read_fixed_width_fields(ballot_image_path, {
+            'contest_id': (0, 7),
+            'voter_id': (7, 16),
+            'tally_type': (23, 26),
+            'precinct_id': (26, 33),
+            'rank': (33, 36),
+            'candidate_id': (36, 43),
+            'skipped': (43, 44),
+            'overvote': (44, 45)
+        })
+        contest_uniques, contest_inverse = np.unique(fields['contest_id'], return_inverse=True)
+        contest_ids = [c.decode().strip() for c in contest_uniques]
+
+        parsed_offices = {}
+        for office in offices:
+
+            contest_id = contest_reverse_map[office]
+
+            # candidates from other contests are left out
+            name_map = {k: {'WRITEIN': BallotMarks.WRITEIN}.get(v.upper().replace('-', ''), v)
+                        for k, v in master_lookup['Candidate'].items() if candidate_contest_map[k] == contest_id}
+
+            # skip lines not for contest
+            contest_match = np.array([c == contest_id for c in contest_ids], dtype=bool)
+            contest_lines = contest_match[contest_inverse]
+            contest_fields = {k: v[contest_lines] for k, v in fields.items()}
+
+            if not len(contest_fields['voter_id']):
+                raise RuntimeError(f'no ballot image lines found for contest {office} ({contest_id}) in {ballot_image_path}')
+
+            parsed_offices[office] = _optech1_ballots(contest_fields, office, name_map, precinct_map, tally_type_map)
+
+        return parsed_offices
 
 
 def optech2(cvr_path):
 
-    cvr_path = pathlib.Path(cvr_path)
+    with InputPath(cvr_path) as cvr_path:
 
-    ballot_glob = [f for f in cvr_path.glob('*allot*.txt')]
-    cntl_glob = [f for f in cvr_path.glob('*ntl*.txt')]
+        ballot_glob = [f for f in cvr_path.glob('*allot*.txt')]
+        cntl_glob = [f for f in cvr_path.glob('*ntl*.txt')]
 
-    if len(ballot_glob) > 1:
-        raise RuntimeError(f'more than 1 file with pattern matching *allot*.txt found in directory {str(cvr_path)}')
+        if len(ballot_glob) > 1:
+            raise RuntimeError(f'more than 1 file with pattern matching *allot*.txt found in directory {str(cvr_path)}')
 
-    if len(cntl_glob) > 1:
-        raise RuntimeError(f'more than 1 file with pattern matching *ntl*.txt found in directory {str(cvr_path)}')
+        if len(cntl_glob) > 1:
+            raise RuntimeError(f'more than 1 file with pattern matching *ntl*.txt found in directory {str(cvr_path)}')
 
-    # read in canadidate codes and names
-    candidate_map = {}
-    with open(cntl_glob[0], encoding='utf8') as f:
-        for i in f:
-            line = [j.strip() for j in i.split(':')]
-            if line and line[0] == 'Candidate':
-                candidate_map[line[1]] = line[2]
+        # read in canadidate codes and names
+        candidate_map = {}
+        with cntl_glob[0].open(encoding='utf8') as f:
+            for i in f:
+                line = [j.strip() for j in i.split(':')]
+                if line and line[0] == 'Candidate':
+                    candidate_map[line[1]] = line[2]
 
-    candidate_map['--'] = BallotMarks.SKIPPED
-    candidate_map['++'] = BallotMarks.OVERVOTE
+        candidate_map['--'] = BallotMarks.SKIPPED
+        candidate_map['++'] = BallotMarks.OVERVOTE
 
-    # read ballots
-    ballots = []
-    with open(ballot_glob[0], "r", encoding='utf8') as f:
-        line = f.readline()
-        while line:
-            ballots.append([candidate_map[i] for i in line.split()[-1].split('>')])
+        # read ballots
+        ballots = []
+        with ballot_glob[0].open("r", encoding='utf8') as f:
             line = f.readline()
+            while line:
+                ballots.append([candidate_map[i] for i in line.split()[-1].split('>')])
+                line = f.readline()
 
-    return ballots
+        return ballots
 
 
 def minneapolis2009(cvr_path, office):
+    return minneapolis2009_offices(cvr_path, [office])[office]
 
-    cvr_path = pathlib.Path(cvr_path)
-
-    # read map file
-    map_file = cvr_path.parent / 'convert.csv'
-
-    choice_map = {}
-    default = None
-    with open(map_file, encoding='utf8') as f:
-        for i in f:
-            split = i.strip().split('\t')
-            if len(split) >= 3 and split[0] == office:
-                choice_map[split[2]] = split[1]
 
-    if choice_map == {}:
-        raise RuntimeError('No candidates found. Ensure "office" field in contest_set matches CVR.')
+def minneapolis2009_offices(cvr_path, offices):
+    """Reads the Minneapolis 2009 CVR once for several offices, each with its own candidate codes from
+    convert.csv.
 
-    choice_map['XXX'] = BallotMarks.SKIPPED
-    default = BallotMarks.WRITEIN
+    :param cvr_path: The path to the CVR file.
+    :type cvr_path: :data:`types.Path`
+    :param offices: Offices whose candidate codes are used, as named in convert.csv.
+    :type offices: List[str]
+    :return: Dictionary with offices as keys and parsed contest dictionaries as values.
+    :rtype: Dict[str, :data:`types.BallotDictOfLists`]
+    """
 
-    # read ballots
-    precincts = []
-    ballots = []
-    with open(cvr_path, "r", encoding='utf8') as f:
-        f.readline()
-        for line in csv.reader(f):
-            choices = [choice_map.get(i.strip(), i if default is None else default)
-                       for i in line[1:-1]]
-            if choices != ['', '', '']:
-                ballots.extend([choices] * int(float(line[-1])))
-                for p in range(int(float(line[-1]))):
-                    precincts.append(line[0])
+    with InputPath(cvr_path) as cvr_path:
 
-    bs = {'ranks': ballots,
-          'weight': [decimal.Decimal('1')] * len(ballots),
-          'precinct': precincts}
+        # read map file
+        map_file = cvr_path.parent / 'convert.csv'
 
-    return bs
+        choice_maps = {office: {} for office in offices}
+        default = None
+        with map_file.open(encoding='utf8') as f:
+            for i in f:
+                split = i.strip().split('\t')
+                if len(split) >= 3 and split[0] in choice_maps:
+                    choice_maps[split[0]][split[2]] = split[1]
+
+        if any(choice_map == {} for choice_map in choice_maps.values()):
+            raise RuntimeError('No candidates found. Ensure "office" field in contest_set matches CVR.')
+
+        for choice_map in choice_maps.values():
+            choice_map['XXX'] = BallotMarks.SKIPPED
+        default = BallotMarks.WRITEIN
+
+        # read ballots
+        office_ballots = {office: {'precincts': [], 'ballots': []} for office in offices}
+        with cvr_path.open("r", encoding='utf8') as f:
+            f.readline()
+            for line in csv.reader(f):
+                for office, choice_map in choice_maps.items():
+                    choices = [choice_map.get(i.strip(), i if default is None else default)
+                               for i in line[1:-1]]
+                    if choices != ['', '', '']:
+                        office_ballots[office]['ballots'].extend([choices] * int(float(line[-1])))
+                        for p in range(int(float(line[-1]))):
+                            office_ballots[office]['precincts'].append(line[0])
+
+        parsed_offices = {}
+        for office, ballots in office_ballots.items():
+            parsed_offices[office] = {'ranks': ballots['ballots'],
+                                      'weight': [decimal.Decimal('1')] * len(ballots['ballots']),
+                                      'precinct': ballots['precincts']}
+
+        return parsed_offices
 
 
 # def santafe(column_id, contest_id, ctx):
@@ -851,161 +1075,490 @@ def minneapolis2009(cvr_path, office):
 
 
 def dominion5_2(cvr_path, office):
+    return dominion5_2_offices(cvr_path, [office])[office]
+
+
+def dominion5_2_offices(cvr_path, offices):
+    """Reads ballot data from Dominion V5.2 CVRs for several contests, in one pass over the CVR export.
+
+    :param cvr_path: Path to the CVR export directory.
+    :type cvr_path: :data:`types.Path`
+    :param offices: Names of the contests to read. Each must match a contest name in ContestManifest.json,
+        ignoring case.
+    :type offices: List[str]
+    :return: Dictionary with offices as keys and parsed contest dictionaries as values.
+    :rtype: Dict[str, :data:`types.BallotDictOfLists`]
+    """
+
+    with InputPath(cvr_path) as path:
+
+        office_contests = {}
+        with path.find('ContestManifest.json').open(encoding='utf8') as f:
+            for i in json.load(f)['List']:
+                for office in offices:
+                    if i['Description'] == office.upper():
+                        ranks = i['NumOfRanks']
+                        if ranks == 0:
+                            ranks = 1
+                        office_contests[office] = {'id': i['Id'], 'ranks': ranks}
+
+        missing_offices = [office for office in offices if office not in office_contests]
+        if missing_offices:
+            raise RuntimeError(f'contest set office values {missing_offices} not present in '
+                               f'ContestManifest.json in {path}')
+
+        # candidates of each contest
+        contest_candidates = {office_contest['id']: {} for office_contest in office_contests.values()}
+        with path.find('CandidateManifest.json').open(encoding='utf8') as f:
+            for i in json.load(f)['List']:
+                if i['ContestId'] in contest_candidates:
+                    contest_candidates[i['ContestId']][i['Id']] = i['Description']
+
+        precincts = {}
+        with path.find('PrecinctPortionManifest.json').open(encoding='utf8') as f:
+            for i in json.load(f)['List']:
+                precincts[i['Id']] = i['Description'].split()[1]
+
+        ballotType_manifest = {}
+        with path.find('BallotTypeManifest.json').open(encoding='utf8') as f:
+            for i in json.load(f)['List']:
+                ballotType_manifest[i['Id']] = i['Description']
+
+        countingGroup_manifest = {}
+        with path.find('CountingGroupManifest.json').open(encoding='utf8') as f:
+            for i in json.load(f)['List']:
+                countingGroup_manifest[i['Id']] = i['Description']
+
+        office_ballots = {office: {'ranks': [], 'ballotID': [], 'precinct': [], 'ballotType': [], 'countingGroup': [],
+                                   'weight': []}
+                          for office in office_contests}
+        with path.find('CvrExport.json').open(encoding='utf8') as f:
+
+            for contests in json.load(f)['Sessions']:
+
+                # ballotID
+                ballotID_search = re.search('Images\\\\(.*)\*\.\*', contests['ImageMask'])
+                if ballotID_search:
+                    ballotID = ballotID_search.group(1)
+                else:
+                    raise RuntimeError('regex is not working correctly. debug')
+
+                countingGroup = countingGroup_manifest[contests['CountingGroupId']]
+
+                if contests['Original']['IsCurrent']:
+                    current_contests = contests['Original']
+                else:
+                    current_contests = contests['Modified']
+
+                precinct = precincts[current_contests['PrecinctPortionId']]
+                ballotType = ballotType_manifest[current_contests['BallotTypeId']]
+
+                for contest in current_contests['Contests']:
+                    for office, office_contest in office_contests.items():
+
+                        # confirm correct contest
+                        if contest['Id'] == office_contest['id']:
+
+                            candidates = contest_candidates[office_contest['id']]
+
+                            # make empty ballot
+                            ballot = [BallotMarks.SKIPPED] * office_contest['ranks']
+
+                            # look through marks
+                            for mark in contest['Marks']:
+                                candidate = candidates[mark['CandidateId']]
+                                if candidate == 'Write-in':
+                                    candidate = BallotMarks.WRITEIN
+                                rank = mark['Rank']-1
+                                if mark['IsAmbiguous']:
+                                    pass
+                                elif ballot[rank] == BallotMarks.OVERVOTE:
+                                    pass
+                                elif ballot[rank] == BallotMarks.SKIPPED:
+                                    ballot[rank] = candidate
+                                elif ballot[rank] != candidate:
+                                    ballot[rank] = BallotMarks.OVERVOTE
+
+                            ballots = office_ballots[office]
+                            ballots['countingGroup'].append(countingGroup)
+                            ballots['ballotType'].append(ballotType)
+                            ballots['precinct'].append(precinct)
+                            ballots['ranks'].append(ballot)
+                            ballots['ballotID'].append(ballotID)
+
+        for ballots in office_ballots.values():
+
+            ballots['weight'] = [decimal.Decimal('1')] * len(ballots['ranks'])
+
+            # check ballotIDs are unique
+            if len(set(ballots['ballotID'])) != len(ballots['ballotID']):
+                print("some non-unique ballot IDs")
+                exit(1)
+
+        return office_ballots
+
+
+def _cdf_local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _cdf_children(elem, name):
+    return [child for child in elem if _cdf_local_name(child.tag) == name]
 
-    path = pathlib.Path(cvr_path)
-
-    with open(path / 'ContestManifest.json', encoding='utf8') as f:
-        for i in json.load(f)['List']:
-            if i['Description'] == office.upper():
-                contest_id = i['Id']
-                ranks = i['NumOfRanks']
-                if ranks == 0:
-                    ranks = 1
-
-    candidates = {}
-    with open(path / 'CandidateManifest.json', encoding='utf8') as f:
-        for i in json.load(f)['List']:
-            if i['ContestId'] == contest_id:
-                candidates[i['Id']] = i['Description']
-
-    precincts = {}
-    with open(path / 'PrecinctPortionManifest.json', encoding='utf8') as f:
-        for i in json.load(f)['List']:
-            precincts[i['Id']] = i['Description'].split()[1]
-
-    ballotType_manifest = {}
-    with open(path / 'BallotTypeManifest.json', encoding='utf8') as f:
-        for i in json.load(f)['List']:
-            ballotType_manifest[i['Id']] = i['Description']
-
-    countingGroup_manifest = {}
-    with open(path / 'CountingGroupManifest.json', encoding='utf8') as f:
-        for i in json.load(f)['List']:
-            countingGroup_manifest[i['Id']] = i['Description']
-
-    ballots = {'ranks': [], 'ballotID': [], 'precinct': [], 'ballotType': [], 'countingGroup': [], 'weight': []}
-    with open(path / 'CvrExport.json', encoding='utf8') as f:
-
-        for contests in json.load(f)['Sessions']:
-
-            # ballotID
-            ballotID_search = re.search('Images\\\\(.*)\*\.\*', contests['ImageMask'])
-            if ballotID_search:
-                ballotID = ballotID_search.group(1)
-            else:
-                raise RuntimeError('regex is not working correctly. debug')
 
-            countingGroup = countingGroup_manifest[contests['CountingGroupId']]
+def _cdf_text(elem, name, default=None):
+    for child in elem:
+        if _cdf_local_name(child.tag) == name:
+            return (child.text or '').strip()
+    return default
 
-            if contests['Original']['IsCurrent']:
-                current_contests = contests['Original']
+
+def _cdf_xml_paths(cvr_path):
+    """
+    Yield the CDF xml file at cvr_path, or each one in the directory. Zip archives stay open while iterating.
+    """
+    with InputPath(cvr_path) as cvr_path:
+        xml_paths = [cvr_path] if cvr_path.is_file() else cvr_path.glob('*.xml')
+        if not xml_paths:
+            raise RuntimeError(f'no .xml files found at {cvr_path}')
+        yield from xml_paths
+
+
+def _iter_cdf_elements(xml_path):
+    """Incrementally parse a NIST Common Data Format (CDF) xml file.
+
+    Yields the local tag name and element of each direct child of the CastVoteRecordReport root
+    (CVR, Election, GpUnit, ...) once it has been fully read. Elements are cleared after they are yielded,
+    so memory use does not grow with the file size.
+    """
+    with xml_path.open('rb') as f:
+
+        context = ET.iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+
+        depth = 1
+        for event, elem in context:
+
+            if event == 'start':
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth == 1:
+                yield _cdf_local_name(elem.tag), elem
+                elem.clear()
+                root.clear()
+
+
+def _cdf_current_snapshot(cvr_elem):
+    """Return the CVRSnapshot element named by CurrentSnapshotId, or the last snapshot if it is missing.
+    """
+    snapshots = _cdf_children(cvr_elem, 'CVRSnapshot')
+    if not snapshots:
+        return None
+
+    current_id = _cdf_text(cvr_elem, 'CurrentSnapshotId')
+    for snapshot in snapshots:
+        if snapshot.get('ObjectId') == current_id:
+            return snapshot
+
+    return snapshots[-1]
+
+
+def _cdf_election_manifest(election_elem, manifest):
+    """Update manifest with the candidates and contests described in a CDF Election element.
+    """
+    for candidate in _cdf_children(election_elem, 'Candidate'):
+        manifest['candidates'][candidate.get('ObjectId')] = _cdf_text(candidate, 'Name', candidate.get('ObjectId'))
+
+    for contest in _cdf_children(election_elem, 'Contest'):
+
+        selections = {}
+        for selection in _cdf_children(contest, 'ContestSelection'):
+            if (_cdf_text(selection, 'IsWriteIn') or '').lower() == 'true':
+                selections[selection.get('ObjectId')] = BallotMarks.WRITEIN
             else:
-                current_contests = contests['Modified']
-
-            precinct = precincts[current_contests['PrecinctPortionId']]
-            ballotType = ballotType_manifest[current_contests['BallotTypeId']]
-
-            for contest in current_contests['Contests']:
-
-                # confirm correct contest
-                if contest['Id'] == contest_id:
-
-                    # make empty ballot
-                    ballot = [BallotMarks.SKIPPED] * ranks
-
-                    # look through marks
-                    for mark in contest['Marks']:
-                        candidate = candidates[mark['CandidateId']]
-                        if candidate == 'Write-in':
-                            candidate = BallotMarks.WRITEIN
-                        rank = mark['Rank']-1
-                        if mark['IsAmbiguous']:
-                            pass
-                        elif ballot[rank] == BallotMarks.OVERVOTE:
-                            pass
-                        elif ballot[rank] == BallotMarks.SKIPPED:
-                            ballot[rank] = candidate
-                        elif ballot[rank] != candidate:
-                            ballot[rank] = BallotMarks.OVERVOTE
+                selections[selection.get('ObjectId')] = (_cdf_text(selection, 'CandidateIds') or '').split()
 
-                    ballots['countingGroup'].append(countingGroup)
-                    ballots['ballotType'].append(ballotType)
-                    ballots['precinct'].append(precinct)
-                    ballots['ranks'].append(ballot)
-                    ballots['ballotID'].append(ballotID)
+        manifest['contests'][contest.get('ObjectId')] = {
+            'name': _cdf_text(contest, 'Name', contest.get('ObjectId')),
+            'selections': selections
+        }
+
+
+def _cdf_gpunit_manifest(gpunit_elem, manifest):
+    manifest['gpunits'][gpunit_elem.get('ObjectId')] = _cdf_text(gpunit_elem, 'Name', gpunit_elem.get('ObjectId'))
+
+
+def _cdf_contest_marks(cvr_contest):
+    """Return {rank: [selection ids]} for a CDF CVRContest element. Ranks are read from SelectionPosition/Rank,
+    falling back to CVRContestSelection/Rank, or 1 for non-ranked contests. Positions without an indication are ignored.
+    """
+    rank_selections = collections.defaultdict(list)
+    for selection in _cdf_children(cvr_contest, 'CVRContestSelection'):
 
-    ballots['weight'] = [decimal.Decimal('1')] * len(ballots['ranks'])
+        selection_id = _cdf_text(selection, 'ContestSelectionId')
+        selection_rank = _cdf_text(selection, 'Rank')
 
-    # check ballotIDs are unique
-    if len(set(ballots['ballotID'])) != len(ballots['ballotID']):
-        print("some non-unique ballot IDs")
-        exit(1)
+        for position in _cdf_children(selection, 'SelectionPosition'):
 
-    return ballots
+            if (_cdf_text(position, 'HasIndication') or 'yes').lower() == 'no':
+                continue
+
+            rank = int(_cdf_text(position, 'Rank') or selection_rank or 1)
+            if selection_id not in rank_selections[rank]:
+                rank_selections[rank].append(selection_id)
+
+    return rank_selections
+
+
+def read_common_data_format(cvr_path, chunk_size=10000):
+    """Read every contest from NIST Common Data Format (CDF) cast vote record xml files in a single pass.
 
+    The xml is parsed incrementally and each CVR element is discarded once read, so memory use is
+    bounded by the encoded output rather than the size of the xml. Rankings are encoded using contest
+    selection ids as they are read and swapped for candidate names once the Election manifest has been
+    read (it may appear after the CVR elements).
 
-def unisyn(cvr_path):
+    For more information on common data format, see:
+    https://pages.nist.gov/CastVoteRecords/
+
+    :param cvr_path: Path to a CDF xml file, or a directory of them.
+    :type cvr_path: :data:`types.Path`
+    :param chunk_size: Number of ballots per contest to buffer before encoding.
+    :type chunk_size: int
+    :return: Dictionary with contest names as keys (contest ObjectIds for contests whose name is shared by
+        another contest) and parsed contest dictionaries as values. Each contest dictionary contains 'ranks'
+        (:class:`rcv_cruncher.encoded.EncodedRanks`), 'weight', and any of 'ballotID', 'precinct',
+        'ballotType' and 'tabulator' present in the CVRs.
+    :rtype: Dict[str, :data:`types.BallotDictOfLists`]
+    """
+
+    manifest = {'candidates': {}, 'contests': {}, 'gpunits': {}}
+    cvr_fields = {'ballotID': 'UniqueId', 'precinct': 'BallotStyleUnitId',
+                  'ballotType': 'BallotStyleId', 'tabulator': 'CreatingDeviceId'}
+
+    contests = collections.defaultdict(lambda: {
+        'ranks': EncodedRanks(),
+        'buffer': [],
+        'fields': {field: [] for field in cvr_fields}
+    })
+
+    def flush(contest):
+        contest['ranks'].append_lists(contest['buffer'], pad_ranks=True)
+        contest['buffer'] = []
+
+    for xml_path in _cdf_xml_paths(cvr_path):
+        for tag, elem in _iter_cdf_elements(xml_path):
+
+            if tag == 'Election':
+                _cdf_election_manifest(elem, manifest)
+
+            elif tag == 'GpUnit':
+                _cdf_gpunit_manifest(elem, manifest)
+
+            elif tag == 'CVR':
+
+                snapshot = _cdf_current_snapshot(elem)
+                if snapshot is None:
+                    continue
+
+                cvr_values = {field: _cdf_text(elem, cdf_name) for field, cdf_name in cvr_fields.items()}
+                if cvr_values['ballotID'] is None:
+                    cvr_values['ballotID'] = _cdf_text(elem, 'BallotAuditId')
+
+                for cvr_contest in _cdf_children(snapshot, 'CVRContest'):
+
+                    contest = contests[_cdf_text(cvr_contest, 'ContestId')]
+
+                    rank_selections = _cdf_contest_marks(cvr_contest)
+                    rank_limit = max(rank_selections, default=0)
+                    ballot = [BallotMarks.SKIPPED] * rank_limit
+                    for rank, selection_ids in rank_selections.items():
+                        ballot[rank-1] = selection_ids[0] if len(selection_ids) == 1 else BallotMarks.OVERVOTE
+
+                    contest['buffer'].append(ballot)
+                    for field, value in cvr_values.items():
+                        contest['fields'][field].append(value)
+
+                    if len(contest['buffer']) >= chunk_size:
+                        flush(contest)
+
+    # contests that share a name are keyed by their ObjectId instead, so none is overwritten
+    contest_names = {contest_id: manifest['contests'].get(contest_id, {'name': contest_id})['name']
+                     for contest_id in contests}
+    name_counts = collections.Counter(contest_names.values())
+
+    # swap selection ids for candidate names
+    parsed_contests = {}
+    for contest_id, contest in contests.items():
+
+        flush(contest)
+
+        contest_manifest = manifest['contests'].get(contest_id, {'name': contest_id, 'selections': {}})
+        selection_names = {}
+        for selection_id, candidate_ids in contest_manifest['selections'].items():
+            if candidate_ids == BallotMarks.WRITEIN:
+                selection_names[selection_id] = BallotMarks.WRITEIN
+            elif candidate_ids:
+                selection_names[selection_id] = ", ".join(manifest['candidates'].get(c, c) for c in candidate_ids)
+
+        parsed = {'ranks': contest['ranks'].relabel(selection_names)}
+        parsed['weight'] = [decimal.Decimal('1')] * len(parsed['ranks'])
+
+        for field, values in contest['fields'].items():
+            if all(v is None for v in values):
+                continue
+            if field == 'precinct':
+                values = [manifest['gpunits'].get(v, v) for v in values]
+            parsed[field] = values
+
+        contest_name = contest_names[contest_id]
+        parsed_contests[contest_name if name_counts[contest_name] == 1 else contest_id] = parsed
+
+    return parsed_contests
+
+
+def common_data_format(cvr_path, office=None):
+    """Read a single contest from NIST Common Data Format (CDF) cast vote record xml files.
+
+    :param cvr_path: Path to a CDF xml file, or a directory of them.
+    :type cvr_path: :data:`types.Path`
+    :param office: Contest name (or contest ObjectId if the Election manifest has no name for it, or the name
+        is shared by another contest).
+        May be omitted if the files only contain one contest.
+    :type office: str, optional
+    :raises RuntimeError: If the requested contest is not found.
+    :rtype: :data:`types.BallotDictOfLists`
+    """
+    return common_data_format_offices(cvr_path, [office])[office]
+
+
+def common_data_format_offices(cvr_path, offices):
+    """Read several contests from NIST Common Data Format (CDF) cast vote record xml files, in one pass.
+    See :func:`common_data_format`.
+
+    :param cvr_path: Path to a CDF xml file, or a directory of them.
+    :type cvr_path: :data:`types.Path`
+    :param offices: Contest names (or ObjectIds, see :func:`common_data_format`).
+    :type offices: List[str]
+    :raises RuntimeError: If a requested contest is not found.
+    :return: Dictionary with offices as keys and parsed contest dictionaries as values.
+    :rtype: Dict[str, :data:`types.BallotDictOfLists`]
+    """
+    parsed_contests = read_common_data_format(cvr_path)
+
+    parsed_offices = {}
+    for office in offices:
+
+        if office is None and len(parsed_contests) == 1:
+            parsed_offices[office] = list(parsed_contests.values())[0]
+            continue
+
+        if office not in parsed_contests:
+            raise RuntimeError(f'contest ({office}) not found in CDF files. Contests present: {sorted(parsed_contests)}')
+
+        parsed_offices[office] = parsed_contests[office]
+
+    return parsed_offices
+
+
+def unisyn(cvr_path, chunk_size=10000):
     """
     This parser was developed for the unisyn 2020 Hawaii Dem Primary CVR which only contained the
-    ranked choice votes for a single election. Unisyn uses the common data format in xml, however the
-    parser currently is not a complete common data format parser.
+    ranked choice votes for a single election. Each rank is stored as its own CDF contest, and the nth
+    CVR of each contest belongs to the nth ballot, so each CVR may hold at most one selection per contest (none
+    counts as a skipped rank). Selections are identified by SelectionPosition/Position rather than by
+    ContestSelectionId.
+
+    The xml is read incrementally with the same helpers as :func:`read_common_data_format`.
 
     For more information on common data format, see:
     https://pages.nist.gov/CastVoteRecords/
     https://github.com/hiltonroscoe/cdfprototype
+
+    :param cvr_path: Path to a CDF xml file, or a directory of them.
+    :type cvr_path: :data:`types.Path`
+    :param chunk_size: Number of ballots per rank contest to buffer before encoding.
+    :type chunk_size: int
     """
 
-    glob_str = pathlib.Path(cvr_path).glob('/*.xml')
+    manifest = {'candidates': {}, 'contests': {}, 'gpunits': {}}
 
-    contestIDdicts = {}
-    for f in glob_str:
+    # one single-rank EncodedRanks per rank contest, holding candidate position ids until the end
+    rank_contests = collections.defaultdict(lambda: {'ranks': EncodedRanks(), 'buffer': [], 'rank': None})
 
-        with open(f) as fd:
-            xml_dict = xmltodict.parse(fd.read())
+    for xml_path in _cdf_xml_paths(cvr_path):
+        for tag, elem in _iter_cdf_elements(xml_path):
 
-        # get candidates
-        candidatesIDs = {}
-        for cand_dict in xml_dict['CastVoteRecordReport']['Election']['Candidate']:
-            candidatesIDs[cand_dict['@ObjectId']] = cand_dict['Name']
+            if tag == 'Election':
+                _cdf_election_manifest(elem, manifest)
 
-        # loop through CVR snapshots
-        for cvr_dict in xml_dict['CastVoteRecordReport']['CVR']:
+            elif tag == 'CVR':
 
-            cvr_contest = cvr_dict['CVRSnapshot']['CVRContest']
+                snapshot = _cdf_current_snapshot(elem)
+                if snapshot is None:
+                    continue
 
-            if cvr_contest['ContestId'] not in contestIDdicts:
-                contestIDdicts.update({cvr_contest['ContestId']: []})
-            contestIDdicts[cvr_contest['ContestId']].append(cvr_contest['CVRContestSelection'])
+                for cvr_contest in _cdf_children(snapshot, 'CVRContest'):
 
-    # check that all rank lists are equal
-    first_rank = list(contestIDdicts.keys())[0]
-    rank_length_equal = [len(contestIDdicts[k]) == len(contestIDdicts[first_rank]) for k in contestIDdicts]
-    if not all(rank_length_equal):
-        print("not all rank lists are equal.")
-        raise RuntimeError
-
-    # combine ranks into lists
-    ballot_lists = []
-    for idx in range(len(contestIDdicts[first_rank])):
-
-        idx_ranks = [int(contestIDdicts[rank_key][idx]['Rank']) for rank_key in contestIDdicts]
-
-        idx_candidates = []
-        for rank_key in contestIDdicts:
-            contest_dict = contestIDdicts[rank_key][idx]
-            if 'SelectionPosition' in contest_dict:
-                if isinstance(contest_dict['SelectionPosition'], list):
-                    idx_candidates.append(BallotMarks.OVERVOTE)
-                else:
-                    idx_candidates.append(candidatesIDs[contest_dict['SelectionPosition']['Position']])
-            elif contest_dict['TotalNumberVotes'] == '0':
-                idx_candidates.append(BallotMarks.SKIPPED)
+                    contest_id = _cdf_text(cvr_contest, 'ContestId')
+                    rank_contest = rank_contests[contest_id]
+
+                    # each CVR adds one ballot row to every rank contest, more would shift all later ballots
+                    contest_selections = _cdf_children(cvr_contest, 'CVRContestSelection')
+                    if len(contest_selections) > 1:
+                        raise RuntimeError(f'CDF contest {contest_id} used for a rank has more than one contest '
+                                           'selection in a CVR. unexpected.')
+
+                    if not contest_selections:
+                        rank_contest['buffer'].append([BallotMarks.SKIPPED])
 
-        ordered_ranks = sorted(zip(idx_candidates, idx_ranks), key=lambda x: x[1])
-        ballot_lists.append([t[0] for t in ordered_ranks])
+                    for contest_selection in contest_selections:
+
+                        rank = int(_cdf_text(contest_selection, 'Rank'))
+                        if rank_contest['rank'] is None:
+                            rank_contest['rank'] = rank
+                        elif rank_contest['rank'] != rank:
+                            raise RuntimeError('CDF contest used for a rank contains more than one rank value.')
+
+                        positions = _cdf_children(contest_selection, 'SelectionPosition')
+                        if len(positions) > 1:
+                            mark = BallotMarks.OVERVOTE
+                        elif positions:
+                            mark = _cdf_text(positions[0], 'Position')
+                        elif _cdf_text(contest_selection, 'TotalNumberVotes') == '0':
+                            mark = BallotMarks.SKIPPED
+                        else:
+                            raise RuntimeError('CDF contest selection without a selection position has votes. unexpected.')
+
+                        rank_contest['buffer'].append([mark])
+
+                    if len(rank_contest['buffer']) >= chunk_size:
+                        rank_contest['ranks'].append_lists(rank_contest['buffer'])
+                        rank_contest['buffer'] = []
+
+    for contest_id, rank_contest in rank_contests.items():
+        if rank_contest['rank'] is None:
+            raise RuntimeError(f'CDF contest {contest_id} used for a rank has no contest selections, '
+                               'so its rank is unknown.')
+        rank_contest['ranks'].append_lists(rank_contest['buffer'])
+
+    # check that all rank lists are equal
+    rank_lengths = set(len(rank_contest['ranks']) for rank_contest in rank_contests.values())
+    if len(rank_lengths) != 1:
+        raise RuntimeError(f"not all rank lists are equal. {sorted(rank_lengths)}")
+
+    # combine rank contests into columns of a shared label table, in rank order
+    ranks = EncodedRanks()
+    rank_columns = []
+    for rank_contest in sorted(rank_contests.values(), key=lambda x: x['rank']):
+        remap = ranks.encode_labels(rank_contest['ranks'].labels)
+        rank_columns.append(remap[rank_contest['ranks'].codes[:, 0]])
+    ranks.append_codes(np.column_stack(rank_columns))
 
     # assemble dict
-    dct = {'ranks': ballot_lists}
+    dct = {'ranks': ranks.relabel(manifest['candidates'])}
     dct['weight'] = [decimal.Decimal('1')] * len(dct['ranks'])
 
     return dct
@@ -1024,61 +1577,77 @@ def surveyUSA(cvr_path):
     candidate_codes.csv - contains two columns ("code" and "candidate") that map cvr code numbers to candidate names.
     """
 
-    path = pathlib.Path(cvr_path)
+    with InputPath(cvr_path) as path:
 
-    csv_df = pd.read_csv(path / 'cvr.csv')
-    candidate_codes_df = pd.read_csv(path / 'candidate_codes.csv')
+        with (path / 'cvr.csv').open('rb') as f:
+            csv_df = pd.read_csv(f)
+        with (path / 'candidate_codes.csv').open('rb') as f:
+            candidate_codes_df = pd.read_csv(f)
 
-    # candidate code dict
-    candidate_map = {row['code']: row['candidate'] for index, row in candidate_codes_df.iterrows()}
+        # candidate code dict
+        candidate_map = {row['code']: row['candidate'] for index, row in candidate_codes_df.iterrows()}
 
-    # find rank columns
-    rank_columns = [col for col in csv_df.columns if 'rank' in col.lower()]
+        # find rank columns
+        rank_columns = [col for col in csv_df.columns if 'rank' in col.lower()]
 
-    ballots = []
-    for index, row in csv_df.iterrows():
+        ballots = []
+        for index, row in csv_df.iterrows():
 
-        b_ranks = [BallotMarks.SKIPPED] * len(rank_columns)
+            b_ranks = [BallotMarks.SKIPPED] * len(rank_columns)
 
-        saw_undecided = False
-        since_undecided = []
+            saw_undecided = False
+            since_undecided = []
 
-        for idx, rank in enumerate(rank_columns):
+            for idx, rank in enumerate(rank_columns):
 
-            # nan marks end of ranks
-            if math.isnan(row[rank]):
-                if since_undecided:
-                    print('some candidates appeared after an undecided vote! debug')
-                    raise RuntimeError
-                break
+                # nan marks end of ranks
+                if math.isnan(row[rank]):
+                    if since_undecided:
+                        print('some candidates appeared after an undecided vote! debug')
+                        raise RuntimeError
+                    break
 
-            candidate = candidate_map[row[rank]]
+                candidate = candidate_map[row[rank]]
 
-            if saw_undecided:
-                since_undecided.append(candidate)
+                if saw_undecided:
+                    since_undecided.append(candidate)
 
-            if candidate == 'Undecided':
-                saw_undecided = True
+                if candidate == 'Undecided':
+                    saw_undecided = True
 
-            if candidate != 'Undecided':
-                b_ranks[idx] = candidate
+                if candidate != 'Undecided':
+                    b_ranks[idx] = candidate
 
-        ballots.append(b_ranks)
+            ballots.append(b_ranks)
 
-    ballot_dict = {'ranks': ballots, 'weight': csv_df['weight'], 'ballotID': csv_df['ballotID']}
-    return ballot_dict
+        ballot_dict = {'ranks': ballots, 'weight': csv_df['weight'], 'ballotID': csv_df['ballotID']}
+        return ballot_dict
 
 
 parser_dict = {
     "burlington2006": burlington2006,
     "cruncher_csv": cruncher_csv,
+    "cruncher_csv_batches": cruncher_csv_batches,
     "dominion5_2": dominion5_2,
     "dominion5_4": dominion5_4,
     "dominion5_10": dominion5_10,
     "optech": optech1,
     "unisyn": unisyn,
+    "common_data_format": common_data_format,
     "surveyUSA": surveyUSA,
     "minneapolis2009": minneapolis2009
     # "santafe": santafe, still need to figure out this parser
     # "santafe_id": santafe_id,
 }
+
+# parsers of one office (contest) in a cvr holding several, mapped to a function reading a list of offices in
+# one pass and returning {office: parsed cvr}. Contests reading the same cvr with one of these parsers are
+# parsed together (see :func:`rcv_cruncher.batch.contest_groups`).
+multi_office_parsers = {
+    common_data_format: common_data_format_offices,
+    dominion5_2: dominion5_2_offices,
+    dominion5_4: dominion5_4_offices,
+    dominion5_10: dominion5_10_offices,
+    minneapolis2009: minneapolis2009_offices,
+    optech1: optech1_offices
+}
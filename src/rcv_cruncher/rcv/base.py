@@ -126,7 +126,9 @@ class RCV(abc.ABC, CastVoteRecord, RCV_stats, RCV_tables):
         self._run_contest()
 
         # CONTEST STATS
-        self._contest_stat_table = None
+        self._contest_final_weights = None
+        self._contest_exhaust_types = None
+        self._contest_flags = None
         self._compute_contest_stat_table()
 
         self._summary_contest_stat_tables = None
@@ -153,7 +155,7 @@ class RCV(abc.ABC, CastVoteRecord, RCV_stats, RCV_tables):
 
         if add_split_stats:
 
-            self._make_split_filter_dict()
+            self._make_split_groups()
             self._compute_summary_cvr_split_stat_table()
             self._compute_summary_contest_split_stat_tables()
             cvr_split_stat_table = self._summary_cvr_split_stat_table
@@ -181,7 +183,7 @@ class RCV(abc.ABC, CastVoteRecord, RCV_stats, RCV_tables):
                 contest_stats = new_contest_stats
 
         if not keep_decimal_type:
-            contest_stats = [t.applymap(util.decimal2float) for t in contest_stats]
+            contest_stats = [util.decimal2float_frame(t) for t in contest_stats]
 
         return contest_stats
 
@@ -0,0 +1,101 @@
+from __future__ import annotations
+from typing import (Any, Callable, Dict, Iterable, List, Optional)
+
+import collections
+
+
+RegisteredStat = collections.namedtuple('RegisteredStat', ['func', 'requires', 'report', 'when'])
+
+
+class StatRegistry:
+    """
+    Named contest stats and the intermediate values they are computed from.
+
+    Every entry is a function called as ``func(rcv, tabulation_num, **inputs)``, where inputs holds the values
+    of the entries named in its ``requires`` list. Entries registered with ``report=False`` are intermediates
+    (round tallies, winners, exhaustion sums...) that are shared between stats but not reported as columns.
+    An entry with a ``when`` entry is only computed if that entry's value is truthy, and is None otherwise.
+
+    Registering a name that already exists replaces that entry. Reported stats keep the order in which they
+    were first registered.
+    """
+
+    def __init__(self) -> None:
+        self._stats = {}
+
+    def register(self,
+                 name: str,
+                 requires: Iterable[str] = (),
+                 report: bool = True,
+                 when: Optional[str] = None) -> Callable:
+        """
+        Decorator form of add().
+        """
+        def decorator(func: Callable) -> Callable:
+            self.add(name, func, requires=requires, report=report, when=when)
+            return func
+        return decorator
+
+    def add(self,
+            name: str,
+            func: Callable,
+            requires: Iterable[str] = (),
+            report: bool = True,
+            when: Optional[str] = None) -> None:
+        self._stats[name] = RegisteredStat(func, tuple(requires), report, when)
+
+    def remove(self, name: str) -> None:
+        if name not in self._stats:
+            raise RuntimeError(f'stat "{name}" is not registered.')
+        del self._stats[name]
+
+    def copy(self) -> StatRegistry:
+        """
+        Copy of the registry, so a variant can add or replace stats without changing the registry it started from.
+        """
+        registry = StatRegistry()
+        registry._stats = dict(self._stats)
+        return registry
+
+    @property
+    def names(self) -> List[str]:
+        """
+        Names of the reported stats, in registration order.
+        """
+        return [name for name, stat in self._stats.items() if stat.report]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stats
+
+    def evaluate(self, rcv: Any, tabulation_num: int = 1, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Compute the named entries (all reported stats if names is None) for one tabulation. Each entry they
+        depend on is computed once, before the entries that require it.
+        """
+        names = self.names if names is None else list(names)
+        values = {}
+        for name in names:
+            self._evaluate(name, rcv, tabulation_num, values, [])
+        return {name: values[name] for name in names}
+
+    def _evaluate(self, name: str, rcv: Any, tabulation_num: int, values: Dict[str, Any], stack: List[str]) -> Any:
+
+        if name in values:
+            return values[name]
+
+        if name not in self._stats:
+            raise RuntimeError(f'stat "{name}" is not registered. required by: {stack}')
+
+        if name in stack:
+            raise RuntimeError(f'stat dependency cycle: {" -> ".join(stack + [name])}')
+
+        stat = self._stats[name]
+        stack = stack + [name]
+
+        if stat.when is not None and not self._evaluate(stat.when, rcv, tabulation_num, values, stack):
+            values[name] = None
+            return None
+
+        inputs = {required: self._evaluate(required, rcv, tabulation_num, values, stack) for required in stat.requires}
+        values[name] = stat.func(rcv, tabulation_num, **inputs)
+        return values[name]
@@ -1,21 +1,345 @@
 
-from typing import List
+from typing import (Any, Dict, List, Optional)
 
 import collections
+import decimal
 
+import numpy as np
 import pandas as pd
 
 # import rcv_cruncher.util as util
 
+from rcv_cruncher.flags import FlagStore
+from rcv_cruncher.histogram import ExactWeights
 from rcv_cruncher.marks import BallotMarks
+from rcv_cruncher.rcv.registry import StatRegistry
 from rcv_cruncher.util import InactiveType
 
 
+contest_stat_registry = StatRegistry()
+
+####################
+# CONTEST INPUTS
+# intermediates shared by the reported stats, computed once per tabulation
+
+
+@contest_stat_registry.register('rule_set', report=False)
+def _rule_set(rcv, tabulation_num):
+    return rcv._rule_sets[rcv._contest_rule_set_name]
+
+
+@contest_stat_registry.register('all_winners', report=False)
+def _all_winners(rcv, tabulation_num):
+    return rcv._all_winners()
+
+
+@contest_stat_registry.register('winners', report=False)
+def _winners(rcv, tabulation_num):
+    return rcv._tabulation_winner(tabulation_num=tabulation_num)
+
+
+@contest_stat_registry.register('single_winner', requires=['winners'], report=False)
+def _single_winner(rcv, tabulation_num, winners):
+    return len(winners) == 1
+
+
+@contest_stat_registry.register('multi_winner', requires=['single_winner'], report=False)
+def _multi_winner(rcv, tabulation_num, single_winner):
+    return not single_winner
+
+
+@contest_stat_registry.register('first_round_tally', report=False)
+def _first_round_tally(rcv, tabulation_num):
+    return rcv.get_round_tally_dict(1, tabulation_num=tabulation_num)
+
+
+@contest_stat_registry.register('first_round_active_tally', report=False)
+def _first_round_active_tally(rcv, tabulation_num):
+    return rcv.get_round_tally_dict(1, tabulation_num=tabulation_num, only_round_active_candidates=True)
+
+
+@contest_stat_registry.register('first_round_active_tally_tuple', report=False)
+def _first_round_active_tally_tuple(rcv, tabulation_num):
+    return rcv.get_round_tally_tuple(1, tabulation_num=tabulation_num,
+                                     only_round_active_candidates=True, desc_sort=True)
+
+
+@contest_stat_registry.register('final_round_tally', requires=['number_of_rounds'], report=False)
+def _final_round_tally(rcv, tabulation_num, number_of_rounds):
+    return rcv.get_round_tally_dict(number_of_rounds, tabulation_num=tabulation_num)
+
+
+@contest_stat_registry.register('exhaust_sums', report=False)
+def _exhaust_sums(rcv, tabulation_num):
+    return rcv._contest_exhaust_sums(tabulation_num)
+
+
+@contest_stat_registry.register('winner_pairwise_margins', requires=['winners'], report=False)
+def _winner_pairwise_margins(rcv, tabulation_num, winners):
+    """
+    Net number of ballots ranking the first winner above each other candidate, minus those ranking the
+    other candidate above the winner. (unweighted)
+    """
+    cands = rcv._contest_candidates
+    if len(cands.unique_candidates) == 1:
+        return {}
+
+    winner = winners[0]
+    losers = [cand for cand in cands.unique_candidates if cand != winner]
+
+    net = collections.Counter()
+    for b in rcv._contest_cvr_ld:
+        for loser in losers:
+
+            # does winner or loser appear first on this ballot?
+            ballot_contrib = 0
+            for mark in b['ballot_marks'].marks:
+                if mark == winner:
+                    ballot_contrib = 1
+                    break
+                if mark == loser:
+                    ballot_contrib = -1
+                    break
+
+            # accumulate
+            net.update({loser: ballot_contrib})
+
+    return net
+
+
+@contest_stat_registry.register('winner_in_top_3', requires=['winners'], report=False)
+def _winner_in_top_3(rcv, tabulation_num, winners):
+    """
+    Number of ballots that ranked any winner in the top 3 ranks. (weighted)
+    """
+    top3 = [b['ballot_marks'].marks[:min(3, len(b['ballot_marks'].marks))] for b in rcv._contest_cvr_ld]
+    top3_check = [bool(set(winners).intersection(b)) for b in top3]
+    return sum(b['weight'] for flag, b in zip(top3_check, rcv._contest_cvr_ld) if flag)
+
+
+####################
+# CONTEST STATS
+# reported in registration order
+
+
+@contest_stat_registry.register('rcv_type')
+def _rcv_type(rcv, tabulation_num):
+    return rcv.__class__.__name__
+
+
+@contest_stat_registry.register('exhaust_on_overvote_marks', requires=['rule_set'])
+def _exhaust_on_overvote_marks(rcv, tabulation_num, rule_set):
+    return rule_set['exhaust_on_overvote_marks']
+
+
+@contest_stat_registry.register('exhaust_on_repeated_skipped_marks', requires=['rule_set'])
+def _exhaust_on_repeated_skipped_marks(rcv, tabulation_num, rule_set):
+    return rule_set['exhaust_on_repeated_skipped_marks']
+
+
+@contest_stat_registry.register('exhaust_on_duplicate_candidate_marks', requires=['rule_set'])
+def _exhaust_on_duplicate_candidate_marks(rcv, tabulation_num, rule_set):
+    return rule_set['exhaust_on_duplicate_candidate_marks']
+
+
+# the writein rules are reported as 1-tuples, which RCV.stats() unpacks when merging in split stats
+@contest_stat_registry.register('combine_writein_marks', requires=['rule_set'])
+def _combine_writein_marks(rcv, tabulation_num, rule_set):
+    return rule_set['combine_writein_marks'],
+
+
+@contest_stat_registry.register('exclude_writein_marks', requires=['rule_set'])
+def _exclude_writein_marks(rcv, tabulation_num, rule_set):
+    return rule_set['exclude_writein_marks'],
+
+
+@contest_stat_registry.register('treat_combined_writeins_as_exhaustable_duplicates', requires=['rule_set'])
+def _treat_combined_writeins_as_exhaustable_duplicates(rcv, tabulation_num, rule_set):
+    return rule_set['treat_combined_writeins_as_exhaustable_duplicates']
+
+
+@contest_stat_registry.register('number_of_winners', requires=['all_winners'])
+def _number_of_winners(rcv, tabulation_num, all_winners):
+    """
+    Number of winners a contest had.
+    """
+    return len(all_winners)
+
+
+@contest_stat_registry.register('tabulation_num')
+def _tabulation_num(rcv, tabulation_num):
+    return tabulation_num
+
+
+@contest_stat_registry.register('winner', requires=['winners'])
+def _winner(rcv, tabulation_num, winners):
+    """
+    The winner(s) of the election.
+    """
+    return ", ".join([str(w).title() for w in winners])
+
+
+@contest_stat_registry.register('number_of_rounds')
+def _number_of_rounds(rcv, tabulation_num):
+    return rcv.n_rounds(tabulation_num=tabulation_num)
+
+
+@contest_stat_registry.register('winners_consensus_value', requires=['winner_in_top_3', 'first_round_active_votes'])
+def _winners_consensus_value(rcv, tabulation_num, winner_in_top_3, first_round_active_votes):
+    """
+    The percentage of valid first round votes that rank any winner in the top 3.
+    """
+    return (winner_in_top_3 / first_round_active_votes) * 100
+
+
+@contest_stat_registry.register('first_round_active_votes', requires=['first_round_tally'])
+def _first_round_active_votes(rcv, tabulation_num, first_round_tally):
+    return sum(first_round_tally.values())
+
+
+@contest_stat_registry.register('final_round_active_votes', requires=['final_round_tally'])
+def _final_round_active_votes(rcv, tabulation_num, final_round_tally):
+    """
+    The number of votes that were awarded to any candidate in the final round. (weighted)
+    """
+    return sum(final_round_tally.values())
+
+
+def _exhaust_total(split_stat):
+    """
+    Stat function picking one total out of the exhaust_sums input. (weighted)
+    """
+    def exhaust_total(rcv, tabulation_num, exhaust_sums):
+        return exhaust_sums[split_stat][0]
+    return exhaust_total
+
+
+for stat_name in ['total_pretally_exhausted',
+                  'total_posttally_exhausted',
+                  'total_posttally_exhausted_by_overvote',
+                  'total_posttally_exhausted_by_skipped_rankings',
+                  'total_posttally_exhausted_by_abstention',
+                  'total_posttally_exhausted_by_rank_limit',
+                  'total_posttally_exhausted_by_duplicate_rankings']:
+    contest_stat_registry.add(stat_name, _exhaust_total('split_' + stat_name), requires=['exhaust_sums'])
+
+
+# the following stats only apply to single winner tabulations, and are None otherwise
+# in the case of multi-winner elections, they pertain to the first candidate elected
+
+
+@contest_stat_registry.register('first_round_winner_vote', requires=['winners', 'first_round_active_tally'],
+                                when='single_winner')
+def _first_round_winner_vote(rcv, tabulation_num, winners, first_round_active_tally):
+    """
+    The number of votes for the winner in the first round. (weighted)
+    """
+    return first_round_active_tally[winners[0]]
+
+
+@contest_stat_registry.register('final_round_winner_vote', requires=['winners', 'final_round_tally'],
+                                when='single_winner')
+def _final_round_winner_vote(rcv, tabulation_num, winners, final_round_tally):
+    """
+    The number of votes for the winner in the final round. (weighted)
+    """
+    return final_round_tally[winners[0]]
+
+
+@contest_stat_registry.register('first_round_winner_percent', requires=['winners', 'first_round_active_tally'],
+                                when='single_winner')
+def _first_round_winner_percent(rcv, tabulation_num, winners, first_round_active_tally):
+    """
+    The percent of votes for the winner in the first round. (weighted)
+    """
+    return first_round_active_tally[winners[0]] / sum(first_round_active_tally.values()) * 100
+
+
+@contest_stat_registry.register('final_round_winner_percent', requires=['winners', 'final_round_tally'],
+                                when='single_winner')
+def _final_round_winner_percent(rcv, tabulation_num, winners, final_round_tally):
+    """
+    The percent of votes for the winner in the final round. (weighted)
+    """
+    return (final_round_tally[winners[0]] / sum(final_round_tally.values())) * 100
+
+
+@contest_stat_registry.register('first_round_winner_place', requires=['winners', 'first_round_active_tally_tuple'],
+                                when='single_winner')
+def _first_round_winner_place(rcv, tabulation_num, winners, first_round_active_tally_tuple):
+    """
+    In terms of first round votes, what place the eventual winner came in.
+    """
+    winner = winners[0]
+
+    # account for ties
+    winner_place = None
+    for order_rank, unique_tally_val in enumerate(sorted(set(first_round_active_tally_tuple[1]), reverse=True), start=1):
+        for cand, tally in zip(*first_round_active_tally_tuple):
+            if winner == cand and tally == unique_tally_val:
+                winner_place = order_rank
+
+    return winner_place
+
+
+@contest_stat_registry.register('condorcet', requires=['winner_pairwise_margins'], when='single_winner')
+def _condorcet(rcv, tabulation_num, winner_pairwise_margins):
+    """
+    Is the winner the condorcet winner?
+    The condorcet winner is the candidate that would win a 1-on-1 election versus
+    any other candidate in the election. Note that this calculation depends on
+    jurisdiction dependant rule variations.
+    """
+    # any negative net values indicate a head-to-head where contest winner loses
+    return not winner_pairwise_margins or min(winner_pairwise_margins.values()) > 0
+
+
+@contest_stat_registry.register('come_from_behind', requires=['first_round_winner_place'], when='single_winner')
+def _come_from_behind(rcv, tabulation_num, first_round_winner_place):
+    """
+    True if rcv winner is not first round leader, else False.
+    """
+    return first_round_winner_place != 1
+
+
+@contest_stat_registry.register('ranked_winner', requires=['winners'], when='single_winner')
+def _ranked_winner(rcv, tabulation_num, winners):
+    """
+    Number of ballots with a non-overvote mark for the winner. (weighted) (filtered)
+    """
+    winner_marked = [bool(set(winners).intersection(b['ballot_marks'].unique_marks)) for b in rcv._contest_cvr_ld]
+    return sum(b['weight'] for flag, b in zip(winner_marked, rcv._contest_cvr_ld) if flag)
+
+
+@contest_stat_registry.register('final_round_winner_votes_over_first_round_active',
+                                requires=['final_round_winner_vote', 'first_round_active_votes'], when='single_winner')
+def _final_round_winner_votes_over_first_round_active(rcv, tabulation_num, final_round_winner_vote,
+                                                      first_round_active_votes):
+    """
+    The number of votes the winner receives in the final round divided by the
+    number of valid votes in the first round. Reported as percentage. (weighted)
+    """
+    return (final_round_winner_vote / first_round_active_votes) * 100
+
+
+@contest_stat_registry.register('win_threshold', when='multi_winner')
+def _win_threshold(rcv, tabulation_num):
+    """
+    Election threshold of multi-winner tabulations, if static, otherwise 'dynamic'.
+    """
+    return rcv.get_win_threshold(tabulation_num=tabulation_num)
+
+
 class RCV_stats:
     """
     Mixin containing all reporting stats. Can be overriden by any rcv variant.
+
+    Summary contest stats are computed from contest_stat_registry. A variant can report different stats by
+    assigning a copy of the registry with stats added, replaced or removed.
     """
 
+    contest_stat_registry = contest_stat_registry
+
     def _exhaustion_categories(self, *, tabulation_num=1):
         """
         Returns a list with constants indicating why each ballot
@@ -52,7 +376,7 @@ class RCV_stats:
 
         restrictive_rank_limit = self._summary_cvr_stat_table['restrictive_rank_limit'].item()
 
-        used_last_rank_list = self._cvr_stat_table['used_last_rank']
+        used_last_rank_list = self._cvr_flags['used_last_rank']
         final_ranks_list = self.get_final_ranks(tabulation_num=tabulation_num)
         ballot_marks_list = self.get_cvr_dict(self._contest_rule_set_name)['ballot_marks']
 
@@ -119,12 +443,6 @@ class RCV_stats:
     ####################
     # OUTCOME STATS
 
-    def _winner(self, tabulation_num=1):
-        '''
-        The winner(s) of the election.
-        '''
-        return ", ".join([str(w).title() for w in self._tabulation_winner(tabulation_num=tabulation_num)])
-
     def _all_winners(self):
         """
         Return contest winner names in order of election.
@@ -143,364 +461,117 @@ class RCV_stats:
                               if d['round_elected'] is not None]
         return [d['name'] for d in sorted(elected_candidates, key=lambda x: x['round_elected'])]
 
-    def _condorcet(self, tabulation_num=1):
-        '''
-        Is the winner the condorcet winner?
-        The condorcet winner is the candidate that would win a 1-on-1 election versus
-        any other candidate in the election. Note that this calculation depends on
-        jurisdiction dependant rule variations.
-
-        In the case of multi-winner elections, this result will only pertain to the first candidate elected.
-        '''
-
-        cands = self._contest_candidates
-        if len(cands.unique_candidates) == 1:
-            return True
-
-        winner = self._tabulation_winner(tabulation_num=tabulation_num)[0]
-        losers = [cand for cand in cands.unique_candidates if cand != winner]
-
-        net = collections.Counter()
-        for b in self._contest_cvr_ld:
-            for loser in losers:
-
-                # does winner or loser appear first on this ballot?
-                ballot_contrib = 0
-                for mark in b['ballot_marks'].marks:
-                    if mark == winner:
-                        ballot_contrib = 1
-                        break
-                    if mark == loser:
-                        ballot_contrib = -1
-                        break
-
-                # accumulate
-                net.update({loser: ballot_contrib})
-
-        # any negative net values indicate a head-to-head where contest winner loses
-        if min(net.values()) > 0:
-            return True
-        else:
-            return False
-
-    def _come_from_behind(self, tabulation_num=1):
-        """
-        "yes" if rcv winner is not first round leader, else "no".
-
-        In the case of multi-winner elections, this result will only pertain to the first candidate elected.
-        """
-        if self._first_round_winner_place(tabulation_num=tabulation_num) != 1:
-            return True
-        else:
-            return False
-
-    def _final_round_active_votes(self, tabulation_num=1):
-        '''
-        The number of votes that were awarded to any candidate in the final round. (weighted)
-        '''
-        n_rounds = self.n_rounds(tabulation_num=tabulation_num)
-        tally_dict = self.get_round_tally_dict(n_rounds, tabulation_num=tabulation_num)
-        return sum(tally_dict.values())
-
-    def _final_round_winner_percent(self, tabulation_num=1):
-        '''
-        The percent of votes for the winner in the final round.
-        If more than one winner, return the final round count for the first winner elected. (weighted)
-        '''
-        n_rounds = self.n_rounds(tabulation_num=tabulation_num)
-        tally_dict = self.get_round_tally_dict(n_rounds, tabulation_num=tabulation_num)
-        winner = self._tabulation_winner(tabulation_num=tabulation_num)
-        return (tally_dict[winner[0]] / sum(tally_dict.values())) * 100
-
-    def _final_round_winner_vote(self, tabulation_num=1):
-        '''
-        The percent of votes for the winner in the final round.
-        If more than one winner, return the final round count for the first winner elected. (weighted)
-        '''
-        n_rounds = self.n_rounds(tabulation_num=tabulation_num)
-        tally_dict = self.get_round_tally_dict(n_rounds, tabulation_num=tabulation_num)
-        winner = self._tabulation_winner(tabulation_num=tabulation_num)
-        return tally_dict[winner[0]]
-
-    def _final_round_winner_votes_over_first_round_active(self, tabulation_num=1):
-        '''
-        The number of votes the winner receives in the final round divided by the
-        number of valid votes in the first round. Reported as percentage.
-
-        If more than one winner, return the final round count for the first winner elected. (weighted)
-        '''
-        first_round_active_votes = sum(self.get_round_tally_dict(1, tabulation_num=tabulation_num).values())
-        return (self._final_round_winner_vote(tabulation_num=tabulation_num) / first_round_active_votes) * 100
-
-    def _first_round_winner_place(self, tabulation_num=1):
-        '''
-        In terms of first round votes, what place the eventual winner came in.
-        In the case of multi-winner elections, this result will only pertain to the first candidate elected.
-        '''
-        winner = self._tabulation_winner(tabulation_num=tabulation_num)[0]
-        tally_tuple = self.get_round_tally_tuple(1, tabulation_num=tabulation_num,
-                                                 only_round_active_candidates=True, desc_sort=True)
-
-        # account for ties
-        winner_place = None
-        for order_rank, unique_tally_val in enumerate(sorted(set(tally_tuple[1]), reverse=True), start=1):
-            for cand, tally in zip(*tally_tuple):
-                if winner == cand and tally == unique_tally_val:
-                    winner_place = order_rank
-
-        return winner_place
-
-    def _first_round_winner_percent(self, tabulation_num=1):
-        '''
-        The percent of votes for the winner in the first round.
-        In the case of multi-winner elections, this result will only pertain to the first candidate elected. (weighted)
-        '''
-        winner = self._tabulation_winner(tabulation_num=tabulation_num)
-        tally_dict = self.get_round_tally_dict(1, tabulation_num=tabulation_num, only_round_active_candidates=True)
-        return tally_dict[winner[0]] / sum(tally_dict.values()) * 100
-
-    def _first_round_winner_vote(self, tabulation_num=1):
-        '''
-        The number of votes for the winner in the first round.
-        In the case of multi-winner elections, this result will only pertain to the first candidate elected. (weighted)
-        '''
-        winner = self._tabulation_winner(tabulation_num=tabulation_num)
-        tally_dict = self.get_round_tally_dict(1, tabulation_num=tabulation_num, only_round_active_candidates=True)
-        return tally_dict[winner[0]]
-
-    def _number_of_winners(self):
-        """
-        Number of winners a contest had.
-        """
-        return len(self._all_winners())
-
-    def _ranked_winner(self, tabulation_num=1):
+    # per-ballot exhaustion flags of each tabulation, suffixed with the tabulation number
+    _contest_exhaust_flags = {
+        'pretally_exhausted': InactiveType.PRETALLY_EXHAUST,
+        'posttally_exhausted_by_overvote': InactiveType.POSTTALLY_EXHAUSTED_BY_OVERVOTE,
+        'posttally_exhausted_by_repeated_skipped_rankings': InactiveType.POSTTALLY_EXHAUSTED_BY_REPEATED_SKIPPED_RANKING,
+        'posttally_exhausted_by_abstention': InactiveType.POSTTALLY_EXHAUSTED_BY_ABSTENTION,
+        'posttally_exhausted_by_rank_limit': InactiveType.POSTTALLY_EXHAUSTED_BY_RANK_LIMIT,
+        'posttally_exhausted_by_duplicate_rankings': InactiveType.POSTTALLY_EXHAUSTED_BY_DUPLICATE_RANKING
+    }
+
+    @property
+    def _contest_stat_table(self) -> pd.DataFrame:
         """
-        Number of ballots with a non-overvote mark for the winner. (weighted) (filtered)
+        Per-ballot contest stat table as a DataFrame, materialized from the compact per-ballot stats on each access.
         """
-        winners = self._tabulation_winner(tabulation_num=tabulation_num)
-        winner_marked = [bool(set(winners).intersection(b['ballot_marks'].unique_marks)) for b in self._contest_cvr_ld]
-        return sum(b['weight'] for flag, b in zip(winner_marked, self._contest_cvr_ld) if flag)
+        df = pd.DataFrame({'weight': self._cvr_weights.decimals})
+        for iTab in range(1, self._tab_num+1):
+            df[f'final_weight{iTab}'] = self._contest_final_weights[iTab].decimals
+        for iTab in range(1, self._tab_num+1):
+            df[f'exhaust_type{iTab}'] = self._contest_exhaust_types[iTab]
+        return pd.concat([df, self._contest_flags.to_frame()], axis='columns')
 
-    def _win_threshold(self, tabulation_num=1):
+    def _compute_contest_stat_table(self) -> None:
         """
-        Election threshold, if static, otherwise NA
+        Final weights, exhaustion category and exhaustion flags of each ballot, for each tabulation.
+        Exhaustion flags are packed into a :class:`rcv_cruncher.flags.FlagStore`.
         """
-        return self.get_win_threshold(tabulation_num=tabulation_num)
-
-    def _winners_consensus_value(self, tabulation_num=1):
-        '''
-        The percentage of valid first round votes that rank any winner in the top 3.
-        '''
-        first_round_active_votes = sum(self.get_round_tally_dict(1, tabulation_num=tabulation_num).values())
-        return (self._winner_in_top_3(tabulation_num=tabulation_num) / first_round_active_votes) * 100
 
-    def _winner_in_top_3(self, tabulation_num=1):
-        """
-        Number of ballots that ranked any winner in the top 3 ranks. (weighted)
-        """
-        winner = self._tabulation_winner(tabulation_num=tabulation_num)
-        top3 = [b['ballot_marks'].marks[:min(3, len(b['ballot_marks'].marks))] for b in self._contest_cvr_ld]
-        top3_check = [bool(set(winner).intersection(b)) for b in top3]
-        return sum(b['weight'] for flag, b in zip(top3_check, self._contest_cvr_ld) if flag)
+        flags = FlagStore(len(self._cvr_weights))
+        self._contest_final_weights = {}
+        self._contest_exhaust_types = {}
 
-    def _compute_contest_stat_table(self):
+        for iTab in range(1, self._tab_num+1):
+            self._contest_final_weights[iTab] = ExactWeights(self.get_final_weights(tabulation_num=iTab))
+            self._contest_exhaust_types[iTab] = pd.Categorical(self._exhaustion_categories(tabulation_num=iTab))
 
-        cvr = self.get_cvr_dict(self._contest_rule_set_name)
+        for iTab in range(1, self._tab_num+1):
 
-        df = pd.DataFrame()
+            exhaust_type = self._contest_exhaust_types[iTab]
+            for flag_name, inactive_type in self._contest_exhaust_flags.items():
+                flags[f'{flag_name}{iTab}'] = np.asarray(exhaust_type == inactive_type)
 
-        # ADD WEIGHTS
-        df['weight'] = cvr['weight']
-        for iTab in range(1, self._tab_num+1):
-            df[f'final_weight{iTab}'] = self.get_final_weights(tabulation_num=iTab)
+            all_posttally_conditions = [f'{flag_name}{iTab}' for flag_name in self._contest_exhaust_flags
+                                        if flag_name != 'pretally_exhausted']
+            flags['posttally_exhausted'+str(iTab)] = flags.any(all_posttally_conditions)
 
-        # EXHAUSTION STATS
-        for iTab in range(1, self._tab_num+1):
-            exhaust_type = self._exhaustion_categories(tabulation_num=iTab)
-            df[f'exhaust_type{iTab}'] = pd.Series(exhaust_type, dtype='category')
+        self._contest_flags = flags
 
-        for iTab in range(1, self._tab_num+1):
-            exhaust_type_str = f'exhaust_type{iTab}'
-            df[f'pretally_exhausted{iTab}'] = df[exhaust_type_str].eq(
-                InactiveType.PRETALLY_EXHAUST)
-            df[f'posttally_exhausted_by_overvote{iTab}'] = df[exhaust_type_str].eq(
-                InactiveType.POSTTALLY_EXHAUSTED_BY_OVERVOTE)
-            df[f'posttally_exhausted_by_repeated_skipped_rankings{iTab}'] = df[exhaust_type_str].eq(
-                InactiveType.POSTTALLY_EXHAUSTED_BY_REPEATED_SKIPPED_RANKING)
-            df[f'posttally_exhausted_by_abstention{iTab}'] = df[exhaust_type_str].eq(
-                InactiveType.POSTTALLY_EXHAUSTED_BY_ABSTENTION)
-            df[f'posttally_exhausted_by_rank_limit{iTab}'] = df[exhaust_type_str].eq(
-                InactiveType.POSTTALLY_EXHAUSTED_BY_RANK_LIMIT)
-            df[f'posttally_exhausted_by_duplicate_rankings{iTab}'] = df[exhaust_type_str].eq(
-                InactiveType.POSTTALLY_EXHAUSTED_BY_DUPLICATE_RANKING)
-
-            all_posttally_conditions = [
-                f'posttally_exhausted_by_overvote{iTab}',
-                f'posttally_exhausted_by_repeated_skipped_rankings{iTab}',
-                f'posttally_exhausted_by_abstention{iTab}',
-                f'posttally_exhausted_by_rank_limit{iTab}',
-                f'posttally_exhausted_by_duplicate_rankings{iTab}'
-            ]
-            df['posttally_exhausted'+str(iTab)] = df[all_posttally_conditions].any(axis='columns')
-
-        self._contest_stat_table = df
+    def get_contest_stats(self,
+                          stat_names: Optional[List[str]] = None,
+                          tabulation_num: int = 1) -> Dict[str, Any]:
+        """
+        Return a dictionary of contest stats for one tabulation, computed from contest_stat_registry.
+        All reported stats are computed if stat_names is None, otherwise only the named stats and their inputs.
+        """
+        return self.contest_stat_registry.evaluate(self, tabulation_num=tabulation_num, names=stat_names)
 
     def _compute_summary_contest_stat_tables(self) -> None:
 
         tabulation_stats = []
 
         for iTab in range(1, self._tab_num+1):
-
-            s = pd.Series()
-
-            s['rcv_type'] = self.__class__.__name__
-
-            exhaust_on_overvote = self._rule_sets[self._contest_rule_set_name]['exhaust_on_overvote_marks']
-            exhaust_on_repeated_skipped = self._rule_sets[self._contest_rule_set_name]['exhaust_on_repeated_skipped_marks']
-            exhaust_on_duplicate = self._rule_sets[self._contest_rule_set_name]['exhaust_on_duplicate_candidate_marks']
-            combine_writeins = self._rule_sets[self._contest_rule_set_name]['combine_writein_marks']
-            exclude_writeins = self._rule_sets[self._contest_rule_set_name]['exclude_writein_marks']
-            treat_writeins = self._rule_sets[self._contest_rule_set_name]['treat_combined_writeins_as_exhaustable_duplicates']
-
-            s['exhaust_on_overvote_marks'] = exhaust_on_overvote
-            s['exhaust_on_repeated_skipped_marks'] = exhaust_on_repeated_skipped
-            s['exhaust_on_duplicate_candidate_marks'] = exhaust_on_duplicate
-            s['combine_writein_marks'] = combine_writeins,
-            s['exclude_writein_marks'] = exclude_writeins,
-            s['treat_combined_writeins_as_exhaustable_duplicates'] = treat_writeins
-
-            s['number_of_winners'] = self._number_of_winners()
-
-            s['tabulation_num'] = iTab
-            s['winner'] = self._winner(tabulation_num=iTab)
-            s['number_of_rounds'] = self.n_rounds(tabulation_num=iTab)
-            s['winners_consensus_value'] = self._winners_consensus_value(tabulation_num=iTab)
-
-            first_round_active_votes = sum(self.get_round_tally_dict(1, tabulation_num=iTab).values())
-            s['first_round_active_votes'] = first_round_active_votes
-
-            final_round_active_votes = sum(self.get_round_tally_dict(s['number_of_rounds'], tabulation_num=iTab).values())
-            s['final_round_active_votes'] = final_round_active_votes
-
-            weight = self._contest_stat_table[f'final_weight{iTab}']
-
-            pretally = sum(self._contest_stat_table[f'pretally_exhausted{iTab}'] * weight)
-            s['total_pretally_exhausted'] = pretally
-
-            posttally = sum(self._contest_stat_table[f'posttally_exhausted{iTab}'] * weight)
-            s['total_posttally_exhausted'] = posttally
-
-            posttally_overvote = sum(self._contest_stat_table[f'posttally_exhausted_by_overvote{iTab}'] * weight)
-            s['total_posttally_exhausted_by_overvote'] = posttally_overvote
-
-            posttally_skipped = sum(self._contest_stat_table[f'posttally_exhausted_by_repeated_skipped_rankings{iTab}'] * weight)
-            s['total_posttally_exhausted_by_skipped_rankings'] = posttally_skipped
-
-            posttally_abstention = sum(self._contest_stat_table[f'posttally_exhausted_by_abstention{iTab}'] * weight)
-            s['total_posttally_exhausted_by_abstention'] = posttally_abstention
-
-            posttally_rank_limit = sum(self._contest_stat_table[f'posttally_exhausted_by_rank_limit{iTab}'] * weight)
-            s['total_posttally_exhausted_by_rank_limit'] = posttally_rank_limit
-
-            posttally_duplicate = sum(self._contest_stat_table[f'posttally_exhausted_by_duplicate_rankings{iTab}'] * weight)
-            s['total_posttally_exhausted_by_duplicate_rankings'] = posttally_duplicate
-
-            if len(self._tabulation_winner(tabulation_num=iTab)) == 1:
-
-                s['first_round_winner_vote'] = self._first_round_winner_vote(tabulation_num=iTab)
-                s['final_round_winner_vote'] = self._final_round_winner_vote(tabulation_num=iTab)
-                s['first_round_winner_percent'] = self._first_round_winner_percent(tabulation_num=iTab)
-                s['final_round_winner_percent'] = self._final_round_winner_percent(tabulation_num=iTab)
-                s['first_round_winner_place'] = self._first_round_winner_place(tabulation_num=iTab)
-                s['condorcet'] = self._condorcet(tabulation_num=iTab)
-                s['come_from_behind'] = self._come_from_behind(tabulation_num=iTab)
-                s['ranked_winner'] = self._ranked_winner(tabulation_num=iTab)
-
-                final_over_first = self._final_round_winner_votes_over_first_round_active(tabulation_num=iTab)
-                s['final_round_winner_votes_over_first_round_active'] = final_over_first
-
-                s['win_threshold'] = None
-
-            else:
-
-                s['first_round_winner_vote'] = None
-                s['final_round_winner_vote'] = None
-                s['first_round_winner_percent'] = None
-                s['final_round_winner_percent'] = None
-                s['first_round_winner_place'] = None
-                s['final_round_winner_votes_over_first_round_active'] = None
-                s['condorcet'] = None
-                s['come_from_behind'] = None
-                s['ranked_winner'] = None
-
-                s['win_threshold'] = self.get_win_threshold(tabulation_num=iTab)
-
+            s = pd.Series(self.get_contest_stats(tabulation_num=iTab), dtype=object)
             tabulation_stats.append(s.to_frame().transpose())
 
         self._summary_contest_stat_tables = tabulation_stats
 
-    def _compute_contest_split_stats(self, split_filter: List[bool]) -> pd.DataFrame:
-
-        tabulation_split_stats = []
-
-        filtered_stat_table = self._contest_stat_table.loc[split_filter, :]
-
-        for iTab in range(1, self._tab_num+1):
-
-            s = pd.Series()
-
-            weight = filtered_stat_table[f'final_weight{iTab}']
-
-            pretally = sum(filtered_stat_table[f'pretally_exhausted{iTab}'] * weight)
-            s['split_total_pretally_exhausted'] = pretally
-
-            posttally = sum(filtered_stat_table[f'posttally_exhausted{iTab}'] * weight)
-            s['split_total_posttally_exhausted'] = posttally
-
-            posttally_overvote = sum(filtered_stat_table[f'posttally_exhausted_by_overvote{iTab}'] * weight)
-            s['split_total_posttally_exhausted_by_overvote'] = posttally_overvote
-
-            posttally_skipped = sum(filtered_stat_table[f'posttally_exhausted_by_repeated_skipped_rankings{iTab}'] * weight)
-            s['split_total_posttally_exhausted_by_skipped_rankings'] = posttally_skipped
-
-            posttally_abstention = sum(filtered_stat_table[f'posttally_exhausted_by_abstention{iTab}'] * weight)
-            s['split_total_posttally_exhausted_by_abstention'] = posttally_abstention
-
-            posttally_rank_limit = sum(filtered_stat_table[f'posttally_exhausted_by_rank_limit{iTab}'] * weight)
-            s['split_total_posttally_exhausted_by_rank_limit'] = posttally_rank_limit
-
-            posttally_duplicate = sum(filtered_stat_table[f'posttally_exhausted_by_duplicate_rankings{iTab}'] * weight)
-            s['split_total_posttally_exhausted_by_duplicate_rankings'] = posttally_duplicate
-
-            tabulation_split_stats.append(s.to_frame().transpose())
-
-        return tabulation_split_stats
+    def _contest_exhaust_sums(self,
+                              tabulation_num: int,
+                              group_codes: Optional[np.ndarray] = None,
+                              n_groups: int = 1) -> Dict[str, List[decimal.Decimal]]:
+        """
+        Final weight of exhausted ballots per group for one tabulation, keyed by split stat name.
+        """
+        flag_stats = {
+            'pretally_exhausted': 'split_total_pretally_exhausted',
+            'posttally_exhausted': 'split_total_posttally_exhausted',
+            'posttally_exhausted_by_overvote': 'split_total_posttally_exhausted_by_overvote',
+            'posttally_exhausted_by_repeated_skipped_rankings': 'split_total_posttally_exhausted_by_skipped_rankings',
+            'posttally_exhausted_by_abstention': 'split_total_posttally_exhausted_by_abstention',
+            'posttally_exhausted_by_rank_limit': 'split_total_posttally_exhausted_by_rank_limit',
+            'posttally_exhausted_by_duplicate_rankings': 'split_total_posttally_exhausted_by_duplicate_rankings'
+        }
+        sums = self._contest_flags.weighted_sums([f'{flag_name}{tabulation_num}' for flag_name in flag_stats],
+                                                 self._contest_final_weights[tabulation_num],
+                                                 group_codes, n_groups, empty=decimal.Decimal('0'))
+        return {stat: sums[f'{flag_name}{tabulation_num}'] for flag_name, stat in flag_stats.items()}
+
+    def _compute_contest_split_stats(self, group_codes: np.ndarray, n_groups: int) -> List[pd.DataFrame]:
+        """
+        Exhaustion split stats for one split field, one table per tabulation, computed with weighted bincounts
+        over the per-ballot exhaustion flags.
+        """
+        return [pd.DataFrame(self._contest_exhaust_sums(iTab, group_codes, n_groups))
+                for iTab in range(1, self._tab_num+1)]
 
     def _compute_summary_contest_split_stat_tables(self) -> None:
 
-        if not self._split_filter_dict:
+        if not self._split_groups:
             return
 
-        split_tabulation_stat_df_list = [[]] * self._tab_num
-
-        for field in self._split_filter_dict:
-            field_clean = self._clean_string(field)
+        split_tabulation_stat_df_list = [[] for _ in range(self._tab_num)]
 
-            for unique_val in self._split_filter_dict[field]:
-                val_clean = self._clean_string(unique_val)
-                split_id = field_clean + "-" + val_clean
+        for split_field, (group_codes, group_values) in self._split_groups.items():
 
-                split_id_df = pd.DataFrame({
-                    'split_field': [field],
-                    'split_value': [unique_val],
-                    'split_id': [split_id]
-                    })
-                split_stat_df_list = self._compute_contest_split_stats(self._split_filter_dict[field][unique_val])
+            split_id_df = self._split_id_table(split_field, group_values)
+            split_stat_df_list = self._compute_contest_split_stats(group_codes, len(group_values))
 
-                for split_stat_df_idx, split_stat_df in enumerate(split_stat_df_list):
-                    split_tabulation_stat_df_list[split_stat_df_idx].append(
-                        pd.concat([split_id_df, split_stat_df], axis='columns'))
+            for split_stat_df_idx, split_stat_df in enumerate(split_stat_df_list):
+                split_tabulation_stat_df_list[split_stat_df_idx].append(
+                    pd.concat([split_id_df, split_stat_df], axis='columns'))
 
         summary_contest_split_stat_tables = [pd.concat(split_stat_list, axis=0, ignore_index=True, sort=False)
                                              for split_stat_list in split_tabulation_stat_df_list]
@@ -0,0 +1,223 @@
+from __future__ import annotations
+from typing import (Any, Callable, Dict, Iterator, List, Optional, Tuple)
+
+import collections
+import multiprocessing
+import multiprocessing.connection
+import pathlib
+import statistics
+import sys
+import time
+
+from rcv_cruncher.inputs import InputPath
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+# estimated peak memory per byte of input file, for parsers without measurements from previous runs
+DEFAULT_BYTES_PER_INPUT_BYTE = 10
+
+# smallest estimate for any contest, covering the interpreter and imported packages
+MIN_CONTEST_BYTES = 256 * 1024 ** 2
+
+# how often worker processes are checked against the memory limit
+MEMORY_POLL_SECONDS = 0.1
+
+
+def input_bytes(contest: Dict) -> int:
+    """
+    Total size of the contest's cvr file, or of all files under its cvr directory. For a path inside a zip file,
+    the uncompressed size of the member(s).
+    """
+    path = contest.get('cvr_path')
+    if not path:
+        return 0
+
+    path = pathlib.Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+
+    with InputPath(path) as input_path:
+        return input_path.size() if input_path.archive is not None else 0
+
+
+def parser_name(contest: Dict) -> str:
+    return getattr(contest.get('parser'), '__name__', str(contest.get('parser')))
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Peak resident set size of the current process, in bytes. None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def process_rss(pid: int) -> Optional[int]:
+    """
+    Current resident set size of a process, in bytes. None where it cannot be read (it is read from /proc).
+    """
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemoryEstimator:
+    """
+    Estimates the peak memory of crunching a contest.
+
+    measurements holds the peak RSS measured for contests in previous runs, as
+    {uid: {'parser': parser name, 'input_bytes': int, 'peak_rss': int}}. A contest measured before with the same
+    input size gets its measured peak. Otherwise the estimate is its input size times the median peak per input
+    byte measured for its parser, or DEFAULT_BYTES_PER_INPUT_BYTE if its parser has no measurements.
+    """
+
+    def __init__(self, measurements: Optional[Dict[str, Dict]] = None) -> None:
+
+        self.measurements = measurements or {}
+
+        ratios = {}
+        for m in self.measurements.values():
+            if m.get('input_bytes') and m.get('peak_rss'):
+                ratios.setdefault(m['parser'], []).append(m['peak_rss'] / m['input_bytes'])
+        self.parser_ratios = {parser: statistics.median(r) for parser, r in ratios.items()}
+
+    def estimate(self, contest: Dict) -> int:
+
+        size = input_bytes(contest)
+
+        measured = self.measurements.get(contest['uid'])
+        if measured and measured.get('peak_rss') and measured.get('input_bytes') == size:
+            return max(MIN_CONTEST_BYTES, measured['peak_rss'])
+
+        ratio = self.parser_ratios.get(parser_name(contest), DEFAULT_BYTES_PER_INPUT_BYTE)
+        return max(MIN_CONTEST_BYTES, int(size * ratio))
+
+
+def next_admissible(pending: List[Tuple[int, int]], in_use: int, budget: Optional[int], n_running: int) -> Optional[int]:
+    """
+    Position in pending, a list of (key, estimated bytes) sorted largest first, of the largest contest whose
+    estimate fits in what is left of budget. With nothing running, the largest contest is admitted even if it
+    does not fit, so every contest eventually runs. None if no contest can start now.
+    """
+    if not pending:
+        return None
+    if budget is None or n_running == 0:
+        return 0
+    for pos, (_, estimate) in enumerate(pending):
+        if in_use + estimate <= budget:
+            return pos
+    return None
+
+
+WorkerFailure = collections.namedtuple('WorkerFailure', ['step', 'message'])
+
+
+def _worker(conn: Any, func: Callable, args: Tuple) -> None:
+    """
+    Process target. Sends back func(*args) and the process peak RSS.
+    """
+    try:
+        result = func(*args)
+        conn.send((result, peak_rss()))
+    except BaseException as e:
+        conn.send((WorkerFailure('worker', repr(e)), peak_rss()))
+    finally:
+        conn.close()
+
+
+def run_in_processes(items: List[Tuple[Any, Any]],
+                     func: Callable,
+                     args: Tuple,
+                     jobs: int,
+                     estimate: Callable[[Any], int],
+                     memory_budget: Optional[int] = None,
+                     memory_limit: Optional[int] = None,
+                     timeout: Optional[float] = None) -> Iterator[Tuple[Any, Any, Optional[int]]]:
+    """
+    Yield (key, func(item, *args), peak RSS in bytes) for the (key, item) pairs as they finish. Each item runs
+    in its own process, so its peak RSS can be measured and it can be stopped without affecting the others.
+
+    Items start largest estimate(item) first, with up to jobs running at a time and the sum of their
+    estimates kept under memory_budget (bytes, no budget if None). Each process is terminated once its RSS
+    goes over memory_limit bytes, checked every MEMORY_POLL_SECONDS where /proc is available (e.g. linux), or
+    after timeout seconds. An item that raises, times out, crashes or goes over the memory limit yields a
+    WorkerFailure in place of its result.
+    """
+    ctx = multiprocessing.get_context()
+
+    pending = sorted(((key, estimate(item)) for key, item in items), key=lambda p: p[1], reverse=True)
+    item_dict = dict(items)
+
+    # connection -> (key, process, estimate, start time)
+    running = {}
+    in_use = 0
+
+    def stop(conn):
+        nonlocal in_use
+        key, process, item_estimate, _ = running.pop(conn)
+        in_use -= item_estimate
+        process.terminate()
+        process.join()
+        conn.close()
+        return key
+
+    while pending or running:
+
+        # admit items
+        while len(running) < jobs:
+            pos = next_admissible(pending, in_use, memory_budget, len(running))
+            if pos is None:
+                break
+            key, item_estimate = pending.pop(pos)
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_worker, args=(child_conn, func, (item_dict[key],) + tuple(args)), daemon=True)
+            process.start()
+            child_conn.close()
+            running[parent_conn] = (key, process, item_estimate, time.monotonic())
+            in_use += item_estimate
+
+        # wait for a result, a crash, the next timeout or the next memory check
+        wait_for = None
+        if timeout is not None:
+            wait_for = max(0, min(start + timeout for _, _, _, start in running.values()) - time.monotonic())
+        if memory_limit is not None:
+            wait_for = MEMORY_POLL_SECONDS if wait_for is None else min(wait_for, MEMORY_POLL_SECONDS)
+        ready = multiprocessing.connection.wait(list(running), timeout=wait_for)
+
+        for conn in ready:
+            key, process, item_estimate, _ = running.pop(conn)
+            in_use -= item_estimate
+            try:
+                result, peak = conn.recv()
+                process.join()
+            except EOFError:
+                process.join()
+                result, peak = WorkerFailure('worker', f'worker process exited with code {process.exitcode}'), None
+            conn.close()
+            yield key, result, peak
+
+        if timeout is not None:
+            now = time.monotonic()
+            for conn in [c for c, (_, _, _, start) in running.items() if now - start >= timeout]:
+                yield stop(conn), WorkerFailure('timeout', f'did not finish within {timeout} seconds'), None
+
+        if memory_limit is not None:
+            # a process that already sent its result is left to be collected
+            for conn, (_, process, _, _) in list(running.items()):
+                rss = process_rss(process.pid)
+                if rss is not None and rss > memory_limit and not conn.poll():
+                    yield stop(conn), WorkerFailure('memory_limit', f'resident memory ({rss} bytes) went over the '
+                                                                    f'memory limit of {memory_limit} bytes'), None
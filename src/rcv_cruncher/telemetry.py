@@ -0,0 +1,140 @@
+from __future__ import annotations
+from typing import (Any, Dict, List, Optional)
+
+import heapq
+import itertools
+import json
+import pathlib
+
+TELEMETRY_FILE = 'telemetry.jsonl'
+SUMMARY_FILE = 'telemetry_summary.txt'
+
+
+def _output_bytes(step: Dict) -> Optional[int]:
+    output = step.get('output')
+    if not step.get('success') or output is None or not pathlib.Path(output).is_file():
+        return None
+    return pathlib.Path(output).stat().st_size
+
+
+class TelemetryLog:
+    """
+    Performance record of a batch run, written to results/telemetry.jsonl as contests finish.
+
+    Each crunched contest gets a JSON line per step that ran and one for the contest, with "record" set to
+    "step" or "contest". Steps record their wall and cpu seconds and the bytes of their output file. Contests
+    record their wall seconds, the cpu seconds of their steps, peak RSS, ballot, candidate and round counts,
+    output bytes and number of errors. Peak RSS is that of the worker process that crunched the contest, or the
+    high-water mark of the whole run so far when contests run in the main process.
+
+    close() writes results/telemetry_summary.txt, with the slowest contests, the slowest steps and the time
+    spent in each step over all contests.
+    """
+
+    def __init__(self, results_dir: pathlib.Path, n_slowest: int = 10) -> None:
+
+        self.results_dir = pathlib.Path(results_dir)
+        self.n_slowest = n_slowest
+
+        self._file = open(self.results_dir / TELEMETRY_FILE, 'w')
+
+        # only what the summary needs is kept: the n slowest of each and a total per step name
+        self._slowest_contests = []
+        self._slowest_steps = []
+        self._step_totals = {}
+        self._n_contests = 0
+        self._order = itertools.count()
+
+    def __enter__(self) -> TelemetryLog:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record) + '\n')
+
+    def _keep_slowest(self, heap: List, seconds: float, record: Dict) -> None:
+        item = (seconds, next(self._order), record)
+        if len(heap) < self.n_slowest:
+            heapq.heappush(heap, item)
+        elif seconds > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    def add_contest(self, contest: Dict, result: Dict, peak_rss: Optional[int] = None) -> None:
+        """
+        Record a crunched contest from its crunch results.
+        """
+        ids = {'contest': contest['uid'], 'split_id': contest.get('split_id', '')}
+        contest_output_bytes = 0
+        contest_cpu = 0.0
+
+        for step_name, step in result.get('steps', {}).items():
+
+            output_bytes = _output_bytes(step)
+            contest_output_bytes += output_bytes or 0
+            contest_cpu += step.get('cpu_seconds') or 0
+
+            record = dict(record='step', **ids, step=step_name, success=step['success'],
+                          wall_seconds=step['seconds'], cpu_seconds=step.get('cpu_seconds'), output_bytes=output_bytes)
+            self._write(record)
+
+            self._keep_slowest(self._slowest_steps, step['seconds'] or 0, record)
+            totals = self._step_totals.setdefault(step_name, {'n': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+            totals['n'] += 1
+            totals['wall_seconds'] += step['seconds'] or 0
+            totals['cpu_seconds'] += step.get('cpu_seconds') or 0
+
+        size = result.get('size', {})
+        record = dict(record='contest', **ids, wall_seconds=result.get('wall_seconds'), cpu_seconds=contest_cpu,
+                      peak_rss_bytes=peak_rss, n_ballots=size.get('n_ballots'), n_candidates=size.get('n_candidates'),
+                      n_rounds=size.get('n_rounds'), output_bytes=contest_output_bytes, n_errors=result['n_errors'])
+        self._write(record)
+        self._file.flush()
+
+        self._keep_slowest(self._slowest_contests, record['wall_seconds'] or 0, record)
+        self._n_contests += 1
+
+    def summary(self, run_seconds: Optional[float] = None) -> str:
+
+        def fmt(value: Any) -> str:
+            return '' if value is None else f'{value:.2f}' if isinstance(value, float) else str(value)
+
+        def table(header: List[str], rows: List[List[Any]]) -> List[str]:
+            rows = [header] + [[fmt(v) for v in row] for row in rows]
+            widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+            return ['  '.join(v.ljust(w) for v, w in zip(row, widths)).rstrip() for row in rows]
+
+        lines = [f'contests crunched: {self._n_contests}']
+        if run_seconds is not None:
+            lines.append(f'run wall seconds: {run_seconds:.2f}')
+
+        lines += ['', f'slowest contests (top {self.n_slowest})']
+        lines += table(['contest', 'split_id', 'wall_seconds', 'cpu_seconds', 'peak_rss_bytes', 'n_ballots',
+                        'n_candidates', 'n_rounds', 'output_bytes', 'n_errors'],
+                       [[r['contest'], r['split_id'], r['wall_seconds'], r['cpu_seconds'], r['peak_rss_bytes'],
+                         r['n_ballots'], r['n_candidates'], r['n_rounds'], r['output_bytes'], r['n_errors']]
+                        for _, _, r in sorted(self._slowest_contests, reverse=True)])
+
+        lines += ['', f'slowest steps (top {self.n_slowest})']
+        lines += table(['contest', 'split_id', 'step', 'wall_seconds', 'cpu_seconds', 'output_bytes'],
+                       [[r['contest'], r['split_id'], r['step'], r['wall_seconds'], r['cpu_seconds'], r['output_bytes']]
+                        for _, _, r in sorted(self._slowest_steps, reverse=True)])
+
+        lines += ['', 'time per step, over all contests']
+        lines += table(['step', 'n', 'wall_seconds', 'cpu_seconds'],
+                       [[step, t['n'], t['wall_seconds'], t['cpu_seconds']]
+                        for step, t in sorted(self._step_totals.items(), key=lambda i: i[1]['wall_seconds'],
+                                              reverse=True)])
+
+        return '\n'.join(lines) + '\n'
+
+    def close(self, run_seconds: Optional[float] = None) -> None:
+        """
+        Close the log and write the summary report.
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        with open(self.results_dir / SUMMARY_FILE, 'w') as summary_file:
+            summary_file.write(self.summary(run_seconds))
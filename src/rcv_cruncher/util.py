@@ -2,6 +2,10 @@ import decimal
 import os
 import pathlib
 import csv
+import re
+
+import numpy as np
+import pandas as pd
 
 from rcv_cruncher.marks import BallotMarks
 
@@ -120,6 +124,71 @@ def decimal2float(stat, round_places=3):
         return stat
 
 
+def round_floats(values, round_places=3):
+    """Round a float array to round_places, with the same results as python's round() on each value.
+
+    np.round scales, rounds and unscales, which can pick the other side of a tie than round() when the scaled
+    value lands within floating point error of .5. Those few values are re-rounded with round().
+
+    Args:
+        values (np.ndarray): float64 array.
+        round_places (int): number of decimal places.
+
+    Returns:
+        np.ndarray: rounded float64 array.
+    """
+    rounded = np.round(values, round_places)
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        scaled = values * 10.0 ** round_places
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) <= 1e-9 * np.maximum(1, np.abs(scaled))
+
+    for idx in np.flatnonzero(near_tie):
+        rounded[idx] = round(float(values[idx]), round_places)
+
+    return rounded
+
+
+def decimal2float_frame(df, round_places=3):
+    """Column-wise equivalent of df.applymap(decimal2float).
+
+    Columns holding only Decimals are cast to float64 and rounded as arrays. Decimal cells of mixed columns
+    are found with a mask and converted the same way. Column dtypes are then inferred as applymap would.
+
+    Args:
+        df (pd.DataFrame): stat table that may contain Decimal values.
+        round_places (int): number of decimal places Decimal values are rounded to.
+
+    Returns:
+        pd.DataFrame: table without Decimal values.
+    """
+    columns = []
+    for col_idx in range(df.shape[1]):
+
+        col = df.iloc[:, col_idx]
+        values = col.to_numpy()
+        if values.dtype != object:
+            columns.append(col)
+            continue
+
+        kind = pd.api.types.infer_dtype(values, skipna=False)
+        if kind == 'decimal':
+            columns.append(pd.Series(round_floats(values.astype(np.float64), round_places), index=col.index))
+            continue
+
+        values = values.copy()
+        if kind in ('mixed', 'mixed-integer'):
+            is_decimal = np.fromiter((isinstance(v, decimal.Decimal) for v in values), dtype=bool, count=len(values))
+            if is_decimal.any():
+                values[is_decimal] = round_floats(values[is_decimal].astype(np.float64), round_places)
+
+        columns.append(pd.Series(values, index=col.index).infer_objects())
+
+    converted = pd.concat(columns, axis='columns') if columns else df.copy()
+    converted.columns = df.columns
+    return converted
+
+
 def DL2LD(dl):
     return [dict(zip(dl, t)) for t in zip(*dl.values())]
 
@@ -130,7 +199,45 @@ def LD2DL(ld):
 
 
 def longname(path):
-    return pathlib.Path('\\\\?\\' + os.fspath(path.resolve()))
+    """
+    Extended-length form of path on Windows, so paths over 260 characters can be written. Other platforms have
+    no such limit and path is returned resolved.
+    """
+    if os.name != 'nt':
+        return pathlib.Path(path).resolve()
+    return pathlib.Path('\\\\?\\' + os.fspath(pathlib.Path(path).resolve()))
+
+
+def unique_id(jurisdiction='', date='', year='', office=''):
+    """
+    Contest id made of the jurisdiction, zero padded date (or year if no date) and office, with characters
+    other than letters, digits and underscores removed.
+    """
+    pieces = []
+    if jurisdiction:
+        pieces.append(jurisdiction)
+    if date:
+        padded_date = "".join(date_piece if len(date_piece) > 1 else "0" + date_piece
+                              for date_piece in date.split("/"))
+        pieces.append(padded_date)
+    elif year:
+        pieces.append(year)
+    if office:
+        pieces.append(office)
+    return "_".join(re.sub('[^0-9a-zA-Z_]+', '', piece) for piece in pieces)
+
+
+def parse_bytes(size):
+    """
+    Number of bytes in a size such as 512, '512M', '1.5G' or '2GB'. Units are powers of 1024.
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*', str(size), flags=re.IGNORECASE)
+    if not match:
+        raise RuntimeError(f'invalid size "{size}". Use a number of bytes, optionally followed by K, M, G or T.')
+    exponent = ' KMGT'.index(match.group(2).upper() or ' ')
+    return int(float(match.group(1)) * 1024 ** exponent)
 
 
 def filter_bool_dict(ballots, field_name):
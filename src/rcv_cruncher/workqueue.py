@@ -0,0 +1,261 @@
+from __future__ import annotations
+from typing import (Any, Callable, Iterable, Iterator, List, Optional, Tuple)
+
+import multiprocessing
+import os
+import pathlib
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+
+from rcv_cruncher.scheduling import WorkerFailure
+
+_SCHEMA = '''CREATE TABLE IF NOT EXISTS tasks (
+                 task_id INTEGER PRIMARY KEY,
+                 key TEXT NOT NULL,
+                 payload BLOB NOT NULL,
+                 status TEXT NOT NULL,
+                 attempts INTEGER NOT NULL DEFAULT 0,
+                 max_attempts INTEGER NOT NULL,
+                 worker TEXT,
+                 lease_expires REAL,
+                 result BLOB,
+                 error TEXT,
+                 collected INTEGER NOT NULL DEFAULT 0
+             )'''
+
+
+class WorkQueue:
+    """
+    Task queue in a SQLite file, shared by a coordinator and any number of worker processes, on one host or on
+    several hosts that see the file on a shared filesystem.
+
+    Each task is a pickled (function, item, args) call. A worker claims a pending task with a lease, keeps the
+    lease alive while it runs the call and stores the pickled return value (or error) when done. A task whose
+    lease expires, because its worker died, is claimed again by another worker. A task that raises or loses its
+    lease max_attempts times (as set by the queue that published it) is failed. The coordinator collects finished and failed tasks as they arrive.
+
+    Functions and argument objects are pickled by reference, so every worker needs the same package (and any
+    custom parsers) installed.
+    """
+
+    PENDING = 'pending'
+    LEASED = 'leased'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, path: pathlib.Path, max_attempts: int = 3) -> None:
+        self.path = pathlib.Path(path)
+        self.max_attempts = max_attempts
+        # autocommit, transactions are opened explicitly where needed
+        self._conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        self._conn.execute(_SCHEMA)
+
+    def __enter__(self) -> WorkQueue:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _transaction(self, func: Callable) -> Any:
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            value = func()
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+        return value
+
+    def reset(self) -> None:
+        self._conn.execute('DELETE FROM tasks')
+
+    def publish(self, tasks: Iterable[Tuple[str, Callable, Any, Tuple]]) -> None:
+        """
+        Add (key, function, item, args) tasks, to be run as function(item, *args).
+        """
+        rows = [(key, pickle.dumps((func, item, tuple(args)), protocol=pickle.HIGHEST_PROTOCOL), self.PENDING,
+                 self.max_attempts) for key, func, item, args in tasks]
+        self._transaction(lambda: self._conn.executemany(
+            'INSERT INTO tasks (key, payload, status, max_attempts) VALUES (?, ?, ?, ?)', rows))
+
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Tuple[int, bytes]]:
+        """
+        Lease the oldest pending task, or one whose lease expired, to worker. Returns (task id, pickled payload),
+        or None if there is no task to claim.
+        """
+        def claim_task():
+            now = time.time()
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, error = 'worker lost its lease ' || attempts || ' times' "
+                'WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts', (self.FAILED, self.LEASED, now))
+
+            row = self._conn.execute(
+                'SELECT task_id, payload FROM tasks WHERE status = ? OR (status = ? AND lease_expires < ?) '
+                'ORDER BY task_id LIMIT 1', (self.PENDING, self.LEASED, now)).fetchone()
+            if row is None:
+                return None
+
+            self._conn.execute(
+                'UPDATE tasks SET status = ?, worker = ?, attempts = attempts + 1, lease_expires = ? WHERE task_id = ?',
+                (self.LEASED, worker, now + lease_seconds, row[0]))
+            return row[0], row[1]
+
+        return self._transaction(claim_task)
+
+    def renew(self, task_id: int, worker: str, lease_seconds: float) -> bool:
+        """
+        Extend worker's lease on a task. False if the worker no longer holds it.
+        """
+        cursor = self._conn.execute('UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND worker = ? AND status = ?',
+                                    (time.time() + lease_seconds, task_id, worker, self.LEASED))
+        return cursor.rowcount == 1
+
+    def complete(self, task_id: int, worker: str, result: Any) -> bool:
+        """
+        Store the result of a task. Ignored (returns False) if worker no longer holds the task.
+        """
+        cursor = self._conn.execute('UPDATE tasks SET status = ?, result = ? WHERE task_id = ? AND worker = ? AND status = ?',
+                                    (self.DONE, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL),
+                                     task_id, worker, self.LEASED))
+        return cursor.rowcount == 1
+
+    def fail(self, task_id: int, worker: str, error: str) -> bool:
+        """
+        Record an error in a task. The task is retried unless it has been attempted max_attempts times.
+        """
+        cursor = self._conn.execute(
+            'UPDATE tasks SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, error = ?, '
+            'lease_expires = NULL WHERE task_id = ? AND worker = ? AND status = ?',
+            (self.FAILED, self.PENDING, error, task_id, worker, self.LEASED))
+        return cursor.rowcount == 1
+
+    def collect(self) -> List[Tuple[str, str, Any, Optional[str]]]:
+        """
+        Finished and failed tasks not collected before, as (key, status, result, error).
+        """
+        def collect_tasks():
+            rows = self._conn.execute('SELECT task_id, key, status, result, error FROM tasks '
+                                      'WHERE status IN (?, ?) AND collected = 0 ORDER BY task_id',
+                                      (self.DONE, self.FAILED)).fetchall()
+            self._conn.executemany('UPDATE tasks SET collected = 1 WHERE task_id = ?', [(row[0],) for row in rows])
+            return rows
+
+        return [(key, status, pickle.loads(result) if result is not None else None, error)
+                for _, key, status, result, error in self._transaction(collect_tasks)]
+
+    def n_unfinished(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM tasks WHERE status IN (?, ?)',
+                                  (self.PENDING, self.LEASED)).fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _keep_lease(queue_path: pathlib.Path, task_id: int, worker: str, lease_seconds: float, stop: threading.Event) -> None:
+    with WorkQueue(queue_path) as queue:
+        while not stop.wait(lease_seconds / 3):
+            if not queue.renew(task_id, worker, lease_seconds):
+                return
+
+
+def run_worker(queue_path: pathlib.Path,
+               worker: Optional[str] = None,
+               lease_seconds: float = 60,
+               poll_interval: float = 1) -> int:
+    """
+    Claim and run tasks from the queue until it has no pending or leased tasks left. The lease on the running
+    task is renewed from a background thread. Returns the number of tasks run.
+    """
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    n_tasks = 0
+
+    with WorkQueue(queue_path) as queue:
+        while True:
+
+            task = queue.claim(worker, lease_seconds)
+            if task is None:
+                if queue.n_unfinished() == 0:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            task_id, payload = task
+            stop = threading.Event()
+            lease_keeper = threading.Thread(target=_keep_lease, args=(queue_path, task_id, worker, lease_seconds, stop),
+                                            daemon=True)
+            lease_keeper.start()
+
+            try:
+                func, item, args = pickle.loads(payload)
+                result = func(item, *args)
+            except Exception as e:
+                queue.fail(task_id, worker, repr(e))
+            else:
+                queue.complete(task_id, worker, result)
+            finally:
+                stop.set()
+                lease_keeper.join()
+
+            n_tasks += 1
+
+    return n_tasks
+
+
+def run_in_queue(items: List[Tuple[Any, Any]],
+                 func: Callable,
+                 args: Tuple,
+                 queue_path: pathlib.Path,
+                 local_workers: int = 1,
+                 lease_seconds: float = 60,
+                 poll_interval: float = 1) -> Iterator[Tuple[Any, Any, Optional[int]]]:
+    """
+    Yield (key, func(item, *args), None) for the (key, item) pairs as they finish, like
+    :func:`rcv_cruncher.scheduling.run_in_processes`, but with the calls published as tasks to the work queue at
+    queue_path. Tasks left in the queue by earlier runs are dropped.
+
+    local_workers worker processes are started on this host, and restarted if they die while tasks are left.
+    Workers on other hosts can join the run with ``python -m rcv_cruncher --worker QUEUE_PATH``. Peak memory
+    is not measured for queued tasks. An item that fails on every attempt yields a WorkerFailure in place of
+    its result.
+    """
+    queue_path = pathlib.Path(queue_path)
+    keys = [key for key, _ in items]
+
+    with WorkQueue(queue_path) as queue:
+
+        queue.reset()
+        queue.publish((str(pos), func, item, args) for pos, (_, item) in enumerate(items))
+
+        ctx = multiprocessing.get_context()
+        worker_kwargs = {'lease_seconds': lease_seconds, 'poll_interval': poll_interval}
+
+        def start_worker():
+            process = ctx.Process(target=run_worker, args=(queue_path,), kwargs=worker_kwargs, daemon=True)
+            process.start()
+            return process
+
+        workers = [start_worker() for _ in range(local_workers)]
+
+        try:
+            n_left = len(items)
+            while n_left:
+
+                finished = queue.collect()
+                for pos, status, result, error in finished:
+                    if status == WorkQueue.FAILED:
+                        result = WorkerFailure('worker', error)
+                    yield keys[int(pos)], result, None
+                n_left -= len(finished)
+
+                if not finished:
+                    workers = [w if w.is_alive() or w.exitcode == 0 else start_worker() for w in workers]
+                    time.sleep(poll_interval)
+
+        finally:
+            for worker in workers:
+                worker.join(timeout=poll_interval * 5)
+                if worker.is_alive():
+                    worker.terminate()
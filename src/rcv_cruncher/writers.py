@@ -0,0 +1,279 @@
+from __future__ import annotations
+from typing import (Any, Optional, Union)
+
+import concurrent.futures
+import gzip
+import io
+import os
+import pathlib
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from rcv_cruncher.arrow import import_pyarrow
+
+FILE_FORMATS = ('csv', 'csv.gz', 'parquet')
+
+
+def infer_file_format(path: Union[str, os.PathLike]) -> str:
+    """
+    File format implied by the extension of path: 'csv', 'csv.gz' (any .gz file) or 'parquet'.
+    """
+    suffixes = [s.lower() for s in pathlib.Path(path).suffixes]
+    if suffixes and suffixes[-1] == '.gz':
+        return 'csv.gz'
+    if suffixes and suffixes[-1] in ('.parquet', '.pq'):
+        return 'parquet'
+    if suffixes and suffixes[-1] == '.csv':
+        return 'csv'
+    raise RuntimeError(f'cannot infer a file format from "{path}". pass one of {FILE_FORMATS} as file_format.')
+
+
+class TableWriter:
+    """
+    Writes a table to a file one DataFrame chunk at a time, so the full table never has to be in memory.
+
+    Every chunk must have the columns of the first chunk, in the same order. Use as a context manager, or call
+    close() once all chunks are written.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        self.path = pathlib.Path(path)
+        self.n_rows = 0
+        self._columns = None
+
+    def __enter__(self) -> TableWriter:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _check_columns(self, df: pd.DataFrame) -> None:
+        columns = list(df.columns)
+        if self._columns is None:
+            self._columns = columns
+        elif columns != self._columns:
+            raise RuntimeError(f'chunk columns {columns} do not match the columns already written {self._columns}')
+
+    def write(self, df: pd.DataFrame) -> None:
+        self._check_columns(df)
+        self._write(df)
+        self.n_rows += len(df)
+
+    def _write(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+class CSVTableWriter(TableWriter):
+    """
+    CSV writer, gzip compressed if compress is True. The header is written with the first chunk.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], compress: bool = False) -> None:
+        super().__init__(path)
+        self._header_written = False
+        if compress:
+            self._file = io.TextIOWrapper(gzip.open(self.path, 'wb'), encoding='utf-8', newline='')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8', newline='')
+
+    def _write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self._file, header=not self._header_written, index=False)
+        self._header_written = True
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class ParquetTableWriter(TableWriter):
+    """
+    Parquet writer, each chunk is written as one row group. Requires pyarrow.
+
+    The schema is taken from the first chunk. Columns that are entirely missing in the first chunk
+    (e.g. a candidate not ranked by any of the first ballots) are stored as strings, and Decimal columns
+    are stored as float64, since the precision of the first chunk may not fit later ones.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], schema: Optional[Any] = None) -> None:
+        super().__init__(path)
+        self._pa, self._pq = import_pyarrow()
+        self._schema = schema
+        self._decimal_columns = []
+        self._writer = None
+
+    def _first_schema(self, df: pd.DataFrame) -> Any:
+        pa = self._pa
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        fields = []
+        for f in schema:
+            if pa.types.is_null(f.type):
+                f = pa.field(f.name, pa.string())
+            elif pa.types.is_decimal(f.type):
+                self._decimal_columns.append(f.name)
+                f = pa.field(f.name, pa.float64())
+            fields.append(f)
+        return pa.schema(fields)
+
+    def _write(self, df: pd.DataFrame) -> None:
+        if self._schema is None:
+            self._schema = self._first_schema(df)
+        if self._decimal_columns:
+            df = df.assign(**{col: df[col].astype(float) for col in self._decimal_columns})
+        table = self._pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(str(self.path), table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def open_table_writer(path: Union[str, os.PathLike], file_format: Optional[str] = None) -> TableWriter:
+    """
+    TableWriter for path. If file_format is None, it is inferred from the file extension.
+    """
+    if file_format is None:
+        file_format = infer_file_format(path)
+
+    if file_format == 'csv':
+        return CSVTableWriter(path)
+    if file_format == 'csv.gz':
+        return CSVTableWriter(path, compress=True)
+    if file_format == 'parquet':
+        return ParquetTableWriter(path)
+
+    raise RuntimeError(f'file_format must be one of {FILE_FORMATS}, not "{file_format}"')
+
+
+class QueuedTableWriter:
+    """
+    Handle of a table being written by a :class:`WriterPool` thread. write() and close() queue the chunk or
+    the close and return at once, unless the thread's queue is full. future holds the number of rows written
+    once the file is closed, or the exception that stopped the write. seconds and cpu_seconds are the time and
+    cpu time the writer thread spent on the file.
+    """
+
+    def __init__(self, chunk_queue: queue.Queue, path: Union[str, os.PathLike], file_format: Optional[str]) -> None:
+        self.path = pathlib.Path(path)
+        self.file_format = file_format
+        self.future = concurrent.futures.Future()
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._queue = chunk_queue
+        self._closed = False
+
+    def __enter__(self) -> QueuedTableWriter:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def write(self, df: pd.DataFrame) -> None:
+        self._queue.put((self, df))
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queue.put((self, None))
+
+
+# cpu time of the calling thread (python 3.7+)
+_thread_time = getattr(time, 'thread_time', time.process_time)
+
+
+def _write_queued(chunk_queue: queue.Queue) -> None:
+    """
+    Writer thread of a WriterPool. Files are opened on their first item and closed on None. After an error,
+    the rest of the file's chunks are dropped.
+    """
+    writers = {}
+
+    while True:
+        item = chunk_queue.get()
+        if item is None:
+            return
+
+        handle, df = item
+        if handle.future.done():
+            continue
+
+        start = time.perf_counter()
+        start_cpu = _thread_time()
+        n_rows, error = None, None
+        try:
+            if handle not in writers:
+                writers[handle] = open_table_writer(handle.path, file_format=handle.file_format)
+            if df is not None:
+                writers[handle].write(df)
+            else:
+                writer = writers.pop(handle)
+                writer.close()
+                n_rows = writer.n_rows
+        except Exception as e:
+            writer = writers.pop(handle, None)
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+            error = e
+
+        # times are read as soon as the future resolves, so they are added first
+        handle.seconds += time.perf_counter() - start
+        handle.cpu_seconds += _thread_time() - start_cpu
+
+        if error is not None:
+            handle.future.set_exception(error)
+        elif df is None:
+            handle.future.set_result(n_rows)
+
+
+class WriterPool:
+    """
+    Threads that write tables handed off by the threads computing them, so computing the next contest does not
+    wait on the disk.
+
+    Each file is written by one thread, in the order its chunks were handed off, and each thread has a queue of
+    at most max_queued chunks. When the disk falls behind and a queue is full, write() blocks until the thread
+    catches up, which bounds the memory held by queued chunks. Use as a context manager, or call close(), which
+    waits for queued writes to finish.
+    """
+
+    def __init__(self, n_threads: int = 2, max_queued: int = 4) -> None:
+        if n_threads < 1:
+            raise RuntimeError('n_threads must be a positive integer.')
+
+        self._queues = [queue.Queue(maxsize=max_queued) for _ in range(n_threads)]
+        self._threads = [threading.Thread(target=_write_queued, args=(q,), daemon=True) for q in self._queues]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self) -> WriterPool:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def open(self, path: Union[str, os.PathLike], file_format: Optional[str] = None) -> QueuedTableWriter:
+        """
+        Writer for path, handled by the thread with the shortest queue. If file_format is None, it is inferred
+        from the file extension.
+        """
+        chunk_queue = min(self._queues, key=lambda q: q.qsize())
+        return QueuedTableWriter(chunk_queue, path, file_format)
+
+    def close(self) -> None:
+        for chunk_queue in self._queues:
+            chunk_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._queues = []
+        self._threads = []
@@ -1,11 +1,13 @@
 
 import pytest
 import decimal
+import gzip
 
 import pandas as pd
 import numpy as np
 
 from rcv_cruncher.cvr.base import CastVoteRecord
+from rcv_cruncher.encoded import (EncodedField, EncodedRanks)
 from rcv_cruncher.marks import BallotMarks
 
 
@@ -2028,3 +2030,210 @@ def test_split_median_rankings_used(param):
     cast_vote_record = CastVoteRecord(parsed_cvr=param['input']['cvr'], split_fields=['split'])
     computed_stat = cast_vote_record.stats(add_split_stats=True)['split_median_rankings_used'].tolist()
     assert param['expected']['stat'] == computed_stat
+
+
+def test_batched_parsed_cvr():
+
+    ballots = [
+        ['A', 'B', BallotMarks.SKIPPED],
+        [BallotMarks.OVERVOTE, 'C', 'A'],
+        ['B', BallotMarks.WRITEIN, 'A']
+    ]
+
+    def batches():
+        yield {'ranks': ballots[:2], 'weight': [1, 2], 'split': ['x', 'y']}
+        yield {'ranks': EncodedRanks.from_lists(ballots[2:]), 'weight': [3], 'split': ['x']}
+
+    batched_cvr = CastVoteRecord(parsed_cvr=batches())
+    full_cvr = CastVoteRecord(parsed_cvr={'ranks': ballots, 'weight': [1, 2, 3], 'split': ['x', 'y', 'x']})
+
+    assert batched_cvr.get_cvr_table().equals(full_cvr.get_cvr_table())
+    assert sorted(batched_cvr.get_candidates().marks) == sorted(full_cvr.get_candidates().marks)
+    assert batched_cvr.stats().equals(full_cvr.stats())
+
+
+def test_cross_split_stats():
+
+    cvr = CastVoteRecord(parsed_cvr={
+        'ranks': [
+            ['A', 'B'],
+            ['B', BallotMarks.SKIPPED],
+            [BallotMarks.SKIPPED, BallotMarks.SKIPPED],
+            ['A', BallotMarks.OVERVOTE]
+        ],
+        'weight': [1, 2, 3, 4],
+        'precinct': ['p1', 'p1', 'p2', 'p2'],
+        'countingGroup': ['mail', 'poll', 'poll', 'mail']
+    }, split_fields=['precinct', ('precinct', 'countingGroup')])
+
+    split_stats = cvr.stats(add_split_stats=True)
+
+    assert split_stats['split_field'].tolist() == ['precinct'] * 2 + ['precinct:countingGroup'] * 4
+    assert split_stats['split_value'].tolist() == ['p1', 'p2', 'p1:mail', 'p1:poll', 'p2:poll', 'p2:mail']
+    assert split_stats['split_id'].tolist() == ['precinct-p1', 'precinct-p2',
+                                                'precinct_countingGroup-p1_mail', 'precinct_countingGroup-p1_poll',
+                                                'precinct_countingGroup-p2_poll', 'precinct_countingGroup-p2_mail']
+    assert split_stats['split_total_ballots'].tolist() == [3, 7, 1, 2, 3, 4]
+    assert split_stats['split_total_undervote'].tolist() == [0, 3, 0, 0, 3, 0]
+    assert split_stats['split_includes_overvote_ranking'].tolist() == [0, 4, 0, 0, 0, 4]
+
+    # a group of only undervotes has no mean or median rankings used
+    assert split_stats['split_mean_rankings_used'].isna().tolist() == [False] * 4 + [True, False]
+    assert split_stats['split_median_rankings_used'].isna().tolist() == [False] * 4 + [True, False]
+
+
+@pytest.mark.parametrize("rank_limit", [3, 70])
+def test_candidate_table(rank_limit):
+
+    skipped = [BallotMarks.SKIPPED] * (rank_limit - 3)
+    cvr = CastVoteRecord(parsed_cvr={
+        'ranks': [
+            ['A', 'B', 'A'] + skipped,
+            [BallotMarks.OVERVOTE, BallotMarks.SKIPPED, 'B'] + skipped,
+            [BallotMarks.SKIPPED] * 3 + skipped[:-1] + ['A'] if skipped else ['A', 'B', 'A']
+        ],
+        'weight': [1, decimal.Decimal('0.5'), 2]
+    })
+
+    table = cvr.get_cvr_table(table_format='candidate')
+
+    assert table.columns.tolist() == ['candidate_A', 'candidate_B', f'candidate_{BallotMarks.OVERVOTE}',
+                                      'rank_limit', 'weight']
+    assert table['candidate_A'].tolist() == ['1,3', None, str(rank_limit) if skipped else '1,3']
+    assert table['candidate_B'].tolist() == ['2', '3', None if skipped else '2']
+    assert table[f'candidate_{BallotMarks.OVERVOTE}'].tolist() == [None, '1', None]
+    assert table['rank_limit'].tolist() == [rank_limit] * 3
+    assert table['weight'].tolist() == [1, decimal.Decimal('0.5'), 2]
+
+
+@pytest.mark.parametrize("table_format", ['rank', 'candidate'])
+@pytest.mark.parametrize("weights", [None, ['1', '0.5', '2', '1', '1']])
+def test_iter_cvr_table(table_format, weights):
+
+    parsed_cvr = {
+        'ranks': [['A', 'B'], ['B', BallotMarks.OVERVOTE], ['C', 'C'], [BallotMarks.SKIPPED] * 2, ['A', 'C']],
+        'precinct': ['p1', 'p2', 'p1', 'p3', 'p2']
+    }
+    if weights:
+        parsed_cvr['weight'] = [decimal.Decimal(w) for w in weights]
+    cvr = CastVoteRecord(parsed_cvr=parsed_cvr)
+
+    table = cvr.get_cvr_table(table_format=table_format)
+    chunks = list(cvr.iter_cvr_table(table_format=table_format, chunk_size=2))
+
+    # candidate C is only ranked in the second chunk, but every chunk has the same columns
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert all(chunk.columns.tolist() == table.columns.tolist() for chunk in chunks)
+    pd.testing.assert_frame_equal(pd.concat(chunks), table)
+
+
+@pytest.mark.parametrize("file_name, open_func", [('cvr.csv', open), ('cvr.csv.gz', gzip.open)])
+@pytest.mark.parametrize("table_format", ['rank', 'candidate'])
+def test_write_cvr_table(tmp_path, file_name, open_func, table_format):
+
+    cvr = CastVoteRecord(parsed_cvr={
+        'ranks': [['A', 'B'], ['B', BallotMarks.OVERVOTE], ['C', 'C'], [BallotMarks.SKIPPED] * 2, ['A', 'C']],
+        'weight': [decimal.Decimal(w) for w in ['1', '0.5', '2', '1', '1']]
+    })
+
+    n_rows = cvr.write_cvr_table(tmp_path / file_name, table_format=table_format, chunk_size=2)
+
+    with open_func(tmp_path / file_name, 'rt') as f:
+        written = f.read()
+
+    assert n_rows == 5
+    assert written == cvr.get_cvr_table(table_format=table_format).to_csv(index=False)
+
+
+def test_write_cvr_table_parquet(tmp_path):
+
+    pytest.importorskip('pyarrow')
+
+    cvr = CastVoteRecord(parsed_cvr={
+        'ranks': [['A', 'B'], ['B', BallotMarks.OVERVOTE], ['C', 'C'], [BallotMarks.SKIPPED] * 2, ['A', 'C']],
+        'weight': [decimal.Decimal(w) for w in ['1', '0.5', '2', '1', '1']]
+    })
+
+    cvr.write_cvr_table(tmp_path / 'cvr.parquet', table_format='candidate', chunk_size=2)
+    written = pd.read_parquet(tmp_path / 'cvr.parquet')
+
+    expected = cvr.get_cvr_table(table_format='candidate')
+    expected['weight'] = expected['weight'].astype(float)
+    pd.testing.assert_frame_equal(written, expected)
+
+
+def test_write_cvr_table_format():
+
+    cvr = CastVoteRecord(parsed_cvr={'ranks': [['A', 'B']]})
+
+    with pytest.raises(RuntimeError):
+        cvr.write_cvr_table('cvr.txt')
+
+    with pytest.raises(RuntimeError):
+        list(cvr.iter_cvr_table(table_format='ballot'))
+
+
+def test_arrow_round_trip(tmp_path):
+
+    pa = pytest.importorskip('pyarrow')
+
+    cvr = CastVoteRecord(jurisdiction='Springfield', year='2020', parsed_cvr={
+        'ranks': [['A', 'B'], [BallotMarks.OVERVOTE, 'C'], [BallotMarks.SKIPPED] * 2],
+        'precinct': ['p1', 'p2', 'p1'],
+        'weight': [decimal.Decimal(w) for w in ['1', '0.25', '2']]
+    })
+
+    table = cvr.to_arrow()
+
+    assert table.column_names == ['precinct', 'rank1', 'rank2', 'weight']
+    assert pa.types.is_dictionary(table.schema.field('rank1').type)
+    assert table.column('rank1').combine_chunks().indices.to_pylist() == cvr._parsed_cvr['ranks'].codes[:, 0].tolist()
+    assert pa.types.is_decimal(table.schema.field('weight').type)
+
+    from_arrow = CastVoteRecord.from_arrow(table)
+    assert from_arrow.unique_id == cvr.unique_id
+    pd.testing.assert_frame_equal(from_arrow.get_cvr_table(), cvr.get_cvr_table())
+    assert from_arrow._parsed_cvr['weight'] == cvr._parsed_cvr['weight']
+
+    cvr.write_parquet(tmp_path / 'cvr.parquet')
+    from_parquet = CastVoteRecord.read_parquet(tmp_path / 'cvr.parquet', office='Mayor')
+    assert from_parquet.unique_id == 'Springfield_2020_Mayor'
+    pd.testing.assert_frame_equal(from_parquet.get_cvr_table(table_format='candidate'),
+                                  cvr.get_cvr_table(table_format='candidate'))
+
+
+def test_from_arrow_rank_table():
+
+    pa = pytest.importorskip('pyarrow')
+
+    # plain string rank columns, out of order, with a missing mark and float weights
+    table = pa.table({
+        'rank2': ['B', None, 'A'],
+        'rank1': ['A', 'B', BallotMarks.OVERVOTE],
+        'weight': [1.0, 0.5, 2.0]
+    })
+
+    cvr = CastVoteRecord.from_arrow(table)
+
+    assert cvr._parsed_cvr['ranks'].to_lists() == [['A', 'B'], ['B', BallotMarks.SKIPPED], [BallotMarks.OVERVOTE, 'A']]
+    assert cvr._parsed_cvr['weight'] == [decimal.Decimal(w) for w in ['1.0', '0.5', '2.0']]
+
+
+def test_encoded_fields():
+
+    cvr = CastVoteRecord(parsed_cvr={
+        'ranks': [['A', 'B'], ['B', 'A'], ['A', BallotMarks.SKIPPED]],
+        'precinct': ['p1', 'p2', 'p1'],
+        'ballotID': [11, 12, 13]
+    }, split_fields=['precinct'])
+
+    cvr.add_rule_set('test', BallotMarks.new_rule_set(exclude_skipped_marks=True))
+
+    # fields are stored once and shared by modified cvrs, but get_cvr_dict returns lists
+    assert isinstance(cvr._parsed_cvr['precinct'], EncodedField)
+    assert cvr.get_cvr_dict('test')['precinct'] == ['p1', 'p2', 'p1']
+    assert cvr.get_cvr_dict()['ballotID'] == [11, 12, 13]
+    assert cvr._modified_cvrs['test']['precinct'] is cvr._parsed_cvr['precinct']
+
+    assert cvr.get_cvr_table()['ballotID'].dtype == np.int64
+    assert cvr.stats(add_split_stats=True)['split_total_ballots'].tolist() == [2, 1]
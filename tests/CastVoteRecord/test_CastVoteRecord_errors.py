@@ -15,7 +15,9 @@ params = [
     (RuntimeError, {'ranks': []}),
     (RuntimeError, {'RANKS': [['A', 'B', 'C']]}),
     (RuntimeError, {'ranks': [['A'], ['A', 'B']]}),
-    (RuntimeError, {'ranks': [['A', 'B'], ['A', 'B']], 'weight': [1, 1, 1]})
+    (RuntimeError, {'ranks': [['A', 'B'], ['A', 'B']], 'weight': [1, 1, 1]}),
+    (RuntimeError, iter([{'ranks': [['A', 'B']]}, {'ranks': [['A', 'B', 'C']]}])),
+    (RuntimeError, iter([{'ranks': [['A', 'B']], 'split': [1]}, {'ranks': [['A', 'B']]}]))
 ]
 
 
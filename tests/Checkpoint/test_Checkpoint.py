@@ -0,0 +1,29 @@
+from rcv_cruncher.checkpoint import Checkpoint
+
+
+def test_checkpoint(tmp_path):
+
+    with Checkpoint(tmp_path) as checkpoint:
+        checkpoint.start_contests([{'uid': 'a', 'hash': 'h1'}, {'uid': 'b', 'hash': 'h1'}])
+        checkpoint.finish_contest('a', 'h1', 1, {
+            'parse': {'success': True, 'seconds': 1.5, 'output': None, 'message': None},
+            'convert_cvr_rank': {'success': False, 'seconds': 0.5, 'output': tmp_path / 'a.csv', 'message': 'bad'}
+        })
+
+    # state survives reopening
+    with Checkpoint(tmp_path) as checkpoint:
+        assert checkpoint.contest('a')['status'] == Checkpoint.FAILED
+        assert checkpoint.contest('b')['status'] == Checkpoint.RUNNING
+        assert checkpoint.contest('c') is None
+        assert checkpoint.steps('a') == {
+            'parse': {'status': 'success', 'seconds': 1.5, 'output': None, 'message': None},
+            'convert_cvr_rank': {'status': 'failed', 'seconds': 0.5, 'output': str(tmp_path / 'a.csv'), 'message': 'bad'}
+        }
+
+        # a changed hash drops the old step records
+        checkpoint.start_contests([{'uid': 'a', 'hash': 'h2'}])
+        assert checkpoint.steps('a') == {}
+        assert checkpoint.contest('a')['hash'] == 'h2'
+
+    with Checkpoint(tmp_path, reset=True) as checkpoint:
+        assert checkpoint.contest('a') is None
@@ -0,0 +1,28 @@
+import numpy as np
+
+from rcv_cruncher.encoded import EncodedField
+
+
+def test_encoded_field_append():
+
+    field = EncodedField(['p1', 'p2', 'p1'])
+    field.append(['p3', None, 'p2'])
+    field.append(EncodedField([None, 'p4', 'p1']))
+
+    assert field.to_list() == ['p1', 'p2', 'p1', 'p3', None, 'p2', None, 'p4', 'p1']
+    assert field.values == ['p1', 'p2', 'p3', None, 'p4']
+    assert field.codes.tolist() == [0, 1, 0, 2, 3, 1, 3, 4, 0]
+    assert field.codes.dtype == np.uint8
+    assert field.missing_code == 3
+    assert field[3] == 'p3'
+    assert field[4:7] == [None, 'p2', None]
+    assert len(field) == 9
+
+
+def test_encoded_field_isin():
+
+    field = EncodedField(['p1', float('nan'), 'p2', 'p1'])
+
+    assert field.isin(['p1']).tolist() == [True, False, False, True]
+    assert field.isin(['p2', None]).tolist() == [False, True, True, False]
+    assert field.isin([]).tolist() == [False] * 4
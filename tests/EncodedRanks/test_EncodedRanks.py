@@ -0,0 +1,25 @@
+import pytest
+
+from rcv_cruncher.encoded import EncodedRanks
+from rcv_cruncher.marks import BallotMarks
+
+
+def test_encoded_ranks_extend():
+
+    first = EncodedRanks.from_lists([['A', 'B'], [BallotMarks.OVERVOTE, 'A']])
+    second = EncodedRanks.from_lists([['C', BallotMarks.SKIPPED]])
+    first.extend(second)
+
+    assert first.to_lists() == [['A', 'B'], [BallotMarks.OVERVOTE, 'A'], ['C', BallotMarks.SKIPPED]]
+    assert first[2] == ['C', BallotMarks.SKIPPED]
+    assert len(first) == 3
+
+
+def test_encoded_ranks_errors():
+
+    with pytest.raises(RuntimeError):
+        EncodedRanks.from_lists([['A', 'B'], ['A']])
+
+    encoded = EncodedRanks.from_lists([['A', 'B']])
+    with pytest.raises(RuntimeError):
+        encoded.append_lists([['A', 'B', 'C']])
@@ -0,0 +1,72 @@
+
+import decimal
+
+import numpy as np
+import pytest
+
+from rcv_cruncher.flags import FlagStore
+from rcv_cruncher.histogram import ExactWeights
+
+D = decimal.Decimal
+
+
+def test_flags_round_trip():
+
+    rng = np.random.default_rng(0)
+    values = {f'flag{i}': rng.random(50) < 0.5 for i in range(20)}
+
+    flags = FlagStore(50)
+    for name, flag in values.items():
+        flags[name] = flag
+
+    # twenty flags fit in three bytes per ballot
+    assert flags.nbytes == 50 * 3
+    assert flags.names == list(values)
+
+    for name, flag in values.items():
+        assert np.array_equal(flags[name], flag)
+
+    # replacing a flag leaves its neighbours untouched
+    flags['flag9'] = ~values['flag9']
+    assert np.array_equal(flags['flag9'], ~values['flag9'])
+    assert np.array_equal(flags['flag8'], values['flag8'])
+    assert np.array_equal(flags['flag10'], values['flag10'])
+
+    assert np.array_equal(flags.any(['flag1', 'flag12']), values['flag1'] | values['flag12'])
+
+    df = flags.to_frame(['flag3', 'flag17'])
+    assert df.columns.tolist() == ['flag3', 'flag17']
+    assert df['flag17'].dtype == bool
+    assert np.array_equal(df['flag3'].to_numpy(), values['flag3'])
+
+
+def test_flag_errors():
+
+    flags = FlagStore(3)
+    with pytest.raises(RuntimeError):
+        flags['a'] = [True, False]
+    with pytest.raises(RuntimeError):
+        flags.get('missing')
+
+
+@pytest.mark.parametrize("weights", [
+    [D('1'), D('2'), D('0.5'), D('1'), D('3')],
+    # weights that cannot be scaled to integers use exact Decimal sums
+    [D(1) / D(3), D('2'), D('0.5'), D(1) / D(3), D('3')]
+])
+def test_weighted_sums(weights):
+
+    flags = FlagStore(5)
+    flags['a'] = [True, False, True, True, False]
+    flags['b'] = [False, False, False, False, False]
+
+    group_codes = np.array([0, 1, 0, 2, 2])
+    sums = flags.weighted_sums(['a', 'b'], weights, group_codes, n_groups=4)
+
+    assert sums['a'] == [weights[0] + weights[2], 0, weights[3], 0]
+    assert all(isinstance(s, D) for s in sums['a'][:1])
+    assert sums['b'] == [0, 0, 0, 0]
+
+    assert flags.count('a', group_codes, 4).tolist() == [2, 0, 1, 0]
+    assert ExactWeights(weights).sums() == [sum(weights)]
+    assert flags.weighted_sums(['b'], weights, empty=D('0'))['b'] == [D('0')]
@@ -0,0 +1,93 @@
+
+import bz2
+import gzip
+import lzma
+import zipfile
+
+import pytest
+
+from rcv_cruncher.inputs import InputPath
+
+
+@pytest.mark.parametrize("suffix, compress", [
+    ('', lambda b: b),
+    ('.gz', gzip.compress),
+    ('.bz2', bz2.compress),
+    ('.xz', lzma.compress)
+])
+def test_compressed_file(tmp_path, suffix, compress):
+
+    (tmp_path / f'cvr.csv{suffix}').write_bytes(compress(b'rank1,rank2\nA,B\n'))
+
+    path = InputPath(tmp_path / f'cvr.csv{suffix}')
+    with path.open() as f:
+        assert f.read() == 'rank1,rank2\nA,B\n'
+
+    assert InputPath(tmp_path).glob('*.csv') == [path]
+
+
+def test_zip_directory(tmp_path):
+
+    with zipfile.ZipFile(tmp_path / 'cvr.zip', 'w') as zf:
+        zf.writestr('export/ContestManifest.json', '{"List": []}')
+        zf.writestr('export/CvrExport_1.json', '{"Sessions": [1]}')
+        zf.writestr('export/CvrExport_2.json.gz', gzip.compress(b'{"Sessions": [2]}'))
+
+    # single top-level folder is used as the root
+    root = InputPath(tmp_path / 'cvr.zip')
+    assert root.is_dir()
+    assert (root / 'ContestManifest.json').is_file()
+    assert not (root / 'CandidateManifest.json').exists()
+
+    exports = root.glob('CvrExport*.json')
+    assert [p.name for p in exports] == ['CvrExport_1.json', 'CvrExport_2.json.gz']
+    for path, expected in zip(exports, ['{"Sessions": [1]}', '{"Sessions": [2]}']):
+        with path.open() as f:
+            assert f.read() == expected
+
+    # paths that continue past the zip file refer to members
+    member = InputPath(tmp_path / 'cvr.zip' / 'export' / 'CvrExport_1.json')
+    assert member.is_file()
+    assert member.parent == root
+    with member.open('rb') as f:
+        assert f.read() == b'{"Sessions": [1]}'
+
+    with pytest.raises(ValueError):
+        member.open('w')
+
+
+def test_zip_close(tmp_path):
+
+    with zipfile.ZipFile(tmp_path / 'cvr.zip', 'w') as zf:
+        zf.writestr('a.csv', 'rank1\nA\n')
+
+    with InputPath(tmp_path / 'cvr.zip') as root:
+        archive = root._zip
+        member = root / 'a.csv'
+
+        # a copy holds the archive open until it is closed too
+        with InputPath(member) as copy:
+            pass
+        assert archive.fp is not None
+
+        with copy.open() as f:
+            pass
+        with member.open() as f:
+            assert f.read() == 'rank1\nA\n'
+
+    assert archive.fp is None
+
+    # closing twice releases once
+    root.close()
+    copy.close()
+
+
+def test_find(tmp_path):
+
+    (tmp_path / 'CvrExport.json.gz').write_bytes(gzip.compress(b'{}'))
+    (tmp_path / 'ContestManifest.json').write_text('{}')
+
+    path = InputPath(tmp_path)
+    assert path.find('CvrExport.json').name == 'CvrExport.json.gz'
+    assert path.find('ContestManifest.json').name == 'ContestManifest.json'
+    assert not path.find('CandidateManifest.json').exists()
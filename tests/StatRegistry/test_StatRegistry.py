@@ -0,0 +1,79 @@
+
+import pytest
+
+from rcv_cruncher.rcv.registry import StatRegistry
+from rcv_cruncher.rcv.variants import SingleWinner
+
+
+def test_evaluate_dependency_order():
+
+    calls = []
+    registry = StatRegistry()
+
+    @registry.register('base', report=False)
+    def base(rcv, tabulation_num):
+        calls.append('base')
+        return tabulation_num * 10
+
+    @registry.register('double', requires=['base'])
+    def double(rcv, tabulation_num, base):
+        return base * 2
+
+    @registry.register('triple', requires=['base'])
+    def triple(rcv, tabulation_num, base):
+        return base * 3
+
+    @registry.register('guarded', requires=['base'], when='never')
+    def guarded(rcv, tabulation_num, base):
+        raise AssertionError('guarded stat should not be computed')
+
+    registry.add('never', lambda rcv, tabulation_num: False, report=False)
+
+    assert registry.names == ['double', 'triple', 'guarded']
+    assert registry.evaluate(None, tabulation_num=2) == {'double': 40, 'triple': 60, 'guarded': None}
+    assert calls == ['base']
+
+    # only the requested stats and their inputs are computed
+    assert registry.evaluate(None, names=['base']) == {'base': 10}
+
+
+def test_evaluate_errors():
+
+    registry = StatRegistry()
+    registry.add('a', lambda rcv, tabulation_num, b: b, requires=['b'])
+    registry.add('b', lambda rcv, tabulation_num, a: a, requires=['a'])
+    registry.add('c', lambda rcv, tabulation_num, d: d, requires=['d'])
+
+    with pytest.raises(RuntimeError, match='cycle'):
+        registry.evaluate(None, names=['a'])
+
+    with pytest.raises(RuntimeError, match='not registered'):
+        registry.evaluate(None, names=['c'])
+
+    with pytest.raises(RuntimeError):
+        registry.remove('d')
+
+
+def test_custom_variant_stat():
+
+    class SingleWinnerMargin(SingleWinner):
+        contest_stat_registry = SingleWinner.contest_stat_registry.copy()
+
+    @SingleWinnerMargin.contest_stat_registry.register('final_round_margin', requires=['final_round_tally'])
+    def final_round_margin(rcv, tabulation_num, final_round_tally):
+        first, second = sorted(final_round_tally.values(), reverse=True)[:2]
+        return first - second
+
+    ballots = {'ranks': [['A', 'B'], ['A', 'C'], ['B', 'A'], ['C', 'B'], ['A', 'B'], ['B', 'C'], ['A', 'C']]}
+
+    rcv = SingleWinnerMargin(parsed_cvr=ballots)
+    stats = rcv.stats()[0]
+    assert stats['final_round_margin'].item() == 2
+    assert stats['winner'].item() == 'A'
+
+    assert rcv.get_contest_stats(['final_round_margin', 'number_of_rounds']) == {'final_round_margin': 2,
+                                                                                 'number_of_rounds': 1}
+
+    # the default registry is unchanged
+    assert 'final_round_margin' not in SingleWinner.contest_stat_registry
+    assert 'final_round_margin' not in SingleWinner(parsed_cvr=ballots).stats()[0].columns
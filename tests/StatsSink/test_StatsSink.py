@@ -0,0 +1,40 @@
+import pandas as pd
+
+from rcv_cruncher.aggregate import (SPOOL_DIR, StatsSink)
+
+RUN_CONFIG = {'per_rcv_group_stats': True, 'per_rcv_type_stats': True}
+
+
+def test_sorted_output(tmp_path):
+
+    contest_dfs = {
+        0: pd.DataFrame({'unique_id': ['a'], 'winner': ['A'], 'n': [1]}),
+        1: pd.DataFrame({'unique_id': ['b', 'b'], 'winner': ['B', 'C'], 'n': [2, 3]}),
+        2: pd.DataFrame({'unique_id': ['c'], 'winner': ['D'], 'n': [4]})
+    }
+
+    with StatsSink(tmp_path, RUN_CONFIG) as sink:
+        for key in [2, 0, 1]:
+            sink.add(key, 'SingleWinner', 'single_winner', contest_dfs[key])
+        assert (tmp_path / SPOOL_DIR).is_dir()
+
+    expected = pd.concat(contest_dfs.values(), ignore_index=True)
+    assert pd.read_csv(tmp_path / 'SingleWinner.csv').equals(expected)
+    assert pd.read_csv(tmp_path / 'group_single_winner.csv').equals(expected)
+    assert not (tmp_path / 'group_multi_winner.csv').exists()
+    assert not (tmp_path / SPOOL_DIR).exists()
+
+
+def test_schema_evolution(tmp_path):
+
+    with StatsSink(tmp_path, {'per_rcv_type_stats': True}) as sink:
+        sink.add(1, 'Until2', 'multi_winner', pd.DataFrame({'unique_id': ['b'], 'extra': ['x'], 'n': [2]}))
+        sink.add(0, 'Until2', 'multi_winner', pd.DataFrame({'unique_id': ['a'], 'n': [1]}))
+        sink.add(2, 'Until2', 'multi_winner', pd.DataFrame({'n': [3], 'unique_id': ['c'], 'late': [True]}))
+
+    df = pd.read_csv(tmp_path / 'Until2.csv')
+    assert df.columns.tolist() == ['unique_id', 'n', 'extra', 'late']
+    assert df['unique_id'].tolist() == ['a', 'b', 'c']
+    assert df['n'].tolist() == [1, 2, 3]
+    assert df['extra'].fillna('').tolist() == ['', 'x', '']
+    assert not (tmp_path / 'group_multi_winner.csv').exists()
@@ -0,0 +1,51 @@
+import json
+
+from rcv_cruncher.telemetry import (SUMMARY_FILE, TELEMETRY_FILE, TelemetryLog)
+
+
+def result(seconds, output=None):
+    return {
+        'n_errors': 0,
+        'wall_seconds': sum(seconds.values()),
+        'size': {'n_ballots': 100, 'n_candidates': 3, 'n_rounds': 2},
+        'steps': {step: {'success': True, 'seconds': s, 'cpu_seconds': s / 2, 'output': output, 'message': None}
+                  for step, s in seconds.items()}
+    }
+
+
+def test_telemetry_log(tmp_path):
+
+    output = tmp_path / 'converted.csv'
+    output.write_text('a,b\n1,2\n')
+
+    with TelemetryLog(tmp_path, n_slowest=2) as telemetry:
+        telemetry.add_contest({'uid': 'fast'}, result({'parse': 1.0, 'tabulate': 0.5}), peak_rss=1000)
+        telemetry.add_contest({'uid': 'slow'}, result({'parse': 8.0, 'convert_cvr_rank': 3.0}, output), peak_rss=2000)
+        telemetry.add_contest({'uid': 'medium'}, result({'parse': 2.0}))
+
+    with open(tmp_path / TELEMETRY_FILE) as f:
+        records = [json.loads(line) for line in f]
+
+    contests = [r for r in records if r['record'] == 'contest']
+    assert [r['contest'] for r in contests] == ['fast', 'slow', 'medium']
+    assert contests[1] == {'record': 'contest', 'contest': 'slow', 'split_id': '', 'wall_seconds': 11.0,
+                           'cpu_seconds': 5.5, 'peak_rss_bytes': 2000, 'n_ballots': 100, 'n_candidates': 3,
+                           'n_rounds': 2, 'output_bytes': 2 * len('a,b\n1,2\n'), 'n_errors': 0}
+
+    steps = [r for r in records if r['record'] == 'step']
+    assert [(r['contest'], r['step']) for r in steps] == [('fast', 'parse'), ('fast', 'tabulate'),
+                                                          ('slow', 'parse'), ('slow', 'convert_cvr_rank'),
+                                                          ('medium', 'parse')]
+
+    summary = (tmp_path / SUMMARY_FILE).read_text().splitlines()
+    assert summary[0] == 'contests crunched: 3'
+
+    # top 2 contests and steps, slowest first
+    contest_rows = summary[summary.index('slowest contests (top 2)') + 2:][:2]
+    assert [row.split()[0] for row in contest_rows] == ['slow', 'medium']
+    step_rows = summary[summary.index('slowest steps (top 2)') + 2:][:2]
+    assert [row.split()[:2] for row in step_rows] == [['slow', 'parse'], ['slow', 'convert_cvr_rank']]
+
+    # parse time summed over contests
+    total_rows = summary[summary.index('time per step, over all contests') + 2:]
+    assert total_rows[0].split() == ['parse', '3', '11.00', '5.50']
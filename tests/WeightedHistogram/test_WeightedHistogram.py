@@ -0,0 +1,48 @@
+
+import decimal
+
+import numpy as np
+import pytest
+
+from rcv_cruncher.histogram import WeightedHistogram
+
+D = decimal.Decimal
+
+params = [
+    # values, weights, expected median, expected mean
+    ([1, 2, 3], [D('1'), D('1'), D('1')], 2, D('2')),
+    ([1, 2, 3, 4], [D('1'), D('1'), D('1'), D('1')], 2.5, D('2.5')),
+    ([1, 3], [D('3'), D('1')], 1, D('1.5')),
+    ([1, 2, 4], [D('0.5'), D('0.5'), D('1')], 3.0, D('2.75')),
+    # a zero weight value is not used as the lower bound of an exact midpoint
+    ([1, 2, 3], [D('1'), D('0'), D('1')], 2.0, D('2')),
+    # weights that cannot be scaled to integers use exact Decimal sums
+    ([1, 2], [D(1) / D(3), D(1) / D(3)], 1.5, D('1.5')),
+]
+
+
+@pytest.mark.parametrize("values, weights, median, mean", params)
+def test_median_mean(values, weights, median, mean):
+    histogram = WeightedHistogram(values, weights)
+    assert histogram.median() == [median]
+    assert histogram.mean() == [mean]
+
+
+def test_groups_and_quantiles():
+
+    histogram = WeightedHistogram([0, 1, 2, 3, 1, 1],
+                                  [D('1')] * 6,
+                                  group_codes=np.array([0, 0, 0, 0, 2, 2]),
+                                  n_groups=3,
+                                  n_values=5)
+
+    assert histogram.counts.shape == (3, 5)
+    assert histogram.totals() == [4, 0, 2]
+
+    quartiles = histogram.quantile(0.25)
+    assert quartiles[0] == 0.5 and quartiles[1].is_nan() and quartiles[2] == 1
+    assert histogram.quantile(1)[0] == 3
+    assert histogram.quantile(0)[0] == 0
+
+    with pytest.raises(ValueError):
+        histogram.quantile(1.5)
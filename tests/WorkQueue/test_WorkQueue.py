@@ -0,0 +1,72 @@
+import os
+import time
+
+from rcv_cruncher.scheduling import WorkerFailure
+from rcv_cruncher.workqueue import (WorkQueue, run_in_queue, run_worker)
+
+
+def divide(x, y):
+    return x / y
+
+
+def die_once(marker):
+    if not marker.exists():
+        marker.touch()
+        os._exit(1)
+    return 'done'
+
+
+def test_work_queue_lease_and_retry(tmp_path):
+
+    with WorkQueue(tmp_path / 'queue.sqlite', max_attempts=3) as queue:
+        queue.publish([('a', divide, 1, (2,)), ('b', divide, 1, (0,))])
+
+        task_a, _ = queue.claim('w1', lease_seconds=60)
+        task_b, _ = queue.claim('w2', lease_seconds=0.2)
+        assert queue.claim('w3', lease_seconds=60) is None
+
+        # w2's lease expired, so its task is handed to w3 and w2 can no longer finish it
+        time.sleep(0.3)
+        assert queue.claim('w3', lease_seconds=60)[0] == task_b
+        assert not queue.complete(task_b, 'w2', 'late')
+        assert queue.renew(task_a, 'w1', 60)
+
+        # a failure is retried until max_attempts
+        assert queue.fail(task_b, 'w3', 'error')
+        assert queue.n_unfinished() == 2
+        assert queue.claim('w1', lease_seconds=60)[0] == task_b
+        queue.fail(task_b, 'w1', 'error again')
+
+        queue.complete(task_a, 'w1', 0.5)
+        assert queue.collect() == [('a', WorkQueue.DONE, 0.5, None), ('b', WorkQueue.FAILED, None, 'error again')]
+        assert queue.collect() == []
+        assert queue.n_unfinished() == 0
+
+
+def test_run_worker(tmp_path):
+
+    with WorkQueue(tmp_path / 'queue.sqlite', max_attempts=1) as queue:
+        queue.publish([('a', divide, 1, (2,)), ('b', divide, 1, (0,))])
+        assert run_worker(tmp_path / 'queue.sqlite', poll_interval=0.01) == 2
+        assert queue.collect() == [('a', WorkQueue.DONE, 0.5, None),
+                                   ('b', WorkQueue.FAILED, None, "ZeroDivisionError('division by zero')")]
+
+
+def test_run_in_queue(tmp_path):
+
+    items = [(n, n + 1) for n in range(6)] + [(6, 0)]
+    results = {key: result for key, result, _ in run_in_queue(items, divide, (2,), tmp_path / 'queue.sqlite',
+                                                               local_workers=3, poll_interval=0.01)}
+    assert {key: results[key] for key in range(6)} == {n: (n + 1) / 2 for n in range(6)}
+
+    items = [('x', 1)]
+    results = list(run_in_queue(items, divide, (0,), tmp_path / 'queue.sqlite', local_workers=2, poll_interval=0.01))
+    assert results == [('x', WorkerFailure('worker', "ZeroDivisionError('division by zero')"), None)]
+
+
+def test_run_in_queue_worker_death(tmp_path):
+
+    # the first worker dies holding the task, which is claimed again once its lease expires
+    results = list(run_in_queue([('x', tmp_path / 'marker')], die_once, (), tmp_path / 'queue.sqlite',
+                                local_workers=1, lease_seconds=0.5, poll_interval=0.01))
+    assert results == [('x', 'done', None)]
@@ -0,0 +1,111 @@
+import concurrent.futures
+import gzip
+import queue
+import threading
+
+import pandas as pd
+import pytest
+
+import rcv_cruncher.writers as writers
+
+from rcv_cruncher.writers import WriterPool
+
+
+def chunks(name, n_chunks=5):
+    return [pd.DataFrame({'file': [name] * 3, 'row': range(i * 3, (i + 1) * 3)}) for i in range(n_chunks)]
+
+
+def test_writer_pool(tmp_path):
+
+    with WriterPool(n_threads=2, max_queued=2) as pool:
+        handles = {}
+        for name in ['a.csv', 'b.csv.gz', 'c.csv']:
+            with pool.open(tmp_path / name) as writer:
+                for chunk in chunks(name):
+                    writer.write(chunk)
+            handles[name] = writer
+
+    for name, writer in handles.items():
+        assert writer.future.result() == 15
+        assert writer.seconds > 0
+        # chunks of a file are written in the order they were handed off
+        assert pd.read_csv(tmp_path / name)['row'].tolist() == list(range(15))
+
+    with gzip.open(tmp_path / 'b.csv.gz', 'rt') as f:
+        assert f.readline().strip() == 'file,row'
+
+
+def test_writer_times_recorded_before_result(tmp_path):
+
+    chunk_queue = queue.Queue()
+    writer = writers.QueuedTableWriter(chunk_queue, tmp_path / 'a.csv', None)
+
+    # a waiter reads the times as soon as the future resolves
+    seen = []
+
+    class RecordingFuture(concurrent.futures.Future):
+        def set_result(self, result):
+            seen.append((writer.seconds, writer.cpu_seconds))
+            super().set_result(result)
+
+    writer.future = RecordingFuture()
+    for chunk in chunks('a.csv'):
+        writer.write(chunk)
+    writer.close()
+    chunk_queue.put(None)
+
+    writers._write_queued(chunk_queue)
+
+    assert writer.future.result() == 15
+    assert seen == [(writer.seconds, writer.cpu_seconds)]
+
+
+def test_writer_pool_error(tmp_path):
+
+    with WriterPool(n_threads=1) as pool:
+        with pool.open(tmp_path / 'bad.csv') as bad:
+            bad.write(pd.DataFrame({'x': [1]}))
+            bad.write(pd.DataFrame({'y': [1]}))
+            bad.write(pd.DataFrame({'x': [2]}))
+        with pool.open(tmp_path / 'good.csv') as good:
+            good.write(pd.DataFrame({'x': [1]}))
+
+    with pytest.raises(RuntimeError, match='do not match'):
+        bad.future.result()
+    assert good.future.result() == 1
+
+
+def test_writer_pool_backpressure(tmp_path, monkeypatch):
+
+    # the writer thread is held on its first chunk, so handing off blocks once the queue is full
+    release = threading.Event()
+    csv_write = writers.CSVTableWriter._write
+
+    def held_write(self, df):
+        release.wait()
+        csv_write(self, df)
+
+    monkeypatch.setattr(writers.CSVTableWriter, '_write', held_write)
+
+    pool = WriterPool(n_threads=1, max_queued=2)
+    writer = pool.open(tmp_path / 'a.csv')
+    n_handed_off = []
+
+    def hand_off():
+        for chunk in chunks('a.csv'):
+            writer.write(chunk)
+            n_handed_off.append(1)
+        writer.close()
+
+    producer = threading.Thread(target=hand_off)
+    producer.start()
+    producer.join(timeout=0.5)
+
+    # one chunk in the writer thread and two in the queue
+    assert producer.is_alive()
+    assert len(n_handed_off) == 3
+
+    release.set()
+    producer.join()
+    pool.close()
+    assert writer.future.result() == 15
@@ -0,0 +1,468 @@
+import collections
+import sys
+import threading
+import time
+import zipfile
+
+import pandas as pd
+import pytest
+
+import rcv_cruncher.batch as batch
+
+from rcv_cruncher.workqueue import WorkQueue
+
+
+CVR_ROWS = {
+    'a.csv': [['A', 'B', 'C']] * 4 + [['B', 'A', 'C']] * 3 + [['C', 'B', 'skipped']] * 2,
+    'b.csv': [['D', 'E', 'skipped']] * 2 + [['E', 'D', 'skipped']] * 5
+}
+
+
+def write_contest_set(path, offices):
+
+    cvr_dir = path / 'cvr'
+    cvr_dir.mkdir()
+    for file_name, rows in CVR_ROWS.items():
+        pd.DataFrame(rows, columns=['rank1', 'rank2', 'rank3']).to_csv(cvr_dir / file_name, index=False)
+
+    contest_set_dir = path / 'contest_set'
+    contest_set_dir.mkdir()
+
+    with open(contest_set_dir / 'run_config.txt', 'w') as f:
+        f.write(f'cvr_path_root = {cvr_dir}\n')
+        f.write('per_rcv_type_stats = true\n')
+        f.write('per_rcv_group_stats = true\n')
+        f.write('convert_cvr_rank_format = true\n')
+
+    pd.DataFrame({
+        'office': offices,
+        'jurisdiction': ['town'] * len(offices),
+        'year': ['2020'] * len(offices),
+        'cvr_path': [f'{office}.csv' for office in offices],
+        'parser': ['cruncher_csv'] * len(offices),
+        'rcv_type': ['SingleWinner'] * len(offices)
+    }).to_csv(contest_set_dir / 'contest_set.csv', index=False)
+
+    return contest_set_dir
+
+
+def test_read_contest_set(tmp_path):
+
+    contest_set_dir = write_contest_set(tmp_path, ['a', 'b'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+
+    assert [contest['uid'] for contest in contest_set] == ['town_2020_a', 'town_2020_b']
+    assert contest_set[0]['parser_args'] == {'cvr_path': tmp_path / 'cvr' / 'a.csv'}
+    assert run_config['per_rcv_type_stats'] is True
+    assert run_config['candidate_details'] is False
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_crunch_contest_set(tmp_path, jobs):
+
+    # contest "missing" has no cvr file, its errors should not stop the other contests
+    contest_set_dir = write_contest_set(tmp_path, ['b', 'missing', 'a'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output', jobs=jobs)
+
+    results_dir = tmp_path / 'output' / 'results'
+    stats = pd.read_csv(results_dir / 'SingleWinner.csv')
+    assert stats['unique_id'].tolist() == ['town_2020_b', 'town_2020_a']
+    assert stats['winner'].tolist() == ['E', 'B']
+    assert pd.read_csv(results_dir / 'group_single_winner.csv').equals(stats)
+
+    errors = pd.read_csv(results_dir / 'error_log.csv')
+    assert errors['contest'].tolist() == ['town_2020_missing']
+    assert errors['cruncher_step'].tolist() == ['parse']
+
+    converted = pd.read_csv(tmp_path / 'output' / 'converted_cvr' / 'rank_format' / 'town_2020_a.csv')
+    assert len(converted) == 9
+
+    durations = pd.read_csv(results_dir / 'step_durations.csv')
+    assert set(durations['contest']) == {'town_2020_a', 'town_2020_b', 'town_2020_missing'}
+    assert durations.loc[durations['contest'] == 'town_2020_missing', 'cruncher_step'].tolist() == ['parse']
+
+
+def test_crunch_contest_set_incremental(tmp_path, monkeypatch):
+
+    contest_set_dir = write_contest_set(tmp_path, ['b', 'missing', 'a'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+
+    crunched = []
+    crunch_contest = batch.crunch_contest
+
+    def recording_crunch_contest(contest, *args, **kwargs):
+        crunched.append(contest['uid'])
+        return crunch_contest(contest, *args, **kwargs)
+
+    monkeypatch.setattr(batch, 'crunch_contest', recording_crunch_contest)
+
+    # unchanged contests are reused, the contest with errors is run again
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+    assert crunched == ['town_2020_missing']
+
+    # changing an input file reruns only its contest
+    crunched.clear()
+    pd.DataFrame([['D', 'E', 'skipped']] * 6, columns=['rank1', 'rank2', 'rank3']).to_csv(tmp_path / 'cvr' / 'b.csv', index=False)
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+    assert crunched == ['town_2020_b', 'town_2020_missing']
+
+    stats = pd.read_csv(tmp_path / 'output' / 'results' / 'SingleWinner.csv')
+    assert stats['unique_id'].tolist() == ['town_2020_b', 'town_2020_a']
+    assert stats['winner'].tolist() == ['D', 'B']
+
+    # changing a run config option reruns every contest
+    crunched.clear()
+    batch.crunch_contest_set(contest_set, {**run_config, 'convert_cvr_candidate_format': True}, tmp_path / 'output')
+    assert crunched == ['town_2020_b', 'town_2020_missing', 'town_2020_a']
+
+    # dropped contests leave the aggregated stats
+    batch.crunch_contest_set(contest_set[2:], run_config, tmp_path / 'output')
+    stats = pd.read_csv(tmp_path / 'output' / 'results' / 'SingleWinner.csv')
+    assert stats['unique_id'].tolist() == ['town_2020_a']
+
+
+def test_crunch_contest_set_incremental_truncated_cache(tmp_path, monkeypatch):
+
+    contest_set_dir = write_contest_set(tmp_path, ['b', 'a'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+
+    # as left by a run killed while writing the cache
+    cache_path = tmp_path / 'output' / 'results' / 'contest_cache' / 'town_2020_a.pkl'
+    cache_path.write_bytes(cache_path.read_bytes()[:20])
+
+    crunched = []
+    crunch_contest = batch.crunch_contest
+
+    def recording_crunch_contest(contest, *args, **kwargs):
+        crunched.append(contest['uid'])
+        return crunch_contest(contest, *args, **kwargs)
+
+    monkeypatch.setattr(batch, 'crunch_contest', recording_crunch_contest)
+
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+    assert crunched == ['town_2020_a']
+
+    stats = pd.read_csv(tmp_path / 'output' / 'results' / 'SingleWinner.csv')
+    assert stats['winner'].tolist() == ['E', 'B']
+    assert not list(cache_path.parent.glob('*.tmp'))
+
+
+def test_crunch_contest_set_incremental_zip_member(tmp_path, monkeypatch):
+
+    contest_set_dir = write_contest_set(tmp_path, ['a'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+
+    def write_zip(rows):
+        with zipfile.ZipFile(tmp_path / 'cvr' / 'export.zip', 'w') as zf:
+            zf.writestr('exp/a.csv', pd.DataFrame(rows, columns=['rank1', 'rank2', 'rank3']).to_csv(index=False))
+
+    write_zip(CVR_ROWS['a.csv'])
+    zip_member = tmp_path / 'cvr' / 'export.zip' / 'exp' / 'a.csv'
+    contest_set[0]['cvr_path'] = zip_member
+    contest_set[0]['parser_args']['cvr_path'] = zip_member
+
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+
+    crunched = []
+    crunch_contest = batch.crunch_contest
+
+    def recording_crunch_contest(contest, *args, **kwargs):
+        crunched.append(contest['uid'])
+        return crunch_contest(contest, *args, **kwargs)
+
+    monkeypatch.setattr(batch, 'crunch_contest', recording_crunch_contest)
+
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+    assert crunched == []
+
+    # rewriting the zip file reruns the contest read from it
+    write_zip([['C', 'B', 'A']] * 6 + CVR_ROWS['a.csv'])
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+    assert crunched == ['town_2020_a']
+
+    stats = pd.read_csv(tmp_path / 'output' / 'results' / 'SingleWinner.csv')
+    assert stats['winner'].tolist() == ['C']
+
+
+class ExampleSteps(batch.Steps):
+
+    def __init__(self, funcs, **kwargs):
+        self.funcs = funcs
+        super().__init__({'uid': 'contest'}, {}, None, None, **kwargs)
+
+    def generate_steps(self):
+        def step(name, depends_on=()):
+            return (name, {'f': self.funcs[name], 'args': [], 'condition': True, 'depends_on': list(depends_on),
+                           'fail_with': [], 'return_key': name})
+        return collections.OrderedDict([
+            step('first'),
+            step('a', ['first']),
+            step('b', ['first']),
+            step('after_a', ['a'])
+        ])
+
+
+def test_steps_run_concurrently():
+
+    # a and b only finish if they run at the same time
+    barrier = threading.Barrier(2, timeout=10)
+    steps = ExampleSteps({'first': lambda: 1, 'a': barrier.wait, 'b': barrier.wait, 'after_a': lambda: 2},
+                         max_workers=2)
+    steps.run_steps()
+
+    assert steps.errors == []
+    assert steps.return_results()['after_a'] == 2
+    assert list(steps.step_durations()) == ['first', 'a', 'b', 'after_a']
+
+
+def test_steps_failure_propagation():
+
+    def fail():
+        raise ValueError('bad step')
+
+    steps = ExampleSteps({'first': lambda: 1, 'a': fail, 'b': lambda: 3, 'after_a': lambda: 2}, max_workers=2)
+    steps.run_steps()
+
+    assert steps.errors == [['contest', '', 'a', "ValueError('bad step')"]]
+    assert steps.return_results()['b'] == 3
+    assert 'after_a' not in steps.return_results()
+    assert list(steps.step_durations()) == ['first', 'a', 'b']
+
+
+def sleeping_parser(cvr_path):
+    time.sleep(60)
+
+
+def allocating_parser(cvr_path):
+    # grows resident memory step by step, up to 4G
+    blocks = []
+    for _ in range(256):
+        blocks.append(b'x' * 16 * 1024 ** 2)
+        time.sleep(0.01)
+    return {'ranks': [['A', 'B']]}
+
+
+def rss():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS'))
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='uses fork and /proc')
+def test_crunch_contest_set_worker_limits(tmp_path):
+
+    contest_set_dir = write_contest_set(tmp_path, ['a', 'slow', 'large'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+    contest_set[1]['parser'] = sleeping_parser
+    contest_set[2]['parser'] = allocating_parser
+
+    # forked workers start with the resident pages of this process
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output', jobs=2,
+                             memory_limit=rss() + 512 * 1024 ** 2, timeout=5)
+
+    results_dir = tmp_path / 'output' / 'results'
+    errors = pd.read_csv(results_dir / 'error_log.csv').set_index('contest')
+    assert errors.at['town_2020_slow', 'cruncher_step'] == 'timeout'
+    assert errors.at['town_2020_large', 'cruncher_step'] == 'memory_limit'
+
+    stats = pd.read_csv(results_dir / 'SingleWinner.csv')
+    assert stats['unique_id'].tolist() == ['town_2020_a']
+
+    # peak memory is measured for the next run's estimates
+    measurements = batch.RunManifest.load(results_dir).measurements
+    assert measurements['town_2020_a']['peak_rss'] > 0
+
+
+def test_crunch_contest_set_resume(tmp_path, monkeypatch):
+
+    contest_set_dir = write_contest_set(tmp_path, ['b', 'a'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+    results_dir = tmp_path / 'output' / 'results'
+
+    # first run fails computing stats, after parsing and converting the cvrs
+    def failing_stats(rcv_obj):
+        raise ValueError('interrupted')
+
+    with monkeypatch.context() as m:
+        m.setattr(batch, 'contest_stats_df', failing_stats)
+        batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+
+    with batch.Checkpoint(results_dir) as checkpoint:
+        assert checkpoint.contest('town_2020_a')['status'] == batch.Checkpoint.FAILED
+        assert checkpoint.steps('town_2020_a')['contest_stats']['message'] == "ValueError('interrupted')"
+        assert checkpoint.steps('town_2020_a')['convert_cvr_rank']['status'] == 'success'
+    assert len(list((results_dir / 'parsed_cvr_cache').iterdir())) == 2
+
+    # resuming neither parses nor converts the cvrs again
+    calls = []
+    monkeypatch.setattr(batch, 'parse_contest_cvr', lambda contest: calls.append('parse'))
+    monkeypatch.setattr(batch, 'write_converted_cvr', lambda *args, **kwargs: calls.append('convert'))
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output', resume=True)
+
+    assert calls == []
+    stats = pd.read_csv(results_dir / 'SingleWinner.csv')
+    assert stats['unique_id'].tolist() == ['town_2020_b', 'town_2020_a']
+    assert stats['winner'].tolist() == ['E', 'B']
+
+    with batch.Checkpoint(results_dir) as checkpoint:
+        assert checkpoint.contest('town_2020_a')['status'] == batch.Checkpoint.FINISHED
+    assert list((results_dir / 'parsed_cvr_cache').iterdir()) == []
+
+
+def test_crunch_contest_set_shared_parse(tmp_path, monkeypatch):
+
+    contest_set_dir = write_contest_set(tmp_path, ['a', 'b', 'a_again'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+
+    # the third contest reads the first contest's cvr, with different rules
+    contest_set[2]['cvr_path'] = contest_set[0]['cvr_path']
+    contest_set[2]['parser_args'] = dict(contest_set[0]['parser_args'])
+    contest_set[2]['exhaust_on_overvote'] = True
+
+    assert [[idx for idx, _ in group] for group in batch.contest_groups(list(enumerate(contest_set)))] == [[0, 2], [1]]
+
+    parsed = []
+    parse_contest_cvr = batch.parse_contest_cvr
+
+    def recording_parse(contest):
+        parsed.append(contest['uid'])
+        return parse_contest_cvr(contest)
+
+    monkeypatch.setattr(batch, 'parse_contest_cvr', recording_parse)
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+
+    assert parsed == ['town_2020_a', 'town_2020_b']
+
+    stats = pd.read_csv(tmp_path / 'output' / 'results' / 'SingleWinner.csv')
+    assert stats['unique_id'].tolist() == ['town_2020_a', 'town_2020_b', 'town_2020_a_again']
+    assert stats['winner'].tolist() == ['B', 'E', 'B']
+    assert stats['exhaust_on_overvote_marks'].tolist() == [False, False, True]
+
+
+def test_crunch_contest_set_multi_office_parse(tmp_path, monkeypatch):
+
+    contest_set_dir = write_contest_set(tmp_path, ['a', 'b', 'c', 'd'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+
+    # one cvr holding two offices, with a column per office and rank
+    cvr_path = tmp_path / 'cvr' / 'offices.csv'
+    pd.DataFrame({
+        'mayor1': [row[0] for row in CVR_ROWS['a.csv']],
+        'mayor2': [row[1] for row in CVR_ROWS['a.csv']],
+        'sheriff1': ['D'] * 4 + ['E'] * 5,
+        'sheriff2': ['E'] * 4 + ['D'] * 5
+    }).to_csv(cvr_path, index=False)
+
+    reads = []
+
+    def office_csv_offices(cvr_path, offices):
+        reads.append(list(offices))
+        df = pd.read_csv(cvr_path)
+        return {office: {'ranks': df[[f'{office}1', f'{office}2']].values.tolist()} for office in offices}
+
+    def office_csv(cvr_path, office):
+        return office_csv_offices(cvr_path, [office])[office]
+
+    monkeypatch.setitem(batch.parsers.multi_office_parsers, office_csv, office_csv_offices)
+
+    # the third contest is the first contest's office again, with different rules
+    for contest, office in zip(contest_set, ['mayor', 'sheriff', 'mayor', 'sheriff']):
+        contest['parser'] = office_csv
+        contest['parser_args'] = {'cvr_path': cvr_path, 'office': office}
+    contest_set[2]['exhaust_on_overvote'] = True
+
+    assert [[idx for idx, _ in group] for group in batch.contest_groups(list(enumerate(contest_set)))] == [[0, 1, 2, 3]]
+
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+
+    assert reads == [['mayor', 'sheriff']]
+    stats = pd.read_csv(tmp_path / 'output' / 'results' / 'SingleWinner.csv')
+    assert stats['winner'].tolist() == ['B', 'E', 'B', 'E']
+
+    # an office missing from the cvr fails its own contest only, the others are parsed office by office
+    reads.clear()
+    contest_set[1]['parser_args']['office'] = 'coroner'
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output_missing')
+
+    assert reads == [['mayor', 'coroner', 'sheriff'], ['mayor'], ['coroner'], ['sheriff']]
+    errors = pd.read_csv(tmp_path / 'output_missing' / 'results' / 'error_log.csv')
+    assert errors['contest'].tolist() == ['town_2020_b']
+    assert errors['cruncher_step'].tolist() == ['parse']
+    stats = pd.read_csv(tmp_path / 'output_missing' / 'results' / 'SingleWinner.csv')
+    assert stats.set_index('unique_id')['winner'].to_dict() == {'town_2020_a': 'B', 'town_2020_c': 'B',
+                                                                'town_2020_d': 'E'}
+
+
+def test_crunch_contest_set_work_queue(tmp_path):
+
+    contest_set_dir = write_contest_set(tmp_path, ['b', 'a'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output', jobs=2,
+                             work_queue=tmp_path / 'work_queue.sqlite')
+
+    stats = pd.read_csv(tmp_path / 'output' / 'results' / 'SingleWinner.csv')
+    assert stats['unique_id'].tolist() == ['town_2020_b', 'town_2020_a']
+    assert stats['winner'].tolist() == ['E', 'B']
+    assert (tmp_path / 'output' / 'converted_cvr' / 'rank_format' / 'town_2020_a.csv').is_file()
+
+    with WorkQueue(tmp_path / 'work_queue.sqlite') as queue:
+        assert queue.n_unfinished() == 0
+
+
+def test_crunch_contest_set_writer_threads(tmp_path):
+
+    contest_set_dir = write_contest_set(tmp_path, ['a', 'b'])
+    with open(contest_set_dir / 'run_config.txt', 'a') as f:
+        f.write('compress_converted_cvr = true\n')
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+
+    # the write of a's converted cvr fails in the writer thread
+    rank_dir = tmp_path / 'output' / 'converted_cvr' / 'rank_format'
+    (rank_dir / 'town_2020_a.csv.gz').mkdir(parents=True)
+
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output', writer_threads=2)
+
+    converted = pd.read_csv(rank_dir / 'town_2020_b.csv.gz')
+    assert len(converted) == len(CVR_ROWS['b.csv'])
+
+    results_dir = tmp_path / 'output' / 'results'
+    errors = pd.read_csv(results_dir / 'error_log.csv')
+    assert errors['contest'].tolist() == ['town_2020_a']
+    assert errors['cruncher_step'].tolist() == ['convert_cvr_rank']
+    assert 'IsADirectoryError' in errors['message'][0]
+
+    stats = pd.read_csv(results_dir / 'SingleWinner.csv')
+    assert stats['unique_id'].tolist() == ['town_2020_a', 'town_2020_b']
+
+    with batch.Checkpoint(results_dir) as checkpoint:
+        assert checkpoint.steps('town_2020_a')['convert_cvr_rank']['status'] == 'failed'
+        assert checkpoint.steps('town_2020_b')['convert_cvr_rank']['status'] == 'success'
+
+
+def test_crunch_contest_set_telemetry(tmp_path):
+
+    contest_set_dir = write_contest_set(tmp_path, ['a', 'b'])
+    contest_set, run_config = batch.read_contest_set(contest_set_dir)
+    batch.crunch_contest_set(contest_set, run_config, tmp_path / 'output')
+
+    results_dir = tmp_path / 'output' / 'results'
+    telemetry = pd.read_json(results_dir / 'telemetry.jsonl', lines=True)
+
+    contests = telemetry[telemetry['record'] == 'contest'].set_index('contest')
+    assert contests['n_ballots'].to_dict() == {'town_2020_a': 9, 'town_2020_b': 7}
+    assert contests['n_candidates'].to_dict() == {'town_2020_a': 3, 'town_2020_b': 2}
+    assert contests['n_rounds'].to_dict() == {'town_2020_a': 2, 'town_2020_b': 1}
+    assert (contests['peak_rss_bytes'] > 0).all()
+    assert (contests['wall_seconds'] > 0).all()
+
+    steps = telemetry[telemetry['record'] == 'step'].set_index(['contest', 'step'])
+    converted = results_dir.parent / 'converted_cvr' / 'rank_format' / 'town_2020_a.csv'
+    assert steps.at[('town_2020_a', 'convert_cvr_rank'), 'output_bytes'] == converted.stat().st_size
+    assert contests.at['town_2020_a', 'output_bytes'] == converted.stat().st_size
+    assert (steps['cpu_seconds'] >= 0).all()
+
+    assert 'slowest contests' in (results_dir / 'telemetry_summary.txt').read_text()
@@ -0,0 +1,307 @@
+import pytest
+import decimal
+import gzip
+import zipfile
+
+from rcv_cruncher.cvr.base import CastVoteRecord
+from rcv_cruncher.encoded import (EncodedField, EncodedRanks)
+from rcv_cruncher.marks import BallotMarks
+import rcv_cruncher.inputs as inputs
+import rcv_cruncher.parsers as parsers
+
+
+cvr_csv = "\n".join([
+    "precinct,rank1,rank2,rank3",
+    "P1,1,2,under",
+    "P2,2,over,",
+    "P1,UWI,1,2",
+    "P3,undervote,skipped,under"
+]) + "\n"
+
+candidate_codes_csv = "\n".join([
+    "code,candidate",
+    "1,Alice",
+    "2,Bob"
+]) + "\n"
+
+expected_ranks = [
+    ['Alice', 'Bob', BallotMarks.SKIPPED],
+    ['Bob', BallotMarks.OVERVOTE, BallotMarks.SKIPPED],
+    [BallotMarks.WRITEIN, 'Alice', 'Bob'],
+    [BallotMarks.SKIPPED, BallotMarks.SKIPPED, BallotMarks.SKIPPED]
+]
+
+
+@pytest.fixture
+def cvr_path(tmp_path):
+    (tmp_path / 'cvr.csv').write_text(cvr_csv)
+    (tmp_path / 'candidate_codes.csv').write_text(candidate_codes_csv)
+    return tmp_path / 'cvr.csv'
+
+
+@pytest.mark.parametrize("chunksize", [None, 1, 3])
+def test_cruncher_csv(cvr_path, chunksize):
+
+    parsed = parsers.cruncher_csv(cvr_path, chunksize=chunksize)
+
+    assert isinstance(parsed['ranks'], EncodedRanks)
+    assert parsed['ranks'].to_lists() == expected_ranks
+    assert parsed['ranks'].rank_limit == 3
+    assert parsed['ranks'].unique_candidates() == {'Alice', 'Bob', BallotMarks.WRITEIN}
+    assert isinstance(parsed['precinct'], EncodedField)
+    assert parsed['precinct'].to_list() == ['P1', 'P2', 'P1', 'P3']
+    assert parsed['weight'] == [decimal.Decimal('1')] * 4
+
+
+def test_cruncher_csv_blank_metadata(tmp_path):
+
+    (tmp_path / 'cvr.csv').write_text("precinct,rank1,rank2\nP1,Alice,Bob\n,Bob,\n")
+
+    parsed = parsers.cruncher_csv(tmp_path / 'cvr.csv')
+
+    assert parsed['precinct'].to_list() == ['P1', BallotMarks.SKIPPED]
+    assert parsed['ranks'].to_lists() == [['Alice', 'Bob'], ['Bob', BallotMarks.SKIPPED]]
+
+
+def test_cruncher_csv_cvr(cvr_path):
+
+    cvr = CastVoteRecord(parser_func=parsers.cruncher_csv, parser_args={'cvr_path': cvr_path})
+    assert [b.marks for b in cvr.get_cvr_dict()['ballot_marks']] == expected_ranks
+
+
+def optech_master_row(mapping, key, value, contest_id=''):
+    return f'{mapping:<10}{key:>7}{value:<50}{"":7}{contest_id:>7}\n'
+
+
+def optech_ballot_row(contest_id, voter_id, tally_type, precinct_id, rank, candidate_id, skipped, overvote):
+    return f'{contest_id:07d}{voter_id:09d}{0:07d}{tally_type:03d}{precinct_id:07d}{rank:03d}{candidate_id:07d}{skipped}{overvote}'
+
+
+def test_optech1(tmp_path):
+
+    (tmp_path / 'MasterLookup.txt').write_text(''.join([
+        optech_master_row('Contest', '0000001', 'Mayor'),
+        optech_master_row('Contest', '0000002', 'Sheriff'),
+        optech_master_row('Candidate', '0000001', 'Alice', '0000001'),
+        optech_master_row('Candidate', '0000002', 'Write-In', '0000001'),
+        optech_master_row('Candidate', '0000003', 'Zed', '0000002'),
+        optech_master_row('Precinct', '0000001', 'Pct 1'),
+        optech_master_row('Precinct', '0000002', 'Pct 2'),
+        optech_master_row('Tally Type', '0000001', 'Election Day')
+    ]))
+
+    # voter 7 appears first, lines are out of rank order, last line has no trailing newline
+    (tmp_path / 'BallotImage.txt').write_text('\n'.join([
+        optech_ballot_row(1, 7, 1, 2, 2, 0, 0, 1),
+        optech_ballot_row(2, 7, 1, 2, 1, 3, 0, 0),
+        optech_ballot_row(1, 3, 1, 1, 1, 2, 0, 0),
+        optech_ballot_row(1, 7, 1, 2, 1, 1, 0, 0),
+        optech_ballot_row(1, 3, 1, 1, 2, 0, 1, 0)
+    ]))
+
+    parsed = parsers.optech1(tmp_path, 'Mayor')
+
+    assert parsed['ranks'].to_lists() == [['Alice', BallotMarks.OVERVOTE], [BallotMarks.WRITEIN, BallotMarks.SKIPPED]]
+    assert parsed['ballotID'] == ['000000007', '000000003']
+    assert parsed['precinct'] == ['Pct 2', 'Pct 1']
+    assert parsed['tally_type'] == ['Election Day', 'Election Day']
+
+    # both offices read in one pass
+    offices = parsers.optech1_offices(tmp_path, ['Mayor', 'Sheriff'])
+    assert offices['Mayor']['ranks'].to_lists() == parsed['ranks'].to_lists()
+    assert offices['Sheriff']['ranks'].to_lists() == [['Zed']]
+    assert offices['Sheriff']['ballotID'] == ['000000007']
+
+
+def test_read_fixed_width_fields_ragged(tmp_path):
+
+    field_slices = {'name': (0, 4), 'value': (5, 7)}
+
+    (tmp_path / 'uniform.txt').write_bytes(b'AAAA 11\nBBBB 22\nCCCC 33')
+    fields = parsers._read_fixed_width_fields(tmp_path / 'uniform.txt', field_slices)
+    assert fields['name'].tolist() == [b'AAAA', b'BBBB', b'CCCC']
+    assert fields['value'].tolist() == [b'11', b'22', b'33']
+
+    # a short line and a blank line must not shift the fields of later records
+    (tmp_path / 'ragged.txt').write_bytes(b'AAAA 11\nBBBB 22\nCC\n\nDDDD 44\n')
+    fields = parsers._read_fixed_width_fields(tmp_path / 'ragged.txt', field_slices)
+    assert fields['name'].tolist() == [b'AAAA', b'BBBB', b'CC  ', b'DDDD']
+    assert fields['value'].tolist() == [b'11', b'22', b'  ', b'44']
+
+
+CDF_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<CastVoteRecordReport xmlns="http://itl.nist.gov/ns/voting/1500-103/v1">
+  <CVR>
+    <BallotStyleUnitId>gp-1</BallotStyleUnitId>
+    <CurrentSnapshotId>s-1b</CurrentSnapshotId>
+    <CVRSnapshot ObjectId="s-1a">
+      <CVRContest>
+        <ContestId>c-mayor</ContestId>
+        <CVRContestSelection>
+          <ContestSelectionId>cs-bob</ContestSelectionId>
+          <SelectionPosition><HasIndication>yes</HasIndication><Rank>1</Rank></SelectionPosition>
+        </CVRContestSelection>
+      </CVRContest>
+    </CVRSnapshot>
+    <CVRSnapshot ObjectId="s-1b">
+      <CVRContest>
+        <ContestId>c-mayor</ContestId>
+        <CVRContestSelection>
+          <ContestSelectionId>cs-alice</ContestSelectionId>
+          <SelectionPosition><HasIndication>yes</HasIndication><Rank>1</Rank></SelectionPosition>
+        </CVRContestSelection>
+        <CVRContestSelection>
+          <ContestSelectionId>cs-bob</ContestSelectionId>
+          <SelectionPosition><HasIndication>yes</HasIndication><Rank>3</Rank></SelectionPosition>
+        </CVRContestSelection>
+      </CVRContest>
+    </CVRSnapshot>
+    <UniqueId>b-1</UniqueId>
+  </CVR>
+  <CVR>
+    <BallotStyleUnitId>gp-2</BallotStyleUnitId>
+    <CurrentSnapshotId>s-2</CurrentSnapshotId>
+    <CVRSnapshot ObjectId="s-2">
+      <CVRContest>
+        <ContestId>c-mayor</ContestId>
+        <CVRContestSelection>
+          <ContestSelectionId>cs-alice</ContestSelectionId>
+          <SelectionPosition><HasIndication>yes</HasIndication><Rank>1</Rank></SelectionPosition>
+        </CVRContestSelection>
+        <CVRContestSelection>
+          <ContestSelectionId>cs-bob</ContestSelectionId>
+          <SelectionPosition><HasIndication>yes</HasIndication><Rank>1</Rank></SelectionPosition>
+          <SelectionPosition><HasIndication>no</HasIndication><Rank>2</Rank></SelectionPosition>
+        </CVRContestSelection>
+        <CVRContestSelection>
+          <ContestSelectionId>cs-wi</ContestSelectionId>
+          <SelectionPosition><HasIndication>yes</HasIndication><Rank>2</Rank></SelectionPosition>
+        </CVRContestSelection>
+      </CVRContest>
+    </CVRSnapshot>
+    <UniqueId>b-2</UniqueId>
+  </CVR>
+  <Election>
+    <Candidate ObjectId="cand-alice"><Name>Alice</Name></Candidate>
+    <Candidate ObjectId="cand-bob"><Name>Bob</Name></Candidate>
+    <Contest ObjectId="c-mayor">
+      <Name>Mayor</Name>
+      <ContestSelection ObjectId="cs-alice"><CandidateIds>cand-alice</CandidateIds></ContestSelection>
+      <ContestSelection ObjectId="cs-bob"><CandidateIds>cand-bob</CandidateIds></ContestSelection>
+      <ContestSelection ObjectId="cs-wi"><IsWriteIn>true</IsWriteIn></ContestSelection>
+    </Contest>
+  </Election>
+  <GpUnit ObjectId="gp-1"><Name>Precinct 1</Name></GpUnit>
+  <GpUnit ObjectId="gp-2"><Name>Precinct 2</Name></GpUnit>
+</CastVoteRecordReport>
+"""
+
+
+
+def test_common_data_format(tmp_path):
+
+    (tmp_path / 'cvr.xml').write_text(CDF_XML)
+
+    parsed = parsers.common_data_format(tmp_path, office='Mayor')
+
+    assert parsed['ranks'].to_lists() == [
+        ['Alice', BallotMarks.SKIPPED, 'Bob'],
+        [BallotMarks.OVERVOTE, BallotMarks.WRITEIN, BallotMarks.SKIPPED]
+    ]
+    assert parsed['ballotID'] == ['b-1', 'b-2']
+    assert parsed['precinct'] == ['Precinct 1', 'Precinct 2']
+    assert parsed['weight'] == [decimal.Decimal('1')] * 2
+    assert 'tabulator' not in parsed
+
+    assert parsers.common_data_format(tmp_path / 'cvr.xml')['ballotID'] == ['b-1', 'b-2']
+
+    with pytest.raises(RuntimeError):
+        parsers.common_data_format(tmp_path, office='Council')
+
+
+def test_common_data_format_zip(tmp_path, monkeypatch):
+
+    with zipfile.ZipFile(tmp_path / 'cvr.zip', 'w') as zf:
+        zf.writestr('cdf/cvr.xml.gz', gzip.compress(CDF_XML.encode('utf8')))
+
+    opened = []
+
+    class RecordedZipFile(zipfile.ZipFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(inputs.zipfile, 'ZipFile', RecordedZipFile)
+
+    parsed = parsers.common_data_format(tmp_path / 'cvr.zip', office='Mayor')
+    assert parsed['ballotID'] == ['b-1', 'b-2']
+
+    # the parser closes the archive it opened
+    assert opened and all(zf.fp is None for zf in opened)
+
+
+def unisyn_cvr(*rank_positions):
+    contests = ''.join(
+        f'<CVRContest><ContestId>c-rank{rank}</ContestId><CVRContestSelection>'
+        + ''.join(f'<SelectionPosition><Position>{p}</Position></SelectionPosition>' for p in positions)
+        + ('' if positions else '<TotalNumberVotes>0</TotalNumberVotes>')
+        + f'<Rank>{rank}</Rank></CVRContestSelection></CVRContest>'
+        for rank, positions in enumerate(rank_positions, start=1))
+    return f'<CVR><CVRSnapshot ObjectId="s">{contests}</CVRSnapshot></CVR>'
+
+
+def test_unisyn(tmp_path):
+
+    (tmp_path / 'cvr.xml').write_text(
+        '<CastVoteRecordReport xmlns="http://itl.nist.gov/ns/voting/1500-103/v1">'
+        + unisyn_cvr(['cand-alice'], ['cand-bob'])
+        # a CVR without a snapshot is skipped
+        + '<CVR><UniqueId>empty</UniqueId></CVR>'
+        + unisyn_cvr(['cand-bob'], [])
+        + unisyn_cvr(['cand-alice', 'cand-bob'], ['cand-alice'])
+        + '<Election><Candidate ObjectId="cand-alice"><Name>Alice</Name></Candidate>'
+        + '<Candidate ObjectId="cand-bob"><Name>Bob</Name></Candidate></Election>'
+        + '</CastVoteRecordReport>')
+
+    expected = [['Alice', 'Bob'], ['Bob', BallotMarks.SKIPPED], [BallotMarks.OVERVOTE, 'Alice']]
+    assert parsers.unisyn(tmp_path / 'cvr.xml')['ranks'].to_lists() == expected
+    assert parsers.unisyn(tmp_path / 'cvr.xml', chunk_size=1)['ranks'].to_lists() == expected
+
+
+def test_unisyn_errors(tmp_path):
+
+    def write_cvr(*cvrs):
+        (tmp_path / 'cvr.xml').write_text(
+            '<CastVoteRecordReport xmlns="http://itl.nist.gov/ns/voting/1500-103/v1">' + ''.join(cvrs)
+            + '<Election><Candidate ObjectId="cand-alice"><Name>Alice</Name></Candidate></Election>'
+            + '</CastVoteRecordReport>')
+
+    # two selections in one rank contest would shift every later ballot
+    two_selections = unisyn_cvr(['cand-alice']).replace(
+        '</CVRContest>', '<CVRContestSelection><TotalNumberVotes>0</TotalNumberVotes><Rank>1</Rank>'
+                         '</CVRContestSelection></CVRContest>')
+    write_cvr(unisyn_cvr(['cand-alice']), two_selections)
+    with pytest.raises(RuntimeError, match='more than one contest selection'):
+        parsers.unisyn(tmp_path / 'cvr.xml')
+
+    # a rank contest without any selections has no rank
+    no_selections = '<CVR><CVRSnapshot ObjectId="s"><CVRContest><ContestId>c-rank2</ContestId></CVRContest></CVRSnapshot></CVR>'
+    write_cvr(unisyn_cvr(['cand-alice']), no_selections)
+    with pytest.raises(RuntimeError, match='c-rank2 used for a rank has no contest selections'):
+        parsers.unisyn(tmp_path / 'cvr.xml')
+
+
+def test_read_common_data_format_shared_contest_name(tmp_path):
+
+    # a second contest named Mayor, with its own ballots
+    second_contest = CDF_XML.replace('c-mayor', 'c-mayor-2').replace('cs-', 'cs2-')
+    cvrs = second_contest[second_contest.index('<CVR>'):second_contest.index('<Election>')]
+    contest = second_contest[second_contest.index('<Contest '):second_contest.index('</Election>')]
+    (tmp_path / 'cvr.xml').write_text(CDF_XML.replace('<Election>', cvrs + '<Election>')
+                                      .replace('</Election>', contest + '</Election>'))
+
+    parsed = parsers.read_common_data_format(tmp_path / 'cvr.xml')
+
+    assert sorted(parsed) == ['c-mayor', 'c-mayor-2']
+    assert parsed['c-mayor']['ranks'].to_lists() == parsed['c-mayor-2']['ranks'].to_lists()
+    assert parsers.common_data_format(tmp_path, office='c-mayor-2')['ballotID'] == ['b-1', 'b-2']
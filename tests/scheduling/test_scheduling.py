@@ -0,0 +1,79 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+import rcv_cruncher.scheduling as scheduling
+
+MB = 1024 ** 2
+
+
+@pytest.mark.parametrize("pending, in_use, budget, n_running, expected", [
+    ([], 0, None, 0, None),
+    ([('a', 900 * MB), ('b', 300 * MB)], 0, None, 2, 0),
+    # the largest contest that fits
+    ([('a', 900 * MB), ('b', 300 * MB), ('c', 200 * MB)], 600 * MB, 1000 * MB, 1, 1),
+    ([('a', 900 * MB), ('b', 300 * MB)], 900 * MB, 1000 * MB, 1, None),
+    # with nothing running, the largest runs even over budget
+    ([('a', 2000 * MB), ('b', 300 * MB)], 0, 1000 * MB, 0, 0)
+])
+def test_next_admissible(pending, in_use, budget, n_running, expected):
+    assert scheduling.next_admissible(pending, in_use, budget, n_running) == expected
+
+
+def csv_parser(cvr_path):
+    pass
+
+
+def other_parser(cvr_path):
+    pass
+
+
+def test_memory_estimator(tmp_path):
+
+    for name, size in [('a.csv', 100 * MB), ('b.csv', 60 * MB), ('c.csv', 10)]:
+        with open(tmp_path / name, 'wb') as f:
+            f.truncate(size)
+
+    estimator = scheduling.MemoryEstimator({
+        'a': {'parser': 'csv_parser', 'input_bytes': 100 * MB, 'peak_rss': 700 * MB},
+        'x': {'parser': 'csv_parser', 'input_bytes': 10 * MB, 'peak_rss': 30 * MB},
+        'y': {'parser': 'csv_parser', 'input_bytes': 10 * MB, 'peak_rss': 50 * MB}
+    })
+
+    def contest(uid, file_name, parser):
+        return {'uid': uid, 'cvr_path': tmp_path / file_name, 'parser': parser}
+
+    # measured before, with the same input size
+    assert estimator.estimate(contest('a', 'a.csv', csv_parser)) == 700 * MB
+    # median measured ratio of the parser
+    assert estimator.estimate(contest('b', 'b.csv', csv_parser)) == 60 * MB * 5
+    # no measurements of the parser
+    assert estimator.estimate(contest('b', 'b.csv', other_parser)) == 60 * MB * scheduling.DEFAULT_BYTES_PER_INPUT_BYTE
+    # never below the minimum
+    assert estimator.estimate(contest('c', 'c.csv', csv_parser)) == scheduling.MIN_CONTEST_BYTES
+
+
+def test_input_bytes(tmp_path):
+
+    (tmp_path / 'cvr').mkdir()
+    (tmp_path / 'cvr' / 'a.csv').write_bytes(b'x' * 10)
+    (tmp_path / 'cvr' / 'b.csv').write_bytes(b'x' * 5)
+    with zipfile.ZipFile(tmp_path / 'export.zip', 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('exp/a.csv', b'x' * 1000)
+        zf.writestr('exp/sub/b.csv', b'x' * 200)
+
+    assert scheduling.input_bytes({'cvr_path': tmp_path / 'cvr' / 'a.csv'}) == 10
+    assert scheduling.input_bytes({'cvr_path': tmp_path / 'cvr'}) == 15
+    assert scheduling.input_bytes({'cvr_path': tmp_path / 'export.zip' / 'exp' / 'a.csv'}) == 1000
+    assert scheduling.input_bytes({'cvr_path': tmp_path / 'export.zip' / 'exp' / 'sub'}) == 200
+    assert scheduling.input_bytes({'cvr_path': tmp_path / 'export.zip' / 'exp' / 'missing.csv'}) == 0
+    assert scheduling.input_bytes({'cvr_path': None}) == 0
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='reads /proc')
+def test_process_rss():
+
+    assert scheduling.process_rss(os.getpid()) > 0
+    assert scheduling.process_rss(-1) is None
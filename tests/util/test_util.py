@@ -0,0 +1,61 @@
+
+import decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import rcv_cruncher.util as util
+
+D = decimal.Decimal
+
+
+@pytest.mark.parametrize("round_places", [0, 2, 3])
+def test_round_floats(round_places):
+
+    # includes values whose scaled form lands on or next to .5
+    values = np.array([2.675, 1.0005, 0.0015, 0.125, -2.5, 1 / 3, 1e20 + 0.5, float('nan'), float('inf')])
+    expected = [round(float(v), round_places) for v in values]
+    assert np.array_equal(util.round_floats(values, round_places), expected, equal_nan=True)
+
+
+def test_decimal2float_frame():
+
+    def column(values):
+        col = np.empty(len(values), dtype=object)
+        col[:] = values
+        return col
+
+    df = pd.DataFrame({
+        'decimals': column([D(1) / D(3), D('2.5'), util.NAN]),
+        'decimal_and_int': column([D('0.0005'), 0, D('7')]),
+        'decimal_and_none': column([D('1.5'), None, D('2')]),
+        'tuples': column([(False,), (True,), (False,)]),
+        'strings': column(['a', 'b', D('1')]),
+        'ints': column([1, 2, 3]),
+        'bools': [True, False, True],
+        'floats': [0.5, 1.5, 2.5]
+    })
+
+    expected = df.applymap(util.decimal2float)
+    converted = util.decimal2float_frame(df)
+
+    pd.testing.assert_frame_equal(converted, expected, check_exact=True)
+    assert converted['decimals'].dtype == np.float64
+    assert converted['decimal_and_int'].tolist() == [0.001, 0.0, 7.0]
+
+
+@pytest.mark.parametrize("size, expected", [
+    (512, 512),
+    ('512', 512),
+    ('1K', 1024),
+    ('1.5G', int(1.5 * 1024 ** 3)),
+    ('2gb', 2 * 1024 ** 3)
+])
+def test_parse_bytes(size, expected):
+    assert util.parse_bytes(size) == expected
+
+
+def test_parse_bytes_invalid():
+    with pytest.raises(RuntimeError):
+        util.parse_bytes('lots')